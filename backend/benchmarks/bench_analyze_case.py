@@ -0,0 +1,78 @@
+"""
+Benchmark for the rule-based case analysis (/ai/analyze-case and /ai/analyze-case/batch).
+
+Run from backend/:
+    python benchmarks/bench_analyze_case.py [--cases 5000] [--rounds 5]
+
+Fails (exit code 1) if the mean per-case cost is not below 1 ms.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.clinical_rules import analyze_case_batch, RED_FLAG_SYMPTOM_PATTERNS, DIAGNOSIS_PATTERNS  # noqa: E402
+
+BUDGET_MS_PER_CASE = 1.0
+
+FILLER = ["patient", "came", "with", "since", "2 days", "mild", "history of", "no", "known", "allergies"]
+
+
+def make_cases(n, seed=42):
+    """Synthetic board of cases with realistic-length complaints and mixed vitals formats"""
+    rng = random.Random(seed)
+    keywords = [k for p in RED_FLAG_SYMPTOM_PATTERNS for k in p[0]] + [k for p in DIAGNOSIS_PATTERNS for k in p[0]]
+    cases = []
+    for _ in range(n):
+        words = rng.sample(keywords, rng.randint(0, 4)) + rng.choices(FILLER, k=rng.randint(5, 25))
+        rng.shuffle(words)
+        cases.append({
+            "symptoms": " ".join(words),
+            "history": " ".join(rng.choices(FILLER + keywords, k=rng.randint(0, 30))),
+            "vitals": {
+                "hr": str(rng.randint(35, 170)),
+                "bp_systolic": rng.randint(70, 200),
+                "spo2": rng.choice([82, 91, 96, 99, "98"]),
+                "temperature": round(rng.uniform(34.5, 41.0), 1),
+                "rr": rng.randint(6, 40),
+                "gcs": rng.choice([15, 15, 14, 10, 7]),
+                "grbs": rng.choice([None, 45, 65, 110, 420]),
+            },
+        })
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = make_cases(args.cases)
+    analyze_case_batch(cases[:100])  # warm up
+
+    timings = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        analyze_case_batch(cases)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    best = min(timings)
+    mean = sum(timings) / len(timings)
+    per_case = mean / args.cases
+    print(f"cases per round : {args.cases}")
+    print(f"batch time      : best {best:.1f} ms, mean {mean:.1f} ms over {args.rounds} rounds")
+    print(f"per case        : {per_case * 1000:.1f} µs (budget {BUDGET_MS_PER_CASE * 1000:.0f} µs)")
+
+    if per_case >= BUDGET_MS_PER_CASE:
+        print("FAIL: per-case cost exceeds budget")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
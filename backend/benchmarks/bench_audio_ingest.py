@@ -0,0 +1,141 @@
+"""
+Benchmark for in-memory audio ingestion (utils/audio_ingest.py) against the
+old temp-file path of transcribe_with_openai_whisper: read the whole upload,
+write it to a NamedTemporaryFile, reopen it for the upload, unlink.
+
+Run from backend/:
+    python benchmarks/bench_audio_ingest.py [--concurrency 10] [--minutes 5]
+
+Each round ingests `concurrency` recordings of `minutes` minutes at once, in
+the formats the mobile app sends, and hands each to a fake STT upload that
+reads the body in 64 KB chunks. Uploads start in Starlette's spooled
+multipart buffer, as they would in a request. Reports wall time, peak Python
+heap (tracemalloc) and temp files left behind when the STT call fails.
+"""
+
+import argparse
+import asyncio
+import glob
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.datastructures import UploadFile  # noqa: E402
+
+from utils.audio_ingest import read_upload  # noqa: E402
+
+# Bytes per second of audio
+FORMATS = {
+    "webm/opus 32 kbps": 32_000 // 8,
+    "m4a/aac 64 kbps": 64_000 // 8,
+    "wav 16 kHz mono": 16_000 * 2,
+}
+SPOOL_MAX_SIZE = 1024 * 1024  # Starlette's multipart spool threshold
+UPLOAD_CHUNK = 64 * 1024
+
+
+class STTFailed(Exception):
+    pass
+
+
+def make_upload(size):
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    block = os.urandom(UPLOAD_CHUNK)
+    written = 0
+    while written < size:
+        spool.write(block[:min(UPLOAD_CHUNK, size - written)])
+        written += min(UPLOAD_CHUNK, size - written)
+    spool.seek(0)
+    return UploadFile(spool, size=size, filename="recording.webm")
+
+
+async def fake_stt(file, fail):
+    """Consume the body the way an HTTP client streams a multipart upload"""
+    total = 0
+    while True:
+        chunk = file.read(UPLOAD_CHUNK)
+        if not chunk:
+            break
+        total += len(chunk)
+        await asyncio.sleep(0)
+    if fail:
+        raise STTFailed()
+    return total
+
+
+async def legacy_ingest(upload, fail):
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".webm", prefix="bench_audio_") as temp_audio:
+        content = await upload.read()
+        temp_audio.write(content)
+        temp_audio_path = temp_audio.name
+    with open(temp_audio_path, "rb") as audio_file:
+        total = await fake_stt(audio_file, fail)
+    os.unlink(temp_audio_path)
+    return total
+
+
+async def memory_ingest(upload, fail):
+    try:
+        clip = await read_upload(upload)
+    finally:
+        await upload.close()
+    # The STT call uploads clip.multipart(); BytesIO over bytes shares the buffer
+    _, data, _ = clip.multipart()
+    return await fake_stt(io.BytesIO(data), fail)
+
+
+async def run_round(ingest, size, concurrency, fail=False):
+    uploads = [make_upload(size) for _ in range(concurrency)]
+    tracemalloc.start()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(ingest(upload, fail) for upload in uploads), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for upload in uploads:
+        upload.file.close()
+    errors = [r for r in results if isinstance(r, Exception) and not isinstance(r, STTFailed)]
+    if errors:
+        raise errors[0]
+    return elapsed * 1000, peak / (1024 * 1024)
+
+
+def leftover_temp_files():
+    return glob.glob(os.path.join(tempfile.gettempdir(), "bench_audio_*"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.concurrency} concurrent recordings of {args.minutes:g} min\n")
+    print(f"{'format':<20} {'size':>8} {'path':<8} {'wall ms':>9} {'peak MB':>9}")
+    for name, rate in FORMATS.items():
+        size = int(rate * args.minutes * 60)
+        for label, ingest in (("tempfile", legacy_ingest), ("memory", memory_ingest)):
+            runs = [asyncio.run(run_round(ingest, size, args.concurrency)) for _ in range(args.repeat)]
+            wall = min(r[0] for r in runs)
+            peak = max(r[1] for r in runs)
+            print(f"{name:<20} {size / (1024 * 1024):>6.1f}MB {label:<8} {wall:>9.1f} {peak:>9.1f}")
+
+    before = set(leftover_temp_files())
+    size = int(FORMATS["webm/opus 32 kbps"] * args.minutes * 60)
+    asyncio.run(run_round(legacy_ingest, size, args.concurrency, fail=True))
+    leaked = set(leftover_temp_files()) - before
+    asyncio.run(run_round(memory_ingest, size, args.concurrency, fail=True))
+    print(f"\nTemp files left after {args.concurrency} failed STT calls: "
+          f"tempfile {len(leaked)}, memory {len(set(leftover_temp_files()) - before - leaked)}")
+    for path in leaked:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark for STT audio preprocessing (utils/audio_preprocess.py): how much
+smaller and shorter a typical dictation gets, and what it costs in CPU.
+
+Run from backend/:
+    python benchmarks/bench_audio_preprocess.py [--minutes 2] [--speech 0.6]
+
+Synthesises 44.1 kHz stereo 16-bit recordings: bursts of amplitude-modulated
+harmonics ("speech") separated by pauses of 0.3-6 s over a low noise floor,
+with `speech` the share of time spoken. Reports upload bytes and audio seconds
+before / after, and preprocessing wall time (best of --repeat). At 176 KB/s,
+recordings over about 2.4 minutes exceed the upload limit and are skipped.
+"""
+
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.audio_ingest import DEFAULT_MAX_AUDIO_BYTES  # noqa: E402
+from utils.audio_preprocess import preprocess_audio  # noqa: E402
+
+RATE = 44100
+
+
+def synth_recording(minutes, speech_share, seed=0):
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * RATE)
+    signal = rng.standard_normal(total).astype(np.float32) * 0.002
+    position = int(rng.uniform(0.5, 2.0) * RATE)
+    mean_burst = 3.0
+    mean_pause = mean_burst * (1 - speech_share) / speech_share
+    while position < total:
+        length = min(int(rng.exponential(mean_burst) * RATE) + RATE // 2, total - position)
+        t = np.arange(length) / RATE
+        pitch = rng.uniform(100, 220)
+        voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)
+        signal[position:position + length] += (0.15 * voice * envelope).astype(np.float32)
+        position += length + int(min(max(rng.exponential(mean_pause), 0.3), 6.0) * RATE)
+    stereo = np.stack([signal, signal * 0.95], axis=1)
+    pcm = (np.clip(stereo, -1, 1) * 32767).astype("<i2").tobytes()
+    header = struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + len(pcm), b"WAVE", b"fmt ", 16, 1, 2, RATE,
+                         RATE * 4, 4, 16, b"data", len(pcm))
+    return header + pcm
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=2)
+    parser.add_argument("--speech", type=float, default=0.6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'length':>7} {'speech':>7} {'bytes before':>13} {'after':>10} {'seconds before':>15} {'after':>8} {'ms':>8}")
+    for minutes in (0.5, 1, args.minutes):
+        data = synth_recording(minutes, args.speech)
+        if len(data) > DEFAULT_MAX_AUDIO_BYTES:
+            print(f"{minutes:>5g}m skipped: {len(data):,} bytes is over the {DEFAULT_MAX_AUDIO_BYTES:,}-byte upload limit")
+            continue
+        reports = [preprocess_audio(data)[1] for _ in range(args.repeat)]
+        report = reports[0]
+        ms = min(r["ms"] for r in reports)
+        print(f"{minutes:>5g}m {args.speech:>7.0%} {report['original_bytes']:>13,} {report['bytes']:>10,} "
+              f"{report['original_seconds']:>15.1f} {report['seconds']:>8.1f} {ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark for chunked transcription (utils/audio_chunking.py): end-to-end
+latency of one STT call on the whole recording against concurrent chunks cut
+at pauses.
+
+Run from backend/:
+    python benchmarks/bench_chunked_transcription.py [--concurrency 4] [--rtf 0.15]
+
+The STT engine is simulated: a call takes `overhead` seconds plus `rtf` times
+the audio length (Whisper-like real-time factor), with --failure-rate of calls
+failing and being retried. Audio is 16 kHz mono dictation: bursts of tone
+separated by 0.3-1.5 s pauses. Splitting time is included in the chunked
+figures.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.audio_chunking import split_audio, transcribe_chunks  # noqa: E402
+from utils.audio_preprocess import encode_wav, parse_wav  # noqa: E402
+
+RATE = 16000
+
+
+class STTFailed(Exception):
+    pass
+
+
+def synth_dictation(minutes, seed=0):
+    rng = np.random.default_rng(seed)
+    parts, total = [], 0.0
+    while total < minutes * 60:
+        burst = rng.uniform(2, 8)
+        t = np.arange(int(burst * RATE)) / RATE
+        parts.append(0.3 * np.sin(2 * np.pi * rng.uniform(100, 220) * t))
+        pause = rng.uniform(0.3, 1.5)
+        parts.append(0.002 * rng.standard_normal(int(pause * RATE)))
+        total += burst + pause
+    return encode_wav(np.concatenate(parts), RATE)
+
+
+def fake_engine(overhead, rtf, failure_rate):
+    async def transcribe(audio):
+        samples, rate = parse_wav(audio)
+        await asyncio.sleep(overhead + rtf * len(samples) / rate)
+        if random.random() < failure_rate:
+            raise STTFailed()
+        return "text"
+    return transcribe
+
+
+async def single_call(data, engine):
+    started = time.perf_counter()
+    for _ in range(3):
+        try:
+            await engine(data)
+            break
+        except STTFailed:
+            continue
+    return time.perf_counter() - started, 1
+
+
+async def chunked_call(data, engine, concurrency):
+    started = time.perf_counter()
+    chunks = await asyncio.to_thread(split_audio, data)
+    results = await transcribe_chunks(chunks, lambda chunk: engine(chunk.data), concurrency=concurrency,
+                                      retries=2, retry_base_seconds=0.05)
+    longest = max(chunk.seconds for chunk, _, _ in results)
+    return time.perf_counter() - started, len(chunks), longest
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rtf", type=float, default=0.15)
+    parser.add_argument("--overhead", type=float, default=0.4)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    args = parser.parse_args()
+    random.seed(0)
+    engine = fake_engine(args.overhead, args.rtf, args.failure_rate)
+
+    print(f"simulated STT: {args.overhead}s + {args.rtf} x audio, {args.failure_rate:.0%} failures; "
+          f"fan-out {args.concurrency}\n")
+    print(f"{'length':>7} {'single s':>9} {'chunked s':>10} {'chunks':>7} {'longest chunk s':>16}")
+    for minutes in (1, 2, 5, 10):
+        data = synth_dictation(minutes)
+        single, _ = asyncio.run(single_call(data, engine))
+        chunked, count, longest = asyncio.run(chunked_call(data, engine, args.concurrency))
+        print(f"{minutes:>5}m {single:>9.2f} {chunked:>10.2f} {count:>7} {longest:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Prompt size before/after the case digest (utils/case_digest.py) for every
+/ai/generate prompt type, and what a case conversation (utils/conversations.py)
+actually sends on repeat analyses compared with a fresh full prompt.
+
+Run from backend/:
+    python benchmarks/bench_prompt_tokens.py [--encoding o200k_base]
+
+Token counts use tiktoken when the encoding can be loaded; otherwise (e.g. no
+network access to fetch the BPE file) they fall back to a chars/4 estimate,
+which the output labels as such.
+"""
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.legacy_case_prompts import build_legacy_case_prompt  # noqa: E402
+from utils.ai_prompts import build_case_prompt, build_delta_prompt  # noqa: E402
+from utils.case_digest import build_case_digest, case_field_values  # noqa: E402
+from utils.conversations import ConversationStore  # noqa: E402
+
+PROMPT_TYPES = ["red_flags", "diagnosis_suggestions", "discharge_summary"]
+
+
+def token_counter(encoding_name):
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(encoding_name)
+        return lambda text: len(encoding.encode(text)), f"tiktoken {encoding_name}"
+    except Exception as e:
+        print(f"tiktoken unavailable ({type(e).__name__}); using chars/4 estimate")
+        return lambda text: (len(text) + 3) // 4, "chars/4 estimate"
+
+
+def default_sections():
+    """Section defaults as stored by POST /cases (model defaults)"""
+    return {
+        "primary_assessment": {
+            "airway_status": "Patent", "airway_obstruction": [], "airway_interventions": [], "airway_notes": "",
+            "airway_additional_notes": "", "breathing_rr": None, "breathing_spo2": None, "breathing_oxygen_device": "",
+            "breathing_oxygen_flow": None, "breathing_work": "", "breathing_air_entry": [], "breathing_adjuncts": [],
+            "breathing_notes": "", "breathing_additional_notes": "", "circulation_hr": None,
+            "circulation_bp_systolic": None, "circulation_bp_diastolic": None, "circulation_crt": None,
+            "circulation_neck_veins": "", "circulation_peripheral_pulses": "", "circulation_external_bleed": False,
+            "circulation_long_bone_deformity": False, "circulation_adjuncts": [], "circulation_notes": "",
+            "circulation_additional_notes": "", "disability_avpu": "", "disability_gcs_e": None,
+            "disability_gcs_v": None, "disability_gcs_m": None, "disability_pupils_size": "",
+            "disability_pupils_reaction": "", "disability_grbs": None, "disability_seizure": False,
+            "disability_notes": "", "disability_additional_notes": "", "exposure_temperature": None,
+            "exposure_logroll_findings": [], "exposure_local_exam_notes": "", "exposure_additional_notes": "",
+            "ecg_findings": "", "bedside_echo_findings": "", "adjuvants_additional_notes": "",
+        },
+        "history": {
+            "hpi": "", "hpi_additional_notes": "", "signs_and_symptoms": "", "secondary_survey_neuro": [],
+            "secondary_survey_resp": [], "secondary_survey_cardiac": [], "secondary_survey_gi": [],
+            "secondary_survey_gu": [], "secondary_survey_msk": [], "secondary_survey_notes": "",
+            "secondary_survey_additional_notes": "", "past_medical": [], "past_medical_additional_notes": "",
+            "past_surgical": "", "past_surgical_additional_notes": "", "drug_history": "", "family_history": "",
+            "family_gyn_additional_notes": "", "gyn_history": "", "lmp": "", "allergies": [],
+            "allergies_additional_notes": "", "psychological_assessment": {}, "psychological_additional_notes": "",
+        },
+        "examination": {
+            "general_pallor": False, "general_icterus": False, "general_clubbing": False,
+            "general_lymphadenopathy": False, "general_thyroid": "Normal", "general_varicose_veins": False,
+            "general_notes": "", "general_additional_notes": "", "cvs_status": "Normal", "cvs_additional_notes": "",
+            "respiratory_status": "Normal", "respiratory_additional_notes": "", "abdomen_status": "Normal",
+            "abdomen_additional_notes": "", "cns_status": "Normal", "cns_additional_notes": "",
+            "extremities_status": "Normal", "extremities_findings": "", "extremities_additional_notes": "",
+        },
+        "investigations": {"panels_selected": [], "individual_tests": [], "results_notes": ""},
+        "treatment": {"interventions": [], "intervention_notes": "", "provisional_diagnoses": [], "differential_diagnoses": []},
+    }
+
+
+def sample_cases():
+    patient = {"name": "Ravi Kumar", "age": "58", "sex": "Male", "uhid": "UH-20391", "mlc": False,
+               "mode_of_arrival": "Ambulance", "nature_of_accident": [], "mechanism_of_injury": []}
+
+    triage_only = {
+        "patient": patient, "case_type": "adult", "triage_priority": 2, "triage_color": "orange",
+        "vitals_at_arrival": {"hr": 112.0, "bp_systolic": 96.0, "bp_diastolic": 60.0, "rr": 24.0, "spo2": 93.0,
+                              "temperature": 37.4, "gcs_e": 4, "gcs_v": 5, "gcs_m": 6},
+        "presenting_complaint": {"text": "Chest pain radiating to left arm", "duration": "1 hour",
+                                 "onset_type": "Sudden", "course": ""},
+        **default_sections(),
+    }
+
+    typical = {**triage_only, **default_sections()}
+    typical["history"].update({
+        "hpi": "Central crushing chest pain at rest, associated with sweating and nausea. No prior episodes.",
+        "past_medical": ["Hypertension", "Type 2 diabetes"], "drug_history": "Metformin 500mg BD, Amlodipine 5mg OD",
+        "allergies": [],
+    })
+    typical["primary_assessment"].update({"breathing_work": "Mild increase", "circulation_crt": 3.0,
+                                          "disability_avpu": "A", "ecg_findings": "ST elevation V1-V4"})
+    typical["investigations"].update({"panels_selected": ["Cardiac", "Basic metabolic"]})
+    typical["treatment"].update({"interventions": ["IV access", "Oxygen"], "provisional_diagnoses": ["Anterior STEMI"]})
+
+    documented = {**typical, **{k: dict(v) for k, v in typical.items() if isinstance(v, dict)}}
+    documented["history"].update({"signs_and_symptoms": "Diaphoresis, pallor", "allergies": ["Penicillin"],
+                                  "family_history": "Father - MI at 60"})
+    documented["examination"].update({"cvs_status": "Abnormal", "cvs_additional_notes": "S3 gallop",
+                                      "respiratory_additional_notes": "Bibasal crepts"})
+    documented["investigations"].update({"results_notes": "Troponin I 4.2 ng/mL"})
+    documented["treatment"].update({"intervention_notes": "Aspirin 300mg, Clopidogrel 600mg loaded",
+                                    "differential_diagnoses": ["Aortic dissection"]})
+    documented["drugs_administered"] = [{"name": "Aspirin", "dose": "300mg", "time": "10:05"},
+                                        {"name": "Heparin", "dose": "5000 IU", "time": "10:20"}]
+    documented["disposition"] = {"type": "admitted-icu", "destination": "CCU", "advice": "",
+                                 "condition_at_discharge": "stable", "discharge_vitals": None}
+
+    return {"triage only": triage_only, "typical": typical, "fully documented": documented}
+
+
+def bench_conversation(count_tokens, answer_chars, cached_prefix_weight, turns=5, prompt_type="red_flags"):
+    """
+    Repeat analyses of one case, one vital changing between them. Each answer
+    is a stand-in of answer_chars characters (real answers vary), which is
+    what the history grows by every turn.
+    """
+    store = ConversationStore(build_delta_prompt, cached_prefix_weight=cached_prefix_weight)
+    case = copy.deepcopy(sample_cases()["typical"])
+    print(f"\nConversation, {prompt_type}, {answer_chars}-char answers "
+          f"(cost = new input + {store.cached_prefix_weight} x prompt-cached history)")
+    print(f"{'turn':<5} {'mode':<24} {'sent':>7} {'fresh':>7} {'cost':>7}")
+    for number in range(1, turns + 1):
+        case["vitals_at_arrival"]["hr"] += 4
+        prompt = build_case_prompt(case, prompt_type)
+        turn = store.start("case", case_field_values(case), prompt)
+        history = count_tokens("".join(m["content"] for m in turn["history"]))
+        message = count_tokens(turn["message"])
+        fresh = count_tokens(prompt)
+        cost = message + store.cached_prefix_weight * history
+        mode = turn["mode"] if turn["mode"] == "delta" else f"fresh ({turn['reason']})"
+        print(f"{number:<5} {mode:<24} {history + message:>7} {fresh:>7} {cost:>7.0f}")
+        store.commit(turn, "x" * answer_chars)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--encoding", default="o200k_base")
+    parser.add_argument("--answer-chars", type=int, nargs="+", default=[600, 2400])
+    parser.add_argument("--cached-prefix-weight", type=float, nargs="+", default=[1.0, 0.5])
+    args = parser.parse_args()
+
+    count_tokens, method = token_counter(args.encoding)
+    print(f"Token counts: {method}\n")
+    print(f"{'case':<18} {'prompt type':<22} {'before':>7} {'after':>7} {'saved':>7}")
+
+    total_before = total_after = 0
+    for name, case in sample_cases().items():
+        for prompt_type in PROMPT_TYPES:
+            before = count_tokens(build_legacy_case_prompt(case, prompt_type))
+            after = count_tokens(build_case_prompt(case, prompt_type))
+            total_before += before
+            total_after += after
+            print(f"{name:<18} {prompt_type:<22} {before:>7} {after:>7} {1 - after / before:>6.0%}")
+
+    print(f"\nTotal: {total_before} -> {total_after} tokens ({1 - total_after / total_before:.0%} fewer)")
+
+    case = sample_cases()["fully documented"]
+    rounds = 2000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        build_case_digest(case)
+    print(f"Digest build: {(time.perf_counter() - started) / rounds * 1e6:.1f} µs per case (once per case write)")
+
+    for weight in args.cached_prefix_weight:
+        for answer_chars in args.answer_chars:
+            bench_conversation(count_tokens, answer_chars, weight)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark for STT routing (utils/stt_router.py): request latency percentiles
+with and without hedging, and success rate through an engine outage.
+
+Run from backend/:
+    python benchmarks/bench_stt_router.py [--requests 400] [--slow-rate 0.08]
+
+Two simulated engines take ~N(mean, 20%) ms per second of audio for
+recordings of 5-60 s, but --slow-rate of calls stall for 5-10x as long
+(queueing at the provider). Requests are issued --concurrency at a time.
+Hedging is compared with the delay taken from each engine's p95 per second of
+audio and, for reference, from its plain p95 (every call treated as the same
+length). The outage phase fails every call to the preferred engine for the
+middle third of the run.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.latency import percentile  # noqa: E402
+from utils.stt_router import STTRouter  # noqa: E402
+
+
+class EngineDown(Exception):
+    pass
+
+
+def make_engine(ms_per_second, slow_rate, down):
+    def engine_for(seconds):
+        async def call(engine):
+            if down.get(engine):
+                await asyncio.sleep(0.05)
+                raise EngineDown(engine)
+            ms = max(1.0, random.gauss(ms_per_second[engine], ms_per_second[engine] * 0.2)) * seconds
+            if random.random() < slow_rate:
+                ms *= random.uniform(5, 10)
+            await asyncio.sleep(ms / 1000)
+            return engine
+        return call
+    return engine_for
+
+
+async def run_phase(router, engine_for, requests, concurrency, down=None, outage=None, sized=True):
+    latencies, failures, issued = [], 0, 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal failures, issued
+        seconds = random.uniform(5, 60)
+        async with semaphore:
+            if outage is not None:
+                down["sarvam"] = outage[0] <= issued < outage[1]
+            issued += 1
+            started = time.perf_counter()
+            try:
+                await router.run(router.route("sarvam", ["openai"]), engine_for(seconds), seconds if sized else 1.0)
+            except Exception:
+                failures += 1
+                return
+            # Reported per second of audio, comparable across lengths
+            latencies.append((time.perf_counter() - started) * 1000 / seconds)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    latencies.sort()
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--slow-rate", type=float, default=0.08)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # one failover warning per request in the outage phase
+    ms_per_second = {"sarvam": 5, "openai": 6}
+
+    print(f"{args.requests} requests of 5-60 s audio, {args.concurrency} concurrent, "
+          f"{args.slow_rate:.0%} of calls stall 5-10x")
+    print("Latency in ms per second of audio\n")
+    print(f"{'mode':<28} {'p50':>6} {'p95':>6} {'p99':>6} {'failed':>7} {'hedges':>7} {'won':>5}")
+    for label, hedge, sized in (("no hedging", False, True), ("hedging, plain p95", True, False),
+                                ("hedging, p95 per audio s", True, True)):
+        random.seed(1)
+        router = STTRouter(["sarvam", "openai"], min_samples=20, hedge=hedge, hedge_min_ms=0)
+        latencies, failures = asyncio.run(run_phase(router, make_engine(ms_per_second, args.slow_rate, {}),
+                                                    args.requests, args.concurrency, sized=sized))
+        print(f"{label:<28} {percentile(latencies, 50):>6.1f} {percentile(latencies, 95):>6.1f} "
+              f"{percentile(latencies, 99):>6.1f} {failures:>7} {router.hedges:>7} {router.hedge_wins:>5}")
+
+    print("\nPreferred engine down for the middle third of the run (every call to it fails after 50 ms):")
+    outage = (args.requests // 3, 2 * args.requests // 3)
+    for label, breakers in (("failover only", 10 ** 6), ("failover + breaker", 3)):
+        random.seed(1)
+        down = {}
+        router = STTRouter(["sarvam", "openai"], min_samples=20, hedge=False, breaker_failures=breakers,
+                           breaker_reset_seconds=1.0)
+        latencies, failures = asyncio.run(run_phase(router, make_engine(ms_per_second, 0, down), args.requests,
+                                                    args.concurrency, down, outage))
+        print(f"{label:<22} p50 {percentile(latencies, 50):>5.1f}, p95 {percentile(latencies, 95):>5.1f} ms/audio s, "
+              f"failed {failures}, failovers {router.failovers}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark for the rule-first triage extraction cascade (utils/triage_extraction.py)
+on a labelled transcript set (benchmarks/data/triage_transcripts.jsonl).
+
+Run from backend/:
+    python benchmarks/bench_triage_extraction.py [--data path] [--verbose]
+
+Reports:
+- LLM call reduction: transcripts fully resolved by the rules (no LLM call)
+- accuracy of every field the rules keep (escalated fields are the LLM's job
+  and are not scored here)
+- rules-only transcripts matching their labels exactly, and the per-transcript
+  cost of the rule stage
+
+Fails (exit code 1) if any field kept from the rules is wrong.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.triage_extraction import SYMPTOM_FIELDS, VITAL_FIELDS, needs_llm, rule_extract  # noqa: E402
+
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "triage_transcripts.jsonl")
+
+
+def load(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def kept_fields(result):
+    """Fields the cascade takes from the rule stage"""
+    fields = {f"vitals.{field}": value for field, value in result["vitals"].items()
+              if field not in result["unresolved_vitals"]}
+    if result["symptoms_resolved"]:
+        fields.update({f"symptoms.{field}": value for field, value in result["symptoms"].items()})
+    return fields
+
+
+def expected_fields(sample):
+    fields = {f"vitals.{field}": sample["vitals"].get(field) for field in VITAL_FIELDS}
+    fields.update({f"symptoms.{field}": field in sample["symptoms"] for field in SYMPTOM_FIELDS})
+    return fields
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=DEFAULT_DATA)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    samples = load(args.data)
+    rules_only = exact = kept = wrong = 0
+    started = time.perf_counter()
+    results = [rule_extract(sample["text"]) for sample in samples]
+    per_transcript_us = (time.perf_counter() - started) / len(samples) * 1e6
+
+    for sample, result in zip(samples, results):
+        expected = expected_fields(sample)
+        fields = kept_fields(result)
+        errors = {name: (value, expected[name]) for name, value in fields.items()
+                  if value != expected[name] and not (value is None and expected[name] is None)}
+        kept += sum(1 for name, value in fields.items() if value or expected[name])
+        wrong += len(errors)
+
+        escalated = needs_llm(result)
+        if not escalated:
+            rules_only += 1
+            exact += not errors
+        if args.verbose or errors:
+            route = "LLM  " if escalated else "rules"
+            print(f"[{route}] cov {result['coverage']:.2f} {sample['text'][:70]}")
+            if escalated:
+                print(f"         escalated: {result['unresolved_vitals']}"
+                      f"{' + symptoms' if not result['symptoms_resolved'] else ''}")
+            for name, (got, want) in errors.items():
+                print(f"         WRONG {name}: got {got!r}, expected {want!r}")
+
+    total = len(samples)
+    print(f"\nTranscripts:            {total}")
+    print(f"LLM calls avoided:      {rules_only}/{total} ({rules_only / total:.0%} fewer calls)")
+    print(f"Rules-only exact match: {exact}/{rules_only}")
+    print(f"Rule-kept field errors: {wrong}/{kept} fields with a value ({1 - wrong / kept:.1%} accurate)" if kept else "")
+    print(f"Rule stage cost:        {per_transcript_us:.0f} µs per transcript")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
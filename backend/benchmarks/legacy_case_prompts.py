@@ -0,0 +1,197 @@
+# Verbose /ai/generate prompt builders as they were before the case digest
+# (utils/case_digest.py). Kept only as the baseline for bench_prompt_tokens.py.
+
+
+def build_legacy_case_prompt(case, prompt_type):
+    """Render the prompt for a case sheet document; None for an unknown prompt_type"""
+    if prompt_type == "discharge_summary":
+        prompt = f"""
+You are an emergency medicine AI assistant. Generate a comprehensive discharge summary based on the following case sheet data.
+
+Patient Information:
+- Name: {case['patient']['name']}
+- Age/Sex: {case['patient']['age']}/{case['patient']['sex']}
+- UHID: {case['patient'].get('uhid', 'N/A')}
+- MLC: {'Yes' if case['patient'].get('mlc', False) else 'No'}
+
+Vitals at Arrival:
+- HR: {case['vitals_at_arrival'].get('hr', 'N/A')}
+- BP: {case['vitals_at_arrival'].get('bp_systolic', 'N/A')}/{case['vitals_at_arrival'].get('bp_diastolic', 'N/A')}
+- RR: {case['vitals_at_arrival'].get('rr', 'N/A')}
+- SpO2: {case['vitals_at_arrival'].get('spo2', 'N/A')}%
+- Temperature: {case['vitals_at_arrival'].get('temperature', 'N/A')}°C
+- GCS: E{case['vitals_at_arrival'].get('gcs_e', '-')} V{case['vitals_at_arrival'].get('gcs_v', '-')} M{case['vitals_at_arrival'].get('gcs_m', '-')}
+
+Presenting Complaint:
+{case['presenting_complaint']['text']}
+Duration: {case['presenting_complaint']['duration']}
+Onset: {case['presenting_complaint']['onset_type']}
+
+History:
+{case['history'].get('hpi', 'Not documented')}
+
+Past Medical History: {', '.join(case['history'].get('past_medical', ['None documented']))}
+
+Primary Assessment (ABCDE):
+- Airway: {case['primary_assessment'].get('airway_status', 'Not documented')}
+- Breathing: RR {case['primary_assessment'].get('breathing_rr', 'N/A')}, SpO2 {case['primary_assessment'].get('breathing_spo2', 'N/A')}%
+- Circulation: HR {case['primary_assessment'].get('circulation_hr', 'N/A')}, BP {case['primary_assessment'].get('circulation_bp_systolic', 'N/A')}/{case['primary_assessment'].get('circulation_bp_diastolic', 'N/A')}
+- Disability: AVPU {case['primary_assessment'].get('disability_avpu', 'N/A')}, GCS E{case['primary_assessment'].get('disability_gcs_e', '-')}V{case['primary_assessment'].get('disability_gcs_v', '-')}M{case['primary_assessment'].get('disability_gcs_m', '-')}
+- Exposure: Temperature {case['primary_assessment'].get('exposure_temperature', 'N/A')}°C
+
+Examination:
+{case['examination'].get('general_notes', 'Not documented')}
+
+Investigations:
+Panels: {', '.join(case['investigations'].get('panels_selected', ['None']))}
+
+Treatment Given:
+Interventions: {', '.join(case['treatment'].get('interventions', ['None documented']))}
+{case['treatment'].get('intervention_notes', '')}
+
+Provisional Diagnosis:
+{', '.join(case['treatment'].get('provisional_diagnoses', ['Not documented']))}
+
+Disposition:
+{case.get('disposition', {}).get('type', 'Not documented') if case.get('disposition') else 'Not documented'}
+Condition: {case.get('disposition', {}).get('condition_at_discharge', 'Not documented') if case.get('disposition') else 'Not documented'}
+
+Please generate a professional, well-structured discharge summary in standard medical format.
+"""
+    elif prompt_type == "red_flags":
+        # Get patient age for context
+        patient_age = case['patient'].get('age', 'Unknown')
+        patient_sex = case['patient'].get('sex', 'Unknown')
+        case_type = case.get('case_type', 'adult')
+        
+        # Build history context
+        past_medical = case['history'].get('past_medical', [])
+        allergies = case['history'].get('allergies', [])
+        hopi = case['history'].get('hpi', case['history'].get('events_hopi', ''))
+        
+        prompt = f"""
+You are a senior emergency medicine consultant providing RAPID RISK STRATIFICATION.
+
+=== PATIENT PROFILE ===
+Age: {patient_age} | Sex: {patient_sex} | Type: {case_type.upper()}
+Chief Complaint: {case['presenting_complaint']['text']}
+Duration: {case['presenting_complaint'].get('duration', 'Not specified')}
+HPI: {hopi if hopi else 'Not documented'}
+PMH: {', '.join(past_medical) if past_medical else 'None'}
+Allergies: {', '.join(allergies) if allergies else 'NKDA'}
+
+=== VITAL SIGNS ===
+HR: {case['vitals_at_arrival'].get('hr', 'N/A')} bpm | BP: {case['vitals_at_arrival'].get('bp_systolic', 'N/A')}/{case['vitals_at_arrival'].get('bp_diastolic', 'N/A')} mmHg
+RR: {case['vitals_at_arrival'].get('rr', 'N/A')}/min | SpO2: {case['vitals_at_arrival'].get('spo2', 'N/A')}%
+Temp: {case['vitals_at_arrival'].get('temperature', 'N/A')}°C | GCS: E{case['vitals_at_arrival'].get('gcs_e', '-')}V{case['vitals_at_arrival'].get('gcs_v', '-')}M{case['vitals_at_arrival'].get('gcs_m', '-')}
+
+=== PRIMARY SURVEY ===
+Airway: {case['primary_assessment'].get('airway_status', 'Patent')} {case['primary_assessment'].get('airway_additional_notes', '')}
+Breathing: WOB {case['primary_assessment'].get('breathing_work', 'Normal')} | {case['primary_assessment'].get('breathing_additional_notes', '')}
+Circulation: CRT {case['primary_assessment'].get('circulation_crt', 'N/A')}s | Pulses {case['primary_assessment'].get('circulation_peripheral_pulses', 'Present')}
+Disability: AVPU {case['primary_assessment'].get('disability_avpu', 'Alert')} | Pupils {case['primary_assessment'].get('disability_pupils_reaction', 'Equal reactive')}
+
+=== PROVIDE CONCISE RISK ANALYSIS ===
+
+🚨 CRITICAL RED FLAGS:
+[List 2-4 LIFE-THREATENING conditions to rule out IMMEDIATELY based on presentation. Be specific to THIS patient's symptoms]
+
+⚠️ URGENT CONCERNS:
+[List 2-3 serious conditions requiring workup within 1-2 hours]
+
+⚡ IMMEDIATE ACTIONS:
+[3-5 specific actions: Labs/ECG/Imaging to order NOW. Be practical for Indian ER setting]
+
+🔍 CLINICAL WATCH:
+[What vital sign trends or symptoms would indicate deterioration?]
+
+📋 DISPOSITION GUIDANCE:
+[Based on current presentation - ICU / Ward / Observation / Safe to discharge after workup?]
+
+Keep responses CONCISE and ACTIONABLE. Focus on what ER doctor should DO right now. Reference Indian protocols where applicable (NICE, ACLS, ATLS).
+"""
+    elif prompt_type == "diagnosis_suggestions":
+        # Get comprehensive patient context
+        patient_age = case['patient'].get('age', 'Unknown')
+        patient_sex = case['patient'].get('sex', 'Unknown')
+        case_type = case.get('case_type', 'adult')
+        
+        past_medical = case['history'].get('past_medical', [])
+        drug_history = case['history'].get('drug_history', '')
+        family_history = case['history'].get('family_history', '')
+        hopi = case['history'].get('hpi', case['history'].get('events_hopi', ''))
+        
+        # Get examination findings
+        exam = case.get('examination', {})
+        general_notes = exam.get('general_additional_notes', exam.get('general_notes', ''))
+        cvs_notes = exam.get('cvs_additional_notes', '')
+        resp_notes = exam.get('respiratory_additional_notes', '')
+        abd_notes = exam.get('abdomen_additional_notes', '')
+        cns_notes = exam.get('cns_additional_notes', '')
+        
+        prompt = f"""
+You are a senior emergency medicine consultant providing DIFFERENTIAL DIAGNOSIS analysis.
+
+=== PATIENT PROFILE ===
+Age: {patient_age} | Sex: {patient_sex} | Type: {case_type.upper()}
+
+=== PRESENTING COMPLAINT ===
+Chief Complaint: {case['presenting_complaint']['text']}
+Duration: {case['presenting_complaint'].get('duration', 'Not specified')}
+Onset: {case['presenting_complaint'].get('onset_type', 'Not specified')}
+Course: {case['presenting_complaint'].get('course', 'Not specified')}
+
+=== HISTORY ===
+HPI: {hopi if hopi else 'Not documented'}
+Past Medical: {', '.join(past_medical) if past_medical else 'None'}
+Drug History: {drug_history if drug_history else 'None'}
+Family History: {family_history if family_history else 'Non-contributory'}
+
+=== VITALS ===
+HR: {case['vitals_at_arrival'].get('hr', 'N/A')} | BP: {case['vitals_at_arrival'].get('bp_systolic', 'N/A')}/{case['vitals_at_arrival'].get('bp_diastolic', 'N/A')} | RR: {case['vitals_at_arrival'].get('rr', 'N/A')}
+SpO2: {case['vitals_at_arrival'].get('spo2', 'N/A')}% | Temp: {case['vitals_at_arrival'].get('temperature', 'N/A')}°C | GCS: {(case['vitals_at_arrival'].get('gcs_e', 0) or 0) + (case['vitals_at_arrival'].get('gcs_v', 0) or 0) + (case['vitals_at_arrival'].get('gcs_m', 0) or 0)}/15
+
+=== EXAMINATION ===
+General: {general_notes if general_notes else case.get('examination', {}).get('general_status', 'Not documented')}
+CVS: {cvs_notes if cvs_notes else exam.get('cvs_status', 'Normal')}
+Respiratory: {resp_notes if resp_notes else exam.get('respiratory_status', 'Normal')}
+Abdomen: {abd_notes if abd_notes else exam.get('abdomen_status', 'Normal')}
+CNS: {cns_notes if cns_notes else exam.get('cns_status', 'Normal')}
+
+=== PROVIDE STRUCTURED DIFFERENTIAL DIAGNOSIS ===
+
+🎯 TOP 3 DIFFERENTIAL DIAGNOSES:
+
+1️⃣ [MOST LIKELY] _____
+   • Supporting features: [List 2-3 key findings from THIS patient that support this diagnosis]
+   • To confirm: [Specific test - e.g., "Troponin + ECG" not generic "cardiac workup"]
+   • Initial Rx: [If confirmed, what to start immediately]
+
+2️⃣ [CONSIDER] _____
+   • Supporting features: [Findings supporting this]
+   • To confirm: [Specific test]
+   • Initial Rx: [If confirmed]
+
+3️⃣ [RULE OUT] _____
+   • Supporting features: [Findings suggesting this]
+   • To confirm: [Specific test]
+   • Initial Rx: [If confirmed]
+
+⚠️ MUST NOT MISS:
+[1-2 dangerous diagnoses that MUST be ruled out even if unlikely - with specific test to exclude]
+
+📊 RECOMMENDED WORKUP:
+[Prioritized list of 4-6 investigations with expected findings. Be specific: "ECG looking for ST changes" not just "ECG"]
+
+💊 EMPIRICAL TREATMENT:
+[If diagnosis uncertain, what can be started safely while awaiting workup? Include doses for Indian setting]
+
+📝 WORKING DIAGNOSIS:
+[Single line - what would you write as provisional diagnosis based on current info?]
+
+Be SPECIFIC to this patient. Avoid generic differentials. Focus on practical ER decision-making.
+"""
+    else:
+        return None
+
+    return prompt
@@ -1,28 +1,55 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, File, UploadFile, Form, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, File, UploadFile, Form, WebSocket, WebSocketDisconnect, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from bson import ObjectId
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Awaitable, Callable, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
 import jwt
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-from emergentintegrations.llm.openai import OpenAISpeechToText
 import openai
-import tempfile
-import re
-import httpx
 import asyncio
 import base64
+import time
 import json
 import websockets
 
+from utils.time_utils import ist_to_utc
+from utils.triage_buffer import RecentTriageBuffer
+from utils.case_extraction import (
+    CASE_SECTIONS, SECTION_KEYS, build_section_prompt, merge_sections,
+    CASESHEET_SECTIONS, CASESHEET_PROMPT_VERSION, build_casesheet_prompt, split_casesheet_response
+)
+from utils.triage_extraction import rule_extract, extract_age, needs_llm, build_escalation_prompt, merge_extraction
+from utils.cache import LRUCache, ResponseCache, content_hash
+from utils.latency import LatencyTracker
+from utils.llm_gateway import LLMGateway, parse_model_limits
+from utils.http_pool import UpstreamPool
+from utils.model_router import ModelRouter, merge_policy
+from utils.singleflight import SingleFlight
+from utils.speculation import SpeculativeRunner
+from utils.circuit_breaker import CircuitBreaker, CLOSED
+from utils.job_queue import JobQueue, PermanentJobError, public_job
+from utils.llm_scheduler import LLMScheduler, classify_llm_request
+from utils.sse import sse_event, SSE_HEADERS
+from utils.audio_ingest import AudioClip, AudioTooLarge, UploadSizeLimitMiddleware, read_upload
+from utils.audio_preprocess import preprocess_audio
+from utils.audio_chunking import split_audio, stitch_transcripts, transcribe_chunks
+from utils.stt_router import STTRouter, STTUnavailable
+from utils.json_stream import IncrementalJSONParser, iter_fields, parse_llm_json
+from utils.ai_prompts import AI_SYSTEM_MESSAGE, PROMPT_VERSION, build_case_prompt, build_delta_prompt, case_context_block
+from utils.case_digest import DIGEST_CASE_FIELDS, case_digest_fields, case_field_values, get_case_digest
+from utils.conversations import ConversationStore
+from utils.clinical_rules import evaluate_case, analyze_case, analyze_case_batch, rescore_batch, rule_based_ai_text, case_rule_input
+from utils.rollups import RollupRecorder, backfill_rollups, summarize_rollups, median_from_histogram, minutes_bin, bucket_keys, HOURLY_COLLECTION, DAILY_COLLECTION
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -39,6 +66,82 @@ JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
 JWT_EXPIRATION_MINUTES = int(os.environ.get('JWT_EXPIRATION_MINUTES', 43200))
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 
+EMERGENT_LLM_BASE_URL = os.environ.get('EMERGENT_LLM_BASE_URL', 'https://integrations.emergentagent.com/llm')
+
+# Rolling latency samples (AI time-to-first-token, totals) exposed on /api/metrics
+latency_tracker = LatencyTracker(window=int(os.environ.get('LATENCY_WINDOW', 1000)))
+
+# Concurrent upstream calls per model (LLM_MAX_CONCURRENCY for unlisted models)
+LLM_DEFAULT_MODEL_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+LLM_MODEL_CONCURRENCY = parse_model_limits(os.environ.get('LLM_MODEL_CONCURRENCY', 'gpt-5.1=4,gpt-4o-mini=16'))
+
+# Priority-aware admission in front of the LLM gateway: global budget, strict
+# priority between classes, weighted fair queuing across hospitals within a class.
+# A call is only dispatched when its model has a free slot, so priority decides
+# who gets each model slot rather than who waits longest on the model's queue
+llm_scheduler = LLMScheduler(
+    max_concurrency=int(os.environ.get('LLM_SCHEDULER_CONCURRENCY', 12)),
+    class_limits={"background": int(os.environ.get('LLM_BACKGROUND_CONCURRENCY', 2))},
+    latency=latency_tracker,
+    model_limits=LLM_MODEL_CONCURRENCY,
+    default_model_limit=LLM_DEFAULT_MODEL_CONCURRENCY
+)
+
+# Model per AI task: quality ladder (best first), p95 latency SLOs (tighter for
+# critical/urgent calls), error-rate SLO and per-plan caps. The router downshifts
+# to the next model while the preferred one is out of SLO. MODEL_ROUTING_POLICY
+# (JSON, {task: {key: value}}) overrides the defaults per task.
+MODEL_ROUTING_POLICY = merge_policy({
+    "ai_generate": {
+        "models": ["gpt-5.1", "gpt-4o-mini"],
+        "latency_budget_ms": 45000,
+        "urgent_latency_budget_ms": 20000,
+        "max_error_rate": 0.2,
+        "plans": {},
+    },
+    "extraction": {
+        "models": ["gpt-4o-mini"],
+        "latency_budget_ms": 15000,
+        "urgent_latency_budget_ms": 8000,
+        "max_error_rate": 0.2,
+    },
+}, json.loads(os.environ.get('MODEL_ROUTING_POLICY') or '{}'))
+
+model_router = ModelRouter(
+    MODEL_ROUTING_POLICY,
+    window_seconds=int(os.environ.get('MODEL_ROUTER_WINDOW_SECONDS', 300)),
+    min_samples=int(os.environ.get('MODEL_ROUTER_MIN_SAMPLES', 20))
+)
+
+# Outbound HTTP: one keep-alive client per upstream (HTTP/2 when h2 is installed),
+# opened at startup and closed at shutdown. Upstreams register their own
+# connection limits and connect/read timeouts.
+upstream_pool = UpstreamPool(latency=latency_tracker, http2=os.environ.get('UPSTREAM_HTTP2', 'true').lower() == 'true')
+upstream_pool.register(
+    "llm",
+    max_connections=int(os.environ.get('LLM_MAX_CONNECTIONS', 50)),
+    max_keepalive_connections=int(os.environ.get('LLM_MAX_CONNECTIONS', 50)),
+    connect_timeout=10.0,
+    read_timeout=float(os.environ.get('LLM_READ_TIMEOUT_SECONDS', 120)),
+    write_timeout=30.0,
+    pool_timeout=30.0
+)
+
+# Shared LLM client: pooled keep-alive connections, per-model concurrency caps
+llm_gateway = LLMGateway(
+    api_key=EMERGENT_LLM_KEY,
+    base_url=EMERGENT_LLM_BASE_URL,
+    latency=latency_tracker,
+    default_limit=LLM_DEFAULT_MODEL_CONCURRENCY,
+    model_limits=LLM_MODEL_CONCURRENCY,
+    scheduler=llm_scheduler,
+    on_result=model_router.record,
+    http_client=upstream_pool.client("llm")
+)
+
+# Identical concurrent AI requests share one upstream call
+ai_singleflight = SingleFlight()
+
 # Initialize FastAPI app
 app = FastAPI(title="ER-EMR Backend API", version="1.0.0")
 api_router = APIRouter(prefix="/api")
@@ -50,6 +153,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ============================================
@@ -386,6 +490,10 @@ class TriageAssessment(BaseModel):
     
     # Link to case sheet
     case_sheet_id: Optional[str] = None
+    
+    # Ownership (used for per-hospital board views)
+    hospital_id: Optional[str] = None
+    created_by_user_id: Optional[str] = None
 
 class TriageCreate(BaseModel):
     age_group: str
@@ -737,6 +845,13 @@ class AIResponse(BaseModel):
     response: str
     case_sheet_id: str
     sources: List[AISource] = []
+    cached: bool = False
+    coalesced: bool = False  # served from an identical request already in flight (not charged)
+    model: Optional[str] = None
+    routing: Optional[dict] = None  # model router decision for this request
+    degraded: bool = False  # rule-engine answer while the LLM is unavailable (not charged)
+    degraded_reason: Optional[str] = None  # circuit_open, timeout or upstream_error
+    conversation: Optional[dict] = None  # {"mode": "fresh" | "delta", ...}: full prompt or only changed fields sent
 
 # Helper functions
 def hash_password(password: str) -> str:
@@ -752,6 +867,27 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
+async def load_user(user_id: str) -> Optional[UserResponse]:
+    """UserResponse for a stored user (also used by background jobs acting for a user)"""
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    if user is None:
+        return None
+    
+    # Convert datetime strings to datetime objects
+    if isinstance(user.get('created_at'), str):
+        user['created_at'] = datetime.fromisoformat(user['created_at'])
+    if isinstance(user.get('updated_at'), str):
+        user['updated_at'] = datetime.fromisoformat(user['updated_at'])
+    if user.get('subscription_end') and isinstance(user['subscription_end'], str):
+        user['subscription_end'] = datetime.fromisoformat(user['subscription_end'])
+    
+    # Provide defaults for missing fields (for backward compatibility)
+    user.setdefault('user_type', 'individual')
+    user.setdefault('subscription_tier', 'free')
+    user.setdefault('subscription_status', 'active')
+    
+    return UserResponse(**user)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
     Get current authenticated user from JWT token
@@ -764,29 +900,20 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
         
-        user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        user = await load_user(user_id)
         if user is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
         
-        # Convert datetime strings to datetime objects
-        if isinstance(user.get('created_at'), str):
-            user['created_at'] = datetime.fromisoformat(user['created_at'])
-        if isinstance(user.get('updated_at'), str):
-            user['updated_at'] = datetime.fromisoformat(user['updated_at'])
-        if user.get('subscription_end') and isinstance(user['subscription_end'], str):
-            user['subscription_end'] = datetime.fromisoformat(user['subscription_end'])
-        
-        # Provide defaults for missing fields (for backward compatibility)
-        user.setdefault('user_type', 'individual')
-        user.setdefault('subscription_tier', 'free')
-        user.setdefault('subscription_status', 'active')
-        
-        return UserResponse(**user)
+        return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
     except jwt.JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+def get_tenant_key(user: UserResponse) -> str:
+    """Hospital the user belongs to, or a per-user key for individual users"""
+    return user.hospital_id or f"user:{user.id}"
+
 # ============================================
 # TRIAGE HELPER FUNCTIONS
 # ============================================
@@ -915,116 +1042,21 @@ def analyze_vitals_to_priority(v: TriageVitals, age_group: str) -> Dict[str, Any
 # TEXT → TRIAGE EXTRACTION (for voice auto-fill)
 # ============================================
 
-def extract_number(pattern: str, text: str) -> Optional[float]:
-    """Extract a number from text using regex pattern"""
-    m = re.search(pattern, text)
-    if not m:
-        return None
-    try:
-        return float(m.group(1))
-    except ValueError:
-        return None
-
-
 def extract_triage_from_text(text: str) -> Dict[str, Any]:
     """
-    Regex-based extractor for triage data from free text.
-    Input: free text like '45 year old male with chest pain, BP 90/60, HR 120, SpO2 88%'
-    Output: vitals + symptom flags
+    Rule-based triage parse of free text, e.g. '45 year old male with chest
+    pain, BP 90/60, HR 120, SpO2 88%': age plus the vitals and symptom flags of
+    the extraction cascade's rule stage (utils/triage_extraction.py), so it
+    agrees with /ai/extract-triage-data. Nothing is escalated from here, so
+    every unambiguous reading is kept.
     """
-    lower = text.lower()
-
-    # Age
-    age = extract_number(r"(\d+)\s*(year|yr|years)", lower)
-    if age is None:
-        # try 'months'
-        months = extract_number(r"(\d+)\s*(month|mo|months)", lower)
-        if months is not None:
-            age = months
-            age_unit = "months"
-        else:
-            age = None
-            age_unit = "years"
-    else:
-        age_unit = "years"
-
-    # HR
-    hr = extract_number(r"(?:hr|heart rate|pulse)[:\s]*([0-9]{2,3})", lower)
-    if hr is None:
-        hr = extract_number(r"([0-9]{2,3})\s*(?:bpm|/min)\s*(?:hr|heart rate)?", lower)
-
-    # RR
-    rr = extract_number(r"(?:rr|resp(?:iratory)? rate)[:\s]*([0-9]{1,2})", lower)
-    if rr is None:
-        rr = extract_number(r"([0-9]{1,2})\s*/min\s*(?:rr|resp)", lower)
-
-    # BP 120/80
-    bp_match = re.search(r"bp[:\s]*([0-9]{2,3})\s*/\s*([0-9]{2,3})", lower)
-    bp_sys = bp_dia = None
-    if bp_match:
-        try:
-            bp_sys = float(bp_match.group(1))
-            bp_dia = float(bp_match.group(2))
-        except ValueError:
-            pass
-
-    # SpO2
-    spo2 = extract_number(r"(?:spo2|spo₂|saturation|sat)[:\s]*([0-9]{2,3})", lower)
-    if spo2 is None:
-        spo2 = extract_number(r"([0-9]{2,3})\s*%", lower)
-
-    # Temp
-    temp = extract_number(r"(?:temp|temperature)[:\s]*([0-9]{2,3}\.?[0-9]*)", lower)
-
-    # GCS components
-    gcs_e = extract_number(r"(?:gcs[:\s]*)?e[:\s]*([0-9])", lower)
-    gcs_v = extract_number(r"(?:gcs[:\s]*)?v[:\s]*([0-9])", lower)
-    gcs_m = extract_number(r"(?:gcs[:\s]*)?m[:\s]*([0-9])", lower)
-
-    # Symptoms
-    symptoms = TriageSymptoms()
-    if "chest pain" in lower:
-        symptoms.chest_pain = True
-    if "shortness of breath" in lower or "difficulty breathing" in lower or "breathless" in lower or "sob" in lower:
-        symptoms.severe_respiratory_distress = True
-    if "fever" in lower or "febrile" in lower:
-        symptoms.fever = True
-    if "sepsis" in lower or "septic" in lower:
-        symptoms.sepsis = True
-    if "stroke" in lower or "one side weak" in lower or "facial droop" in lower or "slurred speech" in lower:
-        symptoms.suspected_stroke = True
-    if "unconscious" in lower or "not responding" in lower or "unresponsive" in lower:
-        symptoms.lethargic_unconscious = True
-    if "hypotension" in lower or (bp_sys is not None and bp_sys < 90):
-        symptoms.shock = True
-    if "seizure" in lower or "convulsion" in lower or "fitting" in lower:
-        symptoms.seizure_ongoing = True
-    if "trauma" in lower or "accident" in lower or "injury" in lower or "fall" in lower:
-        symptoms.moderate_trauma = True
-    if "bleeding" in lower or "blood loss" in lower:
-        symptoms.severe_bleeding = True
-    if "abdominal pain" in lower or "stomach pain" in lower:
-        symptoms.abdominal_pain_moderate = True
-    if "vomiting" in lower or "diarrhea" in lower or "dehydrated" in lower:
-        symptoms.moderate_dehydration = True
-
-    vitals = TriageVitals(
-        hr=hr,
-        rr=rr,
-        bp_systolic=bp_sys,
-        bp_diastolic=bp_dia,
-        spo2=spo2,
-        temperature=temp,
-        gcs_e=int(gcs_e) if gcs_e else None,
-        gcs_v=int(gcs_v) if gcs_v else None,
-        gcs_m=int(gcs_m) if gcs_m else None,
-    )
-
+    age, age_unit = extract_age(text)
+    result = rule_extract(text, min_confidence=0.0)
     return {
         "age": age,
         "age_unit": age_unit,
-        "vitals": vitals,
-        "symptoms": symptoms,
+        "vitals": TriageVitals(**result["vitals"]),
+        "symptoms": TriageSymptoms(**result["symptoms"]),
     }
 
 
@@ -1543,6 +1575,88 @@ def calculate_triage_priority(age_group: str, vitals: TriageVitals, symptoms: Tr
     reasons.append("Stable condition, routine assessment")
     return {"level": 5, "color": "blue", "name": "NON-URGENT", "time": "Time-permitted", "reasons": reasons}
 
+# Recent triage ring buffer (serves board "recent arrivals" without Mongo)
+TRIAGE_RECENT_WINDOW_HOURS = float(os.environ.get("TRIAGE_RECENT_WINDOW_HOURS", 6))
+TRIAGE_RECENT_MAX_PER_HOSPITAL = int(os.environ.get("TRIAGE_RECENT_MAX_PER_HOSPITAL", 2000))
+TRIAGE_HISTORY_MAX_LIMIT = 1000
+
+recent_triage_buffer = RecentTriageBuffer(
+    window_hours=TRIAGE_RECENT_WINDOW_HOURS,
+    max_per_hospital=TRIAGE_RECENT_MAX_PER_HOSPITAL
+)
+
+PRIORITY_COLOR_LEVELS = {"red": 1, "orange": 2, "yellow": 3, "green": 4, "blue": 5}
+
+def parse_priority_filter(priority: Optional[str]) -> Optional[List[int]]:
+    """Parse 'red,orange' or '1,2' into a list of priority levels"""
+    if not priority:
+        return None
+    levels = []
+    for part in priority.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        if part in PRIORITY_COLOR_LEVELS:
+            levels.append(PRIORITY_COLOR_LEVELS[part])
+        elif part.isdigit() and 1 <= int(part) <= 5:
+            levels.append(int(part))
+        else:
+            raise HTTPException(status_code=400, detail=f"Invalid priority filter: {part}")
+    return levels or None
+
+def parse_time_bound(value: Optional[str], name: str) -> Optional[str]:
+    """Parse an ISO timestamp query param (naive = IST) into a UTC ISO string"""
+    if not value:
+        return None
+    try:
+        return ist_to_utc(value).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid '{name}' timestamp: {value}")
+
+def encode_triage_cursor(triaged_at: str, triage_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{triaged_at}|{triage_id}".encode()).decode()
+
+def decode_triage_cursor(cursor: str) -> tuple:
+    try:
+        triaged_at, triage_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return triaged_at, triage_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def save_triage_assessment(triage: TriageAssessment, current_user: UserResponse) -> None:
+    """Persist a triage assessment and push it into the recent-arrivals buffer"""
+    triage.hospital_id = current_user.hospital_id
+    triage.created_by_user_id = current_user.id
+    
+    doc = triage.model_dump()
+    doc['triaged_at'] = doc['triaged_at'].isoformat()
+    await db.triage_assessments.insert_one(doc)
+    
+    recent_triage_buffer.add(get_tenant_key(current_user), triage.model_dump())
+    rollup_recorder.record_nowait(get_tenant_key(current_user), triage.triaged_at, {
+        f"arrivals.{triage.priority_color}": 1,
+        "arrivals_total": 1
+    })
+
+async def warm_recent_triage_buffer(current_user: UserResponse) -> None:
+    """Seed the ring buffer from Mongo once per hospital per process"""
+    tenant = get_tenant_key(current_user)
+    if recent_triage_buffer.is_warm(tenant):
+        return
+    
+    since = (datetime.now(timezone.utc) - timedelta(hours=TRIAGE_RECENT_WINDOW_HOURS)).isoformat()
+    query = {"triaged_at": {"$gte": since}}
+    if current_user.hospital_id:
+        query["hospital_id"] = current_user.hospital_id
+    else:
+        query["created_by_user_id"] = current_user.id
+    
+    triages = await db.triage_assessments.find(query, {"_id": 0}).sort("triaged_at", -1).to_list(TRIAGE_RECENT_MAX_PER_HOSPITAL)
+    for triage in triages:
+        if isinstance(triage['triaged_at'], str):
+            triage['triaged_at'] = datetime.fromisoformat(triage['triaged_at'])
+    recent_triage_buffer.warm(tenant, triages)
+
 # Triage endpoints
 @api_router.post("/triage", response_model=TriageAssessment)
 async def create_triage(triage_data: TriageCreate, current_user: UserResponse = Depends(get_current_user)):
@@ -1570,12 +1684,36 @@ async def create_triage(triage_data: TriageCreate, current_user: UserResponse =
     )
     
     # Save to database
-    doc = triage.model_dump()
-    doc['triaged_at'] = doc['triaged_at'].isoformat()
-    await db.triage_assessments.insert_one(doc)
+    await save_triage_assessment(triage, current_user)
     
     return triage
 
+@api_router.get("/triage/recent", response_model=List[TriageAssessment])
+async def get_recent_triage(
+    hours: Optional[float] = None,
+    priority: Optional[str] = None,
+    limit: int = 200,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Recent arrivals for the user's hospital, served from the in-memory ring buffer.
+    Window is capped at TRIAGE_RECENT_WINDOW_HOURS; use GET /triage for older history.
+    """
+    if hours is not None and (hours <= 0 or hours > TRIAGE_RECENT_WINDOW_HOURS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"hours must be between 0 and {TRIAGE_RECENT_WINDOW_HOURS}"
+        )
+    
+    await warm_recent_triage_buffer(current_user)
+    
+    return recent_triage_buffer.recent(
+        get_tenant_key(current_user),
+        hours=hours,
+        priority_levels=parse_priority_filter(priority),
+        limit=max(1, min(limit, TRIAGE_RECENT_MAX_PER_HOSPITAL))
+    )
+
 @api_router.get("/triage/{triage_id}", response_model=TriageAssessment)
 async def get_triage(triage_id: str, current_user: UserResponse = Depends(get_current_user)):
     """Get a specific triage assessment"""
@@ -1589,9 +1727,64 @@ async def get_triage(triage_id: str, current_user: UserResponse = Depends(get_cu
     return triage
 
 @api_router.get("/triage", response_model=List[TriageAssessment])
-async def get_all_triage(current_user: UserResponse = Depends(get_current_user)):
-    """Get all triage assessments"""
-    triages = await db.triage_assessments.find({}, {"_id": 0}).sort("triaged_at", -1).to_list(1000)
+async def get_all_triage(
+    response: Response,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    hours: Optional[float] = None,
+    priority: Optional[str] = None,
+    limit: int = TRIAGE_HISTORY_MAX_LIMIT,
+    cursor: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Get triage assessments, newest first.
+    
+    Filters:
+    - since / until: ISO timestamps (naive values are treated as IST)
+    - hours: shorthand for since = now - hours
+    - priority: comma-separated colours or levels, e.g. "red,orange" or "1,2"
+    
+    Keyset pagination: when more records exist, the X-Next-Cursor response header
+    carries the cursor to pass back as ?cursor= for the next page.
+    """
+    query = {}
+    
+    since_iso = parse_time_bound(since, "since")
+    if hours is not None:
+        hours_since = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+        since_iso = max(since_iso, hours_since) if since_iso else hours_since
+    until_iso = parse_time_bound(until, "until")
+    
+    time_filter = {}
+    if since_iso:
+        time_filter["$gte"] = since_iso
+    if until_iso:
+        time_filter["$lte"] = until_iso
+    if time_filter:
+        query["triaged_at"] = time_filter
+    
+    priority_levels = parse_priority_filter(priority)
+    if priority_levels:
+        query["priority_level"] = {"$in": priority_levels}
+    
+    if cursor:
+        cursor_at, cursor_id = decode_triage_cursor(cursor)
+        keyset = {"$or": [
+            {"triaged_at": {"$lt": cursor_at}},
+            {"triaged_at": cursor_at, "id": {"$lt": cursor_id}}
+        ]}
+        query = {"$and": [query, keyset]} if query else keyset
+    
+    limit = max(1, min(limit, TRIAGE_HISTORY_MAX_LIMIT))
+    triages = await db.triage_assessments.find(query, {"_id": 0}).sort(
+        [("triaged_at", -1), ("id", -1)]
+    ).to_list(limit)
+    
+    if len(triages) == limit:
+        last = triages[-1]
+        last_at = last['triaged_at'] if isinstance(last['triaged_at'], str) else last['triaged_at'].isoformat()
+        response.headers["X-Next-Cursor"] = encode_triage_cursor(last_at, last['id'])
     
     for triage in triages:
         if isinstance(triage['triaged_at'], str):
@@ -1677,10 +1870,7 @@ async def create_triage_full(
         triage_reason=triage_result["triage_reason"],
     )
 
-    doc = assessment.model_dump()
-    doc["triaged_at"] = doc["triaged_at"].isoformat()
-
-    await db.triage_assessments.insert_one(doc)
+    await save_triage_assessment(assessment, current_user)
 
     return assessment
 
@@ -1744,8 +1934,11 @@ async def create_case(case_data: CaseSheetCreate, current_user: UserResponse = D
     doc = case_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     doc['updated_at'] = doc['updated_at'].isoformat()
+    doc.update(case_digest_fields(doc))
     
     await db.cases.insert_one(doc)
+    rollup_recorder.spawn(record_case_created_rollup(get_tenant_key(current_user), case_obj))
+    schedule_speculative_ai(doc, current_user)
     return case_obj
 
 @api_router.get("/cases", response_model=List[CaseSheet])
@@ -1879,15 +2072,28 @@ async def update_case(
     if custom_timestamp:
         update_data['custom_save_timestamp'] = save_timestamp.isoformat()
     
+    # Keep disposition rollups in step with the case's current disposition
+    if update_data.get('disposition'):
+        update_data.update(track_disposition_rollup(
+            case, update_data['disposition'].get('type'), get_tenant_key(current_user), save_timestamp
+        ))
+    
     # If lock_case is True, lock the case permanently
     if lock_case:
         update_data['is_locked'] = True
         update_data['locked_at'] = save_timestamp.isoformat()
         update_data['locked_by_user_id'] = current_user.id
     
+    # Keep the stored prompt digest in step with the case content
+    if any(field in DIGEST_CASE_FIELDS for field in update_data):
+        update_data.update(case_digest_fields({**case, **update_data}))
+    
     await db.cases.update_one({"id": case_id}, {"$set": update_data})
+    await invalidate_ai_response_cache(case_id, update_data)
     
     updated_case = await db.cases.find_one({"id": case_id}, {"_id": 0})
+    if 'ai_digest_hash' in update_data:
+        schedule_speculative_ai(updated_case, current_user)
     if isinstance(updated_case['created_at'], str):
         updated_case['created_at'] = datetime.fromisoformat(updated_case['created_at'])
     if isinstance(updated_case['updated_at'], str):
@@ -2441,15 +2647,20 @@ async def check_export_access(user_id: str, export_type: str = "pdf") -> dict:
     
     return {"allowed": False, "reason": "unknown_export_type"}
 
-async def log_export(user_id: str, case_id: str, export_type: str, doc_type: str) -> None:
+async def log_export(user_id: str, case_id: str, export_type: str, doc_type: str, tenant_key: Optional[str] = None) -> None:
     """Log an export event"""
+    now = datetime.now(timezone.utc)
     await db.exports.insert_one({
         "id": str(uuid.uuid4()),
         "user_id": user_id,
         "case_id": case_id,
         "export_type": export_type,  # pdf, word
         "doc_type": doc_type,  # case_sheet, discharge_summary, referral
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": now.isoformat()
+    })
+    rollup_recorder.record_nowait(tenant_key or f"user:{user_id}", now, {
+        f"exports.{export_type}": 1,
+        "exports_total": 1
     })
 
 async def deduct_word_credit(user_id: str) -> bool:
@@ -2548,7 +2759,7 @@ async def export_case_sheet(
             raise HTTPException(status_code=429, detail="Failed to deduct Word export credit")
     
     # Log the export
-    await log_export(current_user.id, case_id, export_type, "case_sheet")
+    await log_export(current_user.id, case_id, export_type, "case_sheet", get_tenant_key(current_user))
     
     # Generate export data
     export_data = {
@@ -2602,7 +2813,7 @@ async def export_discharge_summary(
             raise HTTPException(status_code=429, detail="Failed to deduct Word export credit")
     
     # Log the export
-    await log_export(current_user.id, case_id, export_type, "discharge_summary")
+    await log_export(current_user.id, case_id, export_type, "discharge_summary", get_tenant_key(current_user))
     
     # Get user/doctor details
     user = await db.users.find_one({"id": current_user.id}, {"_id": 0})
@@ -2667,218 +2878,434 @@ async def get_export_stats(current_user: UserResponse = Depends(get_current_user
     }
 
 
-# ========== SIMPLE AI ENDPOINTS (No LLM required) ==========
+# ============================================
+# ANALYTICS ROLLUPS & DASHBOARD
+# ============================================
 
-@api_router.post("/ai/red-flags")
-async def detect_red_flags_simple(data: dict, current_user: UserResponse = Depends(get_current_user)):
-    """Simple rule-based red flag detection - no AI credits required"""
-    vitals = data.get("vitals", {})
-    symptoms = data.get("symptoms", "") or data.get("chief_complaint", "")
-    red_flags = []
+# Hourly/daily per-hospital counters, updated incrementally from the write paths
+rollup_recorder = RollupRecorder(db)
+
+ANALYTICS_ADMIN_ROLES = ["admin", "hospital_admin"]
+
+def record_ai_call(user: UserResponse, kind: str) -> None:
+    """Count a completed AI call in the hospital's rollups"""
+    rollup_recorder.record_nowait(get_tenant_key(user), datetime.now(timezone.utc), {
+        f"ai_calls.{kind}": 1,
+        "ai_calls_total": 1
+    })
+
+async def record_case_created_rollup(tenant_key: str, case_obj: CaseSheet) -> None:
+    """Count a new case and, when linked to a triage, its triage -> case delay"""
+    inc = {"cases_created": 1}
+    
+    if case_obj.triage_id:
+        triage = await db.triage_assessments.find_one({"id": case_obj.triage_id}, {"_id": 0, "triaged_at": 1})
+        if triage and triage.get("triaged_at"):
+            triaged_at = triage["triaged_at"]
+            if isinstance(triaged_at, str):
+                triaged_at = datetime.fromisoformat(triaged_at)
+            if triaged_at.tzinfo is None:
+                triaged_at = triaged_at.replace(tzinfo=timezone.utc)
+            minutes = max(0.0, (case_obj.created_at - triaged_at).total_seconds() / 60)
+            inc[f"triage_to_case_hist.{minutes_bin(minutes)}"] = 1
+            inc["triage_to_case_count"] = 1
+            inc["triage_to_case_minutes_sum"] = minutes
+    
+    await rollup_recorder.record(tenant_key, case_obj.created_at, inc)
+
+def track_disposition_rollup(case: dict, new_type: Optional[str], tenant_key: str, at: datetime) -> dict:
+    """
+    Move a case's disposition count to its new type.
+    Returns the case fields to $set so the next change can undo this one exactly.
+    """
+    previous = case.get("rollup_disposition") or {}
+    if not new_type or previous.get("type") == new_type:
+        return {}
+    
+    if previous.get("type"):
+        rollup_recorder.record_nowait(
+            previous.get("tenant", tenant_key),
+            datetime.fromisoformat(previous["at"]),
+            {f"dispositions.{previous['type']}": -1}
+        )
+    rollup_recorder.record_nowait(tenant_key, at, {f"dispositions.{new_type}": 1})
     
-    # Check critical vital signs
-    hr = vitals.get("heart_rate") or vitals.get("pulse") or vitals.get("hr")
-    if hr:
-        try:
-            hr = int(float(hr))
-            if hr > 150: red_flags.append({"flag": "Severe Tachycardia (HR > 150)", "priority": 1})
-            elif hr > 120: red_flags.append({"flag": "Tachycardia (HR > 120)", "priority": 2})
-            if hr < 40: red_flags.append({"flag": "Severe Bradycardia (HR < 40)", "priority": 1})
-            elif hr < 50: red_flags.append({"flag": "Bradycardia (HR < 50)", "priority": 2})
-        except: pass
-    
-    sbp = vitals.get("systolic_bp") or vitals.get("bp_systolic") or vitals.get("sbp")
-    if sbp:
-        try:
-            sbp = int(float(sbp))
-            if sbp < 80: red_flags.append({"flag": "Hypotension (SBP < 80) - Shock Range", "priority": 1})
-            elif sbp < 90: red_flags.append({"flag": "Hypotension (SBP < 90)", "priority": 2})
-            if sbp > 180: red_flags.append({"flag": "Hypertensive Crisis (SBP > 180)", "priority": 1})
-        except: pass
-    
-    spo2 = vitals.get("spo2") or vitals.get("oxygen_saturation")
-    if spo2:
-        try:
-            spo2 = int(float(spo2))
-            if spo2 < 90: red_flags.append({"flag": "Severe Hypoxia (SpO2 < 90%)", "priority": 1})
-            elif spo2 < 94: red_flags.append({"flag": "Hypoxia (SpO2 < 94%)", "priority": 2})
-        except: pass
+    return {"rollup_disposition": {"type": new_type, "tenant": tenant_key, "at": at.isoformat()}}
+
+@api_router.get("/analytics/dashboard")
+async def get_analytics_dashboard(
+    granularity: str = "daily",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    hospital_id: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Hospital dashboard built only from the hourly/daily rollup documents.
     
-    temp = vitals.get("temperature") or vitals.get("temp")
-    if temp:
-        try:
-            temp = float(temp)
-            if temp > 40: red_flags.append({"flag": "High Fever (>40°C) - Hyperpyrexia", "priority": 1})
-            elif temp > 39: red_flags.append({"flag": "Fever (>39°C)", "priority": 2})
-            if temp < 35: red_flags.append({"flag": "Hypothermia (<35°C)", "priority": 1})
-        except: pass
-    
-    rr = vitals.get("rr") or vitals.get("respiratory_rate")
-    if rr:
-        try:
-            rr = int(float(rr))
-            if rr < 8: red_flags.append({"flag": "Bradypnea (RR < 8) - Respiratory Failure", "priority": 1})
-            if rr > 35: red_flags.append({"flag": "Severe Tachypnea (RR > 35)", "priority": 1})
-            elif rr > 25: red_flags.append({"flag": "Tachypnea (RR > 25)", "priority": 2})
-        except: pass
-    
-    gcs = vitals.get("gcs") or vitals.get("glasgow_coma_scale")
-    if gcs:
-        try:
-            gcs = int(float(gcs))
-            if gcs <= 8: red_flags.append({"flag": "GCS ≤8 - Coma, Consider Intubation", "priority": 1})
-            elif gcs <= 12: red_flags.append({"flag": "Altered Consciousness (GCS 9-12)", "priority": 2})
-        except: pass
+    - granularity: "hourly" (default window 24h) or "daily" (default window 7 days)
+    - since / until: ISO timestamps (naive values are treated as IST)
+    - hospital_id: admins may view another hospital
+    """
+    plan = SUBSCRIPTION_PLANS.get(current_user.subscription_tier, SUBSCRIPTION_PLANS["free"])
+    is_admin = current_user.role in ANALYTICS_ADMIN_ROLES
+    if not plan.get("analytics_enabled", False) and not is_admin:
+        raise HTTPException(
+            status_code=403,
+            detail={
+                "error": "analytics_not_included",
+                "message": "Analytics is available on Hospital plans. Please upgrade.",
+                "upgrade_required": True
+            }
+        )
     
-    grbs = vitals.get("grbs") or vitals.get("blood_sugar")
-    if grbs:
-        try:
-            grbs = float(grbs)
-            if grbs < 50: red_flags.append({"flag": "Severe Hypoglycemia (GRBS < 50)", "priority": 1})
-            elif grbs < 70: red_flags.append({"flag": "Hypoglycemia (GRBS < 70)", "priority": 2})
-            if grbs > 400: red_flags.append({"flag": "Severe Hyperglycemia (GRBS > 400)", "priority": 1})
-        except: pass
-    
-    # Symptom-based red flags
-    symptoms_lower = symptoms.lower() if symptoms else ""
-    symptom_flags = [
-        (["chest pain", "crushing", "radiating arm", "radiating to jaw"], "Possible ACS/MI - ECG Stat", 1),
-        (["sudden headache", "worst headache", "thunderclap"], "Possible SAH - CT Head Stat", 1),
-        (["seizure", "convulsion", "fitting"], "Seizure Activity", 1),
-        (["unresponsive", "unconscious", "not responding"], "Altered Consciousness", 1),
-        (["difficulty breathing", "can't breathe", "gasping", "stridor"], "Respiratory Distress", 1),
-        (["bloody stool", "hematemesis", "coffee ground vomit"], "GI Bleeding", 1),
-        (["swelling throat", "anaphylaxis", "severe allergy"], "Possible Anaphylaxis", 1),
-        (["trauma", "accident", "rta", "fall from height"], "Trauma - Assess for occult injuries", 2),
-    ]
-    
-    for keywords, flag, priority in symptom_flags:
-        if any(kw in symptoms_lower for kw in keywords):
-            red_flags.append({"flag": flag, "priority": priority})
-    
-    # Sort by priority
-    red_flags.sort(key=lambda x: x["priority"])
+    if granularity not in ["hourly", "daily"]:
+        raise HTTPException(status_code=400, detail="granularity must be 'hourly' or 'daily'")
+    
+    tenant = hospital_id if (hospital_id and is_admin) else get_tenant_key(current_user)
+    
+    now = datetime.now(timezone.utc)
+    default_window = timedelta(hours=24) if granularity == "hourly" else timedelta(days=7)
+    since_dt = datetime.fromisoformat(parse_time_bound(since, "since")) if since else now - default_window
+    until_dt = datetime.fromisoformat(parse_time_bound(until, "until")) if until else now
+    
+    key_index = 0 if granularity == "hourly" else 1
+    since_bucket = bucket_keys(since_dt)[key_index]
+    until_bucket = bucket_keys(until_dt)[key_index]
+    
+    collection = db[HOURLY_COLLECTION] if granularity == "hourly" else db[DAILY_COLLECTION]
+    docs = await collection.find(
+        {"hospital_id": tenant, "bucket": {"$gte": since_bucket, "$lte": until_bucket}},
+        {"_id": 0}
+    ).sort("bucket", 1).to_list(1000)
+    
+    series = []
+    for doc in docs:
+        series.append({
+            "bucket": doc["bucket"],
+            "arrivals_by_priority": doc.get("arrivals", {}),
+            "arrivals_total": doc.get("arrivals_total", 0),
+            "cases_created": doc.get("cases_created", 0),
+            "median_triage_to_case_minutes": median_from_histogram(doc.get("triage_to_case_hist", {})),
+            "dispositions": doc.get("dispositions", {}),
+            "ai_calls_total": doc.get("ai_calls_total", 0),
+            "exports_total": doc.get("exports_total", 0)
+        })
     
     return {
-        "red_flags": [f["flag"] for f in red_flags],
-        "detailed_flags": red_flags,
-        "count": len(red_flags),
-        "critical_count": len([f for f in red_flags if f["priority"] == 1])
+        "hospital_id": tenant,
+        "granularity": granularity,
+        "since_bucket": since_bucket,
+        "until_bucket": until_bucket,
+        "summary": summarize_rollups(docs),
+        "series": series
     }
 
+@api_router.post("/analytics/backfill")
+async def backfill_analytics(
+    hospital_id: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Rebuild rollups from triage_assessments, cases and exports (admin only)"""
+    if current_user.role not in ANALYTICS_ADMIN_ROLES:
+        raise HTTPException(status_code=403, detail="Only admins can backfill analytics")
+    
+    result = await backfill_rollups(db, hospital_id, rollup_recorder)
+    logging.info(f"Analytics backfill by {current_user.email}: {result}")
+    return {"success": True, **result}
 
-@api_router.post("/ai/provisional-diagnosis")
-async def provisional_diagnosis_simple(data: dict, current_user: UserResponse = Depends(get_current_user)):
-    """Simple rule-based provisional diagnosis - no AI credits required"""
-    symptoms = data.get("symptoms", "") or data.get("chief_complaint", "")
-    history = data.get("history", "")
-    vitals = data.get("vitals", {})
-    
-    diagnoses = []
-    symptoms_lower = (symptoms + " " + history).lower()
-    
-    # Pattern matching for common presentations
-    diagnosis_patterns = [
-        # Cardiac
-        (["chest pain", "crushing", "sweating", "radiating"], ["Acute Coronary Syndrome", "Angina", "GERD"]),
-        (["palpitation", "racing heart", "irregular pulse"], ["Cardiac Arrhythmia", "Anxiety", "Thyroid disorder"]),
-        
-        # Respiratory
-        (["breathless", "shortness of breath", "dyspnea"], ["COPD Exacerbation", "Pneumonia", "Heart Failure", "Asthma"]),
-        (["cough", "fever", "sputum"], ["Community Acquired Pneumonia", "Bronchitis", "TB - Rule out"]),
-        (["wheeze", "asthma", "difficulty breathing"], ["Acute Asthma", "COPD", "Bronchitis"]),
-        
-        # GI
-        (["abdominal pain", "vomiting"], ["Acute Gastritis", "Appendicitis", "Gastroenteritis"]),
-        (["diarrhea", "loose stools"], ["Acute Gastroenteritis", "Food Poisoning", "Inflammatory Bowel Disease"]),
-        (["right lower quadrant", "rlq pain"], ["Acute Appendicitis", "Ovarian Pathology", "Mesenteric Adenitis"]),
-        (["epigastric", "burning"], ["Acute Gastritis", "GERD", "Peptic Ulcer Disease"]),
-        
-        # Neurological
-        (["headache", "vomiting", "neck pain"], ["Meningitis - Rule out", "Migraine", "Tension Headache"]),
-        (["weakness", "slurred", "facial droop"], ["Acute Stroke", "TIA", "Bell's Palsy"]),
-        (["seizure", "convulsion"], ["Seizure Disorder", "Epilepsy", "Febrile Seizure"]),
-        (["giddiness", "vertigo", "spinning"], ["BPPV", "Vestibular Neuritis", "Meniere's Disease"]),
-        
-        # Infectious
-        (["fever", "body ache", "malaise"], ["Acute Febrile Illness", "Viral Fever", "Dengue - Investigate"]),
-        (["fever", "rash"], ["Dengue", "Chikungunya", "Viral Exanthem"]),
-        (["sore throat", "difficulty swallowing"], ["Acute Pharyngitis", "Tonsillitis", "Peritonsillar Abscess"]),
-        (["burning urination", "dysuria", "frequency"], ["Urinary Tract Infection", "Cystitis", "Pyelonephritis"]),
-        
-        # Trauma
-        (["fall", "injury", "trauma"], ["Soft Tissue Injury", "Fracture - X-ray needed", "Contusion"]),
-        (["head injury", "fall", "hit head"], ["Head Injury - CT if indicated", "Concussion", "Scalp Laceration"]),
-        
-        # Pediatric
-        (["not feeding", "lethargy", "irritable infant"], ["Sepsis - Workup needed", "Meningitis", "Metabolic disorder"]),
-        (["barking cough", "stridor"], ["Croup", "Laryngotracheitis", "Foreign Body - Rule out"]),
-    ]
-    
-    for keywords, dx_list in diagnosis_patterns:
-        if any(kw in symptoms_lower for kw in keywords):
-            diagnoses.extend(dx_list)
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_diagnoses = []
-    for dx in diagnoses:
-        if dx not in seen:
-            seen.add(dx)
-            unique_diagnoses.append(dx)
-    
-    if not unique_diagnoses:
-        unique_diagnoses = ["Requires further evaluation", "Undifferentiated illness"]
+
+@api_router.get("/metrics")
+async def get_metrics(current_user: UserResponse = Depends(get_current_user)):
+    """
+    Operational metrics (admin only). AI streaming time-to-first-token is the
+    primary latency figure; blocking totals are listed for comparison.
+    """
+    if current_user.role not in ANALYTICS_ADMIN_ROLES:
+        raise HTTPException(status_code=403, detail="Only admins can view metrics")
     
+    latency = latency_tracker.snapshot()
     return {
-        "diagnoses": unique_diagnoses[:5],
-        "primary_diagnosis": unique_diagnoses[0] if unique_diagnoses else None,
-        "differentials": unique_diagnoses[1:5] if len(unique_diagnoses) > 1 else [],
-        "based_on": symptoms[:100] if symptoms else "No symptoms provided"
+        "ai_ttft": {name: summary for name, summary in latency.items() if name.endswith(".ttft_ms")},
+        "latency": latency,
+        "llm_gateway": llm_gateway.stats(),
+        "ai_singleflight": ai_singleflight.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "model_router": model_router.stats(),
+        "llm_breakers": {model: breaker.stats() for model, breaker in llm_breakers.items()},
+        "upstream_http": upstream_pool.stats(),
+        "audio_preprocessing": {"enabled": AUDIO_PREPROCESS, **audio_preprocessing},
+        "audio_chunking": {"enabled": AUDIO_CHUNKING, **audio_chunking},
+        "stt_cache": {"enabled": STT_CACHE_ENABLED, **stt_cache.stats(), **stt_cache_counts},
+        "stt_router": stt_router.stats(),
+        "ai_conversations": {"enabled": AI_CONVERSATIONS, **ai_conversations.stats()},
+        "ai_fallbacks": ai_fallbacks,
+        "ai_speculation": {"enabled": AI_SPECULATIVE_PREFETCH, **ai_speculator.stats()},
+        "jobs": job_queue.stats(),
+        "ai_response_cache": ai_response_cache.stats(),
+        "casesheet_section_cache": casesheet_section_cache.stats(),
+        "recent_triage_buffer": recent_triage_buffer.stats()
     }
 
 
+# ========== SIMPLE AI ENDPOINTS (No LLM required) ==========
+
+@api_router.post("/ai/red-flags")
+async def detect_red_flags_simple(data: dict, current_user: UserResponse = Depends(get_current_user)):
+    """Simple rule-based red flag detection - no AI credits required"""
+    red_flags_result, _ = evaluate_case(data)
+    return red_flags_result
+
+
+@api_router.post("/ai/provisional-diagnosis")
+async def provisional_diagnosis_simple(data: dict, current_user: UserResponse = Depends(get_current_user)):
+    """Simple rule-based provisional diagnosis - no AI credits required"""
+    _, diagnosis_result = evaluate_case(data)
+    return diagnosis_result
+
+
 @api_router.post("/ai/analyze-case")
 async def analyze_case_simple(data: dict, current_user: UserResponse = Depends(get_current_user)):
     """Combined analysis - red flags + provisional diagnosis"""
-    red_flags_result = await detect_red_flags_simple(data, current_user)
-    diagnosis_result = await provisional_diagnosis_simple(data, current_user)
-    
-    # Generate recommendations based on findings
-    recommendations = ["Monitor vitals regularly"]
-    
-    if red_flags_result["critical_count"] > 0:
-        recommendations.insert(0, "URGENT: Address critical findings immediately")
-        recommendations.append("Consider ICU/HDU admission")
-    
-    if any("ACS" in f or "MI" in f for f in red_flags_result["red_flags"]):
-        recommendations.append("ECG - Stat")
-        recommendations.append("Cardiac enzymes (Troponin)")
-    
-    if any("stroke" in dx.lower() for dx in diagnosis_result["diagnoses"]):
-        recommendations.append("CT Head - Stat")
-        recommendations.append("Check for thrombolysis window")
-    
-    if any("pneumonia" in dx.lower() or "respiratory" in dx.lower() for dx in diagnosis_result["diagnoses"]):
-        recommendations.append("Chest X-ray")
-        recommendations.append("ABG if SpO2 < 94%")
+    return analyze_case(data)
+
+
+# Batch analysis for triage boards / audits (pure CPU, no AI credits)
+ANALYZE_BATCH_MAX_CASES = int(os.environ.get('ANALYZE_BATCH_MAX_CASES', '1000'))
+
+class AnalyzeCaseBatchRequest(BaseModel):
+    cases: List[dict]
+
+@api_router.post("/ai/analyze-case/batch")
+async def analyze_case_batch_simple(request: AnalyzeCaseBatchRequest, current_user: UserResponse = Depends(get_current_user)):
+    """
+    Combined analysis for many cases in one call.
+    Each case takes the same body as /ai/analyze-case; results are returned in input order.
+    """
+    if len(request.cases) > ANALYZE_BATCH_MAX_CASES:
+        raise HTTPException(status_code=400, detail=f"At most {ANALYZE_BATCH_MAX_CASES} cases per batch")
     
-    recommendations.append("Complete blood count")
-    recommendations.append("Basic metabolic panel")
+    results = analyze_case_batch(request.cases)
+    return {"results": results, "count": len(results)}
+
+
+
+# Audit re-scoring of stored cases with the rule-based keyword engine
+RESCORE_MAX_CASES = 5000
+
+class CaseRescoreRequest(BaseModel):
+    case_ids: List[str] = []
+    since: Optional[str] = None  # created_at window, ISO (naive = IST)
+    until: Optional[str] = None
+    limit: int = 500
+
+@api_router.post("/ai/rescore-cases")
+async def rescore_cases(request: CaseRescoreRequest, current_user: UserResponse = Depends(get_current_user)):
+    """
+    Re-score historical cases with the keyword red-flag / diagnosis rules (no AI credits).
+    Uses the presenting complaint as symptoms and the HPI plus signs and symptoms
+    as history (case_rule_input, as for the rule-based AI answers).
+    """
+    query = {}
+    if request.case_ids:
+        query["id"] = {"$in": request.case_ids}
+    
+    created_filter = {}
+    since_iso = parse_time_bound(request.since, "since")
+    until_iso = parse_time_bound(request.until, "until")
+    if since_iso:
+        created_filter["$gte"] = since_iso
+    if until_iso:
+        created_filter["$lte"] = until_iso
+    if created_filter:
+        query["created_at"] = created_filter
+    
+    limit = max(1, min(request.limit, RESCORE_MAX_CASES))
+    cases = await db.cases.find(
+        query,
+        {"_id": 0, "id": 1, "created_at": 1, "presenting_complaint.text": 1, "history.hpi": 1,
+         "history.signs_and_symptoms": 1}
+    ).sort("created_at", -1).to_list(limit)
+    
+    rule_inputs = [case_rule_input(case) for case in cases]
+    scores = rescore_batch([(rule_input["symptoms"], rule_input["history"]) for rule_input in rule_inputs])
+    
+    results = []
+    for case, (red_flags, diagnoses) in zip(cases, scores):
+        red_flags.sort(key=lambda x: x["priority"])
+        results.append({
+            "case_id": case["id"],
+            "created_at": case.get("created_at"),
+            "red_flags": [f["flag"] for f in red_flags],
+            "critical_count": len([f for f in red_flags if f["priority"] == 1]),
+            "diagnoses": list(dict.fromkeys(diagnoses))[:5]
+        })
     
-    return {
-        "red_flags": red_flags_result["red_flags"],
-        "critical_count": red_flags_result["critical_count"],
-        "provisional_diagnoses": diagnosis_result["diagnoses"],
-        "primary_diagnosis": diagnosis_result["primary_diagnosis"],
-        "differentials": diagnosis_result["differentials"],
-        "recommendations": list(dict.fromkeys(recommendations))[:8],  # Remove duplicates, limit to 8
-        "urgency": "CRITICAL" if red_flags_result["critical_count"] > 0 else "URGENT" if red_flags_result["count"] > 0 else "ROUTINE"
-    }
+    return {"count": len(results), "results": results}
+
+# Content-addressed cache for /ai/generate responses
+AI_GENERATE_MODEL = "gpt-5.1"
+AI_CACHE_TTL_HOURS = float(os.environ.get('AI_CACHE_TTL_HOURS', '24'))
+AI_CACHE_LRU_SIZE = int(os.environ.get('AI_CACHE_LRU_SIZE', '512'))
+ai_response_cache = ResponseCache(db, "ai_response_cache", int(AI_CACHE_TTL_HOURS * 3600), AI_CACHE_LRU_SIZE)
+
+# Case sections read by the case digest; updating any of them drops cached responses
+AI_PROMPT_CASE_FIELDS = DIGEST_CASE_FIELDS
+
+def ai_response_cache_key(case_id: str, prompt_type: str, digest_hash: str, model: str = AI_GENERATE_MODEL) -> str:
+    """Case data reaches the prompt only through the digest, so its hash stands in for the prompt"""
+    return content_hash(case_id, prompt_type, model, AI_SYSTEM_MESSAGE, PROMPT_VERSION, digest_hash)
+
+# Opt-in: repeat analyses of a case continue its conversation. The first call
+# sends the digest, later calls the earlier turns plus the fields changed since
+# the previous answer, as long as that costs less than the full prompt.
+# Off by default: the chat API keeps no state, so a delta turn re-sends the whole
+# history (earlier prompt and answers), which is larger than a fresh prompt. It
+# only pays when the provider's prompt cache bills that prefix at a discount:
+# enable it together with AI_CONVERSATION_CACHED_PREFIX_WEIGHT set to the cached
+# input price relative to fresh input (at 1.0 every turn goes out fresh).
+# benchmarks/bench_prompt_tokens.py shows delta turns win only at weights around
+# 0.5 and below, and not after long answers
+AI_CONVERSATIONS = os.environ.get('AI_CONVERSATIONS', 'false').lower() == 'true'
+ai_conversations = ConversationStore(
+    build_delta_prompt,
+    maxsize=int(os.environ.get('AI_CONVERSATION_CACHE_SIZE', '1024')),
+    ttl_seconds=float(os.environ.get('AI_CONVERSATION_TTL_MINUTES', '60')) * 60,
+    max_delta_fields=int(os.environ.get('AI_CONVERSATION_MAX_DELTA_FIELDS', '12')),
+    max_turns=int(os.environ.get('AI_CONVERSATION_MAX_TURNS', '6')),
+    cached_prefix_weight=float(os.environ.get('AI_CONVERSATION_CACHED_PREFIX_WEIGHT', '1.0'))
+)
 
+def ai_conversation_turn(request: AIGenerateRequest, case: dict, prompt: str, model: str) -> dict:
+    """What to send for this generation: history + delta message, or the full prompt"""
+    if not AI_CONVERSATIONS:
+        return {"mode": "fresh", "reason": "disabled", "history": [], "message": prompt, "changed_fields": None,
+                "sent_chars": len(prompt), "fresh_chars": len(prompt)}
+    key = (request.case_sheet_id, request.prompt_type, model, PROMPT_VERSION)
+    return ai_conversations.start(key, case_field_values(case), prompt)
+
+def commit_ai_conversation(turn: dict, response: str) -> None:
+    if AI_CONVERSATIONS:
+        ai_conversations.commit(turn, response)
+
+def conversation_info(turn: dict) -> dict:
+    """Client-facing summary of a conversation turn"""
+    return {"mode": turn["mode"], "reason": turn["reason"], "changed_fields": turn["changed_fields"],
+            "sent_chars": turn["sent_chars"], "fresh_chars": turn["fresh_chars"]}
+
+def route_model(task: str, priority_class: str, current_user: Optional[UserResponse] = None) -> dict:
+    """Model router decision for one LLM call; returned to the client as `routing`"""
+    return model_router.route(task, priority_class, current_user.subscription_tier if current_user else None)
+
+async def load_case_digest(case_id: Optional[str]) -> str:
+    """Stored digest of an existing case (follow-up dictation context); empty if unknown"""
+    if not case_id:
+        return ""
+    projection = {"_id": 0, "ai_digest": 1, "ai_digest_hash": 1, "ai_digest_version": 1,
+                  **{field: 1 for field in DIGEST_CASE_FIELDS}}
+    case = await db.cases.find_one({"id": case_id}, projection)
+    if not case:
+        return ""
+    digest, _ = get_case_digest(case)
+    return digest
+
+async def coalesced_completion(kind: str, prompt: str, system_message: Optional[str] = None,
+                               model: str = "gpt-4o-mini", tenant: Optional[str] = None,
+                               priority_class: Optional[str] = None, **options) -> str:
+    """LLM completion where concurrent identical requests (same endpoint, prompt and model) share one call"""
+    key = (kind, content_hash(model, system_message or "", prompt, options))
+    response, _ = await ai_singleflight.do(
+        key, lambda: llm_gateway.complete(
+            prompt, system_message=system_message, model=model,
+            priority_class=priority_class or classify_llm_request(prompt_type=kind), tenant=tenant, **options
+        )
+    )
+    return response
 
-@api_router.post("/ai/generate", response_model=AIResponse)
-async def generate_ai_response(request: AIGenerateRequest, current_user: UserResponse = Depends(get_current_user)):
+async def json_completion(kind: str, prompt: str, system_message: str, routing: dict, tenant: Optional[str],
+                          on_field: Optional[Callable[[str, Any], None]] = None) -> Tuple[Any, bool]:
+    """
+    JSON completion for an extraction prompt; returns (document, repaired).
+    With on_field the completion is streamed and on_field(path, value) is
+    called for every field as soon as the model has finished writing it.
+    Truncated or chatty output is repaired instead of failing the request.
+    """
+    if on_field is None:
+        response_text = await coalesced_completion(
+            kind, prompt, system_message=system_message, model=routing["model"],
+            tenant=tenant, priority_class=routing["priority_class"]
+        )
+        return parse_llm_json(response_text)
+
+    parser = IncrementalJSONParser()
+    async for text in llm_gateway.stream(prompt, system_message=system_message, model=routing["model"],
+                                         priority_class=routing["priority_class"], tenant=tenant):
+        for path, value in parser.feed(text):
+            on_field(path, value)
+    return parser.finish()
+
+async def invalidate_ai_response_cache(case_id: str, updated_fields) -> None:
+    """Drop cached responses for a case when a prompt-relevant section changed (dotted paths allowed)"""
+    if not any(field.split(".")[0] in AI_PROMPT_CASE_FIELDS for field in updated_fields):
+        return
+    try:
+        await ai_response_cache.invalidate_case(case_id)
+    except Exception as e:
+        logging.error(f"AI cache invalidation failed for case {case_id}: {e}")
+
+def get_ai_sources(prompt_type: str) -> List[AISource]:
+    """Relevant medical sources shown with an /ai/generate response"""
+    sources = []
+    if prompt_type == "red_flags":
+        sources = [
+            AISource(
+                title="ACLS Guidelines - Advanced Cardiovascular Life Support",
+                url="https://www.heart.org/en/professional/quality-improvement/acls-ecc",
+                snippet="Evidence-based guidelines for emergency cardiovascular care and critical patient assessment"
+            ),
+            AISource(
+                title="ATLS Guidelines - Advanced Trauma Life Support",
+                url="https://www.facs.org/quality-programs/trauma/education/atls",
+                snippet="Systematic approach to trauma patient assessment and management"
+            ),
+            AISource(
+                title="Emergency Triage Manchester Triage System",
+                url="https://www.manchester triage.com",
+                snippet="Standardized clinical risk assessment for emergency departments"
+            )
+        ]
+    elif prompt_type == "diagnosis_suggestions":
+        sources = [
+            AISource(
+                title="UpToDate - Clinical Decision Support",
+                url="https://www.uptodate.com",
+                snippet="Evidence-based clinical decision support resource for differential diagnosis"
+            ),
+            AISource(
+                title="NICE Guidelines - National Institute for Health and Care Excellence",
+                url="https://www.nice.org.uk/guidance",
+                snippet="Evidence-based recommendations for health and care in England"
+            ),
+            AISource(
+                title="AHA/ASA Stroke Guidelines",
+                url="https://www.stroke.org/en/professional/guidelines",
+                snippet="American Heart Association/American Stroke Association clinical practice guidelines"
+            ),
+            AISource(
+                title="Emergency Medicine Practice Guidelines",
+                url="https://www.ebmedicine.net",
+                snippet="Evidence-based emergency medicine clinical practice guidelines and reviews"
+            )
+        ]
+    return sources
+
+
+async def prepare_ai_generation(request: AIGenerateRequest, current_user: UserResponse):
+    """
+    Access check, prompt and cache lookup shared by the blocking and streaming
+    /ai/generate variants. Returns (prompt, cache_key, cached_doc, ai_access, routing, case)
+    where routing is the model router decision (model, scheduler priority class).
+    """
     # Determine AI type based on prompt
     ai_type = "advanced" if request.prompt_type in ["vbg_interpretation", "differential_diagnosis", "discharge_summary"] else "basic"
     
@@ -2895,6 +3322,24 @@ async def generate_ai_response(request: AIGenerateRequest, current_user: UserRes
             }
         )
     
+    case = await db.cases.find_one({"id": request.case_sheet_id}, {"_id": 0})
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    
+    digest, digest_hash = get_case_digest(case)
+    prompt = build_case_prompt(case, request.prompt_type, digest)
+    if prompt is None:
+        raise HTTPException(status_code=400, detail="Invalid prompt type")
+    
+    llm_class = classify_llm_request(case.get("triage_priority"), request.prompt_type)
+    routing = route_model("ai_generate", llm_class, current_user)
+    
+    # Same case content + prompt type + model -> serve the stored response, no credit charged
+    cache_key = ai_response_cache_key(request.case_sheet_id, request.prompt_type, digest_hash, routing["model"])
+    cached = await ai_response_cache.get(cache_key)
+    return prompt, cache_key, cached, ai_access, routing, case
+
+async def charge_ai_generation(ai_access: dict, current_user: UserResponse):
     # Deduct credit if using credits method
     if ai_access["method"] == "credits":
         success = await deduct_ai_credit(current_user.id)
@@ -2903,274 +3348,500 @@ async def generate_ai_response(request: AIGenerateRequest, current_user: UserRes
     
     # Track AI usage
     await increment_daily_ai_usage(current_user.id)
-    
-    case = await db.cases.find_one({"id": request.case_sheet_id}, {"_id": 0})
-    if not case:
-        raise HTTPException(status_code=404, detail="Case not found")
-    
-    if request.prompt_type == "discharge_summary":
-        prompt = f"""
-You are an emergency medicine AI assistant. Generate a comprehensive discharge summary based on the following case sheet data.
-
-Patient Information:
-- Name: {case['patient']['name']}
-- Age/Sex: {case['patient']['age']}/{case['patient']['sex']}
-- UHID: {case['patient'].get('uhid', 'N/A')}
-- MLC: {'Yes' if case['patient'].get('mlc', False) else 'No'}
 
-Vitals at Arrival:
-- HR: {case['vitals_at_arrival'].get('hr', 'N/A')}
-- BP: {case['vitals_at_arrival'].get('bp_systolic', 'N/A')}/{case['vitals_at_arrival'].get('bp_diastolic', 'N/A')}
-- RR: {case['vitals_at_arrival'].get('rr', 'N/A')}
-- SpO2: {case['vitals_at_arrival'].get('spo2', 'N/A')}%
-- Temperature: {case['vitals_at_arrival'].get('temperature', 'N/A')}°C
-- GCS: E{case['vitals_at_arrival'].get('gcs_e', '-')} V{case['vitals_at_arrival'].get('gcs_v', '-')} M{case['vitals_at_arrival'].get('gcs_m', '-')}
-
-Presenting Complaint:
-{case['presenting_complaint']['text']}
-Duration: {case['presenting_complaint']['duration']}
-Onset: {case['presenting_complaint']['onset_type']}
-
-History:
-{case['history'].get('hpi', 'Not documented')}
+async def refund_ai_charge(ai_access: dict, current_user: UserResponse):
+    """Undo charge_ai_generation for a call whose result the caller never got"""
+    if ai_access["method"] == "credits":
+        await db.users.update_one(
+            {"id": current_user.id},
+            {
+                "$inc": {"ai_credits": 1},
+                "$push": {
+                    "credit_history": {
+                        "type": "refund",
+                        "credits": 1,
+                        "timestamp": datetime.now(timezone.utc).isoformat()
+                    }
+                }
+            }
+        )
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    await db.ai_usage.update_one(
+        {"user_id": current_user.id, "date": today, "count": {"$gt": 0}},
+        {"$inc": {"count": -1}}
+    )
 
-Past Medical History: {', '.join(case['history'].get('past_medical', ['None documented']))}
+async def finish_ai_generation(request: AIGenerateRequest, current_user: UserResponse, cache_key: str, response: str,
+                               model: str = AI_GENERATE_MODEL):
+    """Bookkeeping after a successful generation: cache, usage and rollups"""
+    await ai_response_cache.set(cache_key, request.case_sheet_id, {
+        "prompt_type": request.prompt_type,
+        "model": model,
+        "response": response
+    })
+    await record_ai_generation_usage(request, current_user)
 
-Primary Assessment (ABCDE):
-- Airway: {case['primary_assessment'].get('airway_status', 'Not documented')}
-- Breathing: RR {case['primary_assessment'].get('breathing_rr', 'N/A')}, SpO2 {case['primary_assessment'].get('breathing_spo2', 'N/A')}%
-- Circulation: HR {case['primary_assessment'].get('circulation_hr', 'N/A')}, BP {case['primary_assessment'].get('circulation_bp_systolic', 'N/A')}/{case['primary_assessment'].get('circulation_bp_diastolic', 'N/A')}
-- Disability: AVPU {case['primary_assessment'].get('disability_avpu', 'N/A')}, GCS E{case['primary_assessment'].get('disability_gcs_e', '-')}V{case['primary_assessment'].get('disability_gcs_v', '-')}M{case['primary_assessment'].get('disability_gcs_m', '-')}
-- Exposure: Temperature {case['primary_assessment'].get('exposure_temperature', 'N/A')}°C
+async def record_ai_generation_usage(request: AIGenerateRequest, current_user: UserResponse):
+    # Increment AI usage for free tier users after successful generation
+    if current_user.subscription_tier == "free":
+        await increment_daily_ai_usage(current_user.id)
+    
+    record_ai_call(current_user, request.prompt_type)
 
-Examination:
-{case['examination'].get('general_notes', 'Not documented')}
+async def charge_speculative_hit(request: AIGenerateRequest, current_user: UserResponse, cache_key: str, ai_access: dict):
+    """The first serve of a speculatively generated response is charged like a generation"""
+    if not await ai_response_cache.claim(cache_key):
+        return
+    try:
+        await charge_ai_generation(ai_access, current_user)
+    except HTTPException:
+        await ai_response_cache.unclaim(cache_key)
+        raise
+    await record_ai_generation_usage(request, current_user)
+
+
+# ========== LLM CIRCUIT BREAKERS / RULE-ENGINE FALLBACK ==========
+# A breaker per model fails /ai/generate fast while the upstream keeps failing or
+# timing out. red_flags and diagnosis_suggestions then answer from the local rule
+# engine (labelled degraded, not cached, not charged); other prompt types get 503.
+# Those two also have a timeout budget: past it the caller gets the rule-based
+# answer and the upstream call finishes in the background into the cache, unpaid
+# (the first request served it is charged, as for speculative results). Streamed
+# they get the same budget for the first token; past it the rule-based answer is
+# sent as the done event, the charge is refunded and the upstream stream closed.
+
+AI_FALLBACK_PROMPT_TYPES = {"red_flags", "diagnosis_suggestions"}
+AI_GENERATE_TIMEOUT_SECONDS = float(os.environ.get('AI_GENERATE_TIMEOUT_SECONDS', '20'))
+LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', 5))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get('LLM_BREAKER_RESET_SECONDS', '30'))
+
+llm_breakers: Dict[str, CircuitBreaker] = {}
+ai_fallbacks: Dict[str, int] = {}
+
+def llm_breaker(model: str) -> CircuitBreaker:
+    breaker = llm_breakers.get(model)
+    if breaker is None:
+        breaker = CircuitBreaker(model, failure_threshold=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET_SECONDS)
+        llm_breakers[model] = breaker
+    return breaker
+
+def degraded_ai_text(request: AIGenerateRequest, case: dict, routing: dict, reason: str) -> str:
+    """Rule-engine text for a fallback-capable prompt type, counted under `reason`"""
+    ai_fallbacks[reason] = ai_fallbacks.get(reason, 0) + 1
+    logging.warning(f"AI generate degraded to rule engine ({reason}) for {request.prompt_type} on {routing['model']}")
+    return rule_based_ai_text(case, request.prompt_type)
+
+def degraded_ai_events(request: AIGenerateRequest, case: dict, routing: dict, reason: str):
+    """SSE events (token, then done) of the rule-engine answer"""
+    return cached_generation_events(request, {"response": degraded_ai_text(request, case, routing, reason)}, {
+        "cached": False, "sources": [], "model": None,
+        "degraded": True, "degraded_reason": reason, "routing": routing
+    })
 
-Investigations:
-Panels: {', '.join(case['investigations'].get('panels_selected', ['None']))}
+def degraded_ai_response(request: AIGenerateRequest, case: dict, routing: dict, reason: str, stream: bool = False):
+    """Rule-engine answer for a fallback-capable prompt type"""
+    if stream:
+        return StreamingResponse(degraded_ai_events(request, case, routing, reason),
+                                 media_type="text/event-stream", headers=SSE_HEADERS)
+    text = degraded_ai_text(request, case, routing, reason)
+    return AIResponse(
+        response=text,
+        case_sheet_id=request.case_sheet_id,
+        sources=[],
+        routing=routing,
+        degraded=True,
+        degraded_reason=reason
+    )
 
-Treatment Given:
-Interventions: {', '.join(case['treatment'].get('interventions', ['None documented']))}
-{case['treatment'].get('intervention_notes', '')}
+def circuit_open_response(request: AIGenerateRequest, case: dict, routing: dict, stream: bool = False):
+    """None while the routed model's breaker admits the call; else the degraded answer (or 503)"""
+    if llm_breaker(routing["model"]).allow():
+        return None
+    if request.prompt_type in AI_FALLBACK_PROMPT_TYPES:
+        return degraded_ai_response(request, case, routing, "circuit_open", stream)
+    raise HTTPException(status_code=503, detail="AI service is temporarily unavailable, please retry shortly")
 
-Provisional Diagnosis:
-{', '.join(case['treatment'].get('provisional_diagnoses', ['Not documented']))}
+async def charge_admitted_generation(ai_access: dict, current_user: UserResponse, routing: dict):
+    """
+    charge_ai_generation for a call the breaker has admitted. If charging
+    fails (e.g. 429, no credits) the call is never made, so the admission is
+    handed back; otherwise a half-open breaker would keep waiting on a trial
+    that never reports.
+    """
+    try:
+        await charge_ai_generation(ai_access, current_user)
+    except BaseException:
+        llm_breaker(routing["model"]).release()
+        raise
 
-Disposition:
-{case.get('disposition', {}).get('type', 'Not documented') if case.get('disposition') else 'Not documented'}
-Condition: {case.get('disposition', {}).get('condition_at_discharge', 'Not documented') if case.get('disposition') else 'Not documented'}
 
-Please generate a professional, well-structured discharge summary in standard medical format.
-"""
-    elif request.prompt_type == "red_flags":
-        # Get patient age for context
-        patient_age = case['patient'].get('age', 'Unknown')
-        patient_sex = case['patient'].get('sex', 'Unknown')
-        case_type = case.get('case_type', 'adult')
-        
-        # Build history context
-        past_medical = case['history'].get('past_medical', [])
-        allergies = case['history'].get('allergies', [])
-        hopi = case['history'].get('hpi', case['history'].get('events_hopi', ''))
+@api_router.post("/ai/generate", response_model=AIResponse)
+async def generate_ai_response(request: AIGenerateRequest, current_user: UserResponse = Depends(get_current_user)):
+    prompt, cache_key, cached, ai_access, routing, case = await prepare_ai_generation(request, current_user)
+    if cached:
+        if cached.get("speculative"):
+            await charge_speculative_hit(request, current_user, cache_key, ai_access)
+        return AIResponse(
+            response=cached["response"],
+            case_sheet_id=request.case_sheet_id,
+            sources=get_ai_sources(request.prompt_type),
+            cached=True,
+            model=cached.get("model"),
+            routing=routing
+        )
+    
+    degraded = circuit_open_response(request, case, routing)
+    if degraded is not None:
+        return degraded
+    
+    breaker = llm_breaker(routing["model"])
+    can_degrade = request.prompt_type in AI_FALLBACK_PROMPT_TYPES
+    abandoned = asyncio.Event()  # the caller already got the rule-based answer
+    turn = ai_conversation_turn(request, case, prompt, routing["model"])
+    reported = False
+    
+    def report(ok: Optional[bool]):
+        # The breaker admitted this request: its outcome is reported exactly once,
+        # whether it made the call, joined another flight or gave up waiting
+        # (None hands the admission back without an outcome)
+        nonlocal reported
+        if reported:
+            return
+        reported = True
+        if ok is None:
+            breaker.release()
+        elif ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+    
+    async def generate() -> str:
+        with latency_tracker.timer("ai_generate.total_ms"), latency_tracker.timer(f"ai_generate.{turn['mode']}_ms"):
+            try:
+                response = await llm_gateway.complete(
+                    turn["message"], system_message=AI_SYSTEM_MESSAGE, model=routing["model"],
+                    priority_class=routing["priority_class"], tenant=get_tenant_key(current_user),
+                    history=turn["history"]
+                )
+            except Exception:
+                report(False)
+                raise
+        commit_ai_conversation(turn, response)
+        if abandoned.is_set():
+            # Keep the late result for the next request, which is charged for it
+            await ai_response_cache.set(cache_key, request.case_sheet_id, {
+                "prompt_type": request.prompt_type,
+                "model": routing["model"],
+                "response": response,
+                "speculative": True
+            })
+            return response
+        report(True)
+        await finish_ai_generation(request, current_user, cache_key, response, routing["model"])
+        return response
+    
+    # The caller that will make the upstream call is charged before it, so a
+    # failed charge (429) never throws away a completion already paid for
+    # upstream; the charge is refunded if the caller does not get that result
+    charged = False
+    if not ai_singleflight.in_flight(("ai_generate", cache_key)):
+        await charge_admitted_generation(ai_access, current_user, routing)
+        charged = True
+    
+    async def refund():
+        nonlocal charged
+        if charged:
+            charged = False
+            await refund_ai_charge(ai_access, current_user)
+    
+    try:
+        # Concurrent duplicates (same case snapshot + prompt type) await the leader's
+        # call; only the leader is charged
+        flight = ai_singleflight.do(("ai_generate", cache_key), generate)
+        if can_degrade:
+            try:
+                response, shared = await asyncio.wait_for(flight, timeout=AI_GENERATE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                abandoned.set()
+                report(False)
+                await refund()
+                return degraded_ai_response(request, case, routing, "timeout")
+        else:
+            response, shared = await flight
+        if shared:
+            # The leader (possibly a speculative pre-generation, which never asks
+            # the breaker) got an answer from this model
+            report(True)
+            # Another request became the leader while this one was being charged
+            await refund()
+            # The leader may have been a background pre-generation nobody paid for yet
+            leader = await ai_response_cache.get(cache_key)
+            if leader and leader.get("speculative"):
+                await charge_speculative_hit(request, current_user, cache_key, ai_access)
         
-        prompt = f"""
-You are a senior emergency medicine consultant providing RAPID RISK STRATIFICATION.
-
-=== PATIENT PROFILE ===
-Age: {patient_age} | Sex: {patient_sex} | Type: {case_type.upper()}
-Chief Complaint: {case['presenting_complaint']['text']}
-Duration: {case['presenting_complaint'].get('duration', 'Not specified')}
-HPI: {hopi if hopi else 'Not documented'}
-PMH: {', '.join(past_medical) if past_medical else 'None'}
-Allergies: {', '.join(allergies) if allergies else 'NKDA'}
+        return AIResponse(
+            response=response,
+            case_sheet_id=request.case_sheet_id,
+            sources=get_ai_sources(request.prompt_type),
+            coalesced=shared,
+            model=routing["model"],
+            routing=routing,
+            conversation=None if shared else conversation_info(turn)
+        )
+    except HTTPException:
+        report(None)
+        await refund()
+        raise
+    except Exception as e:
+        logging.error(f"AI generation error: {str(e)}")
+        # The leader already counted its upstream failure; a follower hands its
+        # admission back rather than counting the same failure again
+        report(None)
+        await refund()
+        if can_degrade:
+            return degraded_ai_response(request, case, routing, "upstream_error")
+        raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
 
-=== VITAL SIGNS ===
-HR: {case['vitals_at_arrival'].get('hr', 'N/A')} bpm | BP: {case['vitals_at_arrival'].get('bp_systolic', 'N/A')}/{case['vitals_at_arrival'].get('bp_diastolic', 'N/A')} mmHg
-RR: {case['vitals_at_arrival'].get('rr', 'N/A')}/min | SpO2: {case['vitals_at_arrival'].get('spo2', 'N/A')}%
-Temp: {case['vitals_at_arrival'].get('temperature', 'N/A')}°C | GCS: E{case['vitals_at_arrival'].get('gcs_e', '-')}V{case['vitals_at_arrival'].get('gcs_v', '-')}M{case['vitals_at_arrival'].get('gcs_m', '-')}
 
-=== PRIMARY SURVEY ===
-Airway: {case['primary_assessment'].get('airway_status', 'Patent')} {case['primary_assessment'].get('airway_additional_notes', '')}
-Breathing: WOB {case['primary_assessment'].get('breathing_work', 'Normal')} | {case['primary_assessment'].get('breathing_additional_notes', '')}
-Circulation: CRT {case['primary_assessment'].get('circulation_crt', 'N/A')}s | Pulses {case['primary_assessment'].get('circulation_peripheral_pulses', 'Present')}
-Disability: AVPU {case['primary_assessment'].get('disability_avpu', 'Alert')} | Pupils {case['primary_assessment'].get('disability_pupils_reaction', 'Equal reactive')}
+# ========== SPECULATIVE AI PRE-GENERATION ==========
+# Opt-in: after a RED/ORANGE case is created or its clinical content changes, the
+# analyses doctors open first are generated in the background (lowest scheduler
+# class) and stored in the response cache flagged speculative. The first request
+# that is served one is charged as if it had generated it.
 
-=== PROVIDE CONCISE RISK ANALYSIS ===
+AI_SPECULATIVE_PREFETCH = os.environ.get('AI_SPECULATIVE_PREFETCH', 'false').lower() == 'true'
+AI_SPECULATIVE_PROMPT_TYPES = ["red_flags", "diagnosis_suggestions"]
+AI_SPECULATIVE_TRIAGE_COLORS = {"red", "orange"}
 
-🚨 CRITICAL RED FLAGS:
-[List 2-4 LIFE-THREATENING conditions to rule out IMMEDIATELY based on presentation. Be specific to THIS patient's symptoms]
+ai_speculator = SpeculativeRunner(
+    max_pending=int(os.environ.get('AI_SPECULATIVE_MAX_PENDING', 4)),
+    # Never add speculative calls while on-demand calls are waiting for a slot
+    is_busy=lambda: llm_scheduler.waiting(["critical", "urgent", "routine"]) > 0
+)
 
-⚠️ URGENT CONCERNS:
-[List 2-3 serious conditions requiring workup within 1-2 hours]
-
-⚡ IMMEDIATE ACTIONS:
-[3-5 specific actions: Labs/ECG/Imaging to order NOW. Be practical for Indian ER setting]
-
-🔍 CLINICAL WATCH:
-[What vital sign trends or symptoms would indicate deterioration?]
-
-📋 DISPOSITION GUIDANCE:
-[Based on current presentation - ICU / Ward / Observation / Safe to discharge after workup?]
-
-Keep responses CONCISE and ACTIONABLE. Focus on what ER doctor should DO right now. Reference Indian protocols where applicable (NICE, ACLS, ATLS).
-"""
-    elif request.prompt_type == "diagnosis_suggestions":
-        # Get comprehensive patient context
-        patient_age = case['patient'].get('age', 'Unknown')
-        patient_sex = case['patient'].get('sex', 'Unknown')
-        case_type = case.get('case_type', 'adult')
-        
-        past_medical = case['history'].get('past_medical', [])
-        drug_history = case['history'].get('drug_history', '')
-        family_history = case['history'].get('family_history', '')
-        hopi = case['history'].get('hpi', case['history'].get('events_hopi', ''))
-        
-        # Get examination findings
-        exam = case.get('examination', {})
-        general_notes = exam.get('general_additional_notes', exam.get('general_notes', ''))
-        cvs_notes = exam.get('cvs_additional_notes', '')
-        resp_notes = exam.get('respiratory_additional_notes', '')
-        abd_notes = exam.get('abdomen_additional_notes', '')
-        cns_notes = exam.get('cns_additional_notes', '')
-        
-        prompt = f"""
-You are a senior emergency medicine consultant providing DIFFERENTIAL DIAGNOSIS analysis.
-
-=== PATIENT PROFILE ===
-Age: {patient_age} | Sex: {patient_sex} | Type: {case_type.upper()}
-
-=== PRESENTING COMPLAINT ===
-Chief Complaint: {case['presenting_complaint']['text']}
-Duration: {case['presenting_complaint'].get('duration', 'Not specified')}
-Onset: {case['presenting_complaint'].get('onset_type', 'Not specified')}
-Course: {case['presenting_complaint'].get('course', 'Not specified')}
-
-=== HISTORY ===
-HPI: {hopi if hopi else 'Not documented'}
-Past Medical: {', '.join(past_medical) if past_medical else 'None'}
-Drug History: {drug_history if drug_history else 'None'}
-Family History: {family_history if family_history else 'Non-contributory'}
-
-=== VITALS ===
-HR: {case['vitals_at_arrival'].get('hr', 'N/A')} | BP: {case['vitals_at_arrival'].get('bp_systolic', 'N/A')}/{case['vitals_at_arrival'].get('bp_diastolic', 'N/A')} | RR: {case['vitals_at_arrival'].get('rr', 'N/A')}
-SpO2: {case['vitals_at_arrival'].get('spo2', 'N/A')}% | Temp: {case['vitals_at_arrival'].get('temperature', 'N/A')}°C | GCS: {(case['vitals_at_arrival'].get('gcs_e', 0) or 0) + (case['vitals_at_arrival'].get('gcs_v', 0) or 0) + (case['vitals_at_arrival'].get('gcs_m', 0) or 0)}/15
-
-=== EXAMINATION ===
-General: {general_notes if general_notes else case.get('examination', {}).get('general_status', 'Not documented')}
-CVS: {cvs_notes if cvs_notes else exam.get('cvs_status', 'Normal')}
-Respiratory: {resp_notes if resp_notes else exam.get('respiratory_status', 'Normal')}
-Abdomen: {abd_notes if abd_notes else exam.get('abdomen_status', 'Normal')}
-CNS: {cns_notes if cns_notes else exam.get('cns_status', 'Normal')}
-
-=== PROVIDE STRUCTURED DIFFERENTIAL DIAGNOSIS ===
-
-🎯 TOP 3 DIFFERENTIAL DIAGNOSES:
-
-1️⃣ [MOST LIKELY] _____
-   • Supporting features: [List 2-3 key findings from THIS patient that support this diagnosis]
-   • To confirm: [Specific test - e.g., "Troponin + ECG" not generic "cardiac workup"]
-   • Initial Rx: [If confirmed, what to start immediately]
-
-2️⃣ [CONSIDER] _____
-   • Supporting features: [Findings supporting this]
-   • To confirm: [Specific test]
-   • Initial Rx: [If confirmed]
-
-3️⃣ [RULE OUT] _____
-   • Supporting features: [Findings suggesting this]
-   • To confirm: [Specific test]
-   • Initial Rx: [If confirmed]
-
-⚠️ MUST NOT MISS:
-[1-2 dangerous diagnoses that MUST be ruled out even if unlikely - with specific test to exclude]
-
-📊 RECOMMENDED WORKUP:
-[Prioritized list of 4-6 investigations with expected findings. Be specific: "ECG looking for ST changes" not just "ECG"]
+def schedule_speculative_ai(case: dict, current_user: UserResponse) -> None:
+    """Queue pre-generation for a high-priority case; dropped when over budget"""
+    if not AI_SPECULATIVE_PREFETCH or not case:
+        return
+    if (case.get("triage_color") or "").lower() not in AI_SPECULATIVE_TRIAGE_COLORS:
+        return
+    
+    digest, digest_hash = get_case_digest(case)
+    for prompt_type in AI_SPECULATIVE_PROMPT_TYPES:
+        # Pre-generate with the model an on-demand request would be routed to now
+        llm_class = classify_llm_request(case.get("triage_priority"), prompt_type)
+        model = route_model("ai_generate", llm_class, current_user)["model"]
+        if llm_breaker(model).state != CLOSED:
+            continue
+        cache_key = ai_response_cache_key(case["id"], prompt_type, digest_hash, model)
+        if ai_singleflight.in_flight(("ai_generate", cache_key)):
+            continue
+        prompt = build_case_prompt(case, prompt_type, digest)
+        ai_speculator.submit(cache_key, lambda prompt_type=prompt_type, prompt=prompt, cache_key=cache_key, model=model:
+                             speculate_ai_generation(case["id"], prompt_type, prompt, cache_key, model, current_user))
+
+async def speculate_ai_generation(case_id: str, prompt_type: str, prompt: str, cache_key: str, model: str,
+                                  current_user: UserResponse) -> None:
+    if await ai_response_cache.get(cache_key):
+        return
+    # Only spend tokens on results the user would be allowed to open
+    ai_access = await check_ai_access(current_user.id, "basic")
+    if not ai_access["allowed"]:
+        return
+    
+    async def generate() -> str:
+        # An on-demand request may have generated it while we were queued
+        existing = await ai_response_cache.get(cache_key)
+        if existing:
+            return existing["response"]
+        with latency_tracker.timer("ai_speculative.total_ms"):
+            response = await llm_gateway.complete(
+                prompt, system_message=AI_SYSTEM_MESSAGE, model=model,
+                priority_class=classify_llm_request(speculative=True), tenant=get_tenant_key(current_user)
+            )
+        if not response:
+            raise ValueError("Empty completion")
+        await ai_response_cache.set(cache_key, case_id, {
+            "prompt_type": prompt_type,
+            "model": model,
+            "response": response,
+            "speculative": True
+        })
+        return response
+    
+    # Shares the /ai/generate flight so a doctor asking mid-generation waits for this call
+    await ai_singleflight.do(("ai_generate", cache_key), generate)
 
-💊 EMPIRICAL TREATMENT:
-[If diagnosis uncertain, what can be started safely while awaiting workup? Include doses for Indian setting]
 
-📝 WORKING DIAGNOSIS:
-[Single line - what would you write as provisional diagnosis based on current info?]
+# ========== AI STREAMING (Server-Sent Events) ==========
+# Time to first token (TTFT) is the primary latency metric for these endpoints.
 
-Be SPECIFIC to this patient. Avoid generic differentials. Focus on practical ER decision-making.
-"""
+def stream_ai_generation(request: AIGenerateRequest, current_user: UserResponse, prompt: str, cache_key: str,
+                         metric: str, routing: dict, on_complete=None, case: Optional[dict] = None,
+                         on_failure=None) -> StreamingResponse:
+    """
+    SSE response for a prepared (and already charged) generation.
+    Events: token {text}, done {response, sources, ttft_ms, total_ms, ...}, error {message}.
+    The upstream read runs in its own task so the result is still cached (and
+    on_complete persisted) if the client disconnects mid-stream. With the case
+    document the call continues the case's conversation (see ai_conversations).
+    on_failure() is awaited when the stream ends without a done event (e.g. to
+    refund the charge). Fallback-capable prompt types get AI_GENERATE_TIMEOUT_SECONDS
+    for the first token; past it the rule-based answer is sent instead, the failure
+    recorded on the breaker and on_failure() awaited.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    breaker = llm_breaker(routing["model"])
+    can_degrade = case is not None and request.prompt_type in AI_FALLBACK_PROMPT_TYPES
+    first_token_timeout = AI_GENERATE_TIMEOUT_SECONDS if can_degrade else None
+    
+    async def failed():
+        if on_failure is not None:
+            try:
+                await on_failure()
+            except Exception as e:
+                logging.error(f"AI streaming failure handler ({metric}): {e}")
+    if case is not None:
+        turn = ai_conversation_turn(request, case, prompt, routing["model"])
     else:
-        raise HTTPException(status_code=400, detail="Invalid prompt type")
+        turn = {"mode": "fresh", "reason": None, "history": [], "message": prompt, "changed_fields": None}
     
+    async def produce():
+        started = time.perf_counter()
+        ttft_ms = None
+        parts = []
+        reported = False  # outcome reported to the breaker; later bookkeeping errors are not upstream failures
+        try:
+            upstream = llm_gateway.stream(turn["message"], system_message=AI_SYSTEM_MESSAGE, model=routing["model"],
+                                          priority_class=routing["priority_class"], tenant=get_tenant_key(current_user),
+                                          history=turn["history"])
+            try:
+                async for text in first_item_within(upstream, first_token_timeout):
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                        latency_tracker.observe(f"{metric}.ttft_ms", ttft_ms)
+                    parts.append(text)
+                    queue.put_nowait(sse_event("token", {"text": text}))
+            except asyncio.TimeoutError:
+                if ttft_ms is not None:
+                    raise
+                # No first token within the budget: the upstream stream is
+                # closed and the caller gets the rule-based answer, unpaid
+                breaker.record_failure()
+                reported = True
+                async for event in degraded_ai_events(request, case, routing, "timeout"):
+                    queue.put_nowait(event)
+                await failed()
+                return
+            
+            response = "".join(parts)
+            if not response:
+                raise ValueError("Empty completion")
+            total_ms = (time.perf_counter() - started) * 1000
+            latency_tracker.observe(f"{metric}.total_ms", total_ms)
+            breaker.record_success()
+            reported = True
+            if case is not None:
+                commit_ai_conversation(turn, response)
+            
+            await finish_ai_generation(request, current_user, cache_key, response, routing["model"])
+            extra = await on_complete(response) if on_complete else {}
+            
+            queue.put_nowait(sse_event("done", {
+                "case_sheet_id": request.case_sheet_id,
+                "response": response,
+                "sources": [src.model_dump() for src in get_ai_sources(request.prompt_type)],
+                "cached": False,
+                "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+                "total_ms": round(total_ms, 1),
+                "model": routing["model"],
+                "routing": routing,
+                "conversation": conversation_info(turn),
+                **(extra or {})
+            }))
+        except asyncio.CancelledError:
+            if not reported:
+                breaker.release()
+            raise
+        except Exception as e:
+            if not reported:
+                breaker.record_failure()
+            logging.error(f"AI streaming error ({metric}): {str(e)}")
+            queue.put_nowait(sse_event("error", {"message": f"AI generation failed: {str(e)}"}))
+            await failed()
+        finally:
+            queue.put_nowait(None)
+    
+    producer = asyncio.create_task(produce())
+    _stream_producers.add(producer)
+    producer.add_done_callback(_stream_producers.discard)
+    
+    async def events():
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# Keeps producer tasks referenced until they finish
+_stream_producers = set()
+
+async def first_item_within(items, timeout: Optional[float]):
+    """Re-yield an async generator; asyncio.TimeoutError if its first item takes longer than timeout (None: no limit)"""
     try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"case_{request.case_sheet_id}_{request.prompt_type}",
-            system_message="You are an expert emergency medicine physician assistant. Always cite clinical guidelines and evidence-based references."
-        ).with_model("openai", "gpt-5.1")
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        # Generate relevant medical sources based on prompt type
-        sources = []
-        if request.prompt_type == "red_flags":
-            sources = [
-                AISource(
-                    title="ACLS Guidelines - Advanced Cardiovascular Life Support",
-                    url="https://www.heart.org/en/professional/quality-improvement/acls-ecc",
-                    snippet="Evidence-based guidelines for emergency cardiovascular care and critical patient assessment"
-                ),
-                AISource(
-                    title="ATLS Guidelines - Advanced Trauma Life Support",
-                    url="https://www.facs.org/quality-programs/trauma/education/atls",
-                    snippet="Systematic approach to trauma patient assessment and management"
-                ),
-                AISource(
-                    title="Emergency Triage Manchester Triage System",
-                    url="https://www.manchester triage.com",
-                    snippet="Standardized clinical risk assessment for emergency departments"
-                )
-            ]
-        elif request.prompt_type == "diagnosis_suggestions":
-            sources = [
-                AISource(
-                    title="UpToDate - Clinical Decision Support",
-                    url="https://www.uptodate.com",
-                    snippet="Evidence-based clinical decision support resource for differential diagnosis"
-                ),
-                AISource(
-                    title="NICE Guidelines - National Institute for Health and Care Excellence",
-                    url="https://www.nice.org.uk/guidance",
-                    snippet="Evidence-based recommendations for health and care in England"
-                ),
-                AISource(
-                    title="AHA/ASA Stroke Guidelines",
-                    url="https://www.stroke.org/en/professional/guidelines",
-                    snippet="American Heart Association/American Stroke Association clinical practice guidelines"
-                ),
-                AISource(
-                    title="Emergency Medicine Practice Guidelines",
-                    url="https://www.ebmedicine.net",
-                    snippet="Evidence-based emergency medicine clinical practice guidelines and reviews"
-                )
-            ]
-        
-        # Increment AI usage for free tier users after successful generation
-        if current_user.subscription_tier == "free":
-            await increment_daily_ai_usage(current_user.id)
-        
-        return AIResponse(response=response, case_sheet_id=request.case_sheet_id, sources=sources)
-    except Exception as e:
-        logging.error(f"AI generation error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
+        try:
+            first = await asyncio.wait_for(items.__anext__(), timeout=timeout)
+        except StopAsyncIteration:
+            return
+        yield first
+        async for item in items:
+            yield item
+    finally:
+        await items.aclose()
+
+async def cached_generation_events(request: AIGenerateRequest, cached: dict, extra: Optional[dict] = None):
+    """SSE events for a whole text: one token event, then done"""
+    yield sse_event("token", {"text": cached["response"]})
+    yield sse_event("done", {
+        "case_sheet_id": request.case_sheet_id,
+        "response": cached["response"],
+        "sources": [src.model_dump() for src in get_ai_sources(request.prompt_type)],
+        "cached": True,
+        "ttft_ms": 0,
+        "total_ms": 0,
+        "model": cached.get("model"),
+        **(extra or {})
+    })
 
-# Discharge Summary endpoints
-@api_router.post("/discharge-summary", response_model=DischargeSummary)
-async def create_discharge_summary(case_sheet_id: str, current_user: UserResponse = Depends(get_current_user)):
-    # Generate AI summary first
-    ai_request = AIGenerateRequest(case_sheet_id=case_sheet_id, prompt_type="discharge_summary")
-    ai_response = await generate_ai_response(ai_request, current_user)
+def stream_cached_generation(request: AIGenerateRequest, cached: dict, extra: Optional[dict] = None) -> StreamingResponse:
+    """SSE response for a cache hit: the whole text as one token event, then done"""
+    return StreamingResponse(cached_generation_events(request, cached, extra),
+                             media_type="text/event-stream", headers=SSE_HEADERS)
+
+@api_router.post("/ai/generate/stream")
+async def generate_ai_response_stream(request: AIGenerateRequest, current_user: UserResponse = Depends(get_current_user)):
+    """Streaming variant of /ai/generate (text/event-stream)"""
+    prompt, cache_key, cached, ai_access, routing, case = await prepare_ai_generation(request, current_user)
+    if cached:
+        if cached.get("speculative"):
+            await charge_speculative_hit(request, current_user, cache_key, ai_access)
+        return stream_cached_generation(request, cached, {"routing": routing})
     
+    degraded = circuit_open_response(request, case, routing, stream=True)
+    if degraded is not None:
+        return degraded
+    
+    await charge_admitted_generation(ai_access, current_user, routing)
+    return stream_ai_generation(request, current_user, prompt, cache_key, "ai_generate_stream", routing, case=case,
+                                on_failure=lambda: refund_ai_charge(ai_access, current_user))
+
+# Discharge Summary endpoints
+async def save_discharge_summary(case_sheet_id: str, summary_text: str) -> DischargeSummary:
     summary = DischargeSummary(
         case_sheet_id=case_sheet_id,
-        summary_text=ai_response.response
+        summary_text=summary_text
     )
     
     doc = summary.model_dump()
@@ -3179,6 +3850,37 @@ async def create_discharge_summary(case_sheet_id: str, current_user: UserRespons
     await db.discharge_summaries.insert_one(doc)
     return summary
 
+@api_router.post("/discharge-summary", response_model=DischargeSummary)
+async def create_discharge_summary(case_sheet_id: str, current_user: UserResponse = Depends(get_current_user)):
+    # Generate AI summary first
+    ai_request = AIGenerateRequest(case_sheet_id=case_sheet_id, prompt_type="discharge_summary")
+    ai_response = await generate_ai_response(ai_request, current_user)
+    
+    return await save_discharge_summary(case_sheet_id, ai_response.response)
+
+@api_router.post("/discharge-summary/stream")
+async def create_discharge_summary_stream(case_sheet_id: str, current_user: UserResponse = Depends(get_current_user)):
+    """
+    Streaming variant of /discharge-summary (text/event-stream).
+    The summary is saved to discharge_summaries when generation completes;
+    the done event carries its id.
+    """
+    ai_request = AIGenerateRequest(case_sheet_id=case_sheet_id, prompt_type="discharge_summary")
+    prompt, cache_key, cached, ai_access, routing, case = await prepare_ai_generation(ai_request, current_user)
+    
+    async def persist(summary_text: str) -> dict:
+        summary = await save_discharge_summary(case_sheet_id, summary_text)
+        return {"summary_id": summary.id, "generated_at": summary.generated_at.isoformat()}
+    
+    if cached:
+        return stream_cached_generation(ai_request, cached, {"routing": routing, **await persist(cached["response"])})
+    
+    circuit_open_response(ai_request, case, routing)
+    await charge_admitted_generation(ai_access, current_user, routing)
+    return stream_ai_generation(ai_request, current_user, prompt, cache_key, "discharge_summary_stream", routing,
+                                on_complete=persist, case=case,
+                                on_failure=lambda: refund_ai_charge(ai_access, current_user))
+
 @api_router.get("/discharge-summary/{case_sheet_id}", response_model=DischargeSummary)
 async def get_discharge_summary(case_sheet_id: str, current_user: UserResponse = Depends(get_current_user)):
     summary = await db.discharge_summaries.find_one({"case_sheet_id": case_sheet_id}, {"_id": 0})
@@ -3232,6 +3934,9 @@ async def update_discharge_data(
             "Referred": "referred",
         }
         update_fields["disposition.type"] = type_map.get(discharge_data.disposition_type, "discharged")
+        update_fields.update(track_disposition_rollup(
+            case, update_fields["disposition.type"], get_tenant_key(current_user), datetime.now(timezone.utc)
+        ))
     
     if discharge_data.condition_at_discharge is not None:
         update_fields["disposition.condition_at_discharge"] = discharge_data.condition_at_discharge.lower()
@@ -3256,6 +3961,13 @@ async def update_discharge_data(
         {"id": case_id},
         {"$set": update_fields}
     )
+    await invalidate_ai_response_cache(case_id, update_fields)
+    
+    # Dotted-path update: rebuild the prompt digest from the stored document
+    if any(field.split(".")[0] in DIGEST_CASE_FIELDS for field in update_fields):
+        updated_case = await db.cases.find_one({"id": case_id}, {"_id": 0})
+        if updated_case:
+            await db.cases.update_one({"id": case_id}, {"$set": case_digest_fields(updated_case)})
     
     logging.info(f"Discharge data updated for case {case_id} by user {current_user.email}")
     
@@ -3312,6 +4024,8 @@ class TranscriptParseRequest(BaseModel):
 async def parse_transcript(request: TranscriptParseRequest, current_user: UserResponse = Depends(get_current_user)):
     """Parse continuous voice transcript and extract structured case sheet data"""
     
+    case_digest = await load_case_digest(request.case_sheet_id)
+    
     prompt = f"""You are an advanced medical AI with 3-STAGE PROCESSING capability.
 
 STAGE 1 - CLEAN THE TRANSCRIPT:
@@ -3402,35 +4116,28 @@ CRITICAL RULES:
 - If uncertain, omit the field rather than guessing
 - Use proper medical terminology
 - Return ONLY the JSON object, no additional text
-"""
+{case_context_block(case_digest)}"""
 
+    routing = route_model("extraction", classify_llm_request(prompt_type="parse_transcript"), current_user)
     try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"transcript_parse_{request.case_sheet_id}",
-            system_message="You are a medical transcription AI with 3-stage processing. Clean, extract, and structure medical data from doctor's notes. Return ONLY valid JSON."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        # Parse the JSON response
-        import json
-        import re
-        
-        # Extract JSON from response (handle markdown code blocks)
-        json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # Try to find JSON object directly
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
-                json_str = response
+        response = await coalesced_completion(
+            "parse_transcript",
+            prompt,
+            system_message="You are a medical transcription AI with 3-stage processing. Clean, extract, and structure medical data from doctor's notes. Return ONLY valid JSON.",
+            model=routing["model"],
+            tenant=get_tenant_key(current_user),
+            priority_class=routing["priority_class"]
+        )
         
-        parsed_data = json.loads(json_str)
+        # Parse the JSON response (code fences, chatter and truncation are repaired)
+        try:
+            parsed_data, repaired = parse_llm_json(response)
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": f"Failed to parse AI response as JSON: {str(e)}",
+                "raw_response": response
+            }
         
         # Auto-calculate ABCDE and Red Flags based on vitals
         abcde_data = {}
@@ -3524,19 +4231,17 @@ CRITICAL RULES:
         if red_flags:
             parsed_data['red_flags'] = red_flags
         
+        record_ai_call(current_user, "parse_transcript")
+        
         return {
             "success": True,
             "parsed_data": parsed_data,
             "message": "Transcript parsed successfully. ABCDE assessment and red flags auto-calculated. Review and save.",
-            "red_flags": red_flags
+            "red_flags": red_flags,
+            "routing": routing,
+            "repaired": repaired
         }
     
-    except json.JSONDecodeError as e:
-        return {
-            "success": False,
-            "error": f"Failed to parse AI response as JSON: {str(e)}",
-            "raw_response": response
-        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcript parsing failed: {str(e)}")
 
@@ -3568,44 +4273,135 @@ class AddendumRequest(BaseModel):
 # ============================================
 
 # Sarvam AI Configuration
-SARVAM_STT_URL = "https://api.sarvam.ai/speech-to-text"
+SARVAM_BASE_URL = "https://api.sarvam.ai"
+SARVAM_STT_PATH = "/speech-to-text"
 SARVAM_API_KEY = os.environ.get("SARVAM_API_KEY", "")
+upstream_pool.register(
+    "sarvam",
+    base_url=SARVAM_BASE_URL,
+    max_connections=int(os.environ.get('SARVAM_MAX_CONNECTIONS', 20)),
+    max_keepalive_connections=int(os.environ.get('SARVAM_MAX_KEEPALIVE', 10)),
+    connect_timeout=5.0,
+    # Long recordings take a while to upload and transcribe
+    read_timeout=float(os.environ.get('SARVAM_READ_TIMEOUT_SECONDS', 120)),
+    write_timeout=60.0,
+    pool_timeout=10.0
+)
 
 # Indian language codes supported by Sarvam
 INDIC_LANGS = {"hi", "mr", "bn", "ta", "te", "kn", "ml", "gu", "pa", "or", "as", "ur"}
 
+# Audio uploads are held in memory (no temp files); larger bodies get 413
+# before they are parsed. The default matches Whisper's 25 MB file limit.
+AUDIO_MAX_UPLOAD_BYTES = int(float(os.environ.get('AUDIO_MAX_UPLOAD_MB', '25')) * 1024 * 1024)
+AUDIO_UPLOAD_PATHS = ["/api/ai/voice-to-text", "/api/transcribe-audio", "/api/jobs/voice-to-text"]
+# Headroom for multipart framing and the other form fields
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=AUDIO_MAX_UPLOAD_BYTES + 64 * 1024, paths=AUDIO_UPLOAD_PATHS)
+
+async def read_audio_upload(file: UploadFile) -> AudioClip:
+    """Uploaded audio as an in-memory AudioClip (413 over the size limit); the upload is closed either way"""
+    try:
+        return await read_upload(file, AUDIO_MAX_UPLOAD_BYTES)
+    except AudioTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        await file.close()
+
+# Recordings are downmixed to mono, trimmed of leading / trailing / long
+# internal silence and resampled to 16 kHz before they are sent to an STT
+# engine, which cuts upload size and transcription time. Formats that cannot be
+# decoded here are sent unchanged.
+AUDIO_PREPROCESS = os.environ.get('AUDIO_PREPROCESS', 'true').lower() == 'true'
+audio_preprocessing: Dict[str, Any] = {"requests": 0, "applied": 0, "bytes_saved": 0, "seconds_saved": 0.0, "skipped": {}}
+
+async def preprocess_audio_clip(clip: AudioClip) -> Tuple[AudioClip, dict]:
+    """(clip to transcribe, preprocessing report); the original clip when preprocessing does not help"""
+    wav, report = await asyncio.to_thread(preprocess_audio, clip.data)
+    latency_tracker.observe("audio_preprocess.ms", report["ms"])
+    audio_preprocessing["requests"] += 1
+    if wav is None:
+        skipped = audio_preprocessing["skipped"]
+        skipped[report["reason"]] = skipped.get(report["reason"], 0) + 1
+        if report["original_seconds"]:
+            clip = AudioClip(clip.data, clip.filename, clip.content_type, report["original_seconds"])
+        return clip, report
+    audio_preprocessing["applied"] += 1
+    audio_preprocessing["bytes_saved"] += report["bytes_saved"]
+    audio_preprocessing["seconds_saved"] = round(audio_preprocessing["seconds_saved"] + report["seconds_saved"], 2)
+    logging.info(f"Audio preprocessed: {report['original_bytes']} -> {report['bytes']} bytes, "
+                 f"{report['original_seconds']}s -> {report['seconds']}s in {report['ms']}ms")
+    stem = clip.filename.rsplit(".", 1)[0] or "audio"
+    return AudioClip(wav, f"{stem}.wav", "audio/wav", report["seconds"]), report
+
+# Long recordings are cut at pauses and the chunks transcribed concurrently, so
+# a several-minute dictation takes about as long as its slowest chunk. "auto"
+# chunks recordings longer than AUDIO_CHUNK_MIN_SECONDS; the chunked form field
+# forces it on or off per request.
+AUDIO_CHUNKING = os.environ.get('AUDIO_CHUNKING', 'true').lower() == 'true'
+AUDIO_CHUNK_MIN_SECONDS = float(os.environ.get('AUDIO_CHUNK_MIN_SECONDS', '60'))
+AUDIO_CHUNK_SECONDS = float(os.environ.get('AUDIO_CHUNK_SECONDS', '30'))
+AUDIO_CHUNK_OVERLAP_MS = int(os.environ.get('AUDIO_CHUNK_OVERLAP_MS', '0'))
+AUDIO_CHUNK_CONCURRENCY = int(os.environ.get('AUDIO_CHUNK_CONCURRENCY', 4))
+AUDIO_CHUNK_RETRIES = int(os.environ.get('AUDIO_CHUNK_RETRIES', 2))
+audio_chunking: Dict[str, int] = {"requests": 0, "chunks": 0, "retries": 0, "failures": 0}
+
+# Flaky connections make the app resubmit the same recording. Transcriptions are
+# cached by a hash of the audio bytes, engine and language (per tenant), and a
+# resubmission that arrives while the first call is still running waits for it.
+STT_CACHE_ENABLED = os.environ.get('STT_CACHE_ENABLED', 'true').lower() == 'true'
+STT_CACHE_TTL_HOURS = float(os.environ.get('STT_CACHE_TTL_HOURS', '24'))
+STT_CACHE_LRU_SIZE = int(os.environ.get('STT_CACHE_LRU_SIZE', '256'))
+stt_cache = ResponseCache(db, "stt_cache", int(STT_CACHE_TTL_HOURS * 3600), STT_CACHE_LRU_SIZE)
+stt_cache_counts: Dict[str, int] = {"coalesced": 0}
+
+def stt_cache_key(clip: AudioClip, engine: str, language: Optional[str], tenant: str) -> str:
+    return content_hash(tenant, clip.digest(), engine, language or "")
+
+async def cached_transcription(clip: AudioClip, engine: str, language: Optional[str], tenant: str,
+                               transcribe: Callable[[], Awaitable[dict]]) -> Tuple[dict, bool]:
+    """
+    (result, cached): a stored transcription of the same audio, the result of
+    an identical request already in flight, or transcribe() stored for repeats
+    """
+    if not STT_CACHE_ENABLED:
+        return await transcribe(), False
+    key = stt_cache_key(clip, engine, language, tenant)
+    cached = await stt_cache.get(key)
+    if cached is not None:
+        logging.info(f"STT cache hit ({engine}, {language}, {clip.size} bytes)")
+        return cached, True
+    
+    async def transcribe_and_store() -> dict:
+        result = await transcribe()
+        await stt_cache.set(key, None, result)
+        return result
+    
+    result, shared = await ai_singleflight.do(("voice_to_text", key), transcribe_and_store)
+    if shared:
+        stt_cache_counts["coalesced"] += 1
+    return result, shared
+
 async def transcribe_with_openai_whisper(
-    file: UploadFile,
+    clip: AudioClip,
     language: Optional[str] = None
 ) -> dict:
     """
-    Transcribe audio using OpenAI Whisper via emergentintegrations
+    Transcribe audio using OpenAI Whisper through the shared LLM client, so it
+    reuses the pooled keep-alive connections of the "llm" upstream.
     Optimized for medical terminology
     """
     try:
-        # Save uploaded audio to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp_audio:
-            content = await file.read()
-            temp_audio.write(content)
-            temp_audio_path = temp_audio.name
-        
-        # Initialize Speech-to-Text with Emergent LLM key
-        stt = OpenAISpeechToText(api_key=EMERGENT_LLM_KEY)
-        
         # Transcribe using Whisper with optimized medical settings
-        with open(temp_audio_path, "rb") as audio_file:
-            response = await stt.transcribe(
-                file=audio_file,
-                model="whisper-1",
-                language=language or "en",
-                response_format="text",
-                temperature=0.0,  # Maximum accuracy for medical terminology
-                prompt="Medical emergency room documentation. Patient vitals: heart rate, blood pressure, respiratory rate, temperature, SpO2, GCS. Clinical symptoms and findings."
-            )
-        
-        # Clean up temp file
-        os.unlink(temp_audio_path)
+        response = await llm_gateway.client.audio.transcriptions.create(
+            file=clip.multipart(),
+            model="whisper-1",
+            language=language or "en",
+            response_format="text",
+            temperature=0.0,  # Maximum accuracy for medical terminology
+            prompt="Medical emergency room documentation. Patient vitals: heart rate, blood pressure, respiratory rate, temperature, SpO2, GCS. Clinical symptoms and findings."
+        )
         
+        # response_format="text" returns the transcript as a plain string
         transcription = response.text if hasattr(response, 'text') else str(response)
         
         return {
@@ -3615,12 +4411,16 @@ async def transcribe_with_openai_whisper(
             "raw": {"model": "whisper-1", "response": transcription}
         }
         
+    except openai.BadRequestError as e:
+        # The audio itself was rejected (format, length): not an engine outage
+        logging.error(f"OpenAI Whisper rejected the audio: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"OpenAI transcription rejected the audio: {str(e)}")
     except Exception as e:
         logging.error(f"OpenAI Whisper transcription error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"OpenAI transcription failed: {str(e)}")
 
 async def transcribe_with_sarvam(
-    file: UploadFile,
+    clip: AudioClip,
     language: Optional[str] = None
 ) -> dict:
     """
@@ -3628,18 +4428,12 @@ async def transcribe_with_sarvam(
     Optimized for Indian languages
     """
     try:
-        import httpx
-        
         if not SARVAM_API_KEY:
             raise HTTPException(
                 status_code=500,
                 detail="Sarvam AI API key not configured. Please add SARVAM_API_KEY to environment variables."
             )
         
-        # Read audio file
-        audio_bytes = await file.read()
-        file.file.seek(0)
-        
         # Prepare request headers
         headers = {
             "api-subscription-key": SARVAM_API_KEY,
@@ -3650,19 +4444,20 @@ async def transcribe_with_sarvam(
         if language:
             data["language_code"] = language  # Sarvam uses language_code parameter
         
-        # Prepare file for upload
+        # Prepare file for upload (straight from memory)
         files = {
-            "file": (file.filename or "audio.wav", audio_bytes, file.content_type or "audio/wav")
+            "file": clip.multipart()
         }
         
-        # Make API request to Sarvam
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                SARVAM_STT_URL,
-                headers=headers,
-                data=data,
-                files=files
-            )
+        # Make API request to Sarvam (pooled keep-alive connection)
+        response = await upstream_pool.request(
+            "sarvam",
+            "POST",
+            SARVAM_STT_PATH,
+            headers=headers,
+            data=data,
+            files=files
+        )
         
         # Check response status
         if response.status_code != 200:
@@ -3746,7 +4541,15 @@ async def transcribe_audio(
     Transcribe audio using OpenAI Whisper (legacy endpoint)
     For dual-engine support, use /ai/voice-to-text instead
     """
-    result = await transcribe_with_openai_whisper(audio, "en")
+    clip = await read_audio_upload(audio)
+    try:
+        result, _ = await cached_transcription(
+            clip, "openai", "en", get_tenant_key(current_user),
+            lambda: transcribe_clip(clip, route_transcription("openai", "openai", "en"), "en")
+        )
+    except STTUnavailable as e:
+        logging.error(f"Transcription refused: {e}")
+        raise HTTPException(status_code=503, detail="Speech-to-text is temporarily unavailable, please retry shortly")
     return {
         "success": True,
         "transcription": result["transcription"]
@@ -3757,6 +4560,7 @@ async def dual_engine_voice_to_text(
     file: UploadFile = File(...),
     engine: Optional[str] = Form("auto"),
     language: Optional[str] = Form(None),
+    chunked: Optional[bool] = Form(None),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """
@@ -3773,6 +4577,8 @@ async def dual_engine_voice_to_text(
     - language: ISO language code (e.g., "en", "hi", "ta", "ml")
         - For OpenAI: en, es, fr, de, etc.
         - For Sarvam: hi, mr, bn, ta, te, kn, ml, gu, pa, or, as, ur
+    - chunked: transcribe as concurrent chunks cut at pauses (default: only
+      recordings longer than AUDIO_CHUNK_MIN_SECONDS)
     
     Returns:
     {
@@ -3780,35 +4586,175 @@ async def dual_engine_voice_to_text(
         "engine_used": "openai" | "sarvam",
         "language": "en",
         "transcription": "Patient presents with...",
+        "cached": false,  // true for a resubmission of the same audio
+        "routing": {"preferred": "openai", "engine": "openai", "reason": "preferred", "hedged": false, "failover": false},
         "raw": {...}  // Engine-specific response details
     }
     """
+    return await run_voice_to_text(await read_audio_upload(file), engine, language, current_user, chunked)
+
+# ========== STT ENGINE ROUTING ==========
+# "auto" requests start from the language-based choice above and move to the
+# other engine when the preferred one's rolling error rate or p95 latency is
+# out of line. A per-engine circuit breaker bypasses a failing engine entirely
+# (explicit engine requests included), a failed call fails over to the other
+# engine, and with STT_HEDGING a call slower than its engine's p95 for that much
+# audio (latency per second of audio, so only decoded recordings) is raced
+# against the other engine. Hedging is off by default: a hedged call is paid for twice.
+
+STT_HEDGING = os.environ.get('STT_HEDGING', 'false').lower() == 'true'
+
+def stt_retryable(error: Exception) -> bool:
+    """Client errors (4xx) will fail the same way again, on either engine"""
+    if isinstance(error, STTUnavailable):
+        return False
+    return not (isinstance(error, HTTPException) and 400 <= error.status_code < 500)
+
+stt_router = STTRouter(
+    ["openai", "sarvam"],
+    min_samples=int(os.environ.get('STT_ROUTER_MIN_SAMPLES', 10)),
+    max_error_rate=float(os.environ.get('STT_MAX_ERROR_RATE', '0.3')),
+    breaker_failures=int(os.environ.get('STT_BREAKER_FAILURES', 3)),
+    breaker_reset_seconds=float(os.environ.get('STT_BREAKER_RESET_SECONDS', '30')),
+    hedge=STT_HEDGING,
+    hedge_min_ms=float(os.environ.get('STT_HEDGE_MIN_MS', '1500')),
+    is_failure=stt_retryable,
+    latency=latency_tracker
+)
+
+STT_ENGINES: Dict[str, Callable[[AudioClip, Optional[str]], Awaitable[dict]]] = {
+    "openai": transcribe_with_openai_whisper,
+    "sarvam": transcribe_with_sarvam,
+}
+
+def preferred_transcription_engine(engine: Optional[str], language: Optional[str]) -> str:
+    """select_transcription_engine, falling back to Whisper when Sarvam has no API key"""
+    selected = select_transcription_engine(engine, language)
+    if selected == "sarvam" and not SARVAM_API_KEY:
+        logging.warning("Sarvam API key not configured, falling back to OpenAI")
+        return "openai"
+    return selected
+
+def route_transcription(engine: Optional[str], preferred: str, language: Optional[str]) -> dict:
+    """Routing decision for a transcription (see STTRouter.route)"""
+    lang = (language or "").lower()
+    alternates = ["openai"]
+    # Sarvam only covers Indian languages and Indian English
+    if SARVAM_API_KEY and (not lang or lang == "en" or lang in INDIC_LANGS):
+        alternates.append("sarvam")
+    return stt_router.route(preferred, alternates, auto=(engine or "auto").lower() == "auto")
+
+async def transcribe_clip(clip: AudioClip, routing: dict, language: Optional[str]) -> dict:
+    """One STT call under a routing decision (breaker, failover, hedging)"""
+    result, outcome = await stt_router.run(routing, lambda name: STT_ENGINES[name](clip, language), clip.seconds)
+    return {**result, "routing": {"preferred": routing["preferred"], "reason": routing["reason"], **outcome}}
+
+async def transcribe_chunked(clip: AudioClip, routing: dict, language: Optional[str],
+                             chunked: Optional[bool]) -> Optional[dict]:
+    """
+    Transcription of a long recording as concurrent chunks cut at pauses, or
+    None when it should go as one call (short, undecodable, chunking off)
+    """
+    if chunked is False or (chunked is None and not AUDIO_CHUNKING):
+        return None
+    chunks = await asyncio.to_thread(
+        split_audio, clip.data, 0.0 if chunked else AUDIO_CHUNK_MIN_SECONDS, AUDIO_CHUNK_SECONDS,
+        overlap_ms=AUDIO_CHUNK_OVERLAP_MS
+    )
+    if not chunks or len(chunks) < 2:
+        return None
+    
+    stem = clip.filename.rsplit(".", 1)[0] or "audio"
+    
+    async def transcribe(chunk) -> dict:
+        return await transcribe_clip(AudioClip(chunk.data, f"{stem}-{chunk.index}.wav", "audio/wav", chunk.seconds),
+                                     routing, language)
+    
+    audio_chunking["requests"] += 1
+    audio_chunking["chunks"] += len(chunks)
     try:
-        # Select which engine to use
-        selected_engine = select_transcription_engine(engine, language)
+        with latency_tracker.timer("stt.chunked_ms"):
+            results = await transcribe_chunks(
+                chunks, transcribe, concurrency=AUDIO_CHUNK_CONCURRENCY, retries=AUDIO_CHUNK_RETRIES,
+                is_retryable=stt_retryable, latency=latency_tracker
+            )
+    except Exception:
+        audio_chunking["failures"] += 1
+        raise
+    audio_chunking["retries"] += sum(attempts - 1 for _, _, attempts in results)
+    
+    first = results[0][1]
+    outcomes = [result["routing"] for _, result, _ in results]
+    return {
+        "engine_used": first["engine_used"],
+        "language": first.get("language", language),
+        "transcription": stitch_transcripts([result["transcription"] for _, result, _ in results],
+                                            overlap=AUDIO_CHUNK_OVERLAP_MS > 0),
+        "chunks": len(results),
+        "routing": {
+            **first["routing"],
+            "hedged": any(o["hedged"] for o in outcomes),
+            "failover": any(o["failover"] for o in outcomes)
+        },
+        "raw": {"chunks": [
+            {
+                "index": chunk.index,
+                "start": round(chunk.start, 2),
+                "end": round(chunk.end, 2),
+                "attempts": attempts,
+                "engine_used": result["engine_used"],
+                "hedged": result["routing"]["hedged"],
+                "failover": result["routing"]["failover"],
+                "transcription": result["transcription"]
+            }
+            for chunk, result, attempts in results
+        ]}
+    }
+
+async def run_voice_to_text(clip: AudioClip, engine: Optional[str], language: Optional[str],
+                            current_user: UserResponse, chunked: Optional[bool] = None) -> dict:
+    """Transcribe an in-memory recording with the selected engine (/ai/voice-to-text body)"""
+    try:
+        # Select which engine to use (routing may move it to the healthier one)
+        selected_engine = preferred_transcription_engine(engine, language)
         
         logging.info(f"Transcription request: engine={engine}, language={language}, selected={selected_engine}")
         
-        # Transcribe using selected engine
-        if selected_engine == "sarvam":
-            if not SARVAM_API_KEY:
-                logging.warning("Sarvam API key not configured, falling back to OpenAI")
-                result = await transcribe_with_openai_whisper(file, language)
-            else:
-                result = await transcribe_with_sarvam(file, language)
-        else:
-            result = await transcribe_with_openai_whisper(file, language)
+        async def transcribe() -> dict:
+            audio, preprocessing = clip, None
+            if AUDIO_PREPROCESS:
+                audio, preprocessing = await preprocess_audio_clip(audio)
+            
+            routing = route_transcription(engine, selected_engine, language)
+            # Long recordings go as concurrent chunks, everything else in one call
+            result = await transcribe_chunked(audio, routing, language, chunked)
+            if result is None:
+                result = await transcribe_clip(audio, routing, language)
+            return {**result, "preprocessing": preprocessing}
+        
+        # Resubmitted audio is answered from the cache (or the call already running)
+        result, cached = await cached_transcription(clip, selected_engine, language, get_tenant_key(current_user),
+                                                    transcribe)
+        if not cached:
+            record_ai_call(current_user, "voice_to_text")
         
         return {
             "success": True,
             "engine_used": result["engine_used"],
             "language": result.get("language", language),
             "transcription": result["transcription"],
+            "cached": cached,
+            "preprocessing": result.get("preprocessing"),
+            "chunks": result.get("chunks", 1),
+            "routing": result.get("routing"),
             "raw": result.get("raw", {})
         }
         
     except HTTPException:
         raise
+    except STTUnavailable as e:
+        logging.error(f"Transcription refused: {e}")
+        raise HTTPException(status_code=503, detail="Speech-to-text is temporarily unavailable, please retry shortly")
     except Exception as e:
         logging.exception("Dual-engine transcription error")
         raise HTTPException(
@@ -3816,24 +4762,97 @@ async def dual_engine_voice_to_text(
             detail=f"Voice transcription failed: {str(e)}"
         )
 
+# ========== STREAMING EXTRACTION ==========
+# The /stream variants of the extraction endpoints report each field as soon as
+# the model has written it, so the form fills in while the completion is still
+# running instead of after the whole JSON document has arrived.
+
+def stream_extraction(run: Callable[[Callable[[str, Any, str], None]], Awaitable[dict]], metric: str) -> StreamingResponse:
+    """
+    SSE response for an extraction: field {path, value, source} events while
+    run(on_field) works, then done {the non-streaming response body} or error
+    {message}. Like stream_ai_generation, the work runs in its own task so a
+    client disconnect does not cancel a call that is already paid for.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+    first_field = []
+    
+    def on_field(path: str, value: Any, source: str) -> None:
+        if not first_field:
+            first_field.append(path)
+            latency_tracker.observe(f"{metric}.first_field_ms", (time.perf_counter() - started) * 1000)
+        queue.put_nowait(sse_event("field", {"path": path, "value": value, "source": source}))
+    
+    async def produce():
+        try:
+            with latency_tracker.timer(f"{metric}.total_ms"):
+                body = await run(on_field)
+            queue.put_nowait(sse_event("done", body))
+        except HTTPException as e:
+            queue.put_nowait(sse_event("error", {"message": e.detail, "status": e.status_code}))
+        except Exception as e:
+            logging.error(f"Streaming extraction error ({metric}): {str(e)}")
+            queue.put_nowait(sse_event("error", {"message": f"Extraction failed: {str(e)}"}))
+        finally:
+            queue.put_nowait(None)
+    
+    producer = asyncio.create_task(produce())
+    _stream_producers.add(producer)
+    producer.add_done_callback(_stream_producers.discard)
+    
+    async def events():
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 class ExtractTriageDataRequest(BaseModel):
     text: str
 
-@api_router.post("/ai/extract-triage-data")
-async def extract_triage_data_ai(
-    request: ExtractTriageDataRequest,
-    current_user: UserResponse = Depends(get_current_user)
-):
+# "cascade": rules first, the LLM only for fields the rules could not resolve;
+# "llm": always send the full transcript to the LLM
+TRIAGE_EXTRACTION_MODE = os.environ.get("TRIAGE_EXTRACTION_MODE", "cascade").lower()
+
+TRIAGE_EXTRACTION_SYSTEM_MESSAGE = "You are a medical data extraction AI. Extract structured data from medical transcriptions and return valid JSON."
+
+async def run_triage_extraction(text: str, current_user: UserResponse,
+                                on_field: Optional[Callable[[str, Any, str], None]] = None) -> dict:
     """
-    Extract structured medical data from transcribed text for triage
-    Uses AI to parse vitals, symptoms, and other relevant information
+    Rule stage, then the LLM for whatever it could not resolve; returns the
+    /ai/extract-triage-data body. on_field(path, value, source) receives the
+    rule-kept fields first, then the escalated fields as the LLM writes them.
     """
-    try:
+    started = time.perf_counter()
+    rule_result = rule_extract(text) if TRIAGE_EXTRACTION_MODE == "cascade" else None
+    if rule_result is not None:
+        data, sources = merge_extraction(rule_result)
+        if on_field:
+            for path in sources:
+                section, field = path.split(".")
+                if section == "vitals" or rule_result["symptoms_resolved"]:
+                    on_field(path, data[section][field], "rules")
+        if not needs_llm(rule_result):
+            latency_tracker.observe("extract_triage.rules_ms", (time.perf_counter() - started) * 1000)
+            return {
+                "success": True,
+                "data": data,
+                "extraction": {"llm_used": False, "sources": sources, "unresolved": [], "coverage": rule_result["coverage"]},
+                "routing": None,
+                "repaired": False
+            }
+
+    if rule_result is not None:
+        extraction_prompt = build_escalation_prompt(text, rule_result)
+    else:
         # Create AI prompt with 3-STAGE EXTRACTION for noise immunity
         extraction_prompt = f"""You are an advanced medical data extraction AI with 3-stage processing.
 
 STAGE 1 - CLEAN THE TRANSCRIPT:
-Raw transcription: "{request.text}"
+Raw transcription: "{text}"
 
 First, clean this text by:
 - Removing repeated words/phrases (e.g., "operation operation operation" → remove)
@@ -3914,37 +4933,166 @@ CRITICAL RULES:
 - If uncertain about a value, use null rather than guessing
 - Return ONLY the JSON object, no additional text or explanation"""
 
-        # Use emergentintegrations LlmChat for extraction
-        import json
-        
-        # Initialize LlmChat with proper parameters
-        llm = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"triage_extraction_{current_user.id}",
-            system_message="You are a medical data extraction AI. Extract structured data from medical transcriptions and return valid JSON."
-        )
-        
-        # Set model to OpenAI GPT-4o-mini
-        llm = llm.with_model(provider="openai", model="gpt-4o-mini")
-        
-        # Send extraction request
-        response_text = await llm.send_message(UserMessage(text=extraction_prompt))
-        
-        # Parse the JSON response
-        extracted_data = json.loads(response_text)
-        
+    def escalated_field(path, value):
+        # Only the fields the rules handed over; the rest were already reported
+        section, _, field = path.partition(".")
+        if rule_result is None:
+            on_field(path, value, "llm")
+        elif section == "vitals" and field in rule_result["unresolved_vitals"]:
+            on_field(path, value, "llm")
+        elif section == "symptoms" and not rule_result["symptoms_resolved"]:
+            on_field(path, value, "llm")
+
+    # Send extraction request through the shared LLM gateway (model from the router)
+    routing = route_model("extraction", classify_llm_request(prompt_type="extract_triage_data"), current_user)
+    extracted_data, repaired = await json_completion(
+        "extract_triage_data",
+        extraction_prompt,
+        TRIAGE_EXTRACTION_SYSTEM_MESSAGE,
+        routing,
+        get_tenant_key(current_user),
+        on_field=escalated_field if on_field else None
+    )
+    
+    record_ai_call(current_user, "extract_triage_data")
+    latency_tracker.observe("extract_triage.llm_ms", (time.perf_counter() - started) * 1000)
+
+    if rule_result is None:
         return {
             "success": True,
-            "data": extracted_data
+            "data": extracted_data,
+            "extraction": {"llm_used": True, "sources": None, "unresolved": None, "coverage": None},
+            "routing": routing,
+            "repaired": repaired
         }
-        
+
+    data, sources = merge_extraction(rule_result, extracted_data)
+    unresolved = [f"vitals.{field}" for field in rule_result["unresolved_vitals"]]
+    if not rule_result["symptoms_resolved"]:
+        unresolved.append("symptoms")
+    return {
+        "success": True,
+        "data": data,
+        "extraction": {"llm_used": True, "sources": sources, "unresolved": unresolved, "coverage": rule_result["coverage"]},
+        "routing": routing,
+        "repaired": repaired
+    }
+
+@api_router.post("/ai/extract-triage-data")
+async def extract_triage_data_ai(
+    request: ExtractTriageDataRequest,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Extract structured medical data from transcribed text for triage
+    Clear dictations are parsed by the rule stage; only fields it cannot
+    resolve (noisy text, spoken numbers, unknown wording) go to the LLM
+    """
+    try:
+        return await run_triage_extraction(request.text, current_user)
     except Exception as e:
         logging.error(f"Data extraction error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
 
+@api_router.post("/ai/extract-triage-data/stream")
+async def extract_triage_data_ai_stream(
+    request: ExtractTriageDataRequest,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Streaming variant of /ai/extract-triage-data (text/event-stream) for
+    progressive form fill: field events for the rule-kept fields straight
+    away, then for each escalated field as the LLM completes it
+    """
+    return stream_extraction(lambda on_field: run_triage_extraction(request.text, current_user, on_field),
+                             "extract_triage_stream")
+
 class ExtractCaseSheetDataRequest(BaseModel):
     text: str
-    section: str  # 'history', 'examination', 'primary_assessment'
+    section: Optional[str] = None  # 'history', 'examination', 'primary_assessment'
+    sections: Optional[List[str]] = None  # several sections of one dictation in one call
+
+# Extracted sections per (tenant, dictation text); a dictation re-sent for
+# another section only pays for the sections not extracted yet
+CASESHEET_SYSTEM_MESSAGE = "You are a medical data extraction AI. Extract structured data from medical documentation and return valid JSON."
+casesheet_section_cache = LRUCache(
+    int(os.environ.get('CASESHEET_CACHE_SIZE', '1024')),
+    float(os.environ.get('CASESHEET_CACHE_TTL_MINUTES', '60')) * 60
+)
+
+def casesheet_cache_key(tenant: Optional[str], text: str, section: str, model: str) -> str:
+    return content_hash(tenant or "", " ".join(text.split()), section, model, CASESHEET_PROMPT_VERSION)
+
+def casesheet_sections(request: ExtractCaseSheetDataRequest) -> List[str]:
+    """Requested sections, de-duplicated; 400 for a missing or unknown section"""
+    sections = list(dict.fromkeys(request.sections or ([request.section] if request.section else [])))
+    if not sections:
+        raise HTTPException(status_code=400, detail="section or sections is required")
+    for section in sections:
+        if section not in CASESHEET_SECTIONS:
+            raise HTTPException(status_code=400, detail=f"Invalid section: {section}")
+    return sections
+
+async def run_casesheet_extraction(request: ExtractCaseSheetDataRequest, sections: List[str], current_user: UserResponse,
+                                   on_field: Optional[Callable[[str, Any, str], None]] = None) -> dict:
+    """
+    Cached sections first, one combined prompt for the rest; returns the
+    /extract-casesheet-data body. on_field(path, value, source) receives the
+    cached fields, then the extracted ones as the LLM writes them.
+    """
+    tenant = get_tenant_key(current_user)
+    routing = route_model("extraction", classify_llm_request(prompt_type="extract_casesheet_data"), current_user)
+    model = routing["model"]
+    results = {}
+    for section in sections:
+        cached = casesheet_section_cache.get(casesheet_cache_key(tenant, request.text, section, model))
+        if cached is not None:
+            results[section] = cached
+            if on_field:
+                for path, value in iter_fields(cached, (section,)):
+                    on_field(path, value, "cache")
+    cached_sections = list(results)
+    missing = [section for section in sections if section not in results]
+    repaired = False
+
+    def extracted_field(path, value):
+        if path.split(".")[0] in missing:
+            on_field(path, value, "llm")
+
+    if missing:
+        # Use the shared LLM gateway for extraction
+        data, repaired = await json_completion(
+            "extract_casesheet_data",
+            build_casesheet_prompt(request.text, missing),
+            CASESHEET_SYSTEM_MESSAGE,
+            routing,
+            tenant,
+            on_field=extracted_field if on_field else None
+        )
+        extracted = split_casesheet_response(data, missing)
+        for section, data in extracted.items():
+            # A repaired (possibly truncated) section is not worth keeping
+            if data is not None and not repaired:
+                casesheet_section_cache.set(casesheet_cache_key(tenant, request.text, section, model), data)
+            results[section] = data
+        record_ai_call(current_user, "extract_casesheet_data")
+
+    if request.sections is None:
+        return {
+            "success": True,
+            "section": request.section,
+            "data": results[request.section],
+            "cached": bool(cached_sections),
+            "routing": routing,
+            "repaired": repaired
+        }
+    return {
+        "success": True,
+        "sections": {section: results[section] for section in sections},
+        "cached_sections": cached_sections,
+        "routing": routing,
+        "repaired": repaired
+    }
 
 @api_router.post("/extract-casesheet-data")
 async def extract_casesheet_data(
@@ -3953,121 +5101,162 @@ async def extract_casesheet_data(
 ):
     """
     Extract structured medical data from case sheet voice transcriptions
-    Section-specific extraction for history, examination, and primary assessment
+    Section-specific extraction for history, examination, and primary assessment.
+    `sections` extracts several sections with one combined prompt; sections
+    already extracted from the same text are served from cache.
     """
+    sections = casesheet_sections(request)
     try:
-        # Create section-specific prompts
-        if request.section == 'history':
-            extraction_prompt = f"""You are a medical data extraction AI. Extract structured history data from this transcription.
+        return await run_casesheet_extraction(request, sections, current_user)
+    except Exception as e:
+        logging.error(f"Case sheet extraction error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
 
-Transcription: "{request.text}"
+@api_router.post("/extract-casesheet-data/stream")
+async def extract_casesheet_data_stream(
+    request: ExtractCaseSheetDataRequest,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Streaming variant of /extract-casesheet-data (text/event-stream); field paths are <section>.<field>"""
+    sections = casesheet_sections(request)
+    return stream_extraction(lambda on_field: run_casesheet_extraction(request, sections, current_user, on_field),
+                             "extract_casesheet_stream")
+
+def apply_abcde_red_flags(extracted_data: dict) -> List[str]:
+    """Auto-calculate ABCDE status and red flags from extracted vitals (in place); returns the red flags"""
+    # Auto-calculate ABCDE and Red Flags
+    abcde_data = {}
+    red_flags = []
 
-Extract and return ONLY a valid JSON object:
-{{
-  "signs_and_symptoms": "extracted text or null",
-  "allergies": ["list of allergies"] or [],
-  "past_medical": ["list of conditions"] or [],
-  "drug_history": "extracted medications text or null",
-  "past_surgical": "extracted surgical history or null",
-  "family_history": "extracted family history or null"
-}}
+    if 'vitals' in extracted_data and extracted_data['vitals']:
+        vitals = extracted_data['vitals']
 
-Rules:
-- Extract ONLY explicitly mentioned information
-- For allergies: return array of allergy strings
-- For past_medical: return array of condition strings  
-- Return null for missing text fields
-- Return empty arrays for missing list fields
-- Return ONLY the JSON object, no additional text"""
+        # Calculate GCS total
+        gcs_total = 0
+        if vitals.get('gcs_e'): gcs_total += vitals['gcs_e']
+        if vitals.get('gcs_v'): gcs_total += vitals['gcs_v']
+        if vitals.get('gcs_m'): gcs_total += vitals['gcs_m']
 
-        elif request.section == 'examination':
-            extraction_prompt = f"""You are a medical data extraction AI. Extract structured examination findings from this transcription.
+        # AIRWAY
+        if gcs_total > 0 and gcs_total <= 8:
+            abcde_data['airway_status'] = 'Threatened'
+            red_flags.append(f'🚨 CRITICAL: GCS {gcs_total} - Consider airway protection')
 
-Transcription: "{request.text}"
+        # BREATHING
+        rr = vitals.get('rr')
+        spo2 = vitals.get('spo2')
 
-Extract and return ONLY a valid JSON object:
-{{
-  "general_notes": "extracted general examination text or null",
-  "cvs_findings": "extracted CVS examination text or null",
-  "respiratory_findings": "extracted respiratory examination text or null",
-  "abdomen_findings": "extracted abdominal examination text or null",
-  "cns_findings": "extracted CNS examination text or null",
-  "general_pallor": boolean,
-  "general_icterus": boolean,
-  "general_clubbing": boolean,
-  "general_lymphadenopathy": boolean
-}}
+        if rr and (rr < 10 or rr > 30):
+            if rr < 10:
+                red_flags.append(f'🚨 CRITICAL: Bradypnea (RR {rr})')
+            else:
+                red_flags.append(f'⚠️ Tachypnea (RR {rr})')
 
-Rules:
-- Extract physical examination findings mentioned
-- For boolean fields: true if explicitly mentioned as present, false otherwise
-- Return null for text fields with no relevant findings
-- Return ONLY the JSON object, no additional text"""
+        if spo2 and spo2 < 90:
+            if spo2 < 85:
+                red_flags.append(f'🚨 CRITICAL: Severe hypoxia (SpO2 {spo2}%)')
+            else:
+                red_flags.append(f'⚠️ Hypoxia (SpO2 {spo2}%)')
 
-        elif request.section == 'primary_assessment':
-            extraction_prompt = f"""You are a medical data extraction AI. Extract ABCDE assessment data from this transcription.
+        # CIRCULATION
+        bp_sys = vitals.get('bp_systolic')
+        hr = vitals.get('hr')
 
-Transcription: "{request.text}"
+        if bp_sys and bp_sys < 90:
+            red_flags.append(f'🚨 CRITICAL: Hypotension (SBP {bp_sys})')
 
-Extract and return ONLY a valid JSON object:
-{{
-  "airway_notes": "extracted airway assessment or null",
-  "breathing_notes": "extracted breathing assessment or null",
-  "circulation_notes": "extracted circulation assessment or null",
-  "disability_notes": "extracted disability/neuro assessment or null",
-  "exposure_local_exam_notes": "extracted exposure findings or null"
-}}
+        if hr and hr < 40:
+            red_flags.append(f'🚨 CRITICAL: Severe Bradycardia (HR {hr})')
+        elif hr and hr > 130:
+            red_flags.append(f'⚠️ Tachycardia (HR {hr})')
 
-Rules:
-- Extract ABCDE primary survey findings
-- Return null for sections not mentioned
-- Return ONLY the JSON object, no additional text"""
+        # DISABILITY
+        if gcs_total > 0 and gcs_total < 13:
+            red_flags.append(f'⚠️ Altered mental status (GCS {gcs_total})')
 
-        else:
-            raise HTTPException(status_code=400, detail=f"Invalid section: {request.section}")
+        # EXPOSURE
+        temp = vitals.get('temperature')
+        if temp and temp > 38.5:
+            red_flags.append(f'⚠️ Fever ({temp}°C) - Consider sepsis')
 
-        # Use emergentintegrations LlmChat for extraction
-        import json
-        
-        llm = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"casesheet_extraction_{current_user.id}_{request.section}",
-            system_message="You are a medical data extraction AI. Extract structured data from medical documentation and return valid JSON."
-        )
-        
-        llm = llm.with_model(provider="openai", model="gpt-4o-mini")
-        response_text = await llm.send_message(UserMessage(text=extraction_prompt))
-        
-        extracted_data = json.loads(response_text)
-        
-        return {
-            "success": True,
-            "section": request.section,
-            "data": extracted_data
-        }
-        
-    except Exception as e:
-        logging.error(f"Case sheet extraction error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+    # Add ABCDE to primary assessment
+    if abcde_data:
+        extracted_data['primary_assessment'] = {**(extracted_data.get('primary_assessment') or {}), **abcde_data}
+
+    if red_flags:
+        extracted_data['red_flags'] = red_flags
+
+    return red_flags
+
+# "sections": concurrent per-section prompts (wall clock of the slowest section);
+# "single": one prompt for the whole case sheet
+CASE_EXTRACTION_MODE = os.environ.get("CASE_EXTRACTION_MODE", "sections").lower()
+CASE_EXTRACTION_SYSTEM_MESSAGE = "You are a medical case sheet AI. Clean transcripts, extract structured data, return valid JSON."
+
+async def extract_case_sections(transcript: str, is_pediatric: bool, context: str, tenant: Optional[str],
+                                routing: dict, on_field: Optional[Callable[[str, Any, str], None]] = None) -> Tuple[dict, bool]:
+    """
+    Fan the transcript out to the section prompts, at most the model's gateway
+    limit at once, and merge; returns (data, repaired). on_field only hears
+    about the keys each section is allowed to fill (see merge_sections).
+    """
+    limit = asyncio.Semaphore(max(1, min(len(CASE_SECTIONS), llm_gateway.limit(routing["model"]))))
+
+    async def extract(section):
+        keys = SECTION_KEYS[is_pediatric][section]
+
+        def section_field(path, value):
+            if path.split(".")[0] in keys:
+                on_field(path, value, "llm")
+
+        async with limit:
+            data, repaired = await json_completion(
+                "extract_case_data",
+                build_section_prompt(section, transcript, is_pediatric) + context,
+                CASE_EXTRACTION_SYSTEM_MESSAGE,
+                routing,
+                tenant,
+                on_field=section_field if on_field else None
+            )
+        return section, data, repaired
+
+    results = await asyncio.gather(*(extract(section) for section in CASE_SECTIONS))
+    data = merge_sections({section: data for section, data, _ in results}, is_pediatric)
+    return data, any(repaired for _, _, repaired in results)
 
 class ExtractCaseDataRequest(BaseModel):
     transcript: str
     is_pediatric: bool = False
+    case_sheet_id: Optional[str] = None  # follow-up dictation for an existing case
 
-@api_router.post("/extract-case-data")
-async def extract_case_data(
-    request: ExtractCaseDataRequest,
-    current_user: UserResponse = Depends(get_current_user)
-):
+async def run_case_extraction(request: ExtractCaseDataRequest, current_user: UserResponse,
+                              on_field: Optional[Callable[[str, Any, str], None]] = None) -> dict:
     """
-    Extract complete case sheet data from continuous voice transcript
-    Includes cleaning, extraction, and ABCDE auto-calculation
-    Similar to /extract-triage-data but for full case sheets
+    /extract-case-data body; on_field(path, value, source) receives each field
+    as the LLM writes it (red flags are only known once extraction is done)
     """
-    try:
-        # Create comprehensive 3-STAGE extraction prompt (with pediatric support)
-        if request.is_pediatric:
-            extraction_prompt = f"""You are an advanced PEDIATRIC medical AI with 3-STAGE PROCESSING for pediatric case sheet documentation.
+    # Follow-up dictation: tell the model what is already documented
+    context = case_context_block(await load_case_digest(request.case_sheet_id))
+    tenant = get_tenant_key(current_user)
+    routing = route_model("extraction", classify_llm_request(prompt_type="extract_case_data"), current_user)
+
+    if CASE_EXTRACTION_MODE == "sections":
+        with latency_tracker.timer("extract_case_data.sections_ms"):
+            extracted_data, repaired = await extract_case_sections(request.transcript, request.is_pediatric, context,
+                                                                   tenant, routing, on_field)
+        red_flags = apply_abcde_red_flags(extracted_data)
+        record_ai_call(current_user, "extract_case_data")
+        return {
+            "success": True,
+            "data": extracted_data,
+            "red_flags": red_flags,
+            "routing": routing,
+            "repaired": repaired
+        }
+
+    # Create comprehensive 3-STAGE extraction prompt (with pediatric support)
+    if request.is_pediatric:
+        extraction_prompt = f"""You are an advanced PEDIATRIC medical AI with 3-STAGE PROCESSING for pediatric case sheet documentation.
 
 STAGE 1 - CLEAN THE TRANSCRIPT:
 Raw transcript: "{request.transcript}"
@@ -4172,8 +5361,8 @@ CRITICAL RULES:
 - Use null for missing data
 - Return ONLY the JSON object, no other text
 """
-        else:
-            extraction_prompt = f"""You are an advanced medical AI with 3-STAGE PROCESSING for case sheet documentation.
+    else:
+        extraction_prompt = f"""You are an advanced medical AI with 3-STAGE PROCESSING for case sheet documentation.
 
 STAGE 1 - CLEAN THE TRANSCRIPT:
 Raw transcript: "{request.transcript}"
@@ -4250,96 +5439,200 @@ CRITICAL RULES:
 - Use null for missing data
 - Return ONLY the JSON object, no other text"""
 
-        # Use LlmChat for extraction
-        import json
-        
-        llm = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"case_extraction_{current_user.id}",
-            system_message="You are a medical case sheet AI. Clean transcripts, extract structured data, return valid JSON."
+    extraction_prompt += context
+    
+    # Use the shared LLM gateway for extraction
+    with latency_tracker.timer("extract_case_data.single_ms"):
+        extracted_data, repaired = await json_completion(
+            "extract_case_data",
+            extraction_prompt,
+            CASE_EXTRACTION_SYSTEM_MESSAGE,
+            routing,
+            tenant,
+            on_field=(lambda path, value: on_field(path, value, "llm")) if on_field else None
         )
-        
-        llm = llm.with_model(provider="openai", model="gpt-4o-mini")
-        response_text = await llm.send_message(UserMessage(text=extraction_prompt))
-        
-        # Parse JSON
-        extracted_data = json.loads(response_text)
-        
-        # Auto-calculate ABCDE and Red Flags
-        abcde_data = {}
-        red_flags = []
-        
-        if 'vitals' in extracted_data and extracted_data['vitals']:
-            vitals = extracted_data['vitals']
-            
-            # Calculate GCS total
-            gcs_total = 0
-            if vitals.get('gcs_e'): gcs_total += vitals['gcs_e']
-            if vitals.get('gcs_v'): gcs_total += vitals['gcs_v']
-            if vitals.get('gcs_m'): gcs_total += vitals['gcs_m']
-            
-            # AIRWAY
-            if gcs_total > 0 and gcs_total <= 8:
-                abcde_data['airway_status'] = 'Threatened'
-                red_flags.append(f'🚨 CRITICAL: GCS {gcs_total} - Consider airway protection')
-            
-            # BREATHING
-            rr = vitals.get('rr')
-            spo2 = vitals.get('spo2')
-            
-            if rr and (rr < 10 or rr > 30):
-                if rr < 10:
-                    red_flags.append(f'🚨 CRITICAL: Bradypnea (RR {rr})')
-                else:
-                    red_flags.append(f'⚠️ Tachypnea (RR {rr})')
-            
-            if spo2 and spo2 < 90:
-                if spo2 < 85:
-                    red_flags.append(f'🚨 CRITICAL: Severe hypoxia (SpO2 {spo2}%)')
-                else:
-                    red_flags.append(f'⚠️ Hypoxia (SpO2 {spo2}%)')
-            
-            # CIRCULATION
-            bp_sys = vitals.get('bp_systolic')
-            hr = vitals.get('hr')
-            
-            if bp_sys and bp_sys < 90:
-                red_flags.append(f'🚨 CRITICAL: Hypotension (SBP {bp_sys})')
-            
-            if hr and hr < 40:
-                red_flags.append(f'🚨 CRITICAL: Severe Bradycardia (HR {hr})')
-            elif hr and hr > 130:
-                red_flags.append(f'⚠️ Tachycardia (HR {hr})')
-            
-            # DISABILITY
-            if gcs_total > 0 and gcs_total < 13:
-                red_flags.append(f'⚠️ Altered mental status (GCS {gcs_total})')
-            
-            # EXPOSURE
-            temp = vitals.get('temperature')
-            if temp and temp > 38.5:
-                red_flags.append(f'⚠️ Fever ({temp}°C) - Consider sepsis')
-        
-        # Add ABCDE to primary assessment
-        if abcde_data and 'primary_assessment' not in extracted_data:
-            extracted_data['primary_assessment'] = {}
-        
-        if abcde_data:
-            extracted_data['primary_assessment'].update(abcde_data)
-        
-        if red_flags:
-            extracted_data['red_flags'] = red_flags
-        
-        return {
-            "success": True,
-            "data": extracted_data,
-            "red_flags": red_flags
-        }
-        
+    
+    red_flags = apply_abcde_red_flags(extracted_data)
+    
+    record_ai_call(current_user, "extract_case_data")
+    
+    return {
+        "success": True,
+        "data": extracted_data,
+        "red_flags": red_flags,
+        "routing": routing,
+        "repaired": repaired
+    }
+
+@api_router.post("/extract-case-data")
+async def extract_case_data(
+    request: ExtractCaseDataRequest,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Extract complete case sheet data from continuous voice transcript
+    Includes cleaning, extraction, and ABCDE auto-calculation
+    Similar to /extract-triage-data but for full case sheets
+    """
+    try:
+        return await run_case_extraction(request, current_user)
     except Exception as e:
         logging.error(f"Case data extraction error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
 
+@api_router.post("/extract-case-data/stream")
+async def extract_case_data_stream(
+    request: ExtractCaseDataRequest,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Streaming variant of /extract-case-data (text/event-stream); the ABCDE
+    status and red flags arrive with the done event
+    """
+    return stream_extraction(lambda on_field: run_case_extraction(request, current_user, on_field),
+                             "extract_case_data_stream")
+
+# ========== BACKGROUND JOBS ==========
+# Long AI / transcription work runs in Mongo-backed jobs instead of holding the
+# HTTP request open past the proxy timeout. Clients get 202 + job_id, then poll
+# GET /jobs/{id} or subscribe to GET /jobs/{id}/events (SSE). Jobs survive worker
+# restarts (expired leases are re-claimed) and are retried with backoff.
+
+job_queue = JobQueue(
+    db,
+    workers=int(os.environ.get('JOB_WORKERS', 2)),
+    lease_seconds=int(os.environ.get('JOB_LEASE_SECONDS', 300)),
+    max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', 3)),
+    result_ttl_seconds=int(float(os.environ.get('JOB_RESULT_TTL_HOURS', '24')) * 3600)
+)
+# Uploaded audio waits here until its transcription job finishes
+job_audio_bucket = AsyncIOMotorGridFSBucket(db, bucket_name="job_audio")
+
+async def job_user(job: dict) -> UserResponse:
+    user = await load_user(job["user_id"])
+    if user is None:
+        raise PermanentJobError("User not found")
+    return user
+
+async def run_job_endpoint(coro):
+    """Await an endpoint coroutine; client errors (4xx) are not worth retrying"""
+    try:
+        return await coro
+    except HTTPException as e:
+        if e.status_code < 500:
+            raise PermanentJobError(str(e.detail)) from e
+        raise RuntimeError(str(e.detail)) from e
+
+async def discharge_summary_job(job: dict) -> dict:
+    summary = await run_job_endpoint(create_discharge_summary(job["payload"]["case_sheet_id"], await job_user(job)))
+    return {
+        "summary_id": summary.id,
+        "case_sheet_id": summary.case_sheet_id,
+        "summary_text": summary.summary_text,
+        "generated_at": summary.generated_at.isoformat()
+    }
+
+async def extract_case_data_job(job: dict) -> dict:
+    return await run_job_endpoint(extract_case_data(ExtractCaseDataRequest(**job["payload"]), await job_user(job)))
+
+async def voice_to_text_job(job: dict) -> dict:
+    payload = job["payload"]
+    try:
+        stream = await job_audio_bucket.open_download_stream(ObjectId(payload["audio_file_id"]))
+    except Exception as e:
+        raise PermanentJobError(f"Audio not found: {e}")
+    clip = AudioClip(await stream.read(), payload.get("filename"), payload.get("content_type"))
+    return await run_job_endpoint(run_voice_to_text(
+        clip, payload.get("engine"), payload.get("language"), await job_user(job), payload.get("chunked")
+    ))
+
+async def delete_job_audio(job: dict) -> None:
+    await job_audio_bucket.delete(ObjectId(job["payload"]["audio_file_id"]))
+
+job_queue.register("discharge_summary", discharge_summary_job)
+job_queue.register("extract_case_data", extract_case_data_job)
+job_queue.register("voice_to_text", voice_to_text_job, on_finish=delete_job_audio)
+
+async def get_user_job(job_id: str, current_user: UserResponse) -> dict:
+    job = await job_queue.get(job_id)
+    if not job or (job.get("user_id") != current_user.id and current_user.role not in ANALYTICS_ADMIN_ROLES):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.post("/jobs/discharge-summary", status_code=202)
+async def enqueue_discharge_summary(case_sheet_id: str, current_user: UserResponse = Depends(get_current_user)):
+    """Background variant of POST /discharge-summary; result carries the saved summary"""
+    if not await db.cases.find_one({"id": case_sheet_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Case not found")
+    job = await job_queue.enqueue("discharge_summary", {"case_sheet_id": case_sheet_id},
+                                  user_id=current_user.id, tenant=get_tenant_key(current_user))
+    return public_job(job)
+
+@api_router.post("/jobs/extract-case-data", status_code=202)
+async def enqueue_extract_case_data(request: ExtractCaseDataRequest, current_user: UserResponse = Depends(get_current_user)):
+    """Background variant of POST /extract-case-data"""
+    job = await job_queue.enqueue("extract_case_data", request.model_dump(),
+                                  user_id=current_user.id, tenant=get_tenant_key(current_user))
+    return public_job(job)
+
+@api_router.post("/jobs/voice-to-text", status_code=202)
+async def enqueue_voice_to_text(
+    file: UploadFile = File(...),
+    engine: Optional[str] = Form("auto"),
+    language: Optional[str] = Form(None),
+    chunked: Optional[bool] = Form(None),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Background variant of POST /ai/voice-to-text for long recordings"""
+    clip = await read_audio_upload(file)
+    audio_file_id = await job_audio_bucket.upload_from_stream(
+        clip.filename, clip.data, metadata={"user_id": current_user.id}
+    )
+    job = await job_queue.enqueue("voice_to_text", {
+        "audio_file_id": str(audio_file_id),
+        "filename": file.filename,
+        "content_type": file.content_type,
+        "engine": engine,
+        "language": language,
+        "chunked": chunked
+    }, user_id=current_user.id, tenant=get_tenant_key(current_user))
+    return public_job(job)
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: UserResponse = Depends(get_current_user)):
+    return public_job(await get_user_job(job_id, current_user))
+
+@api_router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, response: Response, current_user: UserResponse = Depends(get_current_user)):
+    """The job's result once it succeeded; 202 while pending, 500 if it failed"""
+    job = await get_user_job(job_id, current_user)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Job failed: {job.get('error')}")
+    if job["status"] != "succeeded":
+        response.status_code = 202
+        return public_job(job)
+    return job["result"]
+
+@api_router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, current_user: UserResponse = Depends(get_current_user)):
+    """
+    Completion push (text/event-stream): a status event on every status change,
+    then done {result} or error {message}.
+    """
+    await get_user_job(job_id, current_user)
+    
+    async def events():
+        async for job in job_queue.watch(job_id):
+            data = public_job(job)
+            if job["status"] == "succeeded":
+                yield sse_event("done", data)
+            elif job["status"] == "failed":
+                yield sse_event("error", {**data, "message": job.get("error")})
+            else:
+                yield sse_event("status", data)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @api_router.post("/cases/{case_id}/addendum")
 async def add_addendum(case_id: str, request: AddendumRequest, current_user: UserResponse = Depends(get_current_user)):
     """Add an addendum note to a locked case"""
@@ -4457,22 +5750,21 @@ Clean up and correct the following transcription:
 Original transcription:"""
 
 
-async def refine_with_openai(text: str) -> str:
+async def refine_with_openai(text: str, tenant: Optional[str] = None) -> str:
     """Use OpenAI to clean up medical terminology in transcription"""
     if not text.strip():
         return text
     
     try:
-        chat = LlmChat(api_key=EMERGENT_LLM_KEY)
-        response = await chat.send_message_async(
-            messages=[
-                UserMessage(content=f"{MEDICAL_CLEANUP_PROMPT}\n\n{text}")
-            ],
+        response = await llm_gateway.complete(
+            f"{MEDICAL_CLEANUP_PROMPT}\n\n{text}",
             model="gpt-4o-mini",
             max_tokens=1000,
-            temperature=0.1
+            temperature=0.1,
+            priority_class=classify_llm_request(prompt_type="refine_transcript"),
+            tenant=tenant
         )
-        return response.content.strip()
+        return response.strip()
     except Exception as e:
         logger.error(f"OpenAI refinement error: {e}")
         return text  # Return original if refinement fails
@@ -4652,7 +5944,7 @@ async def websocket_streaming_stt(websocket: WebSocket):
         # Step 3: Refine accumulated text with OpenAI
         if accumulated_text.strip():
             logger.info(f"Refining transcript ({len(accumulated_text)} chars)")
-            refined_text = await refine_with_openai(accumulated_text)
+            refined_text = await refine_with_openai(accumulated_text, user.get("hospital_id") or f"user:{user.get('id')}")
             
             await websocket.send_json({
                 "type": "final",
@@ -4720,7 +6012,34 @@ async def root():
         "health": "/health"
     }
 
+# Startup event
+@app.on_event("startup")
+async def create_indexes():
+    """Indexes backing triage history queries, analytics rollups and the AI response cache"""
+    try:
+        await db.triage_assessments.create_index([("triaged_at", -1), ("id", -1)])
+        await db.triage_assessments.create_index([("hospital_id", 1), ("triaged_at", -1)])
+        await db.triage_assessments.create_index([("priority_level", 1), ("triaged_at", -1)])
+        await rollup_recorder.ensure_indexes()
+        await ai_response_cache.ensure_indexes()
+        await stt_cache.ensure_indexes()
+        await job_queue.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Index creation failed: {e}")
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+
+@app.on_event("startup")
+async def open_upstream_pool():
+    upstream_pool.open()
+
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    # Running jobs are handed back to the queue before the connection goes away
+    await job_queue.stop()
+    client.close()
+    await llm_gateway.aclose()
+    await upstream_pool.aclose()
\ No newline at end of file
@@ -0,0 +1,72 @@
+# Prompt builders for /ai/generate. Case data enters the prompt only through
+# the case digest (utils/case_digest.py), so (prompt type, PROMPT_VERSION,
+# digest hash) identifies the rendered prompt and doubles as the cache key.
+
+from utils.case_digest import get_case_digest
+
+AI_SYSTEM_MESSAGE = "You are an expert emergency medicine physician assistant. Always cite clinical guidelines and evidence-based references."
+
+# Bump when a template below changes so cached responses are not reused
+PROMPT_VERSION = 2
+
+_TEMPLATES = {
+    "discharge_summary": """Write a professional, well-structured ER discharge summary in standard medical format from this case sheet.
+
+Patient: {identity}
+{digest}""",
+
+    "red_flags": """As a senior emergency medicine consultant, give a RAPID RISK STRATIFICATION for this ER patient.
+
+{digest}
+
+Answer under these headings, specific to THIS patient:
+🚨 CRITICAL RED FLAGS: 2-4 life-threatening conditions to rule out immediately
+⚠️ URGENT CONCERNS: 2-3 serious conditions needing workup within 1-2 hours
+⚡ IMMEDIATE ACTIONS: 3-5 labs/ECG/imaging to order now, practical for an Indian ER
+🔍 CLINICAL WATCH: vital sign trends or symptoms indicating deterioration
+📋 DISPOSITION GUIDANCE: ICU / ward / observation / safe to discharge after workup
+
+Be concise and actionable. Reference NICE, ACLS, ATLS or Indian protocols where applicable.""",
+
+    "diagnosis_suggestions": """As a senior emergency medicine consultant, give a DIFFERENTIAL DIAGNOSIS for this ER patient.
+
+{digest}
+
+Answer under these headings, specific to THIS patient:
+🎯 TOP 3 DIFFERENTIAL DIAGNOSES: 1️⃣ most likely, 2️⃣ consider, 3️⃣ rule out. For each: supporting features from this case, specific confirmatory test (e.g. "Troponin + ECG", not "cardiac workup"), initial Rx if confirmed
+⚠️ MUST NOT MISS: 1-2 dangerous diagnoses to exclude, with the test
+📊 RECOMMENDED WORKUP: 4-6 prioritised investigations with expected findings
+💊 EMPIRICAL TREATMENT: safe treatment while awaiting workup, with doses for an Indian setting
+📝 WORKING DIAGNOSIS: one line
+
+Avoid generic differentials; focus on practical ER decisions.""",
+}
+
+
+def build_case_prompt(case, prompt_type, digest=None):
+    """Render the prompt for a case sheet document; None for an unknown prompt_type"""
+    template = _TEMPLATES.get(prompt_type)
+    if template is None:
+        return None
+    if digest is None:
+        digest, _ = get_case_digest(case)
+    # Identifiers stay out of the digest; only the discharge summary needs them
+    patient = case.get("patient") or {}
+    identity = " | ".join(str(patient[k]) for k in ("name", "uhid") if patient.get(k)) or "Unnamed"
+    return template.format(digest=digest or "No clinical data documented yet.", identity=identity)
+
+
+def build_delta_prompt(changes):
+    """Follow-up turn of a case conversation: only the fields changed since the previous answer"""
+    lines = "\n".join(changes)
+    return f"""The case sheet has been updated since your last answer (+ added, ~ changed, - removed):
+{lines}
+
+Give your complete answer again for the case as it stands now, under the same headings."""
+
+
+def case_context_block(digest):
+    """Existing-case context appended to transcript / extraction prompts"""
+    if not digest:
+        return ""
+    return f"\n\nALREADY DOCUMENTED FOR THIS CASE (do not repeat unless the transcript changes it):\n{digest}\n"
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import re
+import time
+
+import numpy as np
+
+from utils.audio_preprocess import AudioDecodeError, decode_audio, encode_wav, frame_energy_db, FRAME_MS
+from utils.job_queue import backoff_seconds
+
+# Long recordings are cut at pauses into chunks of about CHUNK_SECONDS, which
+# are transcribed concurrently and joined back in order, so a five-minute
+# dictation takes about as long as its slowest half-minute chunk.
+
+CHUNK_SECONDS = 30.0
+# Each cut is placed at the quietest moment within this many seconds of the
+# chunk target, so it lands in a pause rather than mid-word
+CUT_SLACK_SECONDS = 10.0
+QUIET_WINDOW_MS = 300  # a cut point is judged by the energy around it, not one frame
+MAX_OVERLAP_WORDS = 8
+
+_WORD = re.compile(r"[\w']+")
+
+
+class AudioChunk:
+    """One slice of a recording: WAV bytes plus its place in the original"""
+
+    __slots__ = ("index", "data", "start", "end")
+
+    def __init__(self, index, data, start, end):
+        self.index = index
+        self.data = data
+        self.start = start
+        self.end = end
+
+    @property
+    def seconds(self):
+        return self.end - self.start
+
+
+def plan_cuts(energy_db, frame_ms=FRAME_MS, chunk_seconds=CHUNK_SECONDS, slack_seconds=CUT_SLACK_SECONDS):
+    """
+    (start, end) frame ranges covering every frame, each about chunk_seconds
+    long, cut at the quietest point (smoothed over QUIET_WINDOW_MS) within
+    slack_seconds of the target
+    """
+    total = len(energy_db)
+    target = max(1, int(chunk_seconds * 1000 / frame_ms))
+    slack = min(int(slack_seconds * 1000 / frame_ms), target - 1)
+    window = max(1, QUIET_WINDOW_MS // frame_ms)
+    smoothed = np.convolve(energy_db, np.full(window, 1.0 / window), mode="same")
+
+    ranges = []
+    start = 0
+    while total - start > target + slack:
+        lo = start + target - slack
+        cut = lo + int(np.argmin(smoothed[lo:start + target + slack + 1]))
+        ranges.append((start, cut))
+        start = cut
+    ranges.append((start, total))
+    return ranges
+
+
+def split_audio(data, min_seconds=0.0, chunk_seconds=CHUNK_SECONDS, slack_seconds=CUT_SLACK_SECONDS, overlap_ms=0):
+    """
+    Mono WAV AudioChunks of a recording cut at pauses, or None when it cannot
+    be decoded or is shorter than min_seconds. With overlap_ms, every chunk
+    after the first also starts that much before its cut, so a word clipped by
+    the cut is heard whole on one side (stitch_transcripts drops the repeat).
+    """
+    try:
+        samples, rate = decode_audio(data)
+    except AudioDecodeError:
+        return None
+    if len(samples) / rate < min_seconds:
+        return None
+    channels = samples.shape[1]
+    mono = samples @ np.full(channels, 1.0 / channels, dtype=np.float32) if channels > 1 else samples[:, 0]
+
+    energy_db, frame = frame_energy_db(mono, rate)
+    overlap = int(overlap_ms * rate / 1000)
+    chunks = []
+    for index, (start, end) in enumerate(plan_cuts(energy_db, FRAME_MS, chunk_seconds, slack_seconds)):
+        first = start * frame
+        last = len(mono) if end == len(energy_db) else end * frame  # the final chunk keeps the partial frame
+        if index:
+            first = max(0, first - overlap)
+        chunks.append(AudioChunk(index, encode_wav(mono[first:last], rate), first / rate, last / rate))
+    return chunks
+
+
+def _words(text):
+    return [w.lower() for w in _WORD.findall(text)]
+
+
+def stitch_transcripts(texts, overlap=False, max_overlap_words=MAX_OVERLAP_WORDS):
+    """
+    Chunk transcripts joined in order. With overlap, the longest run of up to
+    max_overlap_words words that ends one chunk and starts the next (ignoring
+    case and punctuation) is kept only once.
+    """
+    stitched = ""
+    for text in texts:
+        text = (text or "").strip()
+        if not text:
+            continue
+        if stitched and overlap:
+            tail = _words(stitched)[-max_overlap_words:]
+            head = _words(text)[:max_overlap_words]
+            repeated = next((n for n in range(min(len(tail), len(head)), 0, -1) if tail[-n:] == head[:n]), 0)
+            if repeated:
+                # Drop the first `repeated` words, keeping the chunk's own spelling of the rest
+                matches = list(_WORD.finditer(text))
+                text = text[matches[repeated - 1].end():].lstrip(" ,.;:-")
+        if text:
+            stitched = f"{stitched} {text}" if stitched else text
+    return stitched
+
+
+async def transcribe_chunks(chunks, transcribe, concurrency=4, retries=2, retry_base_seconds=0.5,
+                            is_retryable=None, latency=None):
+    """
+    await transcribe(chunk) for every chunk, at most `concurrency` at a time,
+    retrying a failed chunk up to `retries` times with jittered backoff
+    (is_retryable(exc) can veto a retry). Returns [(chunk, result, attempts)]
+    in chunk order; a chunk that still fails fails the whole call.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(chunk):
+        attempt = 0
+        while True:
+            attempt += 1
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await transcribe(chunk)
+                except Exception as e:
+                    if attempt > retries or (is_retryable is not None and not is_retryable(e)):
+                        raise
+                    logging.warning(f"Transcription of chunk {chunk.index} failed (attempt {attempt}), retrying: {e}")
+                else:
+                    if latency is not None:
+                        latency.observe("stt.chunk_ms", (time.perf_counter() - started) * 1000)
+                    return chunk, result, attempt
+            # Back off outside the semaphore so waiting chunks can use the slot
+            await asyncio.sleep(backoff_seconds(attempt, retry_base_seconds, retry_base_seconds * 8))
+
+    tasks = [asyncio.ensure_future(run(chunk)) for chunk in chunks]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
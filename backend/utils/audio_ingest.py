@@ -0,0 +1,133 @@
+import hashlib
+import json
+
+# Audio uploads for speech-to-text are held in memory and handed to the STT
+# client from there: no temp file is written, re-read or left behind. Size is
+# bounded twice: UploadSizeLimitMiddleware refuses oversize request bodies
+# before multipart parsing spools them, and read_upload() checks the spooled
+# size before reading anything.
+#
+# The spooled upload is read into bytes once rather than passed through to the
+# engines: the cache key hashes it, preprocessing and chunking decode it, a
+# failover, hedge or chunk retry sends it again, and background jobs store it.
+# Each of those would otherwise re-read the spool (from disk past 1 MB).
+
+# Whisper's API rejects files over 25 MB
+DEFAULT_MAX_AUDIO_BYTES = 25 * 1024 * 1024
+
+
+class AudioTooLarge(Exception):
+    def __init__(self, max_bytes):
+        super().__init__(f"Audio upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+        self.max_bytes = max_bytes
+
+
+class AudioClip:
+    """An uploaded recording held in memory; seconds is its duration once decoded (else None)"""
+
+    __slots__ = ("data", "filename", "content_type", "seconds")
+
+    def __init__(self, data, filename=None, content_type=None, seconds=None):
+        self.data = data
+        self.filename = filename or "audio.webm"
+        self.content_type = content_type or "application/octet-stream"
+        self.seconds = seconds
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    def digest(self):
+        """sha256 of the audio bytes: identical uploads share it whatever their filename"""
+        return hashlib.sha256(self.data).hexdigest()
+
+    def multipart(self):
+        """(filename, bytes, content type) for an httpx multipart upload"""
+        return self.filename, self.data, self.content_type
+
+
+async def read_upload(upload, max_bytes=DEFAULT_MAX_AUDIO_BYTES):
+    """
+    Read an UploadFile into an AudioClip in one call; raises AudioTooLarge,
+    without reading, when it is over max_bytes. Without a known size (not a
+    multipart part) the spooled file is measured by seeking to its end.
+    """
+    size = upload.size
+    if size is None:
+        size = upload.file.seek(0, 2)
+        await upload.seek(0)
+    if size > max_bytes:
+        raise AudioTooLarge(max_bytes)
+    return AudioClip(await upload.read(), upload.filename, upload.content_type)
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware answering 413 for request bodies over max_bytes on the
+    given path prefixes. Content-Length is checked before anything is read;
+    chunked bodies are counted as they arrive, so an oversize upload is cut off
+    instead of being spooled in full first.
+    """
+
+    def __init__(self, app, max_bytes, paths):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        too_large = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    too_large = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if too_large:
+                # Body parsing failed on the cut-off body (FastAPI answers 400): send the 413 instead
+                if message["type"] == "http.response.start" and not started:
+                    started = True
+                    await self._reject(send)
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except _BodyTooLarge:
+            if started:
+                return
+            await self._reject(send)
+
+    async def _reject(self, send):
+        self.rejected += 1
+        body = json.dumps({"detail": f"Upload exceeds the {self.max_bytes // (1024 * 1024)} MB limit"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,251 @@
+import shutil
+import struct
+import subprocess
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Speech-to-text preprocessing: decode, downmix to mono, trim silence with an
+# energy VAD and resample to 16 kHz, all vectorised with NumPy. Whisper and
+# Sarvam work at 16 kHz mono internally, so anything above that is bandwidth
+# and upload time spent for nothing, and long silences only add latency.
+#
+# WAV (PCM 8/16/24/32-bit, float) is decoded here. Other containers (webm,
+# m4a, mp3...) are decoded with ffmpeg when it is on PATH and passed through
+# untouched otherwise.
+
+TARGET_RATE = 16000
+FRAME_MS = 30
+# A frame is speech when it is this far above the noise floor (10th percentile
+# frame energy), capped below the loud frames so continuous speech is kept
+SPEECH_MARGIN_DB = 12.0
+SPEECH_CAP_DB = 15.0
+SILENCE_FLOOR_DBFS = -60.0
+PAD_MS = 200  # kept around every speech run
+MAX_SILENCE_MS = 800  # internal pauses longer than this...
+KEEP_SILENCE_MS = 400  # ...are shortened to this
+FIR_TAPS = 31
+RESAMPLE_BLOCK = 1 << 16  # output samples filtered per matrix product
+FFMPEG_TIMEOUT_SECONDS = 60
+
+FFMPEG = shutil.which("ffmpeg")
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+def parse_wav(data):
+    """(samples float32 [frames, channels] in -1..1, sample rate) from WAV bytes"""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise AudioDecodeError("Not a WAV file")
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        size = struct.unpack("<I", data[offset + 4:offset + 8])[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            audio_format, channels, rate = struct.unpack("<HHI", data[body:body + 8])
+            bits = struct.unpack("<H", data[body + 14:body + 16])[0]
+            if audio_format == _WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                audio_format = struct.unpack("<H", data[body + 24:body + 26])[0]
+            fmt = (audio_format, channels, rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioDecodeError("WAV data before fmt chunk")
+            # Streamed WAVs (e.g. from a pipe) carry a placeholder size
+            return _pcm_to_float(data[body:min(body + size, len(data))], *fmt)
+        offset = body + size + (size & 1)
+    raise AudioDecodeError("WAV without data chunk")
+
+
+def _pcm_to_float(raw, audio_format, channels, rate, bits):
+    if channels < 1 or rate < 1:
+        raise AudioDecodeError("Invalid WAV format")
+    width = bits // 8
+    raw = raw[:len(raw) - len(raw) % (width * channels)]
+    if audio_format == _WAVE_FORMAT_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(raw, dtype="<f4" if bits == 32 else "<f8").astype(np.float32)
+    elif audio_format == _WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif audio_format == _WAVE_FORMAT_PCM and bits == 16:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif audio_format == _WAVE_FORMAT_PCM and bits == 24:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        value = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        value = np.where(value & 0x800000, value - 0x1000000, value)
+        samples = value.astype(np.float32) / 8388608.0
+    elif audio_format == _WAVE_FORMAT_PCM and bits == 32:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise AudioDecodeError(f"Unsupported WAV encoding (format {audio_format}, {bits} bit)")
+    return samples.reshape(-1, channels), rate
+
+
+def decode_audio(data):
+    """(samples [frames, channels], rate): WAV natively, anything else through ffmpeg if available"""
+    if data[:4] == b"RIFF":
+        return parse_wav(data)
+    if FFMPEG is None:
+        raise AudioDecodeError("Compressed audio needs ffmpeg")
+    try:
+        result = subprocess.run(
+            [FFMPEG, "-hide_banner", "-loglevel", "error", "-i", "pipe:0", "-f", "wav", "-acodec", "pcm_s16le", "pipe:1"],
+            input=data, capture_output=True, timeout=FFMPEG_TIMEOUT_SECONDS, check=True,
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        raise AudioDecodeError(f"ffmpeg could not decode the audio: {e}")
+    return parse_wav(result.stdout)
+
+
+def encode_wav(samples, rate):
+    """Mono float samples -> 16-bit PCM WAV bytes"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + len(pcm), b"WAVE", b"fmt ", 16, _WAVE_FORMAT_PCM, 1, rate, rate * 2, 2, 16, b"data", len(pcm),
+    )
+    return header + pcm
+
+
+def frame_energy_db(mono, rate, frame_ms=FRAME_MS):
+    """RMS level (dBFS) of consecutive frames; the last partial frame is dropped"""
+    frame = max(1, rate * frame_ms // 1000)
+    count = len(mono) // frame
+    frames = mono[:count * frame].reshape(count, frame)
+    power = np.einsum("ij,ij->i", frames, frames) / frame
+    return 10.0 * np.log10(np.maximum(power, 1e-20)), frame
+
+
+def speech_mask(energy_db):
+    """Speech frames: above the noise floor by SPEECH_MARGIN_DB (never above loud frames minus SPEECH_CAP_DB)"""
+    if not len(energy_db):
+        return np.zeros(0, dtype=bool)
+    floor = np.percentile(energy_db, 10)
+    loud = np.percentile(energy_db, 95)
+    threshold = max(min(floor + SPEECH_MARGIN_DB, loud - SPEECH_CAP_DB), SILENCE_FLOOR_DBFS)
+    return energy_db > threshold
+
+
+def keep_mask(speech, frame_ms=FRAME_MS):
+    """
+    Frames to keep: speech padded by PAD_MS on both sides, with leading and
+    trailing silence dropped and internal pauses over MAX_SILENCE_MS shortened
+    to KEEP_SILENCE_MS
+    """
+    pad = max(1, PAD_MS // frame_ms)
+    # Dilate speech by `pad` frames either side (hangover)
+    padded = np.convolve(speech.astype(np.int32), np.ones(2 * pad + 1, dtype=np.int32), mode="same") > 0
+    keep = padded.copy()
+    max_gap = MAX_SILENCE_MS // frame_ms
+    half_keep = max(1, KEEP_SILENCE_MS // frame_ms // 2)
+
+    edges = np.diff(np.concatenate(([1], padded.astype(np.int8), [1])))
+    starts = np.flatnonzero(edges == -1)
+    ends = np.flatnonzero(edges == 1)
+    for start, end in zip(starts, ends):
+        if start == 0 or end == len(padded):
+            continue  # leading / trailing silence: already dropped
+        if end - start > max_gap:
+            continue  # long pause: keep only its edges
+        keep[start:end] = True
+    for start, end in zip(starts, ends):
+        if start != 0 and end != len(padded) and end - start > max_gap:
+            keep[start:start + half_keep] = True
+            keep[end - half_keep:end] = True
+    return keep
+
+
+def lowpass_taps(rate, target=TARGET_RATE, taps=FIR_TAPS):
+    """Hamming-windowed sinc anti-aliasing filter, cut off just under the target Nyquist"""
+    cutoff = 0.5 * target / rate * 0.9  # cycles per input sample
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(mono, rate, target=TARGET_RATE):
+    """
+    Resample onto the target rate by linear interpolation, low-pass filtered
+    first when downsampling. The filter is only evaluated at the input samples
+    each output point interpolates between (a window x taps matrix product per
+    block) rather than convolving the whole input, which at 44.1 -> 16 kHz is
+    less than half the work.
+    """
+    mono = mono.astype(np.float32, copy=False)
+    count = int(len(mono) * target / rate)
+    if rate == target or not count:
+        return mono
+    positions = np.arange(count) * (rate / target)
+    if rate < target:
+        return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+    kernel = lowpass_taps(rate, target)
+    half = len(kernel) // 2
+    windows = sliding_window_view(np.pad(mono, (half, half + 1)), len(kernel))
+    left = positions.astype(np.int64)
+    frac = (positions - left).astype(np.float32)
+    out = np.empty(count, dtype=np.float32)
+    for start in range(0, count, RESAMPLE_BLOCK):
+        block = slice(start, start + RESAMPLE_BLOCK)
+        a = windows[left[block]] @ kernel
+        b = windows[left[block] + 1] @ kernel
+        out[block] = a + (b - a) * frac[block]
+    return out
+
+
+def preprocess_audio(data):
+    """
+    Mono 16-bit WAV at 16 kHz (or the input rate, if lower) with silence
+    trimmed, for STT. Returns (wav bytes or None, report); None means "send the
+    original": it could not be decoded, no speech was found, or the result is
+    not smaller than the upload (typically compressed input, whose trimmed
+    audio as PCM outweighs the original).
+    """
+    started = time.perf_counter()
+    report = {"applied": False, "reason": None, "original_bytes": len(data), "bytes": len(data), "bytes_saved": 0,
+              "original_seconds": None, "seconds": None, "seconds_saved": 0.0,
+              "sample_rate": None, "output_sample_rate": None, "channels": None}
+
+    def done(wav):
+        report["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return wav, report
+
+    try:
+        samples, rate = decode_audio(data)
+    except AudioDecodeError as e:
+        report["reason"] = str(e)
+        return done(None)
+
+    channels = samples.shape[1]
+    original_seconds = len(samples) / rate
+    report.update(sample_rate=rate, channels=channels,
+                  original_seconds=round(original_seconds, 2), seconds=round(original_seconds, 2))
+    mono = samples @ np.full(channels, 1.0 / channels, dtype=np.float32) if channels > 1 else samples[:, 0]
+
+    energy_db, frame = frame_energy_db(mono, rate)
+    speech = speech_mask(energy_db)
+    if not speech.any():
+        report["reason"] = "no_speech"
+        return done(None)
+
+    keep = keep_mask(speech)
+    kept = mono[:len(keep) * frame].reshape(len(keep), frame)[keep].ravel()
+    # Narrowband (e.g. 8 kHz telephony) audio is not upsampled
+    out_rate = min(rate, TARGET_RATE)
+    out = resample(kept, rate, out_rate)
+    wav = encode_wav(out, out_rate)
+    seconds = len(out) / out_rate
+    if len(wav) >= len(data):
+        report["reason"] = "no_gain"
+        return done(None)
+
+    report.update(applied=True, bytes=len(wav), bytes_saved=len(data) - len(wav), output_sample_rate=out_rate,
+                  seconds=round(seconds, 2), seconds_saved=round(original_seconds - seconds, 2))
+    return done(wav)
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+
+
+def content_hash(*parts):
+    """Stable sha256 over strings / JSON-serialisable parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, default=str)
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Small in-process LRU with optional per-entry TTL.
+    Not shared between workers; meant to sit in front of a shared store.
+    """
+
+    def __init__(self, maxsize=512, ttl_seconds=None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl_seconds=None):
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        entry = self._data.pop(key, None)
+        return entry[0] if entry else None
+
+    def remove_where(self, predicate):
+        """Drop every entry whose value matches `predicate`; returns the count"""
+        stale = [k for k, (value, _) in self._data.items() if predicate(value)]
+        for key in stale:
+            del self._data[key]
+        return len(stale)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class ResponseCache:
+    """
+    Two-level cache for generated AI responses: an in-process LRU in front of
+    a Mongo collection with a TTL index. Entries are tagged with the case id so
+    they can be dropped when the case changes. Store errors are logged and
+    treated as misses so the cache never fails a request.
+    """
+
+    def __init__(self, db, collection="ai_response_cache", ttl_seconds=86400, lru_size=512):
+        self.db = db
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.lru = LRUCache(lru_size, ttl_seconds)
+        self.store_hits = 0
+
+    async def get(self, key):
+        entry = self.lru.get(key)
+        if entry is not None:
+            return entry
+
+        try:
+            doc = await self.db[self.collection].find_one({"key": key}, {"_id": 0})
+        except Exception as e:
+            logging.error(f"Response cache read failed: {e}")
+            return None
+        if not doc:
+            return None
+        expires_at = doc.get("expires_at")
+        if expires_at is not None:
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            # The TTL monitor only runs once a minute
+            if expires_at < datetime.now(timezone.utc):
+                return None
+        self.store_hits += 1
+        self.lru.set(key, doc)
+        return doc
+
+    async def set(self, key, case_id, value):
+        now = datetime.now(timezone.utc)
+        doc = {
+            "key": key,
+            "case_id": case_id,
+            **value,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+        }
+        self.lru.set(key, doc)
+        try:
+            await self.db[self.collection].replace_one({"key": key}, doc, upsert=True)
+        except Exception as e:
+            logging.error(f"Response cache write failed: {e}")
+        return doc
+
+    async def claim(self, key, flag="speculative"):
+        """
+        Atomically clear a boolean flag on a stored entry. True only for the
+        one caller (across workers) that cleared it.
+        """
+        self.lru.pop(key)
+        try:
+            doc = await self.db[self.collection].find_one_and_update(
+                {"key": key, flag: True}, {"$set": {flag: False}}, projection={"_id": 1}
+            )
+        except Exception as e:
+            logging.error(f"Response cache claim failed: {e}")
+            return False
+        return doc is not None
+
+    async def unclaim(self, key, flag="speculative"):
+        """Undo claim() when the work it guarded failed"""
+        self.lru.pop(key)
+        try:
+            await self.db[self.collection].update_one({"key": key}, {"$set": {flag: True}})
+        except Exception as e:
+            logging.error(f"Response cache unclaim failed: {e}")
+
+    async def invalidate_case(self, case_id):
+        """Drop every cached response generated for a case"""
+        self.lru.remove_where(lambda doc: doc.get("case_id") == case_id)
+        result = await self.db[self.collection].delete_many({"case_id": case_id})
+        return result.deleted_count
+
+    async def ensure_indexes(self):
+        coll = self.db[self.collection]
+        await coll.create_index("key", unique=True)
+        await coll.create_index("case_id")
+        await coll.create_index("expires_at", expireAfterSeconds=0)
+
+    def stats(self):
+        lru = self.lru.stats()
+        lookups = lru["hits"] + lru["misses"]
+        hits = lru["hits"] + self.store_hits
+        return {
+            "lru": lru,
+            "store_hits": self.store_hits,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -0,0 +1,349 @@
+import hashlib
+
+# Bump when the digest format changes so stored digests are rebuilt
+DIGEST_VERSION = 1
+
+# Values that carry no information for the model
+_EMPTY = {"", "n/a", "na", "none", "null", "not documented", "not specified", "-"}
+
+# Exam system statuses default to "Normal" even when never examined, so a system
+# is only listed when something other than the default was recorded
+_EXAM_SYSTEMS = [
+    ("CVS", "cvs", ["cvs_s1_s2", "cvs_pulse", "cvs_apex_beat", "cvs_precordial_heave", "cvs_added_sounds", "cvs_murmurs"]),
+    ("RS", "respiratory", ["respiratory_expansion", "respiratory_percussion", "respiratory_breath_sounds",
+                           "respiratory_vocal_resonance", "respiratory_added_sounds"]),
+    ("P/A", "abdomen", ["abdomen_umbilical", "abdomen_organomegaly", "abdomen_percussion", "abdomen_bowel_sounds",
+                        "abdomen_external_genitalia", "abdomen_hernial_orifices", "abdomen_per_rectal", "abdomen_per_vaginal"]),
+    ("CNS", "cns", ["cns_higher_mental", "cns_cranial_nerves", "cns_sensory_system", "cns_motor_system",
+                    "cns_reflexes", "cns_romberg_sign", "cns_cerebellar_signs"]),
+    ("Extremities", "extremities", ["extremities_findings"]),
+]
+
+
+# Top-level case fields the digest reads; writing any of them changes the digest
+DIGEST_CASE_FIELDS = {
+    "patient", "vitals_at_arrival", "presenting_complaint", "history", "primary_assessment",
+    "examination", "investigations", "treatment", "disposition", "case_type",
+    "triage_priority", "triage_color", "procedures_performed", "drugs_administered",
+}
+
+
+def _present(value):
+    if value is None or value is False:
+        return False
+    if isinstance(value, str):
+        return value.strip().lower() not in _EMPTY
+    if isinstance(value, (list, tuple, dict)):
+        return any(_present(v) for v in (value.values() if isinstance(value, dict) else value))
+    return True
+
+
+def _num(value):
+    """110.0 -> '110', 37.25 -> '37.2'"""
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (int, float)):
+        return str(int(value)) if float(value).is_integer() else f"{value:.1f}"
+    return str(value).strip()
+
+
+def _text(value):
+    return " ".join(str(value).split())
+
+
+def _join(values):
+    return ", ".join(_text(v) for v in values if _present(v))
+
+
+def _gcs(e, v, m):
+    parts = [p for p in (e, v, m) if _present(p)]
+    if not parts:
+        return None
+    components = f"E{_num(e) if _present(e) else '-'}V{_num(v) if _present(v) else '-'}M{_num(m) if _present(m) else '-'}"
+    try:
+        total = sum(int(float(p)) for p in parts)
+    except (TypeError, ValueError):
+        return components
+    return f"{total} ({components})" if len(parts) == 3 else components
+
+
+def vitals_line(vitals):
+    """Terse vitals block, e.g. 'HR 110 | BP 100/70 | RR 22 | SpO2 95% | T 37.2C | GCS 15 (E4V5M6)'"""
+    vitals = vitals or {}
+    parts = []
+    if _present(vitals.get("hr")):
+        parts.append(f"HR {_num(vitals['hr'])}")
+    sbp, dbp = vitals.get("bp_systolic"), vitals.get("bp_diastolic")
+    if _present(sbp):
+        parts.append(f"BP {_num(sbp)}/{_num(dbp) if _present(dbp) else '-'}")
+    if _present(vitals.get("rr")):
+        parts.append(f"RR {_num(vitals['rr'])}")
+    if _present(vitals.get("spo2")):
+        parts.append(f"SpO2 {_num(vitals['spo2'])}%")
+    if _present(vitals.get("temperature")):
+        parts.append(f"T {_num(vitals['temperature'])}C")
+    gcs = _gcs(vitals.get("gcs_e"), vitals.get("gcs_v"), vitals.get("gcs_m"))
+    if gcs:
+        parts.append(f"GCS {gcs}")
+    if _present(vitals.get("grbs")):
+        parts.append(f"GRBS {_num(vitals['grbs'])}")
+    if _present(vitals.get("pain_score")):
+        parts.append(f"Pain {_num(vitals['pain_score'])}/10")
+    return " | ".join(parts)
+
+
+def _fields(section, labels):
+    """'Label value' pairs for the present fields of a section"""
+    parts = []
+    for key, label in labels:
+        value = section.get(key)
+        if not _present(value):
+            continue
+        if isinstance(value, list):
+            value = _join(value)
+        elif value is True:
+            value = "yes"
+        else:
+            value = _num(value) if isinstance(value, (int, float)) else _text(value)
+        parts.append(f"{label} {value}" if label else value)
+    return parts
+
+
+def _primary_assessment_lines(pa):
+    lines = []
+    airway = _fields(pa, [("airway_status", ""), ("airway_obstruction", "obstruction"),
+                          ("airway_interventions", "interventions"), ("airway_notes", ""),
+                          ("airway_additional_notes", "")])
+    if airway and airway != ["Patent"]:
+        lines.append("A: " + "; ".join(airway))
+
+    breathing = _fields(pa, [("breathing_rr", "RR"), ("breathing_spo2", "SpO2"), ("breathing_oxygen_device", "O2"),
+                             ("breathing_oxygen_flow", "L/min"), ("breathing_work", "WOB"),
+                             ("breathing_air_entry", "air entry"), ("breathing_adjuncts", "adjuncts"),
+                             ("breathing_notes", ""), ("breathing_additional_notes", "")])
+    if breathing:
+        lines.append("B: " + "; ".join(breathing))
+
+    circulation = _fields(pa, [("circulation_hr", "HR"),
+                               ("circulation_neck_veins", "JVP"), ("circulation_peripheral_pulses", "pulses"),
+                               ("circulation_external_bleed", "external bleed"),
+                               ("circulation_long_bone_deformity", "long bone deformity"),
+                               ("circulation_adjuncts", "adjuncts"), ("circulation_notes", ""),
+                               ("circulation_additional_notes", "")])
+    if _present(pa.get("circulation_crt")):
+        circulation.insert(1 if _present(pa.get("circulation_hr")) else 0, f"CRT {_num(pa['circulation_crt'])}s")
+    sbp, dbp = pa.get("circulation_bp_systolic"), pa.get("circulation_bp_diastolic")
+    if _present(sbp):
+        circulation.insert(1 if _present(pa.get("circulation_hr")) else 0,
+                           f"BP {_num(sbp)}/{_num(dbp) if _present(dbp) else '-'}")
+    if circulation:
+        lines.append("C: " + "; ".join(circulation))
+
+    disability = _fields(pa, [("disability_avpu", "AVPU"), ("disability_pupils_size", "pupils"),
+                              ("disability_pupils_reaction", "reaction"), ("disability_grbs", "GRBS"),
+                              ("disability_seizure", "seizure"), ("disability_notes", ""),
+                              ("disability_additional_notes", "")])
+    gcs = _gcs(pa.get("disability_gcs_e"), pa.get("disability_gcs_v"), pa.get("disability_gcs_m"))
+    if gcs:
+        disability.insert(1 if _present(pa.get("disability_avpu")) else 0, f"GCS {gcs}")
+    if disability:
+        lines.append("D: " + "; ".join(disability))
+
+    exposure = _fields(pa, [("exposure_temperature", "T"), ("exposure_logroll_findings", "logroll"),
+                            ("exposure_local_exam_notes", ""), ("exposure_additional_notes", "")])
+    if exposure:
+        lines.append("E: " + "; ".join(exposure))
+
+    vbg = _fields(pa, [("vbg_ph", "pH"), ("vbg_pco2", "pCO2"), ("vbg_hco3", "HCO3"), ("vbg_hb", "Hb"),
+                       ("vbg_glu", "Glu"), ("vbg_lac", "Lac"), ("vbg_na", "Na"), ("vbg_k", "K"), ("vbg_cr", "Cr")])
+    if vbg:
+        lines.append("VBG: " + " ".join(vbg))
+    adjuncts = _fields(pa, [("ecg_findings", "ECG"), ("bedside_echo_findings", "Echo"),
+                            ("adjuvants_additional_notes", "")])
+    if adjuncts:
+        lines.append("Bedside: " + "; ".join(adjuncts))
+    return lines
+
+
+def _examination_lines(exam):
+    lines = []
+    general = [label for key, label in (("general_pallor", "pallor"), ("general_icterus", "icterus"),
+                                        ("general_clubbing", "clubbing"),
+                                        ("general_lymphadenopathy", "lymphadenopathy"),
+                                        ("general_varicose_veins", "varicose veins")) if exam.get(key)]
+    thyroid = exam.get("general_thyroid")
+    if _present(thyroid) and thyroid != "Normal":
+        general.append(f"thyroid {_text(thyroid)}")
+    general += _fields(exam, [("general_notes", ""), ("general_additional_notes", "")])
+    if general:
+        lines.append("General: " + "; ".join(general))
+
+    for label, prefix, detail_keys in _EXAM_SYSTEMS:
+        status = exam.get(f"{prefix}_status")
+        details = _fields(exam, [(key, "") for key in detail_keys] + [(f"{prefix}_additional_notes", "")])
+        if prefix == "cvs" and _present(exam.get("cvs_pulse_rate")):
+            details.insert(0, f"PR {_num(exam['cvs_pulse_rate'])}")
+        # A bare "Normal" is indistinguishable from the unexamined default
+        if details or (_present(status) and status != "Normal"):
+            head = _text(status) if _present(status) else ""
+            lines.append(f"{label}: " + "; ".join(([head] if head else []) + details))
+    return lines
+
+
+# Patient fields the digest reads; identifiers (name, UHID, phone...) are left out
+_PATIENT_DIGEST_FIELDS = ("age", "sex", "mode_of_arrival", "mlc", "nature_of_accident", "mechanism_of_injury")
+
+
+def case_field_values(case):
+    """
+    Flat {dotted path: display value} of the present digest fields, e.g.
+    {"vitals_at_arrival.hr": "110"}. Two snapshots of a case diff into the
+    field-level changes between them.
+    """
+    values = {}
+
+    def walk(value, path):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(item, f"{path}.{key}")
+        elif isinstance(value, list) and any(isinstance(item, dict) for item in value):
+            for index, item in enumerate(value):
+                walk(item, f"{path}.{index}")
+        elif _present(value):
+            if isinstance(value, list):
+                values[path] = _join(value)
+            elif value is True:
+                values[path] = "yes"
+            else:
+                values[path] = _num(value) if isinstance(value, (int, float)) else _text(value)
+
+    for field in sorted(DIGEST_CASE_FIELDS):
+        value = case.get(field)
+        if field == "patient":
+            value = {key: item for key, item in (value or {}).items() if key in _PATIENT_DIGEST_FIELDS}
+        walk(value, field)
+    return values
+
+
+def build_case_digest(case):
+    """
+    Compact, token-efficient text summary of a case sheet for LLM prompts.
+    Empty / placeholder fields are dropped and vitals are normalised into
+    one line. Patient identifiers (name, UHID) are left out. Deterministic for a given case, so its hash identifies the
+    clinical content the prompts see.
+    """
+    patient = case.get("patient") or {}
+    complaint = case.get("presenting_complaint") or {}
+    history = case.get("history") or {}
+    pa = case.get("primary_assessment") or {}
+    exam = case.get("examination") or {}
+    investigations = case.get("investigations") or {}
+    treatment = case.get("treatment") or {}
+    disposition = case.get("disposition") or {}
+
+    lines = []
+
+    who = []
+    age_sex = "/".join(_text(patient[k]) for k in ("age", "sex") if _present(patient.get(k)))
+    if age_sex:
+        who.append(age_sex)
+    if _present(case.get("case_type")):
+        who.append(_text(case["case_type"]))
+    if patient.get("mlc"):
+        who.append("MLC")
+    if _present(patient.get("mode_of_arrival")):
+        who.append(f"arrival {_text(patient['mode_of_arrival'])}")
+    if who:
+        lines.append("Pt: " + " | ".join(who))
+
+    injury = _fields(patient, [("nature_of_accident", ""), ("mechanism_of_injury", "mechanism")])
+    if injury:
+        lines.append("Injury: " + "; ".join(injury))
+
+    if _present(case.get("triage_color")) or _present(case.get("triage_priority")):
+        triage = _text(case.get("triage_color") or "").upper()
+        level = case.get("triage_priority")
+        lines.append("Triage: " + " ".join(p for p in (triage, f"(P{level})" if _present(level) else "") if p))
+
+    vitals = vitals_line(case.get("vitals_at_arrival"))
+    if vitals:
+        lines.append("Vitals: " + vitals)
+
+    cc = _fields(complaint, [("text", ""), ("duration", ""), ("onset_type", "onset"), ("course", "course")])
+    if cc:
+        lines.append("CC: " + "; ".join(cc))
+
+    for label, keys in (
+        ("HPI", ("hpi", "events_hopi", "hpi_additional_notes")),
+        ("Symptoms", ("signs_and_symptoms",)),
+        ("PMH", ("past_medical", "past_medical_additional_notes")),
+        ("PSH", ("past_surgical", "past_surgical_additional_notes")),
+        ("Drugs", ("drug_history",)),
+        ("Allergies", ("allergies", "allergies_additional_notes")),
+        ("FHx", ("family_history", "family_gyn_additional_notes")),
+        ("Gyn", ("gyn_history", "lmp")),
+    ):
+        values = _fields(history, [(key, "LMP" if key == "lmp" else "") for key in keys])
+        if values:
+            lines.append(f"{label}: " + "; ".join(values))
+
+    ros = _fields(history, [("secondary_survey_neuro", "neuro"), ("secondary_survey_resp", "resp"),
+                            ("secondary_survey_cardiac", "cardiac"), ("secondary_survey_gi", "GI"),
+                            ("secondary_survey_gu", "GU"), ("secondary_survey_msk", "MSK"),
+                            ("secondary_survey_notes", ""), ("secondary_survey_additional_notes", "")])
+    if ros:
+        lines.append("ROS: " + "; ".join(ros))
+
+    lines += _primary_assessment_lines(pa)
+    lines += _examination_lines(exam)
+
+    inv = _fields(investigations, [("panels_selected", "panels"), ("individual_tests", "tests"),
+                                   ("results_notes", "results")])
+    if inv:
+        lines.append("Ix: " + "; ".join(inv))
+
+    rx = _fields(treatment, [("interventions", ""), ("intervention_notes", "")])
+    drugs = [
+        " ".join(_text(d[k]) for k in ("name", "dose", "time") if _present(d.get(k)))
+        for d in case.get("drugs_administered") or [] if isinstance(d, dict)
+    ]
+    if drugs:
+        rx.append("drugs " + ", ".join(d for d in drugs if d))
+    procedures = [_text(p["name"]) for p in case.get("procedures_performed") or [] if isinstance(p, dict) and _present(p.get("name"))]
+    if procedures:
+        rx.append("procedures " + ", ".join(procedures))
+    if rx:
+        lines.append("Rx: " + "; ".join(rx))
+
+    dx = _fields(treatment, [("provisional_diagnoses", ""), ("differential_diagnoses", "DDx")])
+    if dx:
+        lines.append("Dx: " + "; ".join(dx))
+
+    if disposition:
+        dispo = _fields(disposition, [("type", ""), ("destination", "to"), ("condition_at_discharge", "condition"),
+                                      ("advice", "advice")])
+        discharge_vitals = vitals_line(disposition.get("discharge_vitals"))
+        if discharge_vitals:
+            dispo.append(f"vitals {discharge_vitals}")
+        if dispo:
+            lines.append("Dispo: " + "; ".join(dispo))
+
+    return "\n".join(lines)
+
+
+def digest_hash(digest):
+    return hashlib.sha256(f"v{DIGEST_VERSION}\x00{digest}".encode("utf-8")).hexdigest()
+
+
+def case_digest_fields(case):
+    """Fields stored on the case document on every write"""
+    digest = build_case_digest(case)
+    return {"ai_digest": digest, "ai_digest_hash": digest_hash(digest), "ai_digest_version": DIGEST_VERSION}
+
+
+def get_case_digest(case):
+    """(digest, hash) from the stored fields, rebuilt if missing or from an older format"""
+    if case.get("ai_digest_version") == DIGEST_VERSION and case.get("ai_digest_hash") and "ai_digest" in case:
+        return case["ai_digest"], case["ai_digest_hash"]
+    fields = case_digest_fields(case)
+    return fields["ai_digest"], fields["ai_digest_hash"]
@@ -0,0 +1,268 @@
+# Section-wise prompts for /extract-case-data. Instead of one prompt that
+# cleans, extracts and structures every case-sheet section (long output, so
+# long latency), each section gets its own small prompt; the calls run
+# concurrently and merge_sections() reassembles the single-call response shape.
+
+CASE_SECTIONS = ["demographics", "vitals", "history", "examination", "primary_assessment"]
+
+# Top-level response keys each section prompt is allowed to fill
+SECTION_KEYS = {
+    False: {
+        "demographics": ["patient_info"],
+        "vitals": ["vitals"],
+        "history": ["history"],
+        "examination": ["examination"],
+        "primary_assessment": ["primary_assessment"],
+    },
+    True: {
+        "demographics": ["patient_info", "growth_parameters", "pat", "presenting_complaint"],
+        "vitals": ["vitals"],
+        "history": ["history"],
+        "examination": ["examination"],
+        "primary_assessment": ["primary_assessment"],
+    },
+}
+
+_SCHEMAS = {
+    "patient_info": {
+        False: """"patient_info": {
+    "name": "string or null",
+    "age": number or null,
+    "gender": "string or null"
+  }""",
+        True: """"patient_info": {
+    "name": "string or null",
+    "age": number or null,
+    "age_unit": "years/months/days or null",
+    "gender": "Male/Female/Other or null"
+  }""",
+    },
+    "growth_parameters": """"growth_parameters": {
+    "weight": number (kg) or null,
+    "height": number (cm) or null,
+    "head_circumference": number (cm) or null,
+    "bmi": number or null
+  }""",
+    "pat": """"pat": {
+    "appearance": "Normal/Abnormal or null",
+    "work_of_breathing": "Normal/Increased or null",
+    "circulation_to_skin": "Normal/Abnormal or null",
+    "overall_impression": "Stable/Sick/Critical or null"
+  }""",
+    "presenting_complaint": """"presenting_complaint": {
+    "text": "string or null",
+    "duration": "string or null",
+    "onset_type": "Sudden/Gradual or null"
+  }""",
+    "vitals": {
+        False: """"vitals": {
+    "hr": number or null,
+    "bp_systolic": number or null,
+    "bp_diastolic": number or null,
+    "rr": number or null,
+    "spo2": number or null,
+    "temperature": number or null,
+    "gcs_e": number (1-4) or null,
+    "gcs_v": number (1-5) or null,
+    "gcs_m": number (1-6) or null
+  }""",
+        True: """"vitals": {
+    "hr": number or null,
+    "bp_systolic": number or null,
+    "bp_diastolic": number or null,
+    "rr": number or null,
+    "spo2": number or null,
+    "temperature": number or null,
+    "gcs_e": number (1-4) or null,
+    "gcs_v": number (1-5) or null,
+    "gcs_m": number (1-6) or null,
+    "capillary_refill": number (seconds) or null
+  }""",
+    },
+    "history": {
+        False: """"history": {
+    "signs_and_symptoms": "string or null",
+    "past_medical": ["conditions"] or [],
+    "allergies": ["allergies"] or [],
+    "drug_history": "string or null",
+    "past_surgical": "string or null",
+    "family_history": "string or null"
+  }""",
+        True: """"history": {
+    "signs_and_symptoms": "string or null",
+    "birth_history": "string or null",
+    "immunization_status": "string or null",
+    "developmental_milestones": "string or null",
+    "feeding_history": "string or null",
+    "past_medical": ["conditions"] or [],
+    "allergies": ["allergies"] or [],
+    "drug_history": "string or null",
+    "past_surgical": "string or null",
+    "family_history": "string or null"
+  }""",
+    },
+    "examination": {
+        False: """"examination": {
+    "general_notes": "string or null",
+    "general_pallor": boolean,
+    "general_icterus": boolean,
+    "general_clubbing": boolean,
+    "general_lymphadenopathy": boolean,
+    "cvs_additional_notes": "string or null",
+    "respiratory_additional_notes": "string or null",
+    "abdomen_additional_notes": "string or null",
+    "cns_additional_notes": "string or null"
+  }""",
+        True: """"examination": {
+    "general_notes": "string or null",
+    "general_pallor": boolean,
+    "general_icterus": boolean,
+    "general_cyanosis": boolean,
+    "general_dehydration": "None/Mild/Moderate/Severe or null",
+    "cvs_additional_notes": "string or null",
+    "respiratory_additional_notes": "string or null",
+    "abdomen_additional_notes": "string or null",
+    "cns_additional_notes": "string or null",
+    "skin_notes": "string or null",
+    "musculoskeletal_notes": "string or null"
+  }""",
+    },
+    "primary_assessment": """"primary_assessment": {
+    "airway_additional_notes": "string or null",
+    "breathing_additional_notes": "string or null",
+    "circulation_additional_notes": "string or null",
+    "disability_additional_notes": "string or null",
+    "exposure_additional_notes": "string or null"
+  }""",
+}
+
+_FOCUS = {
+    "demographics": "patient demographics (name, age, gender)",
+    "vitals": "vital signs (HR, BP, RR, SpO2, Temp, GCS)",
+    "history": "chief complaint details, past medical/surgical history, allergies and medications",
+    "examination": "physical examination findings (all systems)",
+    "primary_assessment": "primary assessment (ABCDE) notes and interventions done",
+}
+_PEDIATRIC_FOCUS = {
+    "demographics": "patient demographics (age with unit: days/months/years), growth parameters, "
+                    "Pediatric Assessment Triangle and the presenting complaint",
+    "vitals": "vital signs (HR, BP, RR, SpO2, Temp, GCS, Capillary Refill Time)",
+    "history": "history including birth history, immunization status, developmental milestones, "
+               "feeding history, past medical/surgical history, allergies and medications",
+    "examination": "physical examination findings (dehydration status, all systems, skin)",
+    "primary_assessment": "primary assessment (ABCDE) notes and interventions done",
+}
+
+
+def _schema(key, is_pediatric):
+    schema = _SCHEMAS[key]
+    return schema[is_pediatric] if isinstance(schema, dict) else schema
+
+
+def build_section_prompt(section, transcript, is_pediatric=False):
+    """Prompt extracting one case-sheet section from the raw transcript"""
+    focus = (_PEDIATRIC_FOCUS if is_pediatric else _FOCUS)[section]
+    schema = ",\n  ".join(_schema(key, is_pediatric) for key in SECTION_KEYS[is_pediatric][section])
+    patient = "PEDIATRIC " if is_pediatric else ""
+    return f"""Extract only the {focus} from this {patient}ER case sheet dictation.
+
+Raw transcript: "{transcript}"
+
+The transcript may contain repeated words, fillers, noise and non-English phrases: ignore them, normalise spoken numbers ("one forty over eighty" → 140/80) and translate to English.
+
+Return ONLY a valid JSON object:
+{{
+  {schema}
+}}
+
+Rules:
+- Extract ONLY explicitly mentioned values; null (or false, or []) for anything missing
+- Ignore information belonging to other sections
+- Return ONLY the JSON object, no other text"""
+
+
+def merge_sections(results, is_pediatric=False):
+    """
+    Combine per-section JSON results ({section: dict}) into the single-call
+    response shape. Sections are applied in CASE_SECTIONS order and each may
+    only contribute its own keys, so the merge does not depend on which call
+    finished first or on keys a model echoed from another section.
+    """
+    merged = {}
+    for section in CASE_SECTIONS:
+        result = results.get(section)
+        if not isinstance(result, dict):
+            continue
+        for key in SECTION_KEYS[is_pediatric][section]:
+            if key in result:
+                merged[key] = result[key]
+    return merged
+
+
+# /extract-casesheet-data: the mobile case-sheet screen's per-section fields.
+# Several sections of one dictation are extracted in one call, keyed by section.
+CASESHEET_SECTIONS = ["history", "examination", "primary_assessment"]
+
+# Bump when a schema or rule below changes so cached sections are not reused
+CASESHEET_PROMPT_VERSION = 1
+
+_CASESHEET_SCHEMAS = {
+    "history": """{
+    "signs_and_symptoms": "extracted text or null",
+    "allergies": ["list of allergies"] or [],
+    "past_medical": ["list of conditions"] or [],
+    "drug_history": "extracted medications text or null",
+    "past_surgical": "extracted surgical history or null",
+    "family_history": "extracted family history or null"
+  }""",
+    "examination": """{
+    "general_notes": "extracted general examination text or null",
+    "cvs_findings": "extracted CVS examination text or null",
+    "respiratory_findings": "extracted respiratory examination text or null",
+    "abdomen_findings": "extracted abdominal examination text or null",
+    "cns_findings": "extracted CNS examination text or null",
+    "general_pallor": boolean,
+    "general_icterus": boolean,
+    "general_clubbing": boolean,
+    "general_lymphadenopathy": boolean
+  }""",
+    "primary_assessment": """{
+    "airway_notes": "extracted airway assessment or null",
+    "breathing_notes": "extracted breathing assessment or null",
+    "circulation_notes": "extracted circulation assessment or null",
+    "disability_notes": "extracted disability/neuro assessment or null",
+    "exposure_local_exam_notes": "extracted exposure findings or null"
+  }""",
+}
+
+_CASESHEET_RULES = {
+    "history": "history: allergies and past_medical are arrays of strings, [] when none mentioned",
+    "examination": "examination: booleans true only if explicitly mentioned as present",
+    "primary_assessment": "primary_assessment: ABCDE primary survey findings",
+}
+
+
+def build_casesheet_prompt(text, sections):
+    """One schema-guided prompt extracting every requested case-sheet section"""
+    schema = ",\n  ".join(f'"{section}": {_CASESHEET_SCHEMAS[section]}' for section in sections)
+    rules = "\n".join(f"- {_CASESHEET_RULES[section]}" for section in sections)
+    return f"""You are a medical data extraction AI. Extract structured case sheet data from this transcription.
+
+Transcription: "{text}"
+
+Extract and return ONLY a valid JSON object with exactly these sections:
+{{
+  {schema}
+}}
+
+Rules:
+- Extract ONLY explicitly mentioned information; null for text fields with nothing relevant
+{rules}
+- Return ONLY the JSON object, no additional text"""
+
+
+def split_casesheet_response(data, sections):
+    """Per-section results from the combined response; sections the model left out are None"""
+    if not isinstance(data, dict):
+        return {section: None for section in sections}
+    return {section: data[section] if isinstance(data.get(section), dict) else None for section in sections}
@@ -0,0 +1,100 @@
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for an upstream dependency.
+
+    closed     calls pass; `failure_threshold` failures in a row open the breaker
+    open       calls are refused until `reset_timeout` seconds have passed
+    half_open  up to `half_open_max_calls` trial calls pass; a success closes
+               the breaker, a failure opens it again
+
+    Callers ask allow() before the call and report the outcome with
+    record_success() / record_failure() (timeouts count as failures). A caller
+    that was admitted but never made the call hands its slot back with
+    release(), so a half-open breaker is not left waiting on a trial that
+    will never report. Every admission must end in exactly one of the three;
+    `pending` in stats() counts admissions that have not reported yet.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trials = 0
+        self._pending = 0
+        self.opened = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trials = 0
+        return self._state
+
+    def allow(self):
+        state = self.state
+        if state == CLOSED:
+            self._pending += 1
+            return True
+        if state == HALF_OPEN and self._trials < self.half_open_max_calls:
+            self._trials += 1
+            self._pending += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def _settle(self):
+        if self._pending > 0:
+            self._pending -= 1
+
+    def release(self):
+        """Return an admission from allow() whose call was not made"""
+        self._settle()
+        if self._state == HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def record_success(self):
+        self._settle()
+        self.successes += 1
+        self._failures = 0
+        self._state = CLOSED
+
+    def record_failure(self):
+        self._settle()
+        self.failures += 1
+        self._failures += 1
+        if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        if self._state != OPEN:
+            self.opened += 1
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+
+    def stats(self):
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self._failures,
+            "retry_in_seconds": round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            if state == OPEN else None,
+            "pending": self._pending,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
@@ -0,0 +1,291 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.keyword_matcher import KeywordMatcher
+
+# Symptom keyword -> red flag rules: (keywords, flag, priority)
+RED_FLAG_SYMPTOM_PATTERNS = [
+    (["chest pain", "crushing", "radiating arm", "radiating to jaw"], "Possible ACS/MI - ECG Stat", 1),
+    (["sudden headache", "worst headache", "thunderclap"], "Possible SAH - CT Head Stat", 1),
+    (["seizure", "convulsion", "fitting"], "Seizure Activity", 1),
+    (["unresponsive", "unconscious", "not responding"], "Altered Consciousness", 1),
+    (["difficulty breathing", "can't breathe", "gasping", "stridor"], "Respiratory Distress", 1),
+    (["bloody stool", "hematemesis", "coffee ground vomit"], "GI Bleeding", 1),
+    (["swelling throat", "anaphylaxis", "severe allergy"], "Possible Anaphylaxis", 1),
+    (["trauma", "accident", "rta", "fall from height"], "Trauma - Assess for occult injuries", 2),
+]
+
+# Symptom/history keyword -> provisional diagnosis rules: (keywords, diagnoses)
+DIAGNOSIS_PATTERNS = [
+    # Cardiac
+    (["chest pain", "crushing", "sweating", "radiating"], ["Acute Coronary Syndrome", "Angina", "GERD"]),
+    (["palpitation", "racing heart", "irregular pulse"], ["Cardiac Arrhythmia", "Anxiety", "Thyroid disorder"]),
+
+    # Respiratory
+    (["breathless", "shortness of breath", "dyspnea"], ["COPD Exacerbation", "Pneumonia", "Heart Failure", "Asthma"]),
+    (["cough", "fever", "sputum"], ["Community Acquired Pneumonia", "Bronchitis", "TB - Rule out"]),
+    (["wheeze", "asthma", "difficulty breathing"], ["Acute Asthma", "COPD", "Bronchitis"]),
+
+    # GI
+    (["abdominal pain", "vomiting"], ["Acute Gastritis", "Appendicitis", "Gastroenteritis"]),
+    (["diarrhea", "loose stools"], ["Acute Gastroenteritis", "Food Poisoning", "Inflammatory Bowel Disease"]),
+    (["right lower quadrant", "rlq pain"], ["Acute Appendicitis", "Ovarian Pathology", "Mesenteric Adenitis"]),
+    (["epigastric", "burning"], ["Acute Gastritis", "GERD", "Peptic Ulcer Disease"]),
+
+    # Neurological
+    (["headache", "vomiting", "neck pain"], ["Meningitis - Rule out", "Migraine", "Tension Headache"]),
+    (["weakness", "slurred", "facial droop"], ["Acute Stroke", "TIA", "Bell's Palsy"]),
+    (["seizure", "convulsion"], ["Seizure Disorder", "Epilepsy", "Febrile Seizure"]),
+    (["giddiness", "vertigo", "spinning"], ["BPPV", "Vestibular Neuritis", "Meniere's Disease"]),
+
+    # Infectious
+    (["fever", "body ache", "malaise"], ["Acute Febrile Illness", "Viral Fever", "Dengue - Investigate"]),
+    (["fever", "rash"], ["Dengue", "Chikungunya", "Viral Exanthem"]),
+    (["sore throat", "difficulty swallowing"], ["Acute Pharyngitis", "Tonsillitis", "Peritonsillar Abscess"]),
+    (["burning urination", "dysuria", "frequency"], ["Urinary Tract Infection", "Cystitis", "Pyelonephritis"]),
+
+    # Trauma
+    (["fall", "injury", "trauma"], ["Soft Tissue Injury", "Fracture - X-ray needed", "Contusion"]),
+    (["head injury", "fall", "hit head"], ["Head Injury - CT if indicated", "Concussion", "Scalp Laceration"]),
+
+    # Pediatric
+    (["not feeding", "lethargy", "irritable infant"], ["Sepsis - Workup needed", "Meningitis", "Metabolic disorder"]),
+    (["barking cough", "stridor"], ["Croup", "Laryngotracheitis", "Foreign Body - Rule out"]),
+]
+
+# One automaton over every red-flag and diagnosis keyword, built once at import
+CLINICAL_KEYWORD_MATCHER = KeywordMatcher({
+    **{("red_flag", i): keywords for i, (keywords, _, _) in enumerate(RED_FLAG_SYMPTOM_PATTERNS)},
+    **{("diagnosis", i): keywords for i, (keywords, _) in enumerate(DIAGNOSIS_PATTERNS)},
+})
+
+
+def match_clinical_keywords(symptoms="", history=""):
+    """
+    Single pass over "<symptoms> <history>".
+    Red flags only count hits inside the symptoms text; diagnoses use both
+    (matching the original `symptoms + " " + history` lookup).
+    Returns (red_flags, diagnoses) in rule order:
+    red_flags = [{"flag", "priority"}], diagnoses = [name, ...] (with duplicates).
+    """
+    symptoms_lower = (symptoms or "").lower()
+    history_lower = (history or "").lower()
+    combined = f"{symptoms_lower} {history_lower}" if history_lower else symptoms_lower
+    hits = CLINICAL_KEYWORD_MATCHER.scan(combined)
+    return _collect(hits, len(symptoms_lower))
+
+
+def _collect(hits, symptoms_end):
+    red_flags = []
+    diagnoses = []
+    for i, (_, flag, priority) in enumerate(RED_FLAG_SYMPTOM_PATTERNS):
+        end = hits.get(("red_flag", i))
+        if end is not None and end <= symptoms_end:
+            red_flags.append({"flag": flag, "priority": priority})
+    for i, (_, dx_list) in enumerate(DIAGNOSIS_PATTERNS):
+        if ("diagnosis", i) in hits:
+            diagnoses.extend(dx_list)
+    return red_flags, diagnoses
+
+
+def rescore_batch(records):
+    """
+    Re-score many (symptoms, history) pairs, e.g. historical cases for an audit.
+    Returns a list of (red_flags, diagnoses) tuples in input order.
+    """
+    return [match_clinical_keywords(symptoms, history) for symptoms, history in records]
+
+
+@dataclass(slots=True)
+class NormalizedVitals:
+    """Vitals parsed once from the loosely-typed request dict (None = missing/unparseable)"""
+    hr: Optional[int] = None
+    sbp: Optional[int] = None
+    spo2: Optional[int] = None
+    temperature: Optional[float] = None
+    rr: Optional[int] = None
+    gcs: Optional[int] = None
+    grbs: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, vitals):
+        vitals = vitals or {}
+        return cls(
+            hr=_as_int(vitals.get("heart_rate") or vitals.get("pulse") or vitals.get("hr")),
+            sbp=_as_int(vitals.get("systolic_bp") or vitals.get("bp_systolic") or vitals.get("sbp")),
+            spo2=_as_int(vitals.get("spo2") or vitals.get("oxygen_saturation")),
+            temperature=_as_float(vitals.get("temperature") or vitals.get("temp")),
+            rr=_as_int(vitals.get("rr") or vitals.get("respiratory_rate")),
+            gcs=_as_int(vitals.get("gcs") or vitals.get("glasgow_coma_scale")),
+            grbs=_as_float(vitals.get("grbs") or vitals.get("blood_sugar")),
+        )
+
+
+def _as_float(value):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_int(value):
+    number = _as_float(value)
+    if number is None:
+        return None
+    try:
+        return int(number)
+    except (OverflowError, ValueError):
+        return None
+
+
+def vital_red_flags(v):
+    """Threshold-based red flags from normalized vitals: [{"flag", "priority"}]"""
+    flags = []
+    if v.hr is not None:
+        if v.hr > 150: flags.append({"flag": "Severe Tachycardia (HR > 150)", "priority": 1})
+        elif v.hr > 120: flags.append({"flag": "Tachycardia (HR > 120)", "priority": 2})
+        if v.hr < 40: flags.append({"flag": "Severe Bradycardia (HR < 40)", "priority": 1})
+        elif v.hr < 50: flags.append({"flag": "Bradycardia (HR < 50)", "priority": 2})
+    if v.sbp is not None:
+        if v.sbp < 80: flags.append({"flag": "Hypotension (SBP < 80) - Shock Range", "priority": 1})
+        elif v.sbp < 90: flags.append({"flag": "Hypotension (SBP < 90)", "priority": 2})
+        if v.sbp > 180: flags.append({"flag": "Hypertensive Crisis (SBP > 180)", "priority": 1})
+    if v.spo2 is not None:
+        if v.spo2 < 90: flags.append({"flag": "Severe Hypoxia (SpO2 < 90%)", "priority": 1})
+        elif v.spo2 < 94: flags.append({"flag": "Hypoxia (SpO2 < 94%)", "priority": 2})
+    if v.temperature is not None:
+        if v.temperature > 40: flags.append({"flag": "High Fever (>40°C) - Hyperpyrexia", "priority": 1})
+        elif v.temperature > 39: flags.append({"flag": "Fever (>39°C)", "priority": 2})
+        if v.temperature < 35: flags.append({"flag": "Hypothermia (<35°C)", "priority": 1})
+    if v.rr is not None:
+        if v.rr < 8: flags.append({"flag": "Bradypnea (RR < 8) - Respiratory Failure", "priority": 1})
+        if v.rr > 35: flags.append({"flag": "Severe Tachypnea (RR > 35)", "priority": 1})
+        elif v.rr > 25: flags.append({"flag": "Tachypnea (RR > 25)", "priority": 2})
+    if v.gcs is not None:
+        if v.gcs <= 8: flags.append({"flag": "GCS ≤8 - Coma, Consider Intubation", "priority": 1})
+        elif v.gcs <= 12: flags.append({"flag": "Altered Consciousness (GCS 9-12)", "priority": 2})
+    if v.grbs is not None:
+        if v.grbs < 50: flags.append({"flag": "Severe Hypoglycemia (GRBS < 50)", "priority": 1})
+        elif v.grbs < 70: flags.append({"flag": "Hypoglycemia (GRBS < 70)", "priority": 2})
+        if v.grbs > 400: flags.append({"flag": "Severe Hyperglycemia (GRBS > 400)", "priority": 1})
+    return flags
+
+
+def _case_text(data):
+    return data.get("symptoms", "") or data.get("chief_complaint", ""), data.get("history", "")
+
+
+def red_flag_report(red_flags):
+    """Response body of /ai/red-flags from a list of flags"""
+    red_flags.sort(key=lambda x: x["priority"])
+    return {
+        "red_flags": [f["flag"] for f in red_flags],
+        "detailed_flags": red_flags,
+        "count": len(red_flags),
+        "critical_count": len([f for f in red_flags if f["priority"] == 1])
+    }
+
+
+def diagnosis_report(diagnoses, symptoms):
+    """Response body of /ai/provisional-diagnosis from matched diagnoses"""
+    unique_diagnoses = list(dict.fromkeys(diagnoses))
+    if not unique_diagnoses:
+        unique_diagnoses = ["Requires further evaluation", "Undifferentiated illness"]
+    return {
+        "diagnoses": unique_diagnoses[:5],
+        "primary_diagnosis": unique_diagnoses[0] if unique_diagnoses else None,
+        "differentials": unique_diagnoses[1:5] if len(unique_diagnoses) > 1 else [],
+        "based_on": symptoms[:100] if symptoms else "No symptoms provided"
+    }
+
+
+def evaluate_case(data):
+    """
+    Red flags + diagnoses for one request dict, sharing the parsed vitals and a
+    single keyword scan. Returns (red_flag_report, diagnosis_report).
+    """
+    symptoms, history = _case_text(data)
+    vitals = NormalizedVitals.from_dict(data.get("vitals"))
+    symptom_flags, diagnoses = match_clinical_keywords(symptoms, history)
+    return red_flag_report(vital_red_flags(vitals) + symptom_flags), diagnosis_report(diagnoses, symptoms)
+
+
+def analyze_case(data):
+    """Combined red flags, provisional diagnoses, recommendations and urgency (/ai/analyze-case)"""
+    red_flags_result, diagnosis_result = evaluate_case(data)
+
+    # Generate recommendations based on findings
+    recommendations = ["Monitor vitals regularly"]
+
+    if red_flags_result["critical_count"] > 0:
+        recommendations.insert(0, "URGENT: Address critical findings immediately")
+        recommendations.append("Consider ICU/HDU admission")
+
+    if any("ACS" in f or "MI" in f for f in red_flags_result["red_flags"]):
+        recommendations.append("ECG - Stat")
+        recommendations.append("Cardiac enzymes (Troponin)")
+
+    diagnoses_lower = [dx.lower() for dx in diagnosis_result["diagnoses"]]
+    if any("stroke" in dx for dx in diagnoses_lower):
+        recommendations.append("CT Head - Stat")
+        recommendations.append("Check for thrombolysis window")
+
+    if any("pneumonia" in dx or "respiratory" in dx for dx in diagnoses_lower):
+        recommendations.append("Chest X-ray")
+        recommendations.append("ABG if SpO2 < 94%")
+
+    recommendations.append("Complete blood count")
+    recommendations.append("Basic metabolic panel")
+
+    return {
+        "red_flags": red_flags_result["red_flags"],
+        "critical_count": red_flags_result["critical_count"],
+        "provisional_diagnoses": diagnosis_result["diagnoses"],
+        "primary_diagnosis": diagnosis_result["primary_diagnosis"],
+        "differentials": diagnosis_result["differentials"],
+        "recommendations": list(dict.fromkeys(recommendations))[:8],  # Remove duplicates, limit to 8
+        "urgency": "CRITICAL" if red_flags_result["critical_count"] > 0 else "URGENT" if red_flags_result["count"] > 0 else "ROUTINE"
+    }
+
+
+def analyze_case_batch(cases):
+    """analyze_case() over many request dicts, in input order"""
+    return [analyze_case(data) for data in cases]
+
+
+def case_rule_input(case):
+    """evaluate_case() request dict from a stored case document"""
+    history = case.get("history") or {}
+    vitals = dict(case.get("vitals_at_arrival") or {})
+    if vitals.get("gcs") is None:
+        parts = [_as_int(vitals.get(key)) for key in ("gcs_e", "gcs_v", "gcs_m")]
+        if all(part is not None for part in parts):
+            vitals["gcs"] = sum(parts)
+    return {
+        "symptoms": (case.get("presenting_complaint") or {}).get("text") or "",
+        "history": " ".join(filter(None, [history.get("hpi"), history.get("signs_and_symptoms")])),
+        "vitals": vitals,
+    }
+
+
+def rule_based_ai_text(case, prompt_type):
+    """
+    Plain-text stand-in for an /ai/generate red_flags or diagnosis_suggestions
+    answer, from the rule engine (used when the LLM is unavailable); None for
+    other prompt types.
+    """
+    red_flags, diagnoses = evaluate_case(case_rule_input(case))
+    if prompt_type == "red_flags":
+        lines = ["🚨 RED FLAGS (rule-based screen of vitals and presenting complaint):"]
+        lines += [f"- {flag['flag']}{' [CRITICAL]' if flag['priority'] == 1 else ''}"
+                  for flag in red_flags["detailed_flags"]] or ["- No rule-based red flags detected"]
+        return "\n".join(lines)
+    if prompt_type == "diagnosis_suggestions":
+        lines = ["🎯 PROVISIONAL DIAGNOSES (rule-based keyword match):"]
+        lines += [f"{i}. {dx}" for i, dx in enumerate(diagnoses["diagnoses"], 1)]
+        if red_flags["red_flags"]:
+            lines += ["", "⚠️ RED FLAGS:"] + [f"- {flag}" for flag in red_flags["red_flags"]]
+        return "\n".join(lines)
+    return None
@@ -0,0 +1,116 @@
+from utils.cache import LRUCache
+
+
+def field_delta(before, after):
+    """Changed fields between two case_field_values() snapshots, one line each"""
+    changes = []
+    for path in sorted(set(before) | set(after)):
+        old, new = before.get(path), after.get(path)
+        if old == new:
+            continue
+        if old is None:
+            changes.append(f"+ {path}: {new}")
+        elif new is None:
+            changes.append(f"- {path} (was {old})")
+        else:
+            changes.append(f"~ {path}: {old} -> {new}")
+    return changes
+
+
+class ConversationStore:
+    """
+    Per-case LLM conversations for repeat analyses of the same patient (one
+    per case, prompt type and model). The first turn sends the full prompt
+    with the case digest; later turns send only the fields changed since the
+    previous answer, on top of the earlier turns. The unchanged history is a
+    stable prefix the provider can serve from its prompt cache.
+
+    A fresh context is started instead when there is no conversation yet,
+    nothing changed, more than `max_delta_fields` fields changed, the delta
+    message would be more than `max_delta_ratio` of the full prompt, the
+    conversation already has `max_turns` answers, or the delta turn would cost
+    more than the full prompt ("larger_than_fresh"). A delta turn still sends
+    every earlier message; its cost is the delta message plus the history
+    weighted by `cached_prefix_weight` (the price of prompt-cached input
+    relative to fresh input; 1.0 compares raw sizes).
+
+    start() returns a turn {"mode", "reason", "history", "message", ...} to send
+    as history + message; commit() records the answer. In-process only: a
+    conversation missing on another worker just means a fresh context.
+    """
+
+    def __init__(self, render_delta, maxsize=1024, ttl_seconds=3600, max_delta_fields=12,
+                 max_delta_ratio=0.5, max_turns=6, cached_prefix_weight=1.0):
+        self.render_delta = render_delta
+        self.max_delta_fields = max_delta_fields
+        self.max_delta_ratio = max_delta_ratio
+        self.max_turns = max_turns
+        self.cached_prefix_weight = cached_prefix_weight
+        self._conversations = LRUCache(maxsize, ttl_seconds)
+        self.delta_turns = 0
+        self.fresh_turns = {}
+        # Characters actually sent on delta turns, and what full prompts would have been
+        self.delta_sent_chars = 0
+        self.delta_fresh_chars = 0
+
+    def start(self, key, fields, prompt):
+        """Turn for the case as it is now (fields: case_field_values, prompt: the full prompt)"""
+        conversation = self._conversations.get(key)
+        reason = None
+        message = None
+        changes = []
+        history_chars = 0
+        if conversation is None:
+            reason = "new"
+        elif conversation["turns"] >= self.max_turns:
+            reason = "max_turns"
+        else:
+            changes = field_delta(conversation["fields"], fields)
+            if not changes:
+                reason = "no_delta"
+            elif len(changes) > self.max_delta_fields:
+                reason = "large_delta"
+            else:
+                message = self.render_delta(changes)
+                history_chars = sum(len(m["content"]) for m in conversation["messages"])
+                if len(message) > self.max_delta_ratio * len(prompt):
+                    reason = "large_delta"
+                elif history_chars * self.cached_prefix_weight + len(message) > len(prompt):
+                    reason = "larger_than_fresh"
+
+        if reason is not None:
+            self.fresh_turns[reason] = self.fresh_turns.get(reason, 0) + 1
+            return {"key": key, "mode": "fresh", "reason": reason, "history": [], "message": prompt,
+                    "fields": fields, "turns": 0, "changed_fields": None,
+                    "sent_chars": len(prompt), "fresh_chars": len(prompt)}
+        self.delta_turns += 1
+        self.delta_sent_chars += history_chars + len(message)
+        self.delta_fresh_chars += len(prompt)
+        return {"key": key, "mode": "delta", "reason": None, "history": conversation["messages"], "message": message,
+                "fields": fields, "turns": conversation["turns"], "changed_fields": len(changes),
+                "sent_chars": history_chars + len(message), "fresh_chars": len(prompt)}
+
+    def commit(self, turn, response):
+        """Record the answer to a turn; the next turn on this key builds on it"""
+        if not response:
+            return
+        self._conversations.set(turn["key"], {
+            "messages": turn["history"] + [
+                {"role": "user", "content": turn["message"]},
+                {"role": "assistant", "content": response},
+            ],
+            "fields": turn["fields"],
+            "turns": turn["turns"] + 1,
+        })
+
+    def stats(self):
+        return {
+            "conversations": len(self._conversations),
+            "delta_turns": self.delta_turns,
+            "fresh_turns": self.fresh_turns,
+            "max_delta_fields": self.max_delta_fields,
+            "max_turns": self.max_turns,
+            "cached_prefix_weight": self.cached_prefix_weight,
+            "delta_sent_chars": self.delta_sent_chars,
+            "delta_fresh_chars": self.delta_fresh_chars,
+        }
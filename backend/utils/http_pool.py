@@ -0,0 +1,158 @@
+import importlib.util
+import logging
+import time
+
+import httpx
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class _Upstream:
+    __slots__ = ("name", "base_url", "limits", "timeout", "http2", "headers", "client",
+                 "requests", "errors", "statuses", "connects", "tls_handshakes", "http_version")
+
+    def __init__(self, name, base_url, limits, timeout, http2, headers):
+        self.name = name
+        self.base_url = base_url
+        self.limits = limits
+        self.timeout = timeout
+        self.http2 = http2
+        self.headers = headers
+        self.client = None
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.connects = 0
+        self.tls_handshakes = 0
+        self.http_version = None  # negotiated on the last response, e.g. "HTTP/2"
+
+
+class UpstreamPool:
+    """
+    One long-lived httpx.AsyncClient per upstream service, so calls reuse
+    keep-alive connections instead of paying a TCP + TLS handshake each time.
+
+    Each upstream is registered with its own connection limits and separate
+    connect / read / write / pool timeouts, and negotiates HTTP/2 when h2 is
+    installed. Clients are created on first use (or by open() at startup) and
+    closed by aclose() at shutdown.
+
+    Per upstream, stats() reports requests, transport errors, response status
+    classes, new TCP connections and TLS handshakes (reuse is the share of
+    requests that did not need a new connection) and the pool's current
+    connections. request() also records latency as upstream.<name>.ms.
+    """
+
+    def __init__(self, latency=None, http2=True):
+        self.latency = latency
+        self.http2_requested = http2
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._upstreams = {}
+
+    def register(self, name, base_url=None, max_connections=20, max_keepalive_connections=10,
+                 keepalive_expiry=60.0, connect_timeout=5.0, read_timeout=60.0, write_timeout=30.0,
+                 pool_timeout=10.0, http2=True, headers=None):
+        self._upstreams[name] = _Upstream(
+            name,
+            base_url,
+            httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections,
+                         keepalive_expiry=keepalive_expiry),
+            httpx.Timeout(connect=connect_timeout, read=read_timeout, write=write_timeout, pool=pool_timeout),
+            http2 and self.http2,
+            headers or {},
+        )
+
+    def client(self, name):
+        upstream = self._upstreams[name]
+        if upstream.client is None:
+            upstream.client = httpx.AsyncClient(
+                base_url=upstream.base_url or "",
+                limits=upstream.limits,
+                timeout=upstream.timeout,
+                http2=upstream.http2,
+                headers=upstream.headers,
+                event_hooks={"request": [self._on_request(upstream)], "response": [self._on_response(upstream)]},
+            )
+        return upstream.client
+
+    def open(self):
+        """Create every client and log the protocol each will offer"""
+        for name, upstream in self._upstreams.items():
+            self.client(name)
+            logging.info(f"Upstream {name}: {'HTTP/2' if upstream.http2 else 'HTTP/1.1'} "
+                         f"(max {upstream.limits.max_connections} connections)")
+        if self.http2_requested and not HTTP2_AVAILABLE:
+            logging.warning("h2 is not installed: upstream calls use HTTP/1.1 (pip install \"httpx[http2]\")")
+
+    @staticmethod
+    def _on_request(upstream):
+        async def trace(event, info):
+            if event == "connection.connect_tcp.complete":
+                upstream.connects += 1
+            elif event == "connection.start_tls.complete":
+                upstream.tls_handshakes += 1
+
+        async def hook(request):
+            upstream.requests += 1
+            request.extensions["trace"] = trace
+        return hook
+
+    @staticmethod
+    def _on_response(upstream):
+        async def hook(response):
+            status = f"{response.status_code // 100}xx"
+            upstream.statuses[status] = upstream.statuses.get(status, 0) + 1
+            if response.http_version != upstream.http_version:
+                # The server, not our offer, decides: log what was actually negotiated
+                logging.info(f"Upstream {upstream.name} negotiated {response.http_version}")
+                upstream.http_version = response.http_version
+        return hook
+
+    async def request(self, name, method, url, **kwargs):
+        """client(name).request() with transport errors counted and latency recorded"""
+        started = time.perf_counter()
+        try:
+            response = await self.client(name).request(method, url, **kwargs)
+        except httpx.TransportError:
+            self._upstreams[name].errors += 1
+            raise
+        if self.latency is not None:
+            self.latency.observe(f"upstream.{name}.ms", (time.perf_counter() - started) * 1000)
+        return response
+
+    async def aclose(self):
+        for upstream in self._upstreams.values():
+            if upstream.client is not None:
+                await upstream.client.aclose()
+                upstream.client = None
+
+    @staticmethod
+    def _connections(client):
+        """Open / idle / HTTP/2 connections in the client's pool (httpcore internals, best effort)"""
+        try:
+            connections = client._transport._pool.connections
+        except AttributeError:
+            return None
+        return {
+            "open": len(connections),
+            "idle": sum(1 for c in connections if c.is_idle()),
+            "http2": sum(1 for c in connections if "HTTP/2" in c.info()),
+        }
+
+    def stats(self):
+        upstreams = {}
+        for name, upstream in self._upstreams.items():
+            upstreams[name] = {
+                "http2": upstream.http2,
+                "http_version": upstream.http_version,
+                "max_connections": upstream.limits.max_connections,
+                "requests": upstream.requests,
+                "errors": upstream.errors,
+                "statuses": upstream.statuses,
+                "new_connections": upstream.connects,
+                "tls_handshakes": upstream.tls_handshakes,
+                "connection_reuse": round(1 - upstream.connects / upstream.requests, 3) if upstream.requests else None,
+                "pool": self._connections(upstream.client) if upstream.client is not None else None,
+            }
+        return {"http2_available": HTTP2_AVAILABLE, "upstreams": upstreams}
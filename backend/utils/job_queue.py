@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import random
+import socket
+import uuid
+from datetime import datetime, timezone, timedelta
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATUSES = (SUCCEEDED, FAILED)
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures a retry cannot fix (bad input, access denied)"""
+
+
+def backoff_seconds(attempt, base=5.0, cap=300.0):
+    """Exponential backoff with full jitter for the given (1-based) attempt"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+def public_job(doc):
+    """Job document as returned by the API"""
+    return {
+        "job_id": doc["id"],
+        "kind": doc["kind"],
+        "status": doc["status"],
+        "attempts": doc.get("attempts", 0),
+        "max_attempts": doc.get("max_attempts"),
+        "created_at": doc.get("created_at"),
+        "started_at": doc.get("started_at"),
+        "finished_at": doc.get("finished_at"),
+        "result": doc.get("result"),
+        "error": doc.get("error"),
+    }
+
+
+class JobQueue:
+    """
+    Durable background jobs in a Mongo collection.
+
+    Workers claim queued jobs with an atomic find_one_and_update that sets a
+    lease; the lease is renewed while the handler runs. A job whose lease
+    expires (worker crashed or was restarted) is claimed again by any worker.
+    Failures are retried with exponential backoff up to max_attempts, except
+    PermanentJobError. Finished jobs are removed by a TTL index after
+    result_ttl_seconds.
+    """
+
+    def __init__(self, db, collection="jobs", workers=2, lease_seconds=300, max_attempts=3,
+                 backoff_base=5.0, backoff_max=300.0, poll_interval=1.0, result_ttl_seconds=86400):
+        self.db = db
+        self.collection = collection
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.result_ttl_seconds = result_ttl_seconds
+        self.worker_id = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+        self._handlers = {}
+        self._finalizers = {}
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._watchers = {}
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.running = 0
+
+    @property
+    def coll(self):
+        return self.db[self.collection]
+
+    def register(self, kind, handler, on_finish=None):
+        """
+        handler(job) -> JSON-serialisable result (async); job carries payload, user_id, tenant.
+        on_finish(job) runs once the job reaches a terminal status (e.g. to
+        delete stored audio).
+        """
+        self._handlers[kind] = handler
+        if on_finish is not None:
+            self._finalizers[kind] = on_finish
+
+    async def enqueue(self, kind, payload, user_id=None, tenant=None, max_attempts=None):
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.now(timezone.utc)
+        doc = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "status": QUEUED,
+            "payload": payload,
+            "user_id": user_id,
+            "tenant": tenant,
+            "attempts": 0,
+            "max_attempts": max_attempts or self.max_attempts,
+            "run_at": now,
+            "created_at": now,
+            "result": None,
+            "error": None,
+        }
+        await self.coll.insert_one(doc)
+        doc.pop("_id", None)
+        self._wakeup.set()
+        return doc
+
+    async def get(self, job_id):
+        return await self.coll.find_one({"id": job_id}, {"_id": 0})
+
+    async def claim(self):
+        """Lease the next runnable job (queued and due, or running with an expired lease)"""
+        now = datetime.now(timezone.utc)
+        return await self.coll.find_one_and_update(
+            {
+                "kind": {"$in": list(self._handlers)},
+                "$or": [
+                    {"status": QUEUED, "run_at": {"$lte": now}},
+                    {"status": RUNNING, "lease_expires_at": {"$lt": now},
+                     "$expr": {"$lt": ["$attempts", "$max_attempts"]}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker_id": self.worker_id,
+                    "started_at": now,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            projection={"_id": 0},
+            return_document=True,
+        )
+
+    async def reap(self):
+        """Fail jobs whose lease expired on their last attempt (the worker died running them)"""
+        now = datetime.now(timezone.utc)
+        stale = await self.coll.find(
+            {"status": RUNNING, "lease_expires_at": {"$lt": now},
+             "$expr": {"$gte": ["$attempts", "$max_attempts"]}},
+            {"_id": 0},
+        ).to_list(100)
+        for job in stale:
+            result = await self.coll.update_one(
+                {"id": job["id"], "status": RUNNING, "lease_expires_at": job["lease_expires_at"]},
+                {"$set": {"worker_id": self.worker_id}},
+            )
+            if result.modified_count:
+                self.failed += 1
+                await self._finish(job, {"status": FAILED, "error": "Worker lost while running the job"})
+        return len(stale)
+
+    async def _renew_lease(self, job_id):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self.coll.update_one(
+                {"id": job_id, "worker_id": self.worker_id, "status": RUNNING},
+                {"$set": {"lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)}},
+            )
+
+    async def _finish(self, job, fields):
+        fields["finished_at"] = datetime.now(timezone.utc)
+        fields["expires_at"] = fields["finished_at"] + timedelta(seconds=self.result_ttl_seconds)
+        await self.coll.update_one({"id": job["id"], "worker_id": self.worker_id}, {"$set": fields})
+        finalizer = self._finalizers.get(job["kind"])
+        if finalizer is not None:
+            try:
+                await finalizer({**job, **fields})
+            except Exception as e:
+                logging.error(f"Job {job['id']} finalizer failed: {e}")
+        self._notify(job["id"])
+
+    async def run_job(self, job):
+        handler = self._handlers[job["kind"]]
+        lease = asyncio.create_task(self._renew_lease(job["id"]))
+        self.running += 1
+        try:
+            result = await handler(job)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job straight back instead of waiting for the lease
+            await asyncio.shield(self.coll.update_one(
+                {"id": job["id"], "worker_id": self.worker_id},
+                {"$set": {"status": QUEUED, "run_at": datetime.now(timezone.utc)}, "$inc": {"attempts": -1}},
+            ))
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if isinstance(e, PermanentJobError) or job["attempts"] >= job["max_attempts"]:
+                self.failed += 1
+                logging.error(f"Job {job['id']} ({job['kind']}) failed: {error}")
+                await self._finish(job, {"status": FAILED, "error": error})
+            else:
+                self.retried += 1
+                delay = backoff_seconds(job["attempts"], self.backoff_base, self.backoff_max)
+                logging.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed, retrying in {delay:.0f}s: {error}")
+                await self.coll.update_one(
+                    {"id": job["id"], "worker_id": self.worker_id},
+                    {"$set": {"status": QUEUED, "error": error,
+                              "run_at": datetime.now(timezone.utc) + timedelta(seconds=delay)}},
+                )
+        else:
+            self.completed += 1
+            await self._finish(job, {"status": SUCCEEDED, "result": result, "error": None})
+        finally:
+            self.running -= 1
+            lease.cancel()
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.claim()
+            except Exception as e:
+                logging.error(f"Job claim failed: {e}")
+                job = None
+            if job is None:
+                try:
+                    await self.reap()
+                except Exception as e:
+                    logging.error(f"Job reaping failed: {e}")
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(job)
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _notify(self, job_id):
+        for event in self._watchers.pop(job_id, []):
+            event.set()
+
+    async def watch(self, job_id):
+        """
+        Yield the job document on every status change until it is finished.
+        Jobs finished by this process wake watchers immediately; jobs run by
+        other workers are picked up by polling.
+        """
+        last_status = None
+        while True:
+            doc = await self.get(job_id)
+            if doc is None:
+                return
+            if doc["status"] != last_status:
+                last_status = doc["status"]
+                yield doc
+            if doc["status"] in TERMINAL_STATUSES:
+                return
+            event = asyncio.Event()
+            self._watchers.setdefault(job_id, []).append(event)
+            try:
+                await asyncio.wait_for(event.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                watchers = self._watchers.get(job_id)
+                if watchers and event in watchers:
+                    watchers.remove(event)
+                    if not watchers:
+                        del self._watchers[job_id]
+
+    async def ensure_indexes(self):
+        await self.coll.create_index("id", unique=True)
+        await self.coll.create_index([("status", 1), ("run_at", 1)])
+        await self.coll.create_index([("user_id", 1), ("created_at", -1)])
+        await self.coll.create_index("expires_at", expireAfterSeconds=0)
+
+    def stats(self):
+        return {
+            "worker_id": self.worker_id,
+            "workers": len(self._tasks),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "watchers": sum(len(w) for w in self._watchers.values()),
+        }
@@ -0,0 +1,216 @@
+import json
+
+# Incremental parsing of JSON produced by an LLM. Completed fields are reported
+# while the completion is still streaming (progressive form fill), and the usual
+# damage is repaired instead of failing the request:
+#   - prose or ``` fences before the object and any text after it
+#   - a truncated completion (open strings / objects / arrays are closed; the
+#     incomplete trailing member is dropped rather than guessed)
+#   - trailing commas, Python literals (True / False / None)
+
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_SCALAR_END = set(",}] \t\r\n:")
+
+
+def _scalar(text):
+    if text in _LITERALS:
+        return _LITERALS[text]
+    try:
+        value = json.loads(text)
+    except ValueError:
+        raise ValueError(f"Invalid JSON value: {text!r}")
+    if isinstance(value, (int, float)):
+        return value
+    raise ValueError(f"Invalid JSON value: {text!r}")
+
+
+class _Frame:
+    __slots__ = ("container", "path", "key")
+
+    def __init__(self, container, path):
+        self.container = container
+        self.path = path
+        self.key = None
+
+
+class IncrementalJSONParser:
+    """
+    Feed completion text in chunks; feed() returns the fields completed by
+    that chunk as (dotted path, value) pairs. Scalars are reported when they
+    end, arrays once closed (as a whole); objects are reported through their
+    members. finish() returns (document, repaired).
+    """
+
+    def __init__(self):
+        self.result = None
+        self.done = False
+        self.repaired = False
+        self._stack = []
+        self._string = None  # raw characters of the string being read
+        self._escape = False
+        self._string_is_key = False
+        self._scalar = None  # characters of the number / literal being read
+        self._events = []
+
+    def feed(self, text):
+        self._events = []
+        for char in text:
+            if self.done:
+                if not char.isspace() and char != "`":
+                    self.repaired = True
+                continue
+            self._char(char)
+        return self._events
+
+    def _char(self, char):
+        if self._string is not None:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._end_string()
+                return
+            self._string.append(char)
+            return
+
+        if self._scalar is not None:
+            if char not in _SCALAR_END:
+                self._scalar.append(char)
+                return
+            self._end_scalar()
+
+        if not self._stack:
+            # Skip anything before the document starts (prose, code fences)
+            if char in "{[":
+                self._open({} if char == "{" else [], ())
+            return
+
+        if char in " \t\r\n,:":
+            return
+        if char == '"':
+            frame = self._stack[-1]
+            self._string = []
+            self._string_is_key = isinstance(frame.container, dict) and frame.key is None
+        elif char in "{[":
+            frame = self._stack[-1]
+            container = {} if char == "{" else []
+            path = self._attach(frame, container)
+            if path is not None:
+                self._open(container, path)
+            else:
+                # Value without a key: parse it to stay in sync, then drop it
+                self._open(container, None)
+        elif char in "}]":
+            self._close()
+        else:
+            self._scalar = [char]
+
+    def _open(self, container, path):
+        if not self._stack:
+            self.result = container
+        self._stack.append(_Frame(container, path))
+
+    def _attach(self, frame, value):
+        """Add a value to the enclosing container; returns its path (None if dropped)"""
+        if frame.path is None:
+            return None
+        if isinstance(frame.container, dict):
+            if frame.key is None:
+                self.repaired = True
+                return None
+            key, frame.key = frame.key, None
+            frame.container[key] = value
+            return frame.path + (key,)
+        frame.container.append(value)
+        return frame.path + (len(frame.container) - 1,)
+
+    def _emit(self, path, value, in_array):
+        if path and not in_array:
+            self._events.append((".".join(str(part) for part in path), value))
+
+    def _value(self, value):
+        frame = self._stack[-1]
+        path = self._attach(frame, value)
+        if path is not None:
+            self._emit(path, value, isinstance(frame.container, list))
+
+    def _end_string(self):
+        raw = "".join(self._string)
+        self._string = None
+        try:
+            value = json.loads(f'"{raw}"')
+        except ValueError:
+            self.repaired = True
+            value = raw
+        if self._string_is_key:
+            self._stack[-1].key = value
+        else:
+            self._value(value)
+
+    def _end_scalar(self):
+        text = "".join(self._scalar)
+        self._scalar = None
+        try:
+            value = _scalar(text)
+        except ValueError:
+            self.repaired = True
+            frame = self._stack[-1]
+            if isinstance(frame.container, dict):
+                frame.key = None
+            return
+        if text in ("True", "False", "None"):
+            self.repaired = True
+        self._value(value)
+
+    def _close(self):
+        frame = self._stack.pop()
+        if isinstance(frame.container, dict) and frame.key is not None:
+            # Key without a value ("a": })
+            self.repaired = True
+        if not self._stack:
+            self.done = True
+            return
+        parent = self._stack[-1]
+        if isinstance(frame.container, list) and frame.path is not None:
+            self._emit(frame.path, frame.container, isinstance(parent.container, list))
+
+    def finish(self):
+        """
+        Close whatever is still open. A value cut off mid-way (string, number)
+        is dropped, never completed. Returns (document, repaired); raises
+        ValueError when no JSON object or array was found.
+        """
+        if self.result is None:
+            raise ValueError("No JSON object in completion")
+        if not self.done:
+            self.repaired = True
+            self._string = None
+            self._scalar = None
+            self._stack.clear()
+            self.done = True
+        return self.result, self.repaired
+
+
+def iter_fields(data, path=()):
+    """(dotted path, value) for every field of a document, as IncrementalJSONParser reports them"""
+    for key, value in data.items():
+        field_path = path + (key,)
+        if isinstance(value, dict):
+            yield from iter_fields(value, field_path)
+        else:
+            yield ".".join(str(part) for part in field_path), value
+
+
+def parse_llm_json(text):
+    """
+    JSON object from a completion: json.loads when it is clean, otherwise the
+    repairing parser. Returns (document, repaired).
+    """
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.finish()
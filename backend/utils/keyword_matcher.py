@@ -0,0 +1,84 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over groups of keywords.
+
+    Built once from {group: [keywords]}; a single pass over the text reports
+    every group with at least one keyword occurring as a substring, i.e. the
+    same result as `any(kw in text for kw in keywords)` per group.
+    Matching is case-insensitive (text is lowercased, keywords are stored lowercased).
+    """
+
+    def __init__(self, groups):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self.groups = list(groups)
+
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                self._add(keyword.lower(), group)
+        self._build_failure_links()
+
+    def _add(self, keyword, group):
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        if group not in self._out[node]:
+            self._out[node] = self._out[node] + (group,)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # Inherit matches of the longest proper suffix
+                inherited = tuple(g for g in self._out[self._fail[child]] if g not in self._out[child])
+                if inherited:
+                    self._out[child] = self._out[child] + inherited
+
+    def scan(self, text):
+        """
+        Single pass over `text`.
+        Returns {group: end offset of its first keyword hit}.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        first_hit = {}
+        node = 0
+        for i, ch in enumerate(text.lower()):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for group in out[node]:
+                    if group not in first_hit:
+                        first_hit[group] = i + 1
+        return first_hit
+
+    def match(self, text):
+        """Set of groups with at least one keyword in `text`"""
+        return set(self.scan(text)) if text else set()
+
+    def match_batch(self, texts):
+        """Match many texts (e.g. historical cases for an audit re-score)"""
+        return [self.match(text) for text in texts]
+
+    @property
+    def size(self):
+        """Number of automaton states"""
+        return len(self._goto)
@@ -0,0 +1,113 @@
+import math
+import time
+from collections import deque
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (q in 0..100)"""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class LatencyTracker:
+    """
+    Rolling latency samples per metric name (last `window` observations).
+    Cheap enough to call on every request; summaries are computed on read.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+
+    def observe(self, name, value_ms):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = deque(maxlen=self.window)
+            self._samples[name] = samples
+        samples.append(value_ms)
+        self._counts[name] = self._counts.get(name, 0) + 1
+
+    def timer(self, name):
+        """Context manager recording elapsed wall time in ms"""
+        return _Timer(self, name)
+
+    def summary(self, name):
+        samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return {"count": self._counts.get(name, 0), "window": 0}
+        return {
+            "count": self._counts.get(name, 0),
+            "window": len(samples),
+            "mean_ms": round(sum(samples) / len(samples), 1),
+            "p50_ms": round(percentile(samples, 50), 1),
+            "p95_ms": round(percentile(samples, 95), 1),
+            "p99_ms": round(percentile(samples, 99), 1),
+            "max_ms": round(samples[-1], 1),
+        }
+
+    def snapshot(self, prefix=None):
+        return {
+            name: self.summary(name)
+            for name in sorted(self._samples)
+            if prefix is None or name.startswith(prefix)
+        }
+
+
+class _Timer:
+    def __init__(self, tracker, name):
+        self.tracker = tracker
+        self.name = name
+        self.elapsed_ms = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed_ms = (time.perf_counter() - self._start) * 1000
+        if exc_type is None:
+            self.tracker.observe(self.name, self.elapsed_ms)
+        return False
+
+
+class RollingHealth:
+    """
+    Outcomes of recent calls to one upstream (a model, an STT engine): the last
+    `max_samples` calls, of which those younger than `window_seconds` count.
+    A call may carry its size in `units` (e.g. seconds of audio), so latency
+    can also be read per unit when call sizes vary widely.
+    """
+
+    __slots__ = ("window_seconds", "samples")
+
+    def __init__(self, window_seconds, max_samples):
+        self.window_seconds = window_seconds
+        # (monotonic time, latency ms, ok, units or None)
+        self.samples = deque(maxlen=max_samples)
+
+    def record(self, elapsed_ms, ok=True, units=None):
+        self.samples.append((time.monotonic(), elapsed_ms, ok, units))
+
+    def _recent(self):
+        cutoff = time.monotonic() - self.window_seconds
+        return [s for s in self.samples if s[0] >= cutoff]
+
+    def summary(self):
+        """Rolling p50/p95 latency (successful calls) and error rate over the window"""
+        recent = self._recent()
+        latencies = sorted(ms for _, ms, ok, _ in recent if ok)
+        errors = sum(1 for _, _, ok, _ in recent if not ok)
+        return {
+            "samples": len(recent),
+            "p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95), 1) if latencies else None,
+            "error_rate": round(errors / len(recent), 3) if recent else None,
+        }
+
+    def per_unit(self, q=95):
+        """(sized successful calls, q-th percentile of ms per unit or None)"""
+        rates = sorted(ms / units for _, ms, ok, units in self._recent() if ok and units)
+        return len(rates), (round(percentile(rates, q), 1) if rates else None)
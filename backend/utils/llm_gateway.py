@@ -0,0 +1,216 @@
+import asyncio
+import contextlib
+import time
+
+import httpx
+import openai
+
+
+def parse_model_limits(spec):
+    """'gpt-5.1=4,gpt-4o-mini=16' -> {'gpt-5.1': 4, 'gpt-4o-mini': 16}"""
+    limits = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        model, _, limit = item.partition("=")
+        try:
+            limits[model.strip()] = max(1, int(limit))
+        except ValueError:
+            continue
+    return limits
+
+
+class _ModelSlot:
+    __slots__ = ("semaphore", "limit", "in_flight", "waiting", "calls", "errors", "started")
+
+    def __init__(self, limit):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.errors = 0
+        self.started = {}  # upstream calls started, by scheduler priority class
+
+
+class LLMGateway:
+    """
+    Shared entry point for outbound LLM calls (OpenAI-compatible API).
+
+    One AsyncOpenAI client on a pooled keep-alive httpx client is reused for
+    every call, and a per-model semaphore caps concurrent upstream requests.
+    With a scheduler (utils.llm_scheduler), calls first wait for a slot in
+    their priority class / tenant queue; the scheduler should be given the
+    same per-model limits, so it only hands out a slot when the model has
+    one free and the semaphore here never queues a call that already holds
+    a scheduler slot.
+    Queue wait and call latency are recorded in a LatencyTracker as
+    llm.<model>.queue_wait_ms / llm.<model>.call_ms (and .ttft_ms for streams).
+    on_result(model, elapsed_ms, ok) is called after every upstream call
+    (e.g. to feed a ModelRouter's health window).
+    http_client, if given, is used instead of a client of its own (e.g. one
+    from a utils.http_pool.UpstreamPool); its owner closes it.
+    """
+
+    def __init__(self, api_key, base_url, latency=None, default_limit=8, model_limits=None,
+                 max_connections=50, timeout=120.0, scheduler=None, on_result=None, http_client=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.latency = latency
+        self.default_limit = default_limit
+        self.model_limits = model_limits or {}
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.scheduler = scheduler
+        self.on_result = on_result
+        self.http_client = http_client
+        self._client = None
+        self._http = None
+        self._slots = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            if self.http_client is not None:
+                http = self.http_client
+            else:
+                http = self._http = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                    timeout=httpx.Timeout(self.timeout, connect=10.0),
+                )
+            self._client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http)
+        return self._client
+
+    def _slot(self, model):
+        slot = self._slots.get(model)
+        if slot is None:
+            slot = _ModelSlot(self.model_limits.get(model, self.default_limit))
+            self._slots[model] = slot
+        return slot
+
+    def limit(self, model):
+        """Concurrent calls allowed for a model"""
+        return self.model_limits.get(model, self.default_limit)
+
+    def _observe(self, model, metric, value_ms):
+        if self.latency is not None:
+            self.latency.observe(f"llm.{model}.{metric}", value_ms)
+
+    def _report(self, model, started, ok):
+        if self.on_result is not None:
+            self.on_result(model, (time.perf_counter() - started) * 1000, ok)
+
+    def _admit(self, priority_class, tenant, model):
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(priority_class, tenant, model)
+
+    async def _acquire(self, model, priority_class):
+        slot = self._slot(model)
+        slot.waiting += 1
+        started = time.perf_counter()
+        try:
+            await slot.semaphore.acquire()
+        finally:
+            slot.waiting -= 1
+        self._observe(model, "queue_wait_ms", (time.perf_counter() - started) * 1000)
+        slot.in_flight += 1
+        slot.started[priority_class] = slot.started.get(priority_class, 0) + 1
+        return slot
+
+    @staticmethod
+    def _release(slot):
+        slot.in_flight -= 1
+        slot.semaphore.release()
+
+    @staticmethod
+    def _messages(prompt, system_message, history=None):
+        messages = [{"role": "system", "content": system_message}] if system_message else []
+        messages.extend(history or ())
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    @staticmethod
+    def _options(temperature, max_tokens):
+        options = {}
+        if temperature is not None:
+            options["temperature"] = temperature
+        if max_tokens is not None:
+            options["max_tokens"] = max_tokens
+        return options
+
+    async def complete(self, prompt, system_message=None, model="gpt-4o-mini", temperature=None, max_tokens=None,
+                       priority_class="routine", tenant=None, history=None):
+        """Single chat completion (after the `history` turns, if any); returns the message text"""
+        async with self._admit(priority_class, tenant, model):
+            slot = await self._acquire(model, priority_class)
+            started = time.perf_counter()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=self._messages(prompt, system_message, history),
+                    **self._options(temperature, max_tokens),
+                )
+                slot.calls += 1
+            except Exception:
+                slot.errors += 1
+                self._report(model, started, False)
+                raise
+            finally:
+                self._release(slot)
+        self._observe(model, "call_ms", (time.perf_counter() - started) * 1000)
+        self._report(model, started, True)
+        return response.choices[0].message.content or ""
+
+    async def stream(self, prompt, system_message=None, model="gpt-4o-mini", temperature=None, max_tokens=None,
+                     priority_class="routine", tenant=None, history=None):
+        """Yield text deltas of a chat completion; slots are held until the stream ends"""
+        async with self._admit(priority_class, tenant, model):
+            slot = await self._acquire(model, priority_class)
+            started = time.perf_counter()
+            first = True
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=model,
+                    messages=self._messages(prompt, system_message, history),
+                    stream=True,
+                    **self._options(temperature, max_tokens),
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                        if first:
+                            self._observe(model, "ttft_ms", (time.perf_counter() - started) * 1000)
+                            first = False
+                        yield chunk.choices[0].delta.content
+                slot.calls += 1
+            except Exception:
+                slot.errors += 1
+                self._report(model, started, False)
+                raise
+            finally:
+                self._release(slot)
+        self._observe(model, "call_ms", (time.perf_counter() - started) * 1000)
+        self._report(model, started, True)
+
+    def stats(self):
+        return {
+            "default_limit": self.default_limit,
+            "max_connections": self.max_connections,
+            "models": {
+                model: {
+                    "limit": slot.limit,
+                    "in_flight": slot.in_flight,
+                    "waiting": slot.waiting,
+                    "calls": slot.calls,
+                    "errors": slot.errors,
+                    "started": dict(slot.started),
+                }
+                for model, slot in self._slots.items()
+            },
+        }
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+        self._client = None
+        self._http = None
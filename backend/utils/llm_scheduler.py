@@ -0,0 +1,243 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+# Priority classes, highest first
+PRIORITY_CLASSES = ("critical", "urgent", "routine", "background")
+
+# Decision support the clinician is waiting on vs. documentation drafts
+INTERACTIVE_PROMPT_TYPES = {
+    "red_flags", "diagnosis_suggestions", "differential_diagnosis", "vbg_interpretation",
+    "parse_transcript", "extract_triage_data", "extract_casesheet_data", "extract_case_data",
+    "refine_transcript",
+}
+
+
+def classify_llm_request(triage_priority=None, prompt_type=None, speculative=False):
+    """
+    Priority class for an LLM call from the case's triage level (1 = RED .. 5 = BLUE)
+    and the prompt type.
+
+    - speculative / prefetch work               -> background
+    - interactive, RED/ORANGE case              -> critical
+    - interactive, other or unknown priority    -> urgent
+    - documentation (e.g. discharge summary)    -> routine, background for GREEN/BLUE
+    """
+    if speculative:
+        return "background"
+    try:
+        level = int(triage_priority) if triage_priority is not None else None
+    except (TypeError, ValueError):
+        level = None
+
+    if prompt_type in INTERACTIVE_PROMPT_TYPES:
+        return "critical" if level is not None and level <= 2 else "urgent"
+    if level is not None and level >= 4:
+        return "background"
+    return "routine"
+
+
+class _Waiter:
+    __slots__ = ("future", "tenant", "model", "enqueued")
+
+    def __init__(self, future, tenant, model):
+        self.future = future
+        self.tenant = tenant
+        self.model = model
+        self.enqueued = time.perf_counter()
+
+
+class _ClassQueue:
+    """Self-clocked weighted fair queue across tenants for one priority class"""
+
+    __slots__ = ("heap", "virtual_time", "last_finish", "in_flight", "limit", "dispatched", "queued")
+
+    def __init__(self, limit):
+        self.heap = []
+        self.virtual_time = 0.0
+        self.last_finish = {}
+        self.in_flight = 0
+        self.limit = limit
+        self.dispatched = 0
+        self.queued = 0
+
+    def push(self, waiter, weight, seq):
+        start = max(self.virtual_time, self.last_finish.get(waiter.tenant, 0.0))
+        finish = start + 1.0 / weight
+        self.last_finish[waiter.tenant] = finish
+        heapq.heappush(self.heap, (finish, seq, waiter))
+        self.queued += 1
+
+    def pop(self, runnable):
+        """
+        Next live waiter in fair order whose model has a free slot
+        (runnable(model)), or None. Waiters passed over keep their place.
+        """
+        blocked = []
+        found = None
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            waiter = entry[2]
+            if waiter.future.done():  # cancelled while queued, already uncounted by discard()
+                continue
+            if not runnable(waiter.model):
+                blocked.append(entry)
+                continue
+            self.queued -= 1
+            self.virtual_time = entry[0]
+            found = waiter
+            break
+        for entry in blocked:
+            heapq.heappush(self.heap, entry)
+        if found is not None and not self.heap:
+            # Idle class: forget history so returning tenants start level
+            self.last_finish.clear()
+        return found
+
+    def discard(self):
+        """A queued waiter was cancelled: stop counting it (pop() skips its heap entry)"""
+        self.queued -= 1
+        if not self.queued:
+            # Only cancelled entries are left
+            self.heap.clear()
+            self.last_finish.clear()
+
+    def has_capacity(self):
+        return self.limit is None or self.in_flight < self.limit
+
+
+class LLMScheduler:
+    """
+    Admission control in front of outbound LLM calls.
+
+    A global budget bounds concurrent calls. Free slots go to the highest
+    non-empty priority class (strict priority, optional per-class caps so e.g.
+    background work can never take every slot); within a class, tenants
+    (hospital_id) share slots by weighted fair queuing. Queue wait per class
+    is recorded as llm_sched.<class>.queue_wait_ms.
+
+    Per-model caps (model_limits, default_model_limit; None = uncapped) are
+    part of the dispatch decision: a waiter is only dispatched when its model
+    has a free slot, so a slot granted to a critical call is never spent
+    queueing behind routine calls for a busy model, and a full model does not
+    hold slots that calls for other models could use.
+    """
+
+    def __init__(self, max_concurrency=8, class_limits=None, tenant_weights=None, latency=None,
+                 model_limits=None, default_model_limit=None):
+        self.max_concurrency = max_concurrency
+        self.tenant_weights = tenant_weights or {}
+        self.latency = latency
+        self.model_limits = model_limits or {}
+        self.default_model_limit = default_model_limit
+        class_limits = class_limits or {}
+        self._classes = {name: _ClassQueue(class_limits.get(name)) for name in PRIORITY_CLASSES}
+        self._in_flight = 0
+        self._model_in_flight = {}
+        self._seq = itertools.count()
+
+    def slot(self, priority_class="routine", tenant="default", model=None):
+        """Async context manager holding one scheduler slot (and one of `model`'s slots)"""
+        return _Slot(self, priority_class if priority_class in self._classes else "routine", tenant or "default", model)
+
+    async def run(self, fn, priority_class="routine", tenant="default", model=None):
+        async with self.slot(priority_class, tenant, model):
+            return await fn()
+
+    def _model_free(self, model):
+        if model is None:
+            return True
+        limit = self.model_limits.get(model, self.default_model_limit)
+        return limit is None or self._model_in_flight.get(model, 0) < limit
+
+    async def _acquire(self, priority_class, tenant, model):
+        queue = self._classes[priority_class]
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tenant, model)
+        queue.push(waiter, self.tenant_weights.get(tenant, 1.0), next(self._seq))
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                # Still queued: waiting() must not count it any more
+                queue.discard()
+            else:
+                # Slot was granted just as we were cancelled: hand it on
+                self._release(priority_class, model)
+            raise
+        self._observe(priority_class, (time.perf_counter() - waiter.enqueued) * 1000)
+
+    def _start(self, queue, model):
+        self._in_flight += 1
+        queue.in_flight += 1
+        queue.dispatched += 1
+        if model is not None:
+            self._model_in_flight[model] = self._model_in_flight.get(model, 0) + 1
+
+    def _release(self, priority_class, model):
+        self._in_flight -= 1
+        self._classes[priority_class].in_flight -= 1
+        if model is not None:
+            self._model_in_flight[model] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._in_flight < self.max_concurrency:
+            for name in PRIORITY_CLASSES:
+                queue = self._classes[name]
+                if queue.queued and queue.has_capacity():
+                    # Waiters for a full model stay queued; a lower class may use the slot
+                    waiter = queue.pop(self._model_free)
+                    if waiter is not None:
+                        self._start(queue, waiter.model)
+                        waiter.future.set_result(None)
+                        break
+            else:
+                return
+
+    def waiting(self, classes=None):
+        """Requests queued for a slot, optionally only in the given classes"""
+        return sum(queue.queued for name, queue in self._classes.items() if classes is None or name in classes)
+
+    def _observe(self, priority_class, wait_ms):
+        if self.latency is not None:
+            self.latency.observe(f"llm_sched.{priority_class}.queue_wait_ms", wait_ms)
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "models": {
+                model: {"in_flight": in_flight, "limit": self.model_limits.get(model, self.default_model_limit)}
+                for model, in_flight in self._model_in_flight.items()
+            },
+            "classes": {
+                name: {
+                    "queued": queue.queued,
+                    "in_flight": queue.in_flight,
+                    "dispatched": queue.dispatched,
+                    "limit": queue.limit,
+                    "queue_wait": self.latency.summary(f"llm_sched.{name}.queue_wait_ms") if self.latency else None,
+                }
+                for name, queue in self._classes.items()
+            },
+        }
+
+
+class _Slot:
+    __slots__ = ("scheduler", "priority_class", "tenant", "model")
+
+    def __init__(self, scheduler, priority_class, tenant, model):
+        self.scheduler = scheduler
+        self.priority_class = priority_class
+        self.tenant = tenant
+        self.model = model
+
+    async def __aenter__(self):
+        await self.scheduler._acquire(self.priority_class, self.tenant, self.model)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler._release(self.priority_class, self.model)
+        return False
@@ -0,0 +1,121 @@
+from utils.latency import RollingHealth
+
+# Interactive classes get the tighter latency budget
+URGENT_CLASSES = ("critical", "urgent")
+
+
+def merge_policy(base, override):
+    """Per-task policy with `override` ({task: {key: value}}) applied on top of `base`"""
+    policy = {task: dict(rules) for task, rules in base.items()}
+    for task, rules in (override or {}).items():
+        policy.setdefault(task, {}).update(rules)
+    return policy
+
+
+class ModelRouter:
+    """
+    Picks the model for an LLM task from a declarative policy and the live
+    health of each model.
+
+    Policy per task:
+        models                    quality ladder, best first
+        latency_budget_ms         p95 SLO for routine / background calls
+        urgent_latency_budget_ms  p95 SLO for critical / urgent calls
+        max_error_rate            error-rate SLO
+        plans                     {subscription tier: best model that plan may use}
+
+    The first model on the ladder (from the plan's cap down) that meets the
+    SLO wins; a model with fewer than `min_samples` recent calls counts as
+    healthy. Samples older than `window_seconds` are dropped, so a model that
+    was downshifted away from is retried once its bad samples age out.
+    """
+
+    def __init__(self, policy, window_seconds=300, max_samples=500, min_samples=20):
+        self.policy = policy
+        self.window_seconds = window_seconds
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self._health = {}
+        self.decisions = {}
+
+    def record(self, model, elapsed_ms, ok=True):
+        """Outcome of one upstream call (LLMGateway on_result hook)"""
+        health = self._health.get(model)
+        if health is None:
+            health = RollingHealth(self.window_seconds, self.max_samples)
+            self._health[model] = health
+        health.record(elapsed_ms, ok)
+
+    def health(self, model):
+        """Rolling p50/p95 latency (successful calls) and error rate over the window"""
+        health = self._health.get(model)
+        if health is None:
+            return {"samples": 0, "p50_ms": None, "p95_ms": None, "error_rate": None}
+        return health.summary()
+
+    def _breach(self, health, budget_ms, max_error_rate):
+        if health["samples"] < self.min_samples:
+            return None
+        if max_error_rate is not None and health["error_rate"] > max_error_rate:
+            return "error_rate"
+        if budget_ms is not None and health["p95_ms"] is not None and health["p95_ms"] > budget_ms:
+            return "p95_latency"
+        return None
+
+    def route(self, task, priority_class="routine", plan=None):
+        """
+        Decision for one call: {"task", "model", "preferred", "reason", ...}.
+        reason is "preferred", "plan" (capped by subscription tier),
+        "slo_<breach>" when the router downshifted, or "all_degraded".
+        """
+        rules = self.policy[task]
+        ladder = list(rules["models"])
+        preferred = ladder[0]
+        cap = (rules.get("plans") or {}).get(plan)
+        if cap in ladder:
+            ladder = ladder[ladder.index(cap):]
+
+        urgent = priority_class in URGENT_CLASSES
+        budget_ms = rules.get("urgent_latency_budget_ms") if urgent else None
+        budget_ms = budget_ms or rules.get("latency_budget_ms")
+        max_error_rate = rules.get("max_error_rate")
+
+        breaches = []
+        chosen = None
+        for model in ladder:
+            health = self.health(model)
+            breach = self._breach(health, budget_ms, max_error_rate)
+            if breach is None:
+                chosen = model
+                break
+            breaches.append((model, breach, health))
+
+        if chosen is None:
+            # Every model is out of SLO: take the one with the best p95
+            chosen = min(breaches, key=lambda b: b[2]["p95_ms"] or float("inf"))[0]
+            reason = "all_degraded"
+        elif breaches:
+            reason = f"slo_{breaches[0][1]}"
+        elif chosen != preferred:
+            reason = "plan"
+        else:
+            reason = "preferred"
+
+        counts = self.decisions.setdefault(task, {})
+        counts[f"{chosen}:{reason}"] = counts.get(f"{chosen}:{reason}", 0) + 1
+        return {
+            "task": task,
+            "model": chosen,
+            "preferred": preferred,
+            "reason": reason,
+            "priority_class": priority_class,
+            "latency_budget_ms": budget_ms,
+        }
+
+    def stats(self):
+        return {
+            "window_seconds": self.window_seconds,
+            "min_samples": self.min_samples,
+            "models": {model: self.health(model) for model in self._health},
+            "decisions": self.decisions,
+        }
@@ -0,0 +1,362 @@
+import asyncio
+import contextlib
+import logging
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from utils.time_utils import utc_to_ist
+
+# Rollup collections (one document per hospital per bucket)
+HOURLY_COLLECTION = "analytics_hourly"
+DAILY_COLLECTION = "analytics_daily"
+# A backfill builds each collection here and renames it over the live one
+STAGING_SUFFIX = "_staging"
+
+# Upper bounds (minutes) of the triage -> case creation histogram bins
+TRIAGE_TO_CASE_BINS = [5, 10, 15, 30, 45, 60, 90, 120, 180, 240, 360]
+OVERFLOW_BIN = "gt_360"
+
+
+def bucket_keys(at):
+    """Hourly and daily bucket keys for a timestamp (hospital-local IST)"""
+    local = utc_to_ist(at)
+    return local.strftime("%Y-%m-%dT%H"), local.strftime("%Y-%m-%d")
+
+
+def minutes_bin(minutes):
+    """Histogram bin label for a triage -> case delay"""
+    for upper in TRIAGE_TO_CASE_BINS:
+        if minutes <= upper:
+            return f"le_{upper}"
+    return OVERFLOW_BIN
+
+
+def median_from_histogram(hist):
+    """
+    Approximate median from the binned histogram, interpolating linearly
+    inside the bin that contains the middle observation.
+    """
+    total = sum(hist.values()) if hist else 0
+    if total <= 0:
+        return None
+
+    half = total / 2
+    seen = 0
+    lower = 0
+    for upper in TRIAGE_TO_CASE_BINS:
+        count = hist.get(f"le_{upper}", 0)
+        if count and seen + count >= half:
+            return round(lower + (upper - lower) * (half - seen) / count, 1)
+        seen += count
+        lower = upper
+    return float(TRIAGE_TO_CASE_BINS[-1])
+
+
+def empty_rollup():
+    return {
+        "arrivals": {},
+        "arrivals_total": 0,
+        "cases_created": 0,
+        "triage_to_case_hist": {},
+        "triage_to_case_count": 0,
+        "triage_to_case_minutes_sum": 0.0,
+        "dispositions": {},
+        "ai_calls": {},
+        "ai_calls_total": 0,
+        "exports": {},
+        "exports_total": 0,
+    }
+
+
+def merge_rollup(target, source):
+    """Add the counters of one rollup document into another"""
+    for key, value in source.items():
+        if isinstance(value, dict):
+            bucket = target.setdefault(key, {})
+            for sub_key, sub_value in value.items():
+                bucket[sub_key] = bucket.get(sub_key, 0) + sub_value
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            target[key] = target.get(key, 0) + value
+    return target
+
+
+def summarize_rollups(docs):
+    """Combine a series of rollup documents into dashboard totals"""
+    totals = empty_rollup()
+    for doc in docs:
+        merge_rollup(totals, {k: v for k, v in doc.items() if k in totals})
+
+    count = totals["triage_to_case_count"]
+    return {
+        "arrivals_by_priority": totals["arrivals"],
+        "arrivals_total": totals["arrivals_total"],
+        "cases_created": totals["cases_created"],
+        "median_triage_to_case_minutes": median_from_histogram(totals["triage_to_case_hist"]),
+        "mean_triage_to_case_minutes": round(totals["triage_to_case_minutes_sum"] / count, 1) if count else None,
+        "dispositions": totals["dispositions"],
+        "ai_calls": totals["ai_calls"],
+        "ai_calls_total": totals["ai_calls_total"],
+        "exports": totals["exports"],
+        "exports_total": totals["exports_total"],
+    }
+
+
+class RollupRecorder:
+    """
+    Incrementally maintains hourly and daily rollup documents with $inc upserts.
+    Writes are scheduled in the background so request latency is unaffected;
+    counts lost to a crash can be rebuilt with backfill_rollups().
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._pending = set()
+        self._held = None
+
+    async def record(self, hospital_id, at, inc):
+        """Apply counter increments (dotted paths allowed) to both buckets"""
+        if not hospital_id or not inc:
+            return
+        if self._held is not None:
+            self._held.append((hospital_id, at, inc))
+            return
+        hour_key, day_key = bucket_keys(at)
+        now = datetime.now(timezone.utc).isoformat()
+        for collection, bucket in ((HOURLY_COLLECTION, hour_key), (DAILY_COLLECTION, day_key)):
+            await self.db[collection].update_one(
+                {"hospital_id": hospital_id, "bucket": bucket},
+                {
+                    "$inc": inc,
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"hospital_id": hospital_id, "bucket": bucket},
+                },
+                upsert=True,
+            )
+
+    def record_nowait(self, hospital_id, at, inc):
+        """Fire-and-forget variant used from request write paths"""
+        self.spawn(self.record(hospital_id, at, inc))
+
+    def spawn(self, coro):
+        """Run a rollup coroutine in the background, logging (not raising) failures"""
+        task = asyncio.create_task(self._run_safely(coro))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    @contextlib.asynccontextmanager
+    async def held(self):
+        """
+        Queue increments instead of writing them while a backfill swaps the
+        rollup collections, and apply them once it is done. Writes already in
+        flight are awaited first so none lands on a collection being replaced.
+        """
+        self._held = []
+        try:
+            if self._pending:
+                await asyncio.wait(set(self._pending))
+            yield
+        finally:
+            held, self._held = self._held, None
+            for args in held:
+                await self._run_safely(self.record(*args))
+
+    async def _run_safely(self, coro):
+        try:
+            await coro
+        except Exception as e:
+            logging.error(f"Rollup update failed: {e}")
+
+    async def ensure_indexes(self):
+        for collection in (HOURLY_COLLECTION, DAILY_COLLECTION):
+            await self.db[collection].create_index([("hospital_id", 1), ("bucket", 1)], unique=True)
+
+
+def _tenant_expr(hospital_field, user_field):
+    """Aggregation expression mirroring get_tenant_key(): hospital id or 'user:<id>'"""
+    return {"$ifNull": [hospital_field, {"$concat": ["user:", {"$ifNull": [user_field, "unknown"]}]}]}
+
+
+def _utc_slot_expr(date_field):
+    """
+    UTC timestamp truncated to 10 minutes ('YYYY-MM-DDTHH:M'). IST is UTC+5:30,
+    so 10-minute slots map onto exactly one IST hour bucket.
+    """
+    return {"$substrBytes": [{"$toString": date_field}, 0, 15]}
+
+
+def _hour_bucket(utc_slot):
+    """IST hourly bucket key for a UTC 10-minute slot from _utc_slot_expr()"""
+    return bucket_keys(datetime.strptime(utc_slot + "0", "%Y-%m-%dT%H:%M").replace(tzinfo=timezone.utc))[0]
+
+
+def _utc_datetime(value):
+    """Aware UTC datetime from a stored timestamp (datetime or ISO string)"""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def _swap_in(db, collection, keep_query, docs):
+    """
+    Replace `collection` with a staging copy holding the documents matching
+    keep_query plus `docs`, renamed over it in one step so readers never see a
+    half-rebuilt collection.
+    """
+    staging = db[collection + STAGING_SUFFIX]
+    await staging.drop()
+    await db[collection].aggregate([{"$match": keep_query}, {"$out": staging.name}]).to_list(None)
+    if docs:
+        await staging.insert_many(docs)
+    await staging.create_index([("hospital_id", 1), ("bucket", 1)], unique=True)
+    await staging.rename(collection, dropTarget=True)
+
+
+async def backfill_rollups(db, hospital_id=None, recorder=None):
+    """
+    Rebuild all rollup documents from the source collections.
+    Hourly buckets are aggregated in Mongo, daily buckets are summed from them,
+    and the rollup documents of the affected hospitals are swapped for the
+    rebuilt ones. With the live recorder passed in, its increments are held
+    from before the first read until the swap and then applied on top of the
+    rebuilt counts, so none is lost or counted twice.
+
+    No source collection records AI calls by kind (ai_usage only keeps a
+    per-user daily count of charged generations), so the live per-kind
+    ai_calls counts of the hourly documents are carried over as they are.
+
+    Cases whose disposition was counted without a rollup_disposition marker
+    get one, so a later disposition change moves the count from the bucket it
+    was backfilled into.
+    """
+    async with recorder.held() if recorder is not None else contextlib.nullcontext():
+        return await _backfill(db, hospital_id)
+
+
+async def _backfill(db, hospital_id):
+    hourly = {}
+    markers = []
+
+    def add(tenant, utc_slot, inc):
+        if hospital_id and tenant != hospital_id:
+            return
+        bucket = _hour_bucket(utc_slot)
+        merge_rollup(hourly.setdefault((tenant, bucket), empty_rollup()), inc)
+
+    user_lookup = [
+        {"$lookup": {"from": "users", "localField": "user_ref", "foreignField": "id", "as": "user"}},
+        {"$addFields": {"user_hospital": {"$arrayElemAt": ["$user.hospital_id", 0]}}},
+    ]
+
+    # Arrivals by priority colour
+    pipeline = [
+        {"$match": {"triaged_at": {"$ne": None}}},
+        {"$group": {
+            "_id": {
+                "tenant": _tenant_expr("$hospital_id", "$created_by_user_id"),
+                "bucket": _utc_slot_expr("$triaged_at"),
+                "color": "$priority_color",
+            },
+            "n": {"$sum": 1},
+        }},
+    ]
+    async for row in db.triage_assessments.aggregate(pipeline):
+        key = row["_id"]
+        add(key["tenant"], key["bucket"], {
+            "arrivals": {key.get("color") or "unknown": row["n"]},
+            "arrivals_total": row["n"],
+        })
+
+    # Cases created, triage -> case delay and dispositions
+    pipeline = [
+        {"$project": {"id": 1, "user_ref": "$created_by_user_id", "created_at": 1, "updated_at": 1,
+                      "triage_id": 1, "disposition_type": "$disposition.type", "rollup_disposition": 1}},
+        *user_lookup,
+        {"$lookup": {"from": "triage_assessments", "localField": "triage_id", "foreignField": "id", "as": "triage"}},
+        {"$project": {
+            "tenant": _tenant_expr("$user_hospital", "$user_ref"),
+            "bucket": _utc_slot_expr("$created_at"),
+            "id": 1,
+            "disposition_at": {"$ifNull": ["$updated_at", "$created_at"]},
+            "disposition_type": 1,
+            "rollup_disposition": 1,
+            "created_at": {"$toString": "$created_at"},
+            "triaged_at": {"$arrayElemAt": ["$triage.triaged_at", 0]},
+        }},
+    ]
+    async for row in db.cases.aggregate(pipeline):
+        inc = {"cases_created": 1}
+        if row.get("triaged_at"):
+            created = datetime.fromisoformat(row["created_at"])
+            triaged = datetime.fromisoformat(str(row["triaged_at"]))
+            if triaged.tzinfo is None:
+                triaged = triaged.replace(tzinfo=timezone.utc)
+            if created.tzinfo is None:
+                created = created.replace(tzinfo=timezone.utc)
+            minutes = max(0.0, (created - triaged).total_seconds() / 60)
+            inc.update({
+                "triage_to_case_hist": {minutes_bin(minutes): 1},
+                "triage_to_case_count": 1,
+                "triage_to_case_minutes_sum": minutes,
+            })
+        add(row["tenant"], row["bucket"], inc)
+        disposition_type = row.get("disposition_type")
+        if disposition_type:
+            # Count it where the live recorder did (or, unmarked, at the last
+            # update) so the next change undoes exactly this count
+            marker = row.get("rollup_disposition") or {}
+            if marker.get("type") == disposition_type and marker.get("at"):
+                tenant, at = marker.get("tenant", row["tenant"]), _utc_datetime(marker["at"])
+            else:
+                tenant, at = row["tenant"], _utc_datetime(row["disposition_at"])
+                if row.get("id") and (not hospital_id or tenant == hospital_id):
+                    markers.append(UpdateOne({"id": row["id"]}, {"$set": {"rollup_disposition": {
+                        "type": disposition_type, "tenant": tenant, "at": at.isoformat()
+                    }}}))
+            add(tenant, at.strftime("%Y-%m-%dT%H:%M")[:15], {"dispositions": {disposition_type: 1}})
+
+    # Exports
+    pipeline = [
+        {"$project": {"user_ref": "$user_id", "export_type": 1, "timestamp": 1}},
+        *user_lookup,
+        {"$group": {
+            "_id": {
+                "tenant": _tenant_expr("$user_hospital", "$user_ref"),
+                "bucket": _utc_slot_expr("$timestamp"),
+                "type": "$export_type",
+            },
+            "n": {"$sum": 1},
+        }},
+    ]
+    async for row in db.exports.aggregate(pipeline):
+        key = row["_id"]
+        add(key["tenant"], key["bucket"], {"exports": {key.get("type") or "unknown": row["n"]}, "exports_total": row["n"]})
+
+    # AI calls, carried over per kind from the live hourly documents
+    query = {"ai_calls_total": {"$gt": 0}}
+    if hospital_id:
+        query["hospital_id"] = hospital_id
+    async for doc in db[HOURLY_COLLECTION].find(query, {"_id": 0, "hospital_id": 1, "bucket": 1,
+                                                        "ai_calls": 1, "ai_calls_total": 1}):
+        merge_rollup(hourly.setdefault((doc["hospital_id"], doc["bucket"]), empty_rollup()), {
+            "ai_calls": doc.get("ai_calls") or {}, "ai_calls_total": doc["ai_calls_total"]
+        })
+
+    daily = {}
+    for (tenant, bucket), doc in hourly.items():
+        merge_rollup(daily.setdefault((tenant, bucket[:10]), empty_rollup()), doc)
+
+    tenants = {tenant for tenant, _ in hourly}
+    if hospital_id:
+        tenants.add(hospital_id)
+    now = datetime.now(timezone.utc).isoformat()
+    for collection, docs in ((HOURLY_COLLECTION, hourly), (DAILY_COLLECTION, daily)):
+        await _swap_in(db, collection, {"hospital_id": {"$nin": list(tenants)}}, [
+            {"hospital_id": tenant, "bucket": bucket, **doc, "updated_at": now, "backfilled": True}
+            for (tenant, bucket), doc in docs.items()
+        ])
+    if markers:
+        await db.cases.bulk_write(markers, ordered=False)
+
+    return {"hospitals": len(tenants), "hourly_buckets": len(hourly), "daily_buckets": len(daily),
+            "dispositions_marked": len(markers)}
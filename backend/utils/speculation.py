@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+
+class SpeculativeRunner:
+    """
+    Bounded fire-and-forget runner for speculative work (e.g. pre-generating
+    AI analyses nobody has asked for yet). Work is dropped rather than queued
+    when `max_pending` jobs are already running, when the same key is already
+    pending, or when `is_busy()` reports that on-demand work is waiting.
+    Failures are logged, never raised.
+    """
+
+    def __init__(self, max_pending=4, is_busy=None):
+        self.max_pending = max_pending
+        self.is_busy = is_busy
+        self._pending = {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped_budget = 0
+        self.skipped_busy = 0
+        self.skipped_duplicate = 0
+
+    def submit(self, key, fn):
+        """Start `fn()` (a coroutine function) in the background; False if dropped"""
+        if key in self._pending:
+            self.skipped_duplicate += 1
+            return False
+        if len(self._pending) >= self.max_pending:
+            self.skipped_budget += 1
+            return False
+        if self.is_busy is not None and self.is_busy():
+            self.skipped_busy += 1
+            return False
+
+        self.submitted += 1
+        task = asyncio.create_task(self._run(fn))
+        self._pending[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return True
+
+    async def _run(self, fn):
+        try:
+            await fn()
+            self.completed += 1
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"Speculative task failed: {e}")
+
+    def _forget(self, key, task):
+        if self._pending.get(key) is task:
+            del self._pending[key]
+
+    def stats(self):
+        return {
+            "max_pending": self.max_pending,
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped_budget": self.skipped_budget,
+            "skipped_busy": self.skipped_busy,
+            "skipped_duplicate": self.skipped_duplicate,
+        }
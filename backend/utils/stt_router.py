@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import time
+
+from utils.circuit_breaker import CircuitBreaker, HALF_OPEN, OPEN
+from utils.latency import RollingHealth
+
+
+class STTUnavailable(Exception):
+    """Every engine that could take the call has its breaker open"""
+
+
+class STTRouter:
+    """
+    Picks the speech-to-text engine for a call from live engine health, and
+    runs the call with a circuit breaker, failover and optional hedging.
+
+    route(preferred, alternates, auto) keeps the language-based preference
+    unless, for "auto" requests, an alternate is healthier:
+        breaker_open  the preferred engine's breaker is open (explicit
+                      requests are moved too, rather than refused)
+        error_rate    its rolling error rate is over max_error_rate
+        p95_latency   its p95 is over latency_ratio x the alternate's
+    An engine with fewer than `min_samples` calls in the window counts as
+    healthy.
+
+    run(decision, call, audio_seconds) awaits call(engine). A failed primary
+    fails over to the alternate. is_failure(exc) separates engine failures
+    (counted, trip the breaker, fail over) from request errors (raised as-is).
+
+    With hedging on, the alternate is also started once the primary has run
+    longer than it should for this much audio: its p95 latency per second of
+    audio times audio_seconds (never less than hedge_min_ms), and the first
+    success wins; the loser is cancelled. Transcription time grows with the
+    recording, so a single p95 over mixed lengths would hedge most long
+    recordings and no short ones. Calls of unknown length are not hedged.
+    """
+
+    def __init__(self, engines, window_seconds=300, max_samples=200, min_samples=10, max_error_rate=0.3,
+                 latency_ratio=1.5, breaker_failures=3, breaker_reset_seconds=30.0, hedge=False,
+                 hedge_min_ms=1500.0, is_failure=None, latency=None):
+        self.window_seconds = window_seconds
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.latency_ratio = latency_ratio
+        self.hedge = hedge
+        self.hedge_min_ms = hedge_min_ms
+        self.is_failure = is_failure
+        self.latency = latency
+        self._health = {engine: RollingHealth(window_seconds, max_samples) for engine in engines}
+        self.breakers = {
+            engine: CircuitBreaker(f"stt:{engine}", failure_threshold=breaker_failures,
+                                   reset_timeout=breaker_reset_seconds)
+            for engine in engines
+        }
+        self.decisions = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def record(self, engine, elapsed_ms, ok=True, audio_seconds=None):
+        self._health[engine].record(elapsed_ms, ok, audio_seconds)
+        if self.latency is not None and ok:
+            self.latency.observe(f"stt.{engine}.ms", elapsed_ms)
+
+    def health(self, engine):
+        """Rolling p50/p95 latency, error rate and p95 ms per second of audio over the window"""
+        health = self._health[engine]
+        sized, per_second = health.per_unit(95)
+        return {**health.summary(), "sized_samples": sized, "p95_ms_per_audio_s": per_second}
+
+    def hedge_delay_ms(self, engine, audio_seconds):
+        """When to start the alternate for a call of this length on `engine`, or None (no hedge)"""
+        if not self.hedge or not audio_seconds:
+            return None
+        sized, per_second = self._health[engine].per_unit(95)
+        if sized < self.min_samples or per_second is None:
+            return None
+        return round(max(self.hedge_min_ms, per_second * audio_seconds), 1)
+
+    def _problem(self, engine, health, other):
+        """Why `engine` should give way to `other` (both health dicts), or None"""
+        if self.breakers[engine].state == OPEN:
+            return "breaker_open"
+        if health["samples"] < self.min_samples:
+            return None
+        if health["error_rate"] > self.max_error_rate and (
+                other["samples"] < self.min_samples or other["error_rate"] < health["error_rate"]):
+            return "error_rate"
+        if (other["samples"] >= self.min_samples and health["p95_ms"] and other["p95_ms"]
+                and health["p95_ms"] > self.latency_ratio * other["p95_ms"]):
+            return "p95_latency"
+        return None
+
+    def route(self, preferred, alternates=(), auto=True):
+        """
+        Decision for one call: {"engine", "preferred", "alternate", "reason"}.
+        reason is "preferred" or why the preferred engine was passed over;
+        alternate is the engine for failover and hedging.
+        """
+        alternates = [a for a in alternates if a != preferred and a in self._health]
+        engine, reason = preferred, "preferred"
+        preferred_health = self.health(preferred)
+        for alternate in alternates:
+            if self.breakers[alternate].state == OPEN:
+                continue
+            problem = self._problem(preferred, preferred_health, self.health(alternate))
+            if problem == "breaker_open" or (auto and problem):
+                engine, reason = alternate, problem
+            break
+
+        alternate = next((a for a in [preferred, *alternates] if a != engine), None)
+
+        key = f"{engine}:{reason}"
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+        return {
+            "engine": engine,
+            "preferred": preferred,
+            "alternate": alternate,
+            "reason": reason,
+        }
+
+    async def _timed(self, engine, call, audio_seconds):
+        breaker = self.breakers[engine]
+        started = time.perf_counter()
+        try:
+            result = await call(engine)
+        except asyncio.CancelledError:
+            # A half-open trial that lost a hedge race would otherwise hold the
+            # breaker half-open with no trial left
+            if breaker.state == HALF_OPEN:
+                breaker.record_failure()
+            else:
+                breaker.release()
+            raise
+        except Exception as e:
+            if self.is_failure is None or self.is_failure(e):
+                self.record(engine, (time.perf_counter() - started) * 1000, ok=False, audio_seconds=audio_seconds)
+                breaker.record_failure()
+            else:
+                # The engine answered; the request was at fault
+                breaker.record_success()
+            raise
+        self.record(engine, (time.perf_counter() - started) * 1000, audio_seconds=audio_seconds)
+        breaker.record_success()
+        return result
+
+    async def run(self, decision, call, audio_seconds=None):
+        """
+        (result, outcome) of call(engine) under the decision, for a recording
+        of audio_seconds (None if unknown); outcome is {"engine", "hedged",
+        "failover", "hedge_after_ms"}. Raises STTUnavailable when every
+        candidate's breaker refuses the call.
+        """
+        engine, alternate = decision["engine"], decision["alternate"]
+        if not self.breakers[engine].allow():
+            if alternate is None or not self.breakers[alternate].allow():
+                raise STTUnavailable(f"Speech-to-text engine {engine} is temporarily unavailable")
+            engine, alternate = alternate, None
+
+        tasks = {}
+
+        def start(name):
+            tasks[asyncio.ensure_future(self._timed(name, call, audio_seconds))] = name
+
+        start(engine)
+        started = time.monotonic()
+        hedge_after_ms = self.hedge_delay_ms(engine, audio_seconds) if alternate is not None else None
+        planned_hedge_ms = hedge_after_ms
+        hedged = failover = False
+        error = None
+        try:
+            pending = set(tasks)
+            while pending:
+                timeout = None
+                if hedge_after_ms is not None:
+                    timeout = max(0.0, hedge_after_ms / 1000 - (time.monotonic() - started))
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The primary is slower than its p95: race the alternate
+                    hedge_after_ms = None
+                    if self.breakers[alternate].allow():
+                        logging.info(f"STT hedge: {engine} over {planned_hedge_ms}ms for {audio_seconds}s of audio, "
+                                     f"starting {alternate}")
+                        self.hedges += 1
+                        hedged = True
+                        start(alternate)
+                        alternate = None
+                        pending = {t for t in tasks if not t.done()}
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        if hedged and tasks[task] != engine:
+                            self.hedge_wins += 1
+                        return task.result(), {"engine": tasks[task], "hedged": hedged, "failover": failover,
+                                               "hedge_after_ms": planned_hedge_ms}
+                    error = task.exception()
+                if not pending and alternate is not None and (self.is_failure is None or self.is_failure(error)):
+                    hedge_after_ms = None
+                    if self.breakers[alternate].allow():
+                        logging.warning(f"STT failover: {engine} failed ({error}), retrying on {alternate}")
+                        self.failovers += 1
+                        failover = True
+                        start(alternate)
+                        alternate = None
+                        pending = {t for t in tasks if not t.done()}
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self):
+        return {
+            "window_seconds": self.window_seconds,
+            "min_samples": self.min_samples,
+            "hedging": self.hedge,
+            "engines": {
+                engine: {**self.health(engine), "breaker": self.breakers[engine].stats()}
+                for engine in self._health
+            },
+            "decisions": self.decisions,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+        }
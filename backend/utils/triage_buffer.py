@@ -0,0 +1,80 @@
+from collections import deque
+from datetime import datetime, timezone, timedelta
+
+
+class RecentTriageBuffer:
+    """
+    Per-hospital in-memory ring buffer of recent triage records.
+    Records are kept oldest -> newest and evicted once they fall outside
+    the time window or the per-hospital capacity is reached.
+    """
+
+    def __init__(self, window_hours=6, max_per_hospital=2000):
+        self.window = timedelta(hours=window_hours)
+        self.max_per_hospital = max_per_hospital
+        self._buffers = {}
+        self._warm = set()
+
+    def _buffer(self, hospital_key):
+        buf = self._buffers.get(hospital_key)
+        if buf is None:
+            buf = deque(maxlen=self.max_per_hospital)
+            self._buffers[hospital_key] = buf
+        return buf
+
+    def _evict(self, buf, now):
+        cutoff = now - self.window
+        while buf and buf[0]["triaged_at"] < cutoff:
+            buf.popleft()
+
+    def add(self, hospital_key, record):
+        """Append a triage record (its 'triaged_at' must be an aware datetime)"""
+        buf = self._buffer(hospital_key)
+        buf.append(record)
+        self._evict(buf, datetime.now(timezone.utc))
+
+    def is_warm(self, hospital_key):
+        return hospital_key in self._warm
+
+    def warm(self, hospital_key, records):
+        """
+        Seed the buffer for a hospital from persisted records (e.g. after a restart).
+        Records already added since startup are kept; duplicates are skipped.
+        """
+        buf = self._buffer(hospital_key)
+        existing = {r["id"] for r in buf}
+        merged = [r for r in records if r["id"] not in existing] + list(buf)
+        merged.sort(key=lambda r: r["triaged_at"])
+        buf.clear()
+        buf.extend(merged)
+        self._evict(buf, datetime.now(timezone.utc))
+        self._warm.add(hospital_key)
+
+    def recent(self, hospital_key, hours=None, priority_levels=None, limit=None):
+        """Return records within the last `hours` (newest first), optionally filtered by priority level"""
+        buf = self._buffers.get(hospital_key)
+        if not buf:
+            return []
+
+        now = datetime.now(timezone.utc)
+        self._evict(buf, now)
+        cutoff = now - (timedelta(hours=hours) if hours is not None else self.window)
+
+        results = []
+        for record in reversed(buf):
+            if record["triaged_at"] < cutoff:
+                break
+            if priority_levels and record.get("priority_level") not in priority_levels:
+                continue
+            results.append(record)
+            if limit and len(results) >= limit:
+                break
+        return results
+
+    def stats(self):
+        return {
+            "hospitals": len(self._buffers),
+            "records": sum(len(b) for b in self._buffers.values()),
+            "window_hours": self.window.total_seconds() / 3600,
+            "max_per_hospital": self.max_per_hospital,
+        }
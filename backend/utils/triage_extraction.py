@@ -0,0 +1,420 @@
+import re
+
+# Rule-first triage extraction. The rule stage resolves what a short, clean
+# dictation states unambiguously ("BP 120/80 HR 88 SpO2 98") and reports what it
+# could not; only those fields are escalated to the LLM (extract-triage-data).
+
+VITAL_FIELDS = ["hr", "bp_systolic", "bp_diastolic", "rr", "spo2", "temperature",
+                "gcs_e", "gcs_v", "gcs_m", "capillary_refill"]
+
+SYMPTOM_FIELDS = [
+    "obstructed_airway", "facial_burns", "stridor", "severe_respiratory_distress",
+    "moderate_respiratory_distress", "mild_respiratory_symptoms", "cyanosis", "apnea", "shock",
+    "severe_bleeding", "cardiac_arrest", "chest_pain", "chest_pain_with_hypotension", "seizure_ongoing",
+    "seizure_controlled", "confusion", "focal_deficits", "lethargic_unconscious", "major_trauma",
+    "moderate_trauma", "minor_injury", "severe_burns", "anaphylaxis", "suspected_stroke", "sepsis",
+    "gi_bleed", "fever", "non_blanching_rash", "severe_dehydration", "moderate_dehydration",
+    "abdominal_pain_severe", "abdominal_pain_moderate", "abdominal_pain_mild",
+]
+
+# Fields kept from the rule stage need at least this confidence
+MIN_FIELD_CONFIDENCE = 0.8
+# Share of transcript words the rules must account for before symptom flags are trusted
+MIN_COVERAGE = 0.85
+
+_VALUE_GAP = r"(?:\s*(?:is|of|was|at|around|about|=|:|-))*\s*"
+_NUM = r"(\d{1,3}(?:\.\d)?)"
+
+# field -> (keyword regex, plausible range)
+_VITAL_KEYWORDS = {
+    "hr": (r"\b(?<!no )(?:hr|heart rate|pulse rate|pulse|pr)\b", (20, 250)),
+    "rr": (r"\b(?:rr|resp(?:iratory)? rate|respirations?|breathing rate)\b", (4, 70)),
+    "spo2": (r"\b(?:spo2|sats?|saturation|saturating|oxygen saturation|o2 sat(?:uration)?s?)\b", (40, 100)),
+    "temperature": (r"\b(?:temp(?:erature)?)\b", (30, 110)),
+    "capillary_refill": (r"\b(?:crt|cap(?:illary)? refill(?: time)?)\b", (0, 10)),
+}
+_BP = re.compile(r"\b(?:bp|blood pressure)\b" + _VALUE_GAP + r"(\d{2,3})\s*/\s*(\d{2,3})")
+_BP_KEYWORD = re.compile(r"\b(?:bp|blood pressure)\b")
+_GCS_COMPONENTS = re.compile(r"\be\s*([1-4])\s*,?\s*v\s*([1-5]|t)\s*,?\s*m\s*([1-6])\b")
+_GCS_TOTAL = re.compile(r"\b(?:gcs|glasgow(?: coma scale)?)\b" + _VALUE_GAP + r"(\d{1,2})\b(?!\s*/\s*\d)")
+_GCS_KEYWORD = re.compile(r"\b(?:gcs|glasgow)\b")
+
+# Unit-anchored values without a keyword: usable, but not confident enough alone
+_UNIT_VALUES = [
+    ("hr", re.compile(r"\b(\d{2,3})\s*(?:bpm|beats per min(?:ute)?)\b"), 0.85),
+    ("spo2", re.compile(r"\b(\d{2,3})\s*%"), 0.6),
+    ("temperature", re.compile(r"\b(\d{2,3}(?:\.\d)?)\s*(?:°\s*[cf]?|degrees?(?: celsius| fahrenheit| c| f)?)"), 0.85),
+]
+
+# Numbers that belong to something other than a vital sign
+_OTHER_NUMBERS = re.compile(
+    r"\b\d+(?:\.\d+)?\s*(?:years?|yrs?|yo|y/o|months?|weeks?|days?|hours?|hrs?|minutes?|mins?|"
+    r"mg|mcg|ml|l|litres?|liters?|kg|units?|iu|times)\b"
+)
+_ANY_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_NUMBER_WORDS = re.compile(
+    r"\b(?:one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|thirteen|fourteen|fifteen|sixteen|"
+    r"seventeen|eighteen|nineteen|twenty|thirty|forty|fifty|sixty|seventy|eighty|ninety|hundred)\b"
+)
+
+_AGE_YEARS = re.compile(r"\b(\d{1,3})\s*-?\s*(?:years?|yrs?|yo|y/o)\b")
+_AGE_MONTHS = re.compile(r"\b(\d{1,2})\s*-?\s*(?:months?|mo)\b")
+
+_FILLERS = re.compile(r"\b(?:um+|uh+|er+m?|ah+|hmm+|you know|i mean|basically|actually|okay|ok)\b")
+_REPEATS = re.compile(r"\b(\w+)(?:\s+\1\b)+")
+
+_SYMPTOM_PHRASES = {
+    "obstructed_airway": ["airway obstruction", "obstructed airway", "choking", "foreign body in airway"],
+    "facial_burns": ["facial burn", "burns to face", "burn on face", "singed"],
+    "stridor": ["stridor"],
+    "severe_respiratory_distress": ["severe respiratory distress", "severe breathlessness", "gasping",
+                                    "unable to speak", "can't speak", "silent chest"],
+    "moderate_respiratory_distress": ["respiratory distress", "shortness of breath", "breathless", "breathlessness",
+                                      "difficulty breathing", "difficulty in breathing", "breathing difficulty",
+                                      "short of breath", "dyspnea", "dyspnoea", "sob", "wheeze", "wheezing"],
+    "mild_respiratory_symptoms": ["cough", "common cold", "runny nose", "sore throat", "nasal congestion"],
+    "cyanosis": ["cyanosis", "cyanosed", "cyanotic", "blue lips", "bluish"],
+    "apnea": ["apnea", "apnoea", "apneic", "not breathing"],
+    "shock": ["shock", "hypotensive", "hypotension", "cold clammy", "clammy", "cold peripheries"],
+    "severe_bleeding": ["severe bleeding", "heavy bleeding", "profuse bleeding", "massive bleeding", "hemorrhage",
+                        "haemorrhage", "bleeding heavily", "blood loss"],
+    "cardiac_arrest": ["cardiac arrest", "pulseless", "no pulse", "cpr in progress", "arrested"],
+    "chest_pain": ["chest pain", "chest tightness", "chest discomfort", "angina"],
+    "seizure_ongoing": ["seizing", "actively seizing", "ongoing seizure", "status epilepticus", "convulsing",
+                        "fitting", "seizure", "convulsion", "fits"],
+    "seizure_controlled": ["seizure stopped", "post ictal", "postictal", "seizure controlled", "had a seizure",
+                           "had a fit"],
+    "confusion": ["confused", "confusion", "disoriented", "disorientated", "altered sensorium", "drowsy"],
+    "focal_deficits": ["focal deficit", "weakness of", "one sided weakness", "hemiparesis", "hemiplegia",
+                       "facial droop", "slurred speech"],
+    "lethargic_unconscious": ["unconscious", "unresponsive", "not responding", "lethargic", "obtunded", "comatose"],
+    "major_trauma": ["major trauma", "polytrauma", "high speed", "fall from height", "run over", "ejected"],
+    "moderate_trauma": ["trauma", "road traffic accident", "rta", "accident", "assault", "fall"],
+    "minor_injury": ["minor injury", "small cut", "laceration", "abrasion", "sprain", "bruise"],
+    "severe_burns": ["severe burns", "extensive burns", "major burns", "burns"],
+    "anaphylaxis": ["anaphylaxis", "anaphylactic", "throat swelling", "lip swelling", "tongue swelling"],
+    "suspected_stroke": ["stroke", "cva", "facial droop", "slurred speech", "one side weak", "hemiparesis"],
+    "sepsis": ["sepsis", "septic"],
+    "gi_bleed": ["gi bleed", "hematemesis", "haematemesis", "melena", "malaena", "melaena", "blood in vomit",
+                 "black stool", "blood in stool", "rectal bleeding"],
+    "fever": ["fever", "febrile", "pyrexia", "high temperature"],
+    "non_blanching_rash": ["non blanching rash", "non-blanching rash", "purpura", "petechiae", "petechial rash"],
+    "severe_dehydration": ["severe dehydration", "severely dehydrated", "sunken eyes"],
+    "moderate_dehydration": ["dehydration", "dehydrated", "vomiting", "diarrhea", "diarrhoea", "loose stools"],
+    "abdominal_pain_severe": ["severe abdominal pain", "severe abdomen pain", "severe stomach pain", "acute abdomen",
+                              "rigid abdomen"],
+    "abdominal_pain_moderate": ["abdominal pain", "abdomen pain", "stomach pain", "belly pain", "tummy pain"],
+    "abdominal_pain_mild": ["mild abdominal pain", "mild stomach pain", "abdominal discomfort"],
+}
+
+# Phrase -> symptom, longest phrases first so "severe abdominal pain" wins over "abdominal pain"
+_SYMPTOM_REGEX = re.compile(
+    r"\b(" + "|".join(sorted({re.escape(p) for ps in _SYMPTOM_PHRASES.values() for p in ps}, key=len, reverse=True)) + r")\b"
+)
+_PHRASE_SYMPTOMS = {}
+for _symptom, _phrases in _SYMPTOM_PHRASES.items():
+    for _phrase in _phrases:
+        _PHRASE_SYMPTOMS.setdefault(_phrase, []).append(_symptom)
+# A more specific phrase suppresses its generic sibling
+_SUPERSEDES = {
+    "severe_respiratory_distress": "moderate_respiratory_distress",
+    "abdominal_pain_severe": "abdominal_pain_moderate",
+    "abdominal_pain_mild": "abdominal_pain_moderate",
+    "severe_dehydration": "moderate_dehydration",
+    "major_trauma": "moderate_trauma",
+    "seizure_controlled": "seizure_ongoing",
+}
+
+_NEGATION = re.compile(r"\b(?:no|not|denies|denied|without|negative for|nil|absent|never|free of)\b")
+# A negation cue reaches at most this many words forward, and stops at these
+_NEGATION_WORDS = 5
+_NEGATION_BREAK = re.compile(r"[.;]|\b(?:but|however|though|complains|c/o|has|reports|presents|with)\b")
+
+# Words that carry no clinical content of their own
+_NEUTRAL_WORDS = set("""
+a an the and or with of in on at to for from by is was were are has have had be been this that his her he she
+they their its it as also since about around over per noted present presents presenting presented complains
+complaining c/o h/o history patient pt male female man woman boy girl child baby infant old year years yr yrs
+month months day days hour hours week weeks minute minutes since yesterday today morning evening night ago
+brought came come arrived arrival by ambulance walk walked known case of mild moderate severe sudden gradual
+onset left right both bilateral vitals vital signs sign reading readings rate per minute min mmhg bpm degrees
+celsius fahrenheit percent on room air ra litres liters l oxygen o2 gcs e v m t
+""".split())
+
+
+def normalize_transcript(text):
+    """Lowercase, drop fillers and stuttered repeats, join spoken number forms ("120 over 80" -> "120/80")"""
+    text = (text or "").lower()
+    text = text.replace("spo₂", "spo2").replace("sp o2", "spo2").replace("sp02", "spo2").replace("°c", "° c")
+    text = _FILLERS.sub(" ", text)
+    text = _REPEATS.sub(r"\1", text)
+    text = re.sub(r"(\d)\s+(?:over|by)\s+(\d)", r"\1/\2", text)
+    text = re.sub(r"(\d)\s+point\s+(\d)", r"\1.\2", text)
+    text = re.sub(r"(\d),(\d)", r"\1.\2", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def extract_age(text):
+    """(age, unit) from "45 year old" / "8 months"; (None, "years") when not stated"""
+    normalized = normalize_transcript(text)
+    match = _AGE_YEARS.search(normalized)
+    if match:
+        return float(match.group(1)), "years"
+    match = _AGE_MONTHS.search(normalized)
+    if match:
+        return float(match.group(1)), "months"
+    return None, "years"
+
+
+def _in_range(value, bounds):
+    return bounds[0] <= value <= bounds[1]
+
+
+class _Findings:
+    """Candidate values per field with confidence and the text spans they consumed"""
+
+    def __init__(self):
+        self.values = {}
+        self.spans = []
+
+    def add(self, field, value, confidence, span):
+        self.values.setdefault(field, []).append((value, confidence))
+        self.spans.append(span)
+
+    def resolve(self, field):
+        """(value, confidence); conflicting readings resolve to (None, 0)"""
+        candidates = self.values.get(field)
+        if not candidates:
+            return None, 0.0
+        distinct = {value for value, _ in candidates}
+        if len(distinct) > 1:
+            # "HR 88 ... pulse 92": let the model decide which is current
+            return None, 0.0
+        return candidates[0][0], max(conf for _, conf in candidates)
+
+
+def _celsius(value):
+    """Temperatures above 45 are read as Fahrenheit"""
+    if value > 45:
+        return round((value - 32) * 5 / 9, 1)
+    return value
+
+
+def _extract_vitals(text, findings):
+    mentioned = set()
+
+    for field, (keyword, bounds) in _VITAL_KEYWORDS.items():
+        keyword_re = re.compile(keyword)
+        for match in keyword_re.finditer(text):
+            mentioned.add(field)
+            value_match = re.compile(_VALUE_GAP + _NUM).match(text, match.end())
+            if not value_match:
+                continue
+            # "BP 120/80" style pairs after a non-BP keyword are not this field's value
+            if re.match(r"\s*/\s*\d", text[value_match.end():]):
+                continue
+            value = float(value_match.group(1))
+            if field == "temperature":
+                if not _in_range(value, (30, 110)):
+                    continue
+                value = _celsius(value)
+                if not _in_range(value, (30, 45)):
+                    continue
+            elif not _in_range(value, bounds):
+                continue
+            findings.add(field, value, 1.0, (match.start(), value_match.end()))
+
+    for match in _BP_KEYWORD.finditer(text):
+        mentioned.update(("bp_systolic", "bp_diastolic"))
+    for match in _BP.finditer(text):
+        systolic, diastolic = float(match.group(1)), float(match.group(2))
+        if _in_range(systolic, (40, 260)) and _in_range(diastolic, (20, 160)) and systolic > diastolic:
+            findings.add("bp_systolic", systolic, 1.0, match.span())
+            findings.add("bp_diastolic", diastolic, 1.0, match.span())
+
+    gcs_fields = ("gcs_e", "gcs_v", "gcs_m")
+    if _GCS_KEYWORD.search(text):
+        mentioned.update(gcs_fields)
+    for match in _GCS_COMPONENTS.finditer(text):
+        mentioned.update(gcs_fields)
+        e, v, m = match.groups()
+        findings.add("gcs_e", float(e), 1.0, match.span())
+        if v != "t":  # intubated: verbal not assessable
+            findings.add("gcs_v", float(v), 1.0, match.span())
+        findings.add("gcs_m", float(m), 1.0, match.span())
+    for match in _GCS_TOTAL.finditer(text):
+        total = int(match.group(1))
+        # Only the extremes map to a single E/V/M split
+        split = {15: (4, 5, 6), 3: (1, 1, 1)}.get(total)
+        findings.spans.append(match.span())
+        if split:
+            for field, value in zip(gcs_fields, split):
+                findings.add(field, float(value), 0.9, match.span())
+
+    for field, pattern, confidence in _UNIT_VALUES:
+        for match in pattern.finditer(text):
+            if any(start <= match.start() < end for start, end in findings.spans):
+                continue
+            value = float(match.group(1))
+            if field == "temperature":
+                value = _celsius(value)
+                if not _in_range(value, (30, 45)):
+                    continue
+            elif not _in_range(value, _VITAL_KEYWORDS[field][1]):
+                continue
+            mentioned.add(field)
+            findings.add(field, value, confidence, match.span())
+
+    return mentioned
+
+
+def _extract_symptoms(text):
+    """{symptom: True/False} for mentioned symptoms (False = negated) and the consumed spans"""
+    flags = {}
+    spans = []
+    previous_end = 0
+    for match in _SYMPTOM_REGEX.finditer(text):
+        # Negation scope: a few words back, not past a break or an earlier symptom phrase
+        window = text[previous_end:match.start()]
+        words = list(re.finditer(r"\S+", window))
+        if len(words) > _NEGATION_WORDS:
+            window = window[words[-_NEGATION_WORDS].start():]
+        breaks = list(_NEGATION_BREAK.finditer(window))
+        if breaks:
+            window = window[breaks[-1].end():]
+        previous_end = match.end()
+        negation = None
+        for negation in _NEGATION.finditer(window):
+            pass
+        negated = negation is not None
+        spans.append(match.span())
+        if negated:
+            spans.append((match.start() - len(window) + negation.start(), match.start()))
+        for symptom in _PHRASE_SYMPTOMS[match.group(1)]:
+            # Any affirmed mention wins over a negated one
+            flags[symptom] = flags.get(symptom, False) or not negated
+
+    for specific, generic in _SUPERSEDES.items():
+        if flags.get(specific) and generic in flags:
+            flags[generic] = False
+    return flags, spans
+
+
+def _coverage(text, spans):
+    """Share of words that are either neutral or inside a consumed span"""
+    total = explained = 0
+    for match in re.finditer(r"[a-z0-9/.%°]+", text):
+        word = match.group(0).strip(".")
+        if not word:
+            continue
+        total += 1
+        if word in _NEUTRAL_WORDS or any(start <= match.start() < end for start, end in spans):
+            explained += 1
+    return explained / total if total else 1.0
+
+
+def rule_extract(text, min_confidence=MIN_FIELD_CONFIDENCE):
+    """
+    Rule stage of the cascade. Returns
+        {"vitals", "symptoms", "confidence", "unresolved_vitals",
+         "symptoms_resolved", "coverage", "normalized"}
+    where unresolved_vitals are fields the transcript mentions but the rules
+    could not read with at least min_confidence, and symptoms_resolved is
+    False when too much of the transcript is unexplained to trust the symptom
+    flags. Callers with no LLM to escalate to pass min_confidence=0 to keep
+    every unambiguous reading.
+    """
+    normalized = normalize_transcript(text)
+    findings = _Findings()
+    mentioned = _extract_vitals(normalized, findings)
+
+    vitals = dict.fromkeys(VITAL_FIELDS)
+    confidence = {}
+    unresolved = []
+    for field in VITAL_FIELDS:
+        value, conf = findings.resolve(field)
+        if value is not None and conf >= min_confidence:
+            vitals[field] = int(value) if value.is_integer() and field != "temperature" else value
+            confidence[field] = conf
+        elif field in mentioned or value is not None:
+            unresolved.append(field)
+
+    flags, symptom_spans = _extract_symptoms(normalized)
+    symptoms = {field: bool(flags.get(field)) for field in SYMPTOM_FIELDS}
+    if symptoms["chest_pain"] and vitals["bp_systolic"] is not None and vitals["bp_systolic"] < 90:
+        symptoms["chest_pain_with_hypotension"] = True
+
+    consumed = findings.spans + symptom_spans + [m.span() for m in _OTHER_NUMBERS.finditer(normalized)]
+    # Numbers (digits or words) the rules could not attribute: some vital may be hiding there
+    stray_numbers = [m for m in _ANY_NUMBER.finditer(normalized)
+                     if not any(start <= m.start() < end for start, end in consumed)]
+    if stray_numbers or _NUMBER_WORDS.search(normalized):
+        unresolved.extend(field for field in VITAL_FIELDS if vitals[field] is None and field not in unresolved)
+
+    coverage = _coverage(normalized, consumed)
+    return {
+        "vitals": vitals,
+        "symptoms": symptoms,
+        "confidence": confidence,
+        "unresolved_vitals": unresolved,
+        "symptoms_resolved": coverage >= MIN_COVERAGE,
+        "coverage": round(coverage, 3),
+        "normalized": normalized,
+    }
+
+
+def needs_llm(rule_result):
+    return bool(rule_result["unresolved_vitals"]) or not rule_result["symptoms_resolved"]
+
+
+def build_escalation_prompt(text, rule_result):
+    """LLM prompt asking only for what the rule stage left unresolved"""
+    vital_fields = rule_result["unresolved_vitals"]
+    sections = []
+    if vital_fields:
+        sections.append('"vitals": {' + ", ".join(f'"{f}": number or null' for f in vital_fields) + "}")
+    if not rule_result["symptoms_resolved"]:
+        sections.append('"symptoms": {' + ", ".join(f'"{f}": boolean' for f in SYMPTOM_FIELDS) + "}")
+
+    return f"""Extract triage data from this emergency dictation. The transcript may contain noise, repeated words and spoken numbers ("one forty over eighty" = 140/80).
+
+Transcript: "{text}"
+
+Return ONLY a JSON object with exactly these fields:
+{{{", ".join(sections)}}}
+
+Rules:
+- Use only explicitly stated values; null (or false) when not mentioned or uncertain
+- GCS: E 1-4, V 1-5, M 1-6; temperature in °C; BP systolic and diastolic separately
+- Symptoms: true only if present (not if denied)"""
+
+
+def merge_extraction(rule_result, llm_data=None):
+    """
+    Combine the rule stage with the LLM's answer for the escalated fields.
+    Returns (data, sources) where data has the full vitals/symptoms shape of
+    /ai/extract-triage-data and sources maps "vitals.hr" etc. to "rules" or
+    "llm" for every field with a value.
+    """
+    llm_data = llm_data or {}
+    llm_vitals = llm_data.get("vitals") or {}
+    llm_symptoms = llm_data.get("symptoms") or {}
+
+    vitals = dict(rule_result["vitals"])
+    sources = {f"vitals.{field}": "rules" for field, value in vitals.items() if value is not None}
+    for field in rule_result["unresolved_vitals"]:
+        value = llm_vitals.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            vitals[field] = value
+            sources[f"vitals.{field}"] = "llm"
+
+    symptoms = dict(rule_result["symptoms"])
+    symptom_source = "rules"
+    if not rule_result["symptoms_resolved"] and llm_symptoms:
+        symptom_source = "llm"
+        for field in SYMPTOM_FIELDS:
+            if field in llm_symptoms:
+                symptoms[field] = bool(llm_symptoms[field])
+    sources.update({f"symptoms.{field}": symptom_source for field, value in symptoms.items() if value})
+
+    return {"vitals": vitals, "symptoms": symptoms}, sources
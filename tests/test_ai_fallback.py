@@ -0,0 +1,197 @@
+"""
+Test suite for the LLM circuit breaker and rule-engine fallback:
+1. red_flags always answers: from the LLM, or rule-based and labelled degraded;
+   streamed, a first token slower than the budget ends in the rule-based done event
+2. Breaker state and fallback counters are exposed on /api/metrics
+3. A request that joins a speculative pre-generation reports its breaker
+   admission (AI_SPECULATIVE_PREFETCH=true on the server)
+"""
+
+import pytest
+import requests
+import os
+import json
+import time
+from datetime import datetime
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+# Background work (pre-generation) still finishing after the response
+SETTLE_SECONDS = 60
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def case_id(auth_headers):
+    response = requests.post(
+        f"{BASE_URL}/api/cases",
+        json={
+            "patient": {
+                "name": "TEST_AI_Fallback_Patient",
+                "age": "58",
+                "sex": "Male",
+                "arrival_datetime": datetime.now().isoformat(),
+                "mode_of_arrival": "Ambulance"
+            },
+            "vitals_at_arrival": {"hr": 132, "bp_systolic": 84, "bp_diastolic": 50, "rr": 26, "spo2": 91, "temperature": 37.1},
+            "presenting_complaint": {"text": "Crushing chest pain radiating to jaw", "duration": "30 minutes", "onset_type": "Sudden"},
+            "em_resident": "Dr. Test Resident"
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 200, f"Failed to create case: {response.text}"
+    return response.json()["id"]
+
+
+def read_events(response):
+    """Parse a text/event-stream body into (event, data) tuples"""
+    events = []
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+class TestAIFallback:
+    """Test degraded answers when the LLM is unavailable"""
+
+    def test_red_flags_never_500(self, auth_headers, case_id):
+        response = requests.post(
+            f"{BASE_URL}/api/ai/generate",
+            json={"case_sheet_id": case_id, "prompt_type": "red_flags"},
+            headers=auth_headers,
+            timeout=120
+        )
+        if response.status_code in (403, 429):
+            pytest.skip(f"AI access unavailable: {response.text[:200]}")
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["response"]
+
+        if body["degraded"]:
+            assert body["degraded_reason"] in ("circuit_open", "timeout", "upstream_error")
+            assert "Hypotension" in body["response"]
+            assert body["cached"] is False
+            print(f"✓ Degraded rule-based answer ({body['degraded_reason']})")
+        else:
+            assert body["degraded_reason"] is None
+            print("✓ LLM answer")
+
+    def test_streamed_red_flags_end_in_done(self, auth_headers, case_id):
+        """A stream whose first token is late ends in the rule-based done event"""
+        response = requests.post(
+            f"{BASE_URL}/api/ai/generate/stream",
+            json={"case_sheet_id": case_id, "prompt_type": "red_flags"},
+            headers=auth_headers,
+            stream=True,
+            timeout=120
+        )
+        if response.status_code in (403, 429):
+            pytest.skip(f"AI access unavailable: {response.text[:200]}")
+        assert response.status_code == 200, response.text
+        events = read_events(response)
+        if events and events[-1][0] == "error":
+            pytest.skip(f"AI generation failed upstream: {events[-1][1]}")
+        assert events and events[-1][0] == "done", events[-1:]
+        done = events[-1][1]
+
+        if done.get("degraded"):
+            assert done["degraded_reason"] in ("circuit_open", "timeout")
+            assert "Hypotension" in done["response"]
+            assert done["model"] is None
+            print(f"✓ Degraded streamed answer ({done['degraded_reason']})")
+        else:
+            tokens = [data["text"] for event, data in events if event == "token"]
+            assert done["response"] == "".join(tokens)
+            print("✓ Streamed LLM answer")
+
+    def test_metrics_expose_breakers(self, auth_headers):
+        response = requests.get(f"{BASE_URL}/api/metrics", headers=auth_headers)
+        if response.status_code == 403:
+            pytest.skip("Metrics require an admin user")
+        assert response.status_code == 200
+        metrics = response.json()
+        for breaker in metrics["llm_breakers"].values():
+            assert breaker["state"] in ("closed", "open", "half_open")
+        assert isinstance(metrics["ai_fallbacks"], dict)
+        print(f"✓ Breakers: {metrics['llm_breakers']}")
+
+
+class TestBreakerAdmissions:
+    """Test that every request the breaker admits reports back to it"""
+
+    def test_request_joining_speculative_flight_reports(self, auth_headers):
+        """
+        A request that joins a background pre-generation (which never asks the
+        breaker) still settles its admission; a half-open breaker would
+        otherwise keep waiting on that trial for good
+        """
+        metrics = requests.get(f"{BASE_URL}/api/metrics", headers=auth_headers)
+        if metrics.status_code == 403:
+            pytest.skip("Metrics require an admin user")
+        assert metrics.status_code == 200
+        if not metrics.json()["ai_speculation"]["enabled"]:
+            pytest.skip("AI_SPECULATIVE_PREFETCH is not enabled on the server")
+
+        response = requests.post(
+            f"{BASE_URL}/api/cases",
+            json={
+                "patient": {
+                    "name": "TEST_AI_Fallback_Speculative",
+                    "age": "66",
+                    "sex": "Female",
+                    "arrival_datetime": datetime.now().isoformat(),
+                    "mode_of_arrival": "Ambulance"
+                },
+                "vitals_at_arrival": {"hr": 138, "bp_systolic": 78, "bp_diastolic": 46, "rr": 30, "spo2": 86, "temperature": 39.4},
+                "presenting_complaint": {"text": "Fever with confusion and breathlessness", "duration": "1 day", "onset_type": "Sudden"},
+                "triage_color": "red",
+                "triage_priority": 1,
+                "em_resident": "Dr. Test Resident"
+            },
+            headers=auth_headers
+        )
+        assert response.status_code == 200, f"Failed to create case: {response.text}"
+
+        # Asked straight away, while the pre-generation is still running
+        response = requests.post(
+            f"{BASE_URL}/api/ai/generate",
+            json={"case_sheet_id": response.json()["id"], "prompt_type": "red_flags"},
+            headers=auth_headers,
+            timeout=120
+        )
+        if response.status_code in (403, 429):
+            pytest.skip(f"AI access unavailable: {response.text[:200]}")
+        assert response.status_code == 200, response.text
+        body = response.json()
+        if not body["coalesced"]:
+            pytest.skip("The request did not join the pre-generation")
+
+        deadline = time.time() + SETTLE_SECONDS
+        breaker = None
+        while time.time() < deadline:
+            metrics = requests.get(f"{BASE_URL}/api/metrics", headers=auth_headers).json()
+            breaker = metrics["llm_breakers"][body["model"]]
+            if metrics["ai_speculation"]["pending"] == 0 and breaker["pending"] == 0:
+                break
+            time.sleep(0.5)
+        assert breaker["pending"] == 0, breaker
+        print(f"✓ Coalesced request settled its breaker admission ({breaker['state']})")
@@ -0,0 +1,162 @@
+"""
+Test suite for the /api/ai/generate response cache:
+1. Repeating a request for an unchanged case is served from cache (no credit charged)
+2. Updating a prompt-relevant case section invalidates the cached response
+3. Identical concurrent requests are coalesced into one generation
+4. Updates that leave the case digest unchanged keep the cached response
+5. A repeat analysis after a small update sends only the changed fields
+"""
+
+import pytest
+import requests
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def case_id(auth_headers):
+    """Create a case to generate AI responses for"""
+    response = requests.post(
+        f"{BASE_URL}/api/cases",
+        json={
+            "patient": {
+                "name": "TEST_AI_Cache_Patient",
+                "age": "52",
+                "sex": "Male",
+                "arrival_datetime": datetime.now().isoformat(),
+                "mode_of_arrival": "Walk-in"
+            },
+            "vitals_at_arrival": {"hr": 110, "bp_systolic": 100, "bp_diastolic": 70, "rr": 22, "spo2": 95, "temperature": 37.2},
+            "presenting_complaint": {"text": "Chest pain radiating to left arm", "duration": "1 hour", "onset_type": "Sudden"},
+            "em_resident": "Dr. Test Resident"
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 200, f"Failed to create case: {response.text}"
+    return response.json()["id"]
+
+
+def generate(headers, case_id):
+    response = requests.post(
+        f"{BASE_URL}/api/ai/generate",
+        json={"case_sheet_id": case_id, "prompt_type": "red_flags"},
+        headers=headers,
+        timeout=120
+    )
+    if response.status_code in (429, 500):
+        pytest.skip(f"AI generation unavailable: {response.text[:200]}")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestAIResponseCache:
+    """Test caching of POST /api/ai/generate"""
+
+    def test_repeat_request_is_cached(self, auth_headers, case_id):
+        """Second identical request is a cache hit"""
+        first = generate(auth_headers, case_id)
+        second = generate(auth_headers, case_id)
+
+        assert second["cached"] is True
+        assert second["response"] == first["response"]
+        print("✓ Repeat /ai/generate served from cache")
+
+    def test_case_update_invalidates(self, auth_headers, case_id):
+        """Changing the presenting complaint produces a fresh response"""
+        generate(auth_headers, case_id)
+
+        response = requests.put(
+            f"{BASE_URL}/api/cases/{case_id}",
+            json={"presenting_complaint": {"text": "Breathlessness on exertion", "duration": "2 days", "onset_type": "Gradual"}},
+            headers=auth_headers
+        )
+        if response.status_code == 403:
+            pytest.skip("Edit limit reached for test user")
+        assert response.status_code == 200, response.text
+
+        assert generate(auth_headers, case_id)["cached"] is False
+        print("✓ Case update invalidated cached AI response")
+
+    def test_concurrent_requests_coalesced(self, auth_headers, case_id):
+        """Concurrent duplicates share one upstream generation"""
+        response = requests.put(
+            f"{BASE_URL}/api/cases/{case_id}",
+            json={"presenting_complaint": {"text": "Palpitations and dizziness", "duration": "30 minutes", "onset_type": "Sudden"}},
+            headers=auth_headers
+        )
+        if response.status_code == 403:
+            pytest.skip("Edit limit reached for test user")
+        assert response.status_code == 200, response.text
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(lambda _: generate(auth_headers, case_id), range(3)))
+
+        fresh = [r for r in results if not r["cached"] and not r["coalesced"]]
+        assert len(fresh) == 1, "Expected exactly one upstream generation"
+        assert len({r["response"] for r in results}) == 1
+        print("✓ Concurrent duplicate /ai/generate requests coalesced")
+
+    def test_non_clinical_update_keeps_cache(self, auth_headers, case_id):
+        """Fields outside the case digest do not change the cache key"""
+        first = generate(auth_headers, case_id)
+
+        response = requests.put(
+            f"{BASE_URL}/api/cases/{case_id}",
+            json={"em_consultant": "Dr. Test Consultant"},
+            headers=auth_headers
+        )
+        if response.status_code == 403:
+            pytest.skip("Edit limit reached for test user")
+        assert response.status_code == 200, response.text
+
+        second = generate(auth_headers, case_id)
+        assert second["cached"] is True
+        assert second["response"] == first["response"]
+        print("✓ Non-clinical case update kept cached AI response")
+
+    def test_small_update_continues_conversation(self, auth_headers, case_id):
+        """A changed vital is sent as a delta on top of the previous answer"""
+        generate(auth_headers, case_id)
+
+        response = requests.put(
+            f"{BASE_URL}/api/cases/{case_id}",
+            json={"vitals_at_arrival": {"hr": 124, "bp_systolic": 96, "bp_diastolic": 64, "rr": 24, "spo2": 94, "temperature": 37.2}},
+            headers=auth_headers
+        )
+        if response.status_code == 403:
+            pytest.skip("Edit limit reached for test user")
+        assert response.status_code == 200, response.text
+
+        result = generate(auth_headers, case_id)
+        conversation = result["conversation"]
+        if conversation["reason"] in ("disabled", "new"):
+            pytest.skip(f"No conversation to continue ({conversation['reason']})")
+        assert result["cached"] is False
+        if conversation["reason"] == "larger_than_fresh":
+            # The earlier turns outweigh the full prompt: sent fresh instead
+            assert conversation["mode"] == "fresh"
+            assert conversation["sent_chars"] == conversation["fresh_chars"]
+            pytest.skip("Conversation history outweighs the full prompt")
+        assert conversation["mode"] == "delta"
+        assert 1 <= conversation["changed_fields"] <= 4
+        print(f"✓ Follow-up sent {conversation['changed_fields']} changed fields "
+              f"({conversation['sent_chars']} chars incl. history vs {conversation['fresh_chars']} fresh)")
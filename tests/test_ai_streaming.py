@@ -0,0 +1,118 @@
+"""
+Test suite for streaming AI endpoints (Server-Sent Events):
+1. POST /api/ai/generate/stream - token events followed by a done event
+2. POST /api/discharge-summary/stream - summary persisted once the stream completes
+"""
+
+import pytest
+import requests
+import os
+import json
+from datetime import datetime
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def case_id(auth_headers):
+    """Create a case to stream AI output for"""
+    response = requests.post(
+        f"{BASE_URL}/api/cases",
+        json={
+            "patient": {
+                "name": "TEST_Stream_Patient",
+                "age": "60",
+                "sex": "Female",
+                "arrival_datetime": datetime.now().isoformat(),
+                "mode_of_arrival": "Ambulance"
+            },
+            "vitals_at_arrival": {"hr": 96, "bp_systolic": 150, "bp_diastolic": 90, "rr": 18, "spo2": 97, "temperature": 36.8},
+            "presenting_complaint": {"text": "Sudden onset weakness of right arm", "duration": "3 hours", "onset_type": "Sudden"},
+            "em_resident": "Dr. Test Resident"
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 200, f"Failed to create case: {response.text}"
+    return response.json()["id"]
+
+
+def read_events(response):
+    """Parse a text/event-stream body into (event, data) tuples"""
+    events = []
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+def stream(url, headers, **kwargs):
+    response = requests.post(url, headers=headers, stream=True, timeout=180, **kwargs)
+    if response.status_code == 429:
+        pytest.skip("AI access limit reached for test user")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = read_events(response)
+    if events and events[-1][0] == "error":
+        pytest.skip(f"AI generation unavailable: {events[-1][1]}")
+    return events
+
+
+class TestAIStreaming:
+    """Test SSE streaming endpoints"""
+
+    def test_generate_stream(self, auth_headers, case_id):
+        """Tokens arrive before a final done event whose text is their concatenation"""
+        events = stream(
+            f"{BASE_URL}/api/ai/generate/stream",
+            auth_headers,
+            json={"case_sheet_id": case_id, "prompt_type": "red_flags"}
+        )
+        tokens = [data["text"] for event, data in events if event == "token"]
+        assert tokens, "Expected at least one token event"
+        assert events[-1][0] == "done"
+        assert events[-1][1]["response"] == "".join(tokens)
+        print(f"✓ Streamed {len(tokens)} tokens, TTFT {events[-1][1]['ttft_ms']} ms")
+
+    def test_discharge_summary_stream_persists(self, auth_headers, case_id):
+        """The streamed summary is saved to discharge_summaries"""
+        events = stream(
+            f"{BASE_URL}/api/discharge-summary/stream",
+            auth_headers,
+            params={"case_sheet_id": case_id}
+        )
+        done = events[-1][1]
+        assert events[-1][0] == "done"
+        assert done["summary_id"]
+
+        saved = requests.get(f"{BASE_URL}/api/discharge-summary/{case_id}", headers=auth_headers)
+        assert saved.status_code == 200
+        assert saved.json()["summary_text"] == done["response"]
+        print(f"✓ Streamed discharge summary persisted as {done['summary_id']}")
+
+    def test_stream_unknown_case(self, auth_headers):
+        """Errors before streaming starts are plain HTTP errors"""
+        response = requests.post(
+            f"{BASE_URL}/api/ai/generate/stream",
+            json={"case_sheet_id": "does-not-exist", "prompt_type": "red_flags"},
+            headers=auth_headers
+        )
+        assert response.status_code in (404, 429)
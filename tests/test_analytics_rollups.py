@@ -0,0 +1,226 @@
+"""
+Test suite for analytics rollups:
+1. Triage, case and disposition writes are counted in the hourly rollups
+2. GET /api/analytics/dashboard reports those counts
+3. POST /api/analytics/backfill rebuilds the same counts, and the live
+   recorder and disposition tracking keep working on top of them
+4. Writes made while a backfill runs are counted exactly once, and AI calls
+   keep their per-kind keys
+"""
+
+import pytest
+import requests
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+# Rollups are written in the background after the request returns
+ROLLUP_WAIT_SECONDS = 5
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def dashboard(auth_headers):
+    """Fetch the hourly dashboard summary (last 24h)"""
+    def fetch():
+        response = requests.get(
+            f"{BASE_URL}/api/analytics/dashboard",
+            params={"granularity": "hourly"},
+            headers=auth_headers
+        )
+        if response.status_code == 403:
+            pytest.skip("Analytics not available to the test user")
+        assert response.status_code == 200, response.text
+        return response.json()["summary"]
+    return fetch
+
+
+def wait_for(fetch, condition):
+    """Poll the dashboard until condition(summary) holds or the wait runs out"""
+    deadline = time.time() + ROLLUP_WAIT_SECONDS
+    summary = fetch()
+    while not condition(summary) and time.time() < deadline:
+        time.sleep(0.25)
+        summary = fetch()
+    return summary
+
+
+def create_red_triage(headers):
+    """Create a RED triage record (SpO2 85%)"""
+    response = requests.post(
+        f"{BASE_URL}/api/triage/create",
+        json={
+            "age_group": "adult",
+            "vitals": {"hr": 110, "spo2": 85, "bp_systolic": 120, "bp_diastolic": 80, "rr": 22},
+            "symptoms": {},
+            "mechanism": "medical",
+            "triaged_by": TEST_EMAIL
+        },
+        headers=headers
+    )
+    assert response.status_code == 200, f"Triage create failed: {response.text}"
+    return response.json()
+
+
+def create_case(headers, name, triage_id=None):
+    response = requests.post(
+        f"{BASE_URL}/api/cases",
+        json={
+            "patient": {
+                "name": name,
+                "age": "52",
+                "sex": "Male",
+                "arrival_datetime": datetime.now().isoformat(),
+                "mode_of_arrival": "Walk-in"
+            },
+            "vitals_at_arrival": {"hr": 110, "bp_systolic": 120, "bp_diastolic": 80, "rr": 22, "spo2": 85},
+            "presenting_complaint": {"text": "Breathlessness", "duration": "1 day", "onset_type": "Sudden"},
+            "triage_id": triage_id,
+            "em_resident": "Dr. Test Resident"
+        },
+        headers=headers
+    )
+    assert response.status_code == 200, f"Failed to create case: {response.text}"
+    return response.json()["id"]
+
+
+def set_disposition(headers, case_id, disposition_type):
+    response = requests.put(
+        f"{BASE_URL}/api/cases/{case_id}",
+        json={"disposition": {"type": disposition_type}},
+        headers=headers
+    )
+    assert response.status_code == 200, f"Failed to update case: {response.text}"
+
+
+def backfill(headers):
+    response = requests.post(f"{BASE_URL}/api/analytics/backfill", headers=headers)
+    if response.status_code == 403:
+        pytest.skip("Backfill needs an admin test user")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestRollupRecording:
+    """Test that write paths update the rollups the dashboard reads"""
+
+    def test_triage_arrival_counted(self, auth_headers, dashboard):
+        """A RED triage adds one RED arrival"""
+        before = dashboard()
+        create_red_triage(auth_headers)
+
+        after = wait_for(dashboard, lambda s: s["arrivals_total"] > before["arrivals_total"])
+        assert after["arrivals_total"] == before["arrivals_total"] + 1
+        assert after["arrivals_by_priority"].get("red", 0) == before["arrivals_by_priority"].get("red", 0) + 1
+        print("✓ Triage arrival counted as RED")
+
+    def test_case_from_triage_counted(self, auth_headers, dashboard):
+        """A case opened from a triage counts the case and its triage -> case delay"""
+        triage = create_red_triage(auth_headers)
+        before = dashboard()
+        create_case(auth_headers, "TEST_Rollup_Case", triage["id"])
+
+        after = wait_for(dashboard, lambda s: s["cases_created"] > before["cases_created"])
+        assert after["cases_created"] == before["cases_created"] + 1
+        assert after["median_triage_to_case_minutes"] is not None
+        print(f"✓ Case counted, median triage -> case {after['median_triage_to_case_minutes']} min")
+
+    def test_disposition_change_moves_count(self, auth_headers, dashboard):
+        """Changing a disposition moves its count instead of adding another"""
+        case_id = create_case(auth_headers, "TEST_Rollup_Disposition")
+        before = dashboard()
+
+        set_disposition(auth_headers, case_id, "admitted-ward")
+        wait_for(dashboard, lambda s: s["dispositions"].get("admitted-ward", 0) > before["dispositions"].get("admitted-ward", 0))
+        set_disposition(auth_headers, case_id, "discharged")
+
+        after = wait_for(dashboard, lambda s: s["dispositions"].get("discharged", 0) > before["dispositions"].get("discharged", 0))
+        assert after["dispositions"].get("discharged", 0) == before["dispositions"].get("discharged", 0) + 1
+        assert after["dispositions"].get("admitted-ward", 0) == before["dispositions"].get("admitted-ward", 0)
+        print("✓ Disposition count moved from admitted-ward to discharged")
+
+
+class TestBackfill:
+    """Test POST /api/analytics/backfill"""
+
+    def test_backfill_is_repeatable(self, auth_headers, dashboard):
+        """Two backfills in a row produce the same dashboard"""
+        create_red_triage(auth_headers)
+        backfill(auth_headers)
+        first = dashboard()
+        result = backfill(auth_headers)
+        second = dashboard()
+
+        assert result["success"] is True
+        assert result["hourly_buckets"] >= 1
+        for key in ("arrivals_total", "arrivals_by_priority", "cases_created", "dispositions", "exports_total",
+                    "ai_calls", "ai_calls_total"):
+            assert second[key] == first[key], key
+        print(f"✓ Backfill repeatable ({result['hourly_buckets']} hourly buckets)")
+
+    def test_recording_continues_after_backfill(self, auth_headers, dashboard):
+        """Live increments land on the rebuilt rollups"""
+        backfill(auth_headers)
+        before = dashboard()
+        create_red_triage(auth_headers)
+
+        after = wait_for(dashboard, lambda s: s["arrivals_total"] > before["arrivals_total"])
+        assert after["arrivals_total"] == before["arrivals_total"] + 1
+        print("✓ Triage counted after backfill")
+
+    def test_disposition_change_after_backfill(self, auth_headers, dashboard):
+        """A disposition counted by the backfill is moved, not duplicated, by a later change"""
+        case_id = create_case(auth_headers, "TEST_Rollup_Backfilled_Disposition")
+        set_disposition(auth_headers, case_id, "referred")
+        time.sleep(0.5)
+        backfill(auth_headers)
+        before = dashboard()
+
+        set_disposition(auth_headers, case_id, "dama")
+        after = wait_for(dashboard, lambda s: s["dispositions"].get("dama", 0) > before["dispositions"].get("dama", 0))
+        assert after["dispositions"].get("dama", 0) == before["dispositions"].get("dama", 0) + 1
+        assert after["dispositions"].get("referred", 0) == before["dispositions"].get("referred", 0) - 1
+        print("✓ Backfilled disposition moved from referred to dama")
+
+    def test_triage_during_backfill_counted_once(self, auth_headers, dashboard):
+        """A triage recorded while a backfill runs is neither lost nor counted twice"""
+        backfill(auth_headers)
+        before = dashboard()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            running = pool.submit(backfill, auth_headers)
+            pool.submit(create_red_triage, auth_headers).result()
+            running.result()
+
+        wait_for(dashboard, lambda s: s["arrivals_total"] > before["arrivals_total"])
+        # Give a second (duplicate) increment time to land before checking
+        time.sleep(1)
+        assert dashboard()["arrivals_total"] == before["arrivals_total"] + 1
+        print("✓ Triage during backfill counted once")
+
+    def test_backfill_keeps_ai_call_kinds(self, auth_headers, dashboard):
+        """AI calls stay under the per-kind keys the live recorder uses"""
+        before = dashboard()
+        backfill(auth_headers)
+        after = dashboard()
+
+        assert after["ai_calls"] == before["ai_calls"]
+        assert after["ai_calls_total"] == sum(after["ai_calls"].values())
+        print(f"✓ AI calls by kind after backfill: {after['ai_calls']}")
@@ -0,0 +1,80 @@
+"""
+Test suite for rule-based case analysis:
+1. POST /api/ai/analyze-case - single case
+2. POST /api/ai/analyze-case/batch - many cases in one call, same results as single
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+CHEST_PAIN_CASE = {
+    "symptoms": "Crushing chest pain radiating to jaw with sweating",
+    "vitals": {"hr": "130", "bp_systolic": 85, "spo2": 92}
+}
+ROUTINE_CASE = {
+    "symptoms": "mild sore throat",
+    "vitals": {"hr": 80, "spo2": 99}
+}
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestAnalyzeCaseBatch:
+    """Test POST /api/ai/analyze-case/batch"""
+
+    def test_batch_matches_single(self, auth_headers):
+        """Batch results equal the single-case endpoint, in input order"""
+        response = requests.post(
+            f"{BASE_URL}/api/ai/analyze-case/batch",
+            json={"cases": [CHEST_PAIN_CASE, ROUTINE_CASE]},
+            headers=auth_headers
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["count"] == 2
+
+        for case, result in zip([CHEST_PAIN_CASE, ROUTINE_CASE], data["results"]):
+            single = requests.post(f"{BASE_URL}/api/ai/analyze-case", json=case, headers=auth_headers)
+            assert single.status_code == 200
+            assert single.json() == result
+
+        assert data["results"][0]["urgency"] == "CRITICAL"
+        assert "Acute Coronary Syndrome" in data["results"][0]["provisional_diagnoses"]
+        assert data["results"][1]["urgency"] == "ROUTINE"
+        print("✓ Batch analysis matches single-case analysis")
+
+    def test_batch_tolerates_bad_vitals(self, auth_headers):
+        """Unparseable or missing vitals are ignored rather than failing the batch"""
+        response = requests.post(
+            f"{BASE_URL}/api/ai/analyze-case/batch",
+            json={"cases": [{"symptoms": "fever", "vitals": {"hr": "abc"}}, {"chief_complaint": "cough"}]},
+            headers=auth_headers
+        )
+        assert response.status_code == 200, response.text
+        assert response.json()["count"] == 2
+
+    def test_batch_size_limit(self, auth_headers):
+        """Oversized batches are rejected with 400"""
+        response = requests.post(
+            f"{BASE_URL}/api/ai/analyze-case/batch",
+            json={"cases": [ROUTINE_CASE] * 100000},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
@@ -0,0 +1,58 @@
+"""
+Test suite for audio upload ingestion (/api/ai/voice-to-text, /api/jobs/voice-to-text):
+1. Uploads over the size limit are rejected with 413 before transcription
+2. Normal-sized uploads are accepted
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+# Just over the default AUDIO_MAX_UPLOAD_MB
+OVERSIZE_BYTES = 26 * 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestAudioIngest:
+    """Test upload size enforcement"""
+
+    @pytest.mark.parametrize("path", ["/api/ai/voice-to-text", "/api/jobs/voice-to-text"])
+    def test_oversize_upload_rejected(self, auth_headers, path):
+        response = requests.post(
+            f"{BASE_URL}{path}",
+            files={"file": ("long.wav", b"\0" * OVERSIZE_BYTES, "audio/wav")},
+            data={"engine": "openai", "language": "en"},
+            headers=auth_headers,
+            timeout=120
+        )
+        assert response.status_code == 413, response.text
+        print(f"✓ Oversize upload rejected on {path}")
+
+    def test_small_upload_accepted(self, auth_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/ai/voice-to-text",
+            files={"file": ("short.wav", b"\0" * 32000, "audio/wav")},
+            data={"engine": "openai", "language": "en"},
+            headers=auth_headers,
+            timeout=120
+        )
+        # Silence may not transcribe, but it must get past ingestion
+        assert response.status_code != 413, response.text
+        print(f"✓ Small upload accepted ({response.status_code})")
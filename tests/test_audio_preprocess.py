@@ -0,0 +1,107 @@
+"""
+Test suite for STT audio preprocessing (/api/ai/voice-to-text):
+1. A 44.1 kHz stereo WAV with long silences is trimmed, downmixed and resampled
+2. Encodings it cannot decode (here mu-law WAV) are sent unchanged and say why
+"""
+
+import io
+import math
+import struct
+import wave
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def stereo_wav(segments, rate=44100):
+    """16-bit stereo WAV of (seconds, is_tone) segments: a 220 Hz tone or digital silence"""
+    frames = bytearray()
+    for seconds, is_tone in segments:
+        for i in range(int(seconds * rate)):
+            sample = int(9000 * math.sin(2 * math.pi * 220 * i / rate)) if is_tone else 0
+            frames += struct.pack("<hh", sample, sample)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(2)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+def mulaw_wav(seconds, rate=8000):
+    """G.711 mu-law mono WAV of a 220 Hz tone: valid audio the preprocessor does not decode"""
+    encoded = bytearray()
+    for i in range(int(seconds * rate)):
+        sample = int(9000 * math.sin(2 * math.pi * 220 * i / rate))
+        sign = 0x80 if sample < 0 else 0
+        magnitude = min(abs(sample), 32635) + 0x84
+        exponent = min(7, magnitude.bit_length() - 8)
+        mantissa = (magnitude >> (exponent + 3)) & 0x0F
+        encoded.append(~(sign | exponent << 4 | mantissa) & 0xFF)
+    fmt = struct.pack("<HHIIHHH", 7, 1, rate, rate, 1, 8, 0)
+    body = (b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"fact" + struct.pack("<II", 4, len(encoded))
+            + b"data" + struct.pack("<I", len(encoded)) + bytes(encoded))
+    return b"RIFF" + struct.pack("<I", 4 + len(body)) + b"WAVE" + body
+
+
+def transcribe(headers, filename, data, content_type):
+    response = requests.post(
+        f"{BASE_URL}/api/ai/voice-to-text",
+        files={"file": (filename, data, content_type)},
+        data={"engine": "openai", "language": "en"},
+        headers=headers,
+        timeout=120
+    )
+    if response.status_code == 503:
+        pytest.skip("Transcription engine unavailable")
+    # The fixtures are valid audio: a 400 means what was sent upstream was broken
+    assert response.status_code != 400, response.text
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestAudioPreprocess:
+    """Test silence trimming and resampling before STT"""
+
+    def test_silence_trimmed_and_resampled(self, auth_headers):
+        audio = stereo_wav([(2, False), (1.5, True), (3, False), (1.5, True), (2, False)])
+        report = transcribe(auth_headers, "dictation.wav", audio, "audio/wav")["preprocessing"]
+        if report is None:
+            pytest.skip("Audio preprocessing disabled")
+
+        assert report["applied"] is True
+        assert report["channels"] == 2 and report["output_sample_rate"] == 16000
+        assert report["seconds_saved"] > 3
+        assert report["bytes"] < report["original_bytes"] / 5
+        print(f"✓ {report['original_bytes']} -> {report['bytes']} bytes, "
+              f"{report['original_seconds']}s -> {report['seconds']}s in {report['ms']}ms")
+
+    def test_undecodable_audio_sent_unchanged(self, auth_headers):
+        report = transcribe(auth_headers, "note.wav", mulaw_wav(3), "audio/wav")["preprocessing"]
+        if report is None:
+            pytest.skip("Audio preprocessing disabled")
+
+        assert report["applied"] is False and report["bytes_saved"] == 0
+        assert report["reason"]
+        print(f"✓ Sent unchanged: {report['reason']}")
@@ -0,0 +1,85 @@
+"""
+Test suite for chunked transcription (/api/ai/voice-to-text, chunked form field):
+1. A long recording with pauses is transcribed as several chunks, in order
+2. chunked=false sends it as one call
+"""
+
+import io
+import math
+import struct
+import wave
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def dictation_wav(seconds=90, rate=16000):
+    """16 kHz mono WAV: 4 s tone bursts separated by 1 s pauses"""
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        sample = int(9000 * math.sin(2 * math.pi * 220 * i / rate)) if (i / rate) % 5 < 4 else 0
+        frames += struct.pack("<h", sample)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def recording():
+    return dictation_wav()
+
+
+def transcribe(headers, audio, chunked):
+    response = requests.post(
+        f"{BASE_URL}/api/ai/voice-to-text",
+        files={"file": ("dictation.wav", audio, "audio/wav")},
+        data={"engine": "openai", "language": "en", "chunked": chunked},
+        headers=headers,
+        timeout=300
+    )
+    if response.status_code == 500:
+        pytest.skip("Transcription engine unavailable")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestChunkedTranscription:
+    """Test concurrent chunked STT"""
+
+    def test_long_recording_chunked(self, auth_headers, recording):
+        result = transcribe(auth_headers, recording, "true")
+        assert result["chunks"] >= 2
+        chunks = result["raw"]["chunks"]
+        assert [c["index"] for c in chunks] == list(range(len(chunks)))
+        assert all(a["end"] <= b["start"] + 1 for a, b in zip(chunks, chunks[1:]))
+        assert all(c["attempts"] >= 1 for c in chunks)
+        print(f"✓ {result['chunks']} chunks: {[(c['start'], c['end']) for c in chunks]}")
+
+    def test_chunking_disabled(self, auth_headers, recording):
+        result = transcribe(auth_headers, recording, "false")
+        assert result["chunks"] == 1
+        assert "chunks" not in result["raw"]
+        print("✓ Sent as a single call")
@@ -0,0 +1,98 @@
+"""
+Test suite for /api/extract-case-data (section-wise extraction by default):
+1. Every section of the response shape is filled from one dictation
+2. ABCDE red flags are computed once from the merged vitals
+3. /api/extract-casesheet-data returns several sections from one call and
+   serves a section re-requested for the same dictation from cache
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestExtractCaseData:
+    """Test full case sheet extraction"""
+
+    def test_sections_merged_with_red_flags(self, auth_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/extract-case-data",
+            json={"transcript": "Ramesh, 60 year old male, chest pain since two hours. Known diabetic, allergic to penicillin. "
+                                "Heart rate 140, BP 80 over 50, SpO2 84 percent, RR 32. Pallor present, chest has bilateral crepitations. "
+                                "Airway patent, started on oxygen."},
+            headers=auth_headers,
+            timeout=120
+        )
+        if response.status_code == 500:
+            pytest.skip(f"Extraction unavailable: {response.text[:200]}")
+        assert response.status_code == 200, response.text
+        data = response.json()["data"]
+
+        for key in ("patient_info", "vitals", "history", "examination", "primary_assessment"):
+            assert key in data, f"missing {key}"
+        assert data["vitals"]["hr"] == 140
+        assert data["vitals"]["bp_systolic"] == 80
+
+        red_flags = response.json()["red_flags"]
+        assert any("Hypotension" in flag for flag in red_flags)
+        assert any("hypoxia" in flag for flag in red_flags)
+        assert data["red_flags"] == red_flags
+        print(f"✓ Case sheet extracted with {len(red_flags)} red flags")
+
+
+class TestExtractCaseSheetSections:
+    """Test multi-section extraction for the case-sheet screen"""
+
+    TEXT = "Known asthmatic on salbutamol inhaler, no allergies. On exam pallor present, bilateral wheeze. Airway patent, speaking full sentences."
+
+    def test_multi_section_then_cached_single(self, auth_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/extract-casesheet-data",
+            json={"text": self.TEXT, "sections": ["history", "examination", "primary_assessment"]},
+            headers=auth_headers,
+            timeout=120
+        )
+        if response.status_code == 500:
+            pytest.skip(f"Extraction unavailable: {response.text[:200]}")
+        assert response.status_code == 200, response.text
+        sections = response.json()["sections"]
+        assert set(sections) == {"history", "examination", "primary_assessment"}
+        assert sections["examination"]["general_pallor"] is True
+
+        single = requests.post(
+            f"{BASE_URL}/api/extract-casesheet-data",
+            json={"text": self.TEXT, "section": "history"},
+            headers=auth_headers,
+            timeout=120
+        )
+        assert single.status_code == 200, single.text
+        assert single.json()["section"] == "history"
+        assert single.json()["cached"] is True
+        assert single.json()["data"] == sections["history"]
+        print("✓ Three sections in one call; re-requested section served from cache")
+
+    def test_invalid_section_400(self, auth_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/extract-casesheet-data",
+            json={"text": self.TEXT, "sections": ["history", "vitals"]},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
@@ -0,0 +1,91 @@
+"""
+Test suite for streaming extraction (progressive form fill, Server-Sent Events):
+1. POST /api/ai/extract-triage-data/stream - rule-kept fields arrive as field events, then done
+2. POST /api/extract-casesheet-data/stream - field paths are <section>.<field>
+3. Invalid sections are rejected before the stream starts
+"""
+
+import pytest
+import requests
+import os
+import json
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def read_events(response):
+    """Parse a text/event-stream body into (event, data) tuples"""
+    events = []
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+def stream(path, headers, payload):
+    response = requests.post(f"{BASE_URL}{path}", json=payload, headers=headers, stream=True, timeout=180)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = read_events(response)
+    if events and events[-1][0] == "error":
+        pytest.skip(f"Extraction unavailable: {events[-1][1]}")
+    return events
+
+
+class TestExtractionStream:
+    """Test SSE extraction endpoints"""
+
+    def test_triage_fields_then_done(self, auth_headers):
+        events = stream("/api/ai/extract-triage-data/stream", auth_headers,
+                        {"text": "Chest pain. HR 110, BP 150/90, RR 20, SpO2 96%, temp 37.2, GCS 15."})
+        assert events[-1][0] == "done"
+        done = events[-1][1]
+        fields = {data["path"]: data for event, data in events if event == "field"}
+        if done["extraction"]["sources"] is None:
+            pytest.skip("TRIAGE_EXTRACTION_MODE=llm on the server")
+
+        assert fields["vitals.hr"]["value"] == 110
+        assert fields["vitals.hr"]["source"] == "rules"
+        assert done["data"]["vitals"]["hr"] == 110
+        assert "repaired" in done
+        print(f"✓ {len(fields)} fields streamed before done")
+
+    def test_casesheet_section_paths(self, auth_headers):
+        events = stream("/api/extract-casesheet-data/stream", auth_headers, {
+            "text": "Known diabetic on metformin, allergic to penicillin. Chest clear, pallor present.",
+            "sections": ["history", "examination"]
+        })
+        assert events[-1][0] == "done"
+        for event, data in events[:-1]:
+            assert event == "field"
+            assert data["path"].split(".")[0] in ("history", "examination")
+        assert set(events[-1][1]["sections"]) == {"history", "examination"}
+        print("✓ Case sheet fields streamed per section")
+
+    def test_invalid_section_rejected(self, auth_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/extract-casesheet-data/stream",
+            json={"text": "Chest clear", "section": "vitals"},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+        print("✓ Invalid section rejected before streaming")
@@ -0,0 +1,156 @@
+"""
+Test suite for the pooled LLM gateway:
+1. /api/metrics exposes per-model limit, in-flight and waiting counts
+2. Under a burst of /api/ai/generate calls, in-flight calls per model never
+   exceed the model's concurrency limit (in the gateway or in the scheduler,
+   which holds the extra calls back), and every slot is released afterwards
+"""
+
+import pytest
+import requests
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+# Concurrent generations per unit of the default /ai/generate model's limit
+BURST_FACTOR = 2
+SAMPLE_INTERVAL_SECONDS = 0.05
+SETTLE_SECONDS = 60
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def gateway_metrics(headers):
+    response = requests.get(f"{BASE_URL}/api/metrics", headers=headers)
+    if response.status_code == 403:
+        pytest.skip("Metrics require an admin user")
+    assert response.status_code == 200, response.text
+    return response.json()["llm_gateway"]
+
+
+def create_case(headers, name):
+    response = requests.post(
+        f"{BASE_URL}/api/cases",
+        json={
+            "patient": {
+                "name": name,
+                "age": "47",
+                "sex": "Female",
+                "arrival_datetime": datetime.now().isoformat(),
+                "mode_of_arrival": "Walk-in"
+            },
+            "vitals_at_arrival": {"hr": 104, "bp_systolic": 132, "bp_diastolic": 84, "rr": 20, "spo2": 96, "temperature": 38.4},
+            "presenting_complaint": {"text": "Fever with productive cough", "duration": "4 days", "onset_type": "Gradual"},
+            "em_resident": "Dr. Test Resident"
+        },
+        headers=headers
+    )
+    assert response.status_code == 200, f"Failed to create case: {response.text}"
+    return response.json()["id"]
+
+
+def generate(headers, case_id):
+    return requests.post(
+        f"{BASE_URL}/api/ai/generate",
+        json={"case_sheet_id": case_id, "prompt_type": "diagnosis_suggestions"},
+        headers=headers,
+        timeout=300
+    )
+
+
+class MetricsSampler:
+    """Polls /api/metrics llm_gateway and llm_scheduler in a background thread"""
+
+    def __init__(self, headers):
+        self.headers = headers
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            response = requests.get(f"{BASE_URL}/api/metrics", headers=self.headers)
+            if response.status_code == 200:
+                metrics = response.json()
+                self.samples.append({
+                    "gateway": metrics["llm_gateway"]["models"],
+                    "scheduler": metrics["llm_scheduler"],
+                })
+            time.sleep(SAMPLE_INTERVAL_SECONDS)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class TestLLMGateway:
+    """Test per-model concurrency caps"""
+
+    def test_metrics_expose_models(self, auth_headers):
+        metrics = gateway_metrics(auth_headers)
+        assert metrics["default_limit"] >= 1
+        for model, stats in metrics["models"].items():
+            assert stats["limit"] >= 1
+            assert 0 <= stats["in_flight"] <= stats["limit"], model
+            assert stats["waiting"] >= 0
+        print(f"✓ Gateway models: {sorted(metrics['models'])}")
+
+    def test_model_cap_holds_under_burst(self, auth_headers):
+        """More concurrent generations than a model allows: the extra calls wait"""
+        first = generate(auth_headers, create_case(auth_headers, "TEST_Gateway_Probe"))
+        if first.status_code in (403, 429, 500):
+            pytest.skip(f"AI generation unavailable: {first.text[:200]}")
+        assert first.status_code == 200, first.text
+        model = first.json()["model"]
+        limit = gateway_metrics(auth_headers)["models"][model]["limit"]
+
+        case_ids = [create_case(auth_headers, f"TEST_Gateway_Burst_{i}") for i in range(limit * BURST_FACTOR)]
+        with MetricsSampler(auth_headers) as sampler:
+            with ThreadPoolExecutor(max_workers=len(case_ids)) as pool:
+                responses = list(pool.map(lambda case_id: generate(auth_headers, case_id), case_ids))
+        if any(r.status_code == 429 for r in responses):
+            pytest.skip("Ran out of AI credits during the burst")
+
+        for sample in sampler.samples:
+            for name, stats in sample["gateway"].items():
+                assert stats["in_flight"] <= stats["limit"], f"{name}: {stats}"
+            for name, stats in sample["scheduler"]["models"].items():
+                assert stats["limit"] is None or stats["in_flight"] <= stats["limit"], f"{name}: {stats}"
+        peak = max((sample["gateway"].get(model, {}).get("in_flight", 0) for sample in sampler.samples), default=0)
+        # Extra calls wait in the scheduler for a model slot (or, without one, on the gateway)
+        queued = max((sample["gateway"].get(model, {}).get("waiting", 0)
+                      + sum(c["queued"] for c in sample["scheduler"]["classes"].values())
+                      for sample in sampler.samples), default=0)
+
+        # A generation abandoned for the rule-based fallback can still be finishing
+        deadline = time.time() + SETTLE_SECONDS
+        after = gateway_metrics(auth_headers)["models"][model]
+        while (after["in_flight"] or after["waiting"]) and time.time() < deadline:
+            time.sleep(0.5)
+            after = gateway_metrics(auth_headers)["models"][model]
+        assert after["in_flight"] == 0 and after["waiting"] == 0, after
+        if not queued:
+            pytest.skip(f"Burst never queued on {model} (peak in flight {peak}/{limit})")
+        print(f"✓ {model}: peak {peak}/{limit} in flight, up to {queued} waiting over {len(sampler.samples)} samples")
@@ -0,0 +1,173 @@
+"""
+Test suite for priority scheduling of outbound LLM calls:
+1. /api/metrics exposes per-class queued, in-flight and dispatched counts
+2. With every scheduler slot taken by routine work (discharge summaries),
+   critical requests (red flags for a RED case) reach the upstream model
+   ahead of the routine requests already queued
+"""
+
+import pytest
+import requests
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+# Routine requests beyond the scheduler budget, so some of them queue whatever the model caps
+ROUTINE_BACKLOG = 4
+CRITICAL_REQUESTS = 3
+CONTENTION_WAIT_SECONDS = 30
+SAMPLE_INTERVAL_SECONDS = 0.05
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def scheduler_metrics(headers):
+    response = requests.get(f"{BASE_URL}/api/metrics", headers=headers)
+    if response.status_code == 403:
+        pytest.skip("Metrics require an admin user")
+    assert response.status_code == 200, response.text
+    return response.json()["llm_scheduler"]
+
+
+def create_case(headers, name, triage_priority=None):
+    """A case; triage_priority 1 makes interactive prompts critical (no triage colour, so no speculation)"""
+    response = requests.post(
+        f"{BASE_URL}/api/cases",
+        json={
+            "patient": {
+                "name": name,
+                "age": "58",
+                "sex": "Male",
+                "arrival_datetime": datetime.now().isoformat(),
+                "mode_of_arrival": "Ambulance"
+            },
+            "vitals_at_arrival": {"hr": 124, "bp_systolic": 88, "bp_diastolic": 54, "rr": 26, "spo2": 90, "temperature": 38.6},
+            "presenting_complaint": {"text": "Breathlessness with chest pain", "duration": "6 hours", "onset_type": "Sudden"},
+            "triage_priority": triage_priority,
+            "em_resident": "Dr. Test Resident"
+        },
+        headers=headers
+    )
+    assert response.status_code == 200, f"Failed to create case: {response.text}"
+    return response.json()["id"]
+
+
+def generate(headers, case_id, prompt_type):
+    return requests.post(
+        f"{BASE_URL}/api/ai/generate",
+        json={"case_sheet_id": case_id, "prompt_type": prompt_type},
+        headers=headers,
+        timeout=300
+    )
+
+
+class SchedulerSampler:
+    """Polls /api/metrics in a background thread: scheduler classes and upstream starts per model"""
+
+    def __init__(self, headers):
+        self.headers = headers
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            response = requests.get(f"{BASE_URL}/api/metrics", headers=self.headers)
+            if response.status_code == 200:
+                metrics = response.json()
+                self.samples.append({
+                    "classes": metrics["llm_scheduler"]["classes"],
+                    "started": {model: stats.get("started", {})
+                                for model, stats in metrics["llm_gateway"]["models"].items()}
+                })
+            time.sleep(SAMPLE_INTERVAL_SECONDS)
+
+    def wait_for(self, condition, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.samples and condition(self.samples[-1]["classes"]):
+                return True
+            time.sleep(SAMPLE_INTERVAL_SECONDS)
+        return False
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class TestLLMScheduler:
+    """Test strict priority between scheduler classes"""
+
+    def test_metrics_expose_classes(self, auth_headers):
+        metrics = scheduler_metrics(auth_headers)
+        assert metrics["max_concurrency"] >= 1
+        assert list(metrics["classes"]) == ["critical", "urgent", "routine", "background"]
+        for name, stats in metrics["classes"].items():
+            assert stats["queued"] >= 0 and stats["in_flight"] >= 0, name
+        print(f"✓ Scheduler budget {metrics['max_concurrency']}, classes {list(metrics['classes'])}")
+
+    def test_critical_served_before_queued_routine(self, auth_headers):
+        """Once critical requests are queued, no routine call starts upstream ahead of them"""
+        probe = generate(auth_headers, create_case(auth_headers, "TEST_Scheduler_Probe"), "discharge_summary")
+        if probe.status_code in (403, 429, 500):
+            pytest.skip(f"AI generation unavailable: {probe.text[:200]}")
+        assert probe.status_code == 200, probe.text
+
+        budget = scheduler_metrics(auth_headers)["max_concurrency"]
+        routine_ids = [create_case(auth_headers, f"TEST_Scheduler_Routine_{i}") for i in range(budget + ROUTINE_BACKLOG)]
+        critical_ids = [create_case(auth_headers, f"TEST_Scheduler_Critical_{i}", 1) for i in range(CRITICAL_REQUESTS)]
+
+        with SchedulerSampler(auth_headers) as sampler:
+            with ThreadPoolExecutor(max_workers=len(routine_ids) + len(critical_ids)) as pool:
+                routine = [pool.submit(generate, auth_headers, case_id, "discharge_summary") for case_id in routine_ids]
+                contended = sampler.wait_for(lambda classes: classes["routine"]["queued"] > 0, CONTENTION_WAIT_SECONDS)
+                critical = [pool.submit(generate, auth_headers, case_id, "red_flags") for case_id in critical_ids]
+                responses = [future.result() for future in routine + critical]
+        if any(r.status_code in (403, 429) for r in responses):
+            pytest.skip("Ran out of AI credits during the burst")
+        if not contended:
+            pytest.skip("No routine request had to queue")
+        models = {r.json().get("model") for r in responses if r.status_code == 200}
+        if len(models) != 1 or any(r.json().get("degraded") for r in responses if r.status_code == 200):
+            pytest.skip(f"Requests did not all reach one model ({models})")
+        model = models.pop()
+
+        def started(sample, priority_class):
+            return sample["started"].get(model, {}).get(priority_class, 0)
+
+        # Between two samples, a routine call starting upstream means every
+        # critical request queued at the first sample had already started
+        checked = 0
+        for before, after in zip(sampler.samples, sampler.samples[1:]):
+            queued = before["classes"]["critical"]["queued"]
+            if queued and started(after, "routine") > started(before, "routine"):
+                checked += 1
+                assert started(after, "critical") >= started(before, "critical") + queued, (before, after)
+        if not any(sample["classes"]["critical"]["queued"] for sample in sampler.samples):
+            pytest.skip("No critical request had to queue")
+
+        wait = scheduler_metrics(auth_headers)["classes"]
+        print(f"✓ Critical calls started first on {model} ({checked} routine starts checked); "
+              f"queue wait critical {wait['critical']['queue_wait']}, routine {wait['routine']['queue_wait']}")
@@ -0,0 +1,83 @@
+"""
+Test suite for the latency-aware model router:
+1. /api/ai/generate responses carry the routing decision and the model used
+2. /api/metrics exposes per-model health and decision counts
+"""
+
+import pytest
+import requests
+import os
+from datetime import datetime
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+ROUTING_REASONS = ("preferred", "plan", "slo_p95_latency", "slo_error_rate", "all_degraded")
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def case_id(auth_headers):
+    response = requests.post(
+        f"{BASE_URL}/api/cases",
+        json={
+            "patient": {
+                "name": "TEST_Model_Router_Patient",
+                "age": "38",
+                "sex": "Male",
+                "arrival_datetime": datetime.now().isoformat(),
+                "mode_of_arrival": "Walk-in"
+            },
+            "vitals_at_arrival": {"hr": 102, "bp_systolic": 124, "bp_diastolic": 80, "rr": 20, "spo2": 97, "temperature": 38.2},
+            "presenting_complaint": {"text": "Headache with fever", "duration": "2 days", "onset_type": "Gradual"},
+            "em_resident": "Dr. Test Resident"
+        },
+        headers=auth_headers
+    )
+    assert response.status_code == 200, f"Failed to create case: {response.text}"
+    return response.json()["id"]
+
+
+class TestModelRouter:
+    """Test routing decisions on responses and in metrics"""
+
+    def test_generate_records_routing(self, auth_headers, case_id):
+        response = requests.post(
+            f"{BASE_URL}/api/ai/generate",
+            json={"case_sheet_id": case_id, "prompt_type": "diagnosis_suggestions"},
+            headers=auth_headers,
+            timeout=120
+        )
+        if response.status_code in (403, 429, 500):
+            pytest.skip(f"AI generation unavailable: {response.text[:200]}")
+        assert response.status_code == 200, response.text
+        body = response.json()
+
+        routing = body["routing"]
+        assert routing["task"] == "ai_generate"
+        assert routing["reason"] in ROUTING_REASONS
+        assert body["model"] == routing["model"]
+        print(f"✓ Routed to {routing['model']} ({routing['reason']})")
+
+    def test_metrics_expose_router(self, auth_headers):
+        response = requests.get(f"{BASE_URL}/api/metrics", headers=auth_headers)
+        if response.status_code == 403:
+            pytest.skip("Metrics require an admin user")
+        assert response.status_code == 200
+        router = response.json()["model_router"]
+        assert "models" in router and "decisions" in router
+        print(f"✓ Router metrics: {router['decisions']}")
@@ -0,0 +1,91 @@
+"""
+Test suite for the transcription cache (/api/ai/voice-to-text, /api/transcribe-audio):
+1. Resubmitting the same audio is answered from the cache
+2. A different language is a different cache entry
+3. /api/metrics reports the STT cache hit rate
+"""
+
+import io
+import math
+import struct
+import uuid
+import wave
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def recording():
+    """3 s 16 kHz tone with a random pitch, so earlier runs have not cached it"""
+    rate, pitch = 16000, 200 + uuid.uuid4().int % 200
+    frames = b"".join(struct.pack("<h", int(9000 * math.sin(2 * math.pi * pitch * i / rate))) for i in range(3 * rate))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(frames)
+    return buffer.getvalue()
+
+
+def transcribe(headers, audio, language="en", filename="note.wav"):
+    response = requests.post(
+        f"{BASE_URL}/api/ai/voice-to-text",
+        files={"file": (filename, audio, "audio/wav")},
+        data={"engine": "openai", "language": language},
+        headers=headers,
+        timeout=120
+    )
+    if response.status_code == 500:
+        pytest.skip("Transcription engine unavailable")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestSTTCache:
+    """Test the audio-hash transcription cache"""
+
+    def test_resubmission_cached(self, auth_headers, recording):
+        first = transcribe(auth_headers, recording)
+        if first["cached"]:
+            pytest.skip("Recording already cached")
+        # A retried upload may carry a different filename; the bytes decide
+        second = transcribe(auth_headers, recording, filename="retry.wav")
+        assert second["cached"] is True
+        assert second["transcription"] == first["transcription"]
+        print("✓ Resubmission served from cache")
+
+    def test_language_is_part_of_key(self, auth_headers, recording):
+        transcribe(auth_headers, recording, language="en")
+        other = transcribe(auth_headers, recording, language="hi")
+        assert other["cached"] is False
+        print("✓ Different language missed the cache")
+
+    def test_metrics_hit_rate(self, auth_headers):
+        response = requests.get(f"{BASE_URL}/api/metrics", headers=auth_headers)
+        if response.status_code == 403:
+            pytest.skip("Metrics require an admin user")
+        assert response.status_code == 200
+        stats = response.json()["stt_cache"]
+        assert {"hit_rate", "lookups", "coalesced", "ttl_seconds"} <= set(stats)
+        print(f"✓ STT cache hit rate {stats['hit_rate']} over {stats['lookups']} lookups")
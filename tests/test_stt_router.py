@@ -0,0 +1,82 @@
+"""
+Test suite for STT engine routing (/api/ai/voice-to-text):
+1. Responses report the routing decision (preferred engine, engine used, hedging)
+2. /api/metrics exposes per-engine health and circuit breakers
+"""
+
+import io
+import math
+import struct
+import uuid
+import wave
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def tone_wav(seconds=2, rate=16000):
+    """Short tone with a random pitch, so the transcription cache does not answer"""
+    pitch = 200 + uuid.uuid4().int % 200
+    frames = b"".join(struct.pack("<h", int(9000 * math.sin(2 * math.pi * pitch * i / rate)))
+                      for i in range(seconds * rate))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(frames)
+    return buffer.getvalue()
+
+
+class TestSTTRouter:
+    """Test health-aware STT routing"""
+
+    @pytest.mark.parametrize("engine", ["auto", "openai"])
+    def test_routing_reported(self, auth_headers, engine):
+        response = requests.post(
+            f"{BASE_URL}/api/ai/voice-to-text",
+            files={"file": ("note.wav", tone_wav(), "audio/wav")},
+            data={"engine": engine, "language": "en"},
+            headers=auth_headers,
+            timeout=120
+        )
+        if response.status_code in (500, 503):
+            pytest.skip("Transcription engines unavailable")
+        assert response.status_code == 200, response.text
+        routing = response.json()["routing"]
+        assert routing["preferred"] == "openai"
+        assert routing["engine"] == response.json()["engine_used"]
+        assert routing["reason"] in ("preferred", "breaker_open", "error_rate", "p95_latency")
+        assert isinstance(routing["hedged"], bool) and isinstance(routing["failover"], bool)
+        print(f"✓ engine={engine}: {routing}")
+
+    def test_metrics_expose_engine_health(self, auth_headers):
+        response = requests.get(f"{BASE_URL}/api/metrics", headers=auth_headers)
+        if response.status_code == 403:
+            pytest.skip("Metrics require an admin user")
+        assert response.status_code == 200
+        router = response.json()["stt_router"]
+        assert {"openai", "sarvam"} <= set(router["engines"])
+        for health in router["engines"].values():
+            assert health["breaker"]["state"] in ("closed", "open", "half_open")
+        assert {"hedges", "hedge_wins", "failovers", "decisions"} <= set(router)
+        print(f"✓ Engines: {[(e, h['breaker']['state']) for e, h in router['engines'].items()]}")
@@ -0,0 +1,103 @@
+"""
+Test suite for the rule-first triage extraction cascade (/api/ai/extract-triage-data):
+1. A clean dictation is resolved by the rules without an LLM call
+2. Negated symptoms are not flagged
+3. Spoken numbers are escalated to the LLM for just the unresolved fields
+4. /api/extract-triage-data shares the rule stage
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def extract(headers, text):
+    response = requests.post(
+        f"{BASE_URL}/api/ai/extract-triage-data",
+        json={"text": text},
+        headers=headers,
+        timeout=120
+    )
+    if response.status_code == 500:
+        pytest.skip(f"Extraction unavailable: {response.text[:200]}")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+class TestTriageExtractionCascade:
+    """Test rule-first extraction with LLM escalation"""
+
+    def test_clean_dictation_skips_llm(self, auth_headers):
+        result = extract(auth_headers, "Chest pain. HR 110, BP 150/90, RR 20, SpO2 96%, temp 37.2, GCS 15.")
+        if result["extraction"]["sources"] is None:
+            pytest.skip("TRIAGE_EXTRACTION_MODE=llm on the server")
+
+        assert result["extraction"]["llm_used"] is False
+        vitals = result["data"]["vitals"]
+        assert vitals["hr"] == 110
+        assert (vitals["bp_systolic"], vitals["bp_diastolic"]) == (150, 90)
+        assert (vitals["gcs_e"], vitals["gcs_v"], vitals["gcs_m"]) == (4, 5, 6)
+        assert result["data"]["symptoms"]["chest_pain"] is True
+        assert result["extraction"]["sources"]["vitals.hr"] == "rules"
+        print("✓ Clean dictation resolved by rules")
+
+    def test_negated_symptoms(self, auth_headers):
+        result = extract(auth_headers, "Cough. No fever, no chest pain. HR 88, BP 120/80, SpO2 98%.")
+        symptoms = result["data"]["symptoms"]
+        assert symptoms["mild_respiratory_symptoms"] is True
+        assert symptoms["fever"] is False
+        assert symptoms["chest_pain"] is False
+        print("✓ Negated symptoms not flagged")
+
+    def test_spoken_numbers_escalate(self, auth_headers):
+        result = extract(auth_headers, "um the patient patient has chest pain, BP one forty over ninety, heart rate 100")
+        if result["extraction"]["sources"] is None:
+            pytest.skip("TRIAGE_EXTRACTION_MODE=llm on the server")
+
+        assert result["extraction"]["llm_used"] is True
+        assert result["extraction"]["unresolved"]
+        print(f"✓ Escalated: {result['extraction']['unresolved']}")
+
+
+class TestRuleParserShared:
+    """/api/extract-triage-data parses with the cascade's rule stage"""
+
+    def test_endpoints_agree(self, auth_headers):
+        text = "45 year old male, shortness of breath and chest pain, no fever. HR 120, BP 150/90, SpO2 91%"
+        response = requests.post(
+            f"{BASE_URL}/api/extract-triage-data",
+            json={"text": text},
+            headers=auth_headers
+        )
+        assert response.status_code == 200, response.text
+        quick = response.json()
+        cascade = extract(auth_headers, text)
+        if cascade["extraction"]["sources"] is None:
+            pytest.skip("TRIAGE_EXTRACTION_MODE=llm on the server")
+
+        assert quick["age"] == 45
+        assert quick["symptoms"]["moderate_respiratory_distress"] is True
+        assert quick["symptoms"]["fever"] is False
+        for field in ("moderate_respiratory_distress", "severe_respiratory_distress", "chest_pain", "fever"):
+            assert quick["symptoms"][field] == cascade["data"]["symptoms"][field], field
+        for field in ("hr", "bp_systolic", "bp_diastolic"):
+            assert quick["vitals"][field] == cascade["data"]["vitals"][field], field
+        print("✓ Both extraction endpoints read the dictation the same way")
@@ -0,0 +1,122 @@
+"""
+Test suite for triage history endpoints:
+1. GET /api/triage - time-window + priority filters with keyset pagination
+2. GET /api/triage/recent - recent arrivals served from the in-memory ring buffer
+"""
+
+import pytest
+import requests
+import os
+from datetime import datetime, timedelta
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def create_red_triage(headers):
+    """Create a RED triage record (SpO2 85%)"""
+    response = requests.post(
+        f"{BASE_URL}/api/triage/create",
+        json={
+            "age_group": "adult",
+            "vitals": {"hr": 110, "spo2": 85, "bp_systolic": 120, "bp_diastolic": 80, "rr": 22},
+            "symptoms": {},
+            "mechanism": "medical",
+            "triaged_by": TEST_EMAIL
+        },
+        headers=headers
+    )
+    assert response.status_code == 200, f"Triage create failed: {response.text}"
+    return response.json()
+
+
+class TestTriageHistory:
+    """Test GET /api/triage filters and pagination"""
+
+    def test_priority_filter(self, auth_headers):
+        """Only records of the requested priority are returned"""
+        create_red_triage(auth_headers)
+
+        response = requests.get(
+            f"{BASE_URL}/api/triage",
+            params={"priority": "red", "hours": 1},
+            headers=auth_headers
+        )
+        assert response.status_code == 200, response.text
+
+        data = response.json()
+        assert len(data) >= 1
+        assert all(t["priority_color"] == "red" for t in data)
+        print(f"✓ Priority filter returned {len(data)} RED records")
+
+    def test_invalid_priority_filter(self, auth_headers):
+        """Unknown priority values are rejected with 400"""
+        response = requests.get(
+            f"{BASE_URL}/api/triage",
+            params={"priority": "purple"},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+
+    def test_keyset_pagination(self, auth_headers):
+        """Pages follow each other without overlap"""
+        create_red_triage(auth_headers)
+        create_red_triage(auth_headers)
+
+        first = requests.get(f"{BASE_URL}/api/triage", params={"limit": 1}, headers=auth_headers)
+        assert first.status_code == 200
+        cursor = first.headers.get("X-Next-Cursor")
+        assert cursor, "Expected X-Next-Cursor header when more records exist"
+
+        second = requests.get(
+            f"{BASE_URL}/api/triage",
+            params={"limit": 1, "cursor": cursor},
+            headers=auth_headers
+        )
+        assert second.status_code == 200
+        assert len(second.json()) == 1
+        assert second.json()[0]["id"] != first.json()[0]["id"]
+        assert second.json()[0]["triaged_at"] <= first.json()[0]["triaged_at"]
+        print("✓ Keyset pagination returned consecutive pages")
+
+    def test_future_window_is_empty(self, auth_headers):
+        """A window entirely in the future returns nothing"""
+        since = (datetime.now() + timedelta(days=1)).isoformat()
+        response = requests.get(f"{BASE_URL}/api/triage", params={"since": since}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == []
+
+
+class TestRecentTriage:
+    """Test GET /api/triage/recent"""
+
+    def test_recent_includes_new_triage(self, auth_headers):
+        """A freshly created triage shows up in the recent arrivals view"""
+        created = create_red_triage(auth_headers)
+
+        response = requests.get(f"{BASE_URL}/api/triage/recent", params={"hours": 1}, headers=auth_headers)
+        assert response.status_code == 200, response.text
+
+        ids = [t["id"] for t in response.json()]
+        assert created["id"] in ids
+        print(f"✓ Recent arrivals contains new triage {created['id']}")
+
+    def test_recent_window_is_bounded(self, auth_headers):
+        """Windows beyond the buffer size are rejected"""
+        response = requests.get(f"{BASE_URL}/api/triage/recent", params={"hours": 1000}, headers=auth_headers)
+        assert response.status_code == 400
@@ -0,0 +1,64 @@
+"""
+Test suite for the shared upstream HTTP pool:
+1. /api/metrics exposes per-upstream pool stats (LLM, Sarvam)
+2. Repeated LLM calls reuse pooled connections
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+TEST_EMAIL = "test@test.com"
+TEST_PASSWORD = "Test123!"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with auth token"""
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": TEST_EMAIL, "password": TEST_PASSWORD}
+    )
+    if response.status_code != 200:
+        pytest.skip("Authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def upstream_metrics(headers):
+    response = requests.get(f"{BASE_URL}/api/metrics", headers=headers)
+    if response.status_code == 403:
+        pytest.skip("Metrics require an admin user")
+    assert response.status_code == 200
+    return response.json()["upstream_http"]
+
+
+class TestUpstreamPool:
+    """Test pooled outbound HTTP"""
+
+    def test_metrics_expose_upstreams(self, auth_headers):
+        metrics = upstream_metrics(auth_headers)
+        assert {"llm", "sarvam"} <= set(metrics["upstreams"])
+        for upstream in metrics["upstreams"].values():
+            assert upstream["max_connections"] > 0
+            assert upstream["requests"] >= upstream["new_connections"] or upstream["requests"] == 0
+        print(f"✓ Upstreams: {sorted(metrics['upstreams'])}, HTTP/2 available: {metrics['http2_available']}")
+
+    def test_llm_connections_reused(self, auth_headers):
+        for _ in range(3):
+            response = requests.post(
+                f"{BASE_URL}/api/ai/extract-triage-data",
+                json={"text": "um patient has chest pain, BP one forty over ninety"},
+                headers=auth_headers,
+                timeout=120
+            )
+            if response.status_code == 500:
+                pytest.skip("LLM unavailable")
+
+        llm = upstream_metrics(auth_headers)["upstreams"]["llm"]
+        if llm["requests"] < 2:
+            pytest.skip("No LLM traffic recorded on this worker")
+        assert llm["new_connections"] < llm["requests"]
+        print(f"✓ LLM connection reuse {llm['connection_reuse']}")